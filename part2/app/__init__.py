@@ -2,7 +2,10 @@ from flask import Flask
 from flask_restx import Api
 
 def create_app():
+    from app.services.metrics import metrics
+    
     app = Flask(__name__)
+    app.before_request(metrics.record_request)
     
     # Configure the API
     api = Api(app, 
@@ -17,11 +20,13 @@ def create_app():
     from app.api.v1.places import api as api_places
     from app.api.v1.reviews import api as api_reviews
     from app.api.v1.amenities import api as api_amenities
+    from app.api.v1.autocomplete import api as api_autocomplete
     
     api.add_namespace(api_health, path='/api/v1/health')
     api.add_namespace(api_users, path='/api/v1/users')
     api.add_namespace(api_places, path='/api/v1/places')
     api.add_namespace(api_reviews, path='/api/v1/reviews')
     api.add_namespace(api_amenities, path='/api/v1/amenities')
+    api.add_namespace(api_autocomplete, path='/api/v1/autocomplete')
     
     return app
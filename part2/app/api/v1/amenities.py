@@ -1,5 +1,8 @@
 from flask_restx import Namespace, Resource, fields
 
+from app.api.v1.pagination import page_params, page_args, page_headers
+from app.api.v1.batch import batch_model, run_batch
+
 api = Namespace('amenities', description='Amenity operations')
 
 # Model for Swagger documentation
@@ -17,11 +20,17 @@ amenity_response_model = api.model('AmenityResponse', {
 @api.route('/')
 class AmenityList(Resource):
     @api.marshal_list_with(amenity_response_model)
+    @api.doc(params=page_params)
+    @api.response(400, 'Invalid limit or cursor')
     def get(self):
         """List all amenities"""
         from app.services import facade
-        amenities = facade.get_all_amenities()
-        return [amenity.to_dict() for amenity in amenities], 200
+        limit, cursor = page_args(api)
+        try:
+            amenities, next_cursor = facade.get_amenities_page(limit, cursor)
+        except ValueError as e:
+            api.abort(400, str(e))
+        return [amenity.to_dict() for amenity in amenities], 200, page_headers(next_cursor)
     
     @api.expect(amenity_model)
     @api.marshal_with(amenity_response_model, code=201)
@@ -37,6 +46,17 @@ class AmenityList(Resource):
         except ValueError as e:
             api.abort(400, str(e))
 
+@api.route('/batch')
+class AmenityBatch(Resource):
+    @api.expect(batch_model(api, 'AmenityBatch', amenity_model))
+    @api.response(200, 'Per-item results')
+    @api.response(400, 'Malformed batch')
+    def post(self):
+        """Create, update and delete several amenities in one request"""
+        from app.services import facade
+        return run_batch(api, create=facade.create_amenities, update=facade.update_amenities,
+                         delete=facade.delete_amenities)
+
 @api.route('/<string:amenity_id>')
 class Amenity(Resource):
     @api.marshal_with(amenity_response_model)
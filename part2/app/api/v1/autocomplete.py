@@ -0,0 +1,50 @@
+from flask import request
+from flask_restx import Namespace, Resource, fields
+
+from app.persistence.autocomplete import MAX_COMPLETIONS
+
+api = Namespace('autocomplete', description='Type-ahead suggestions')
+
+DEFAULT_COMPLETIONS = 10
+
+completion_model = api.model('Completion', {
+    'id': fields.String(description='Place or user ID'),
+    'label': fields.String(description='Place title, or user name and email'),
+    'popularity': fields.Integer(description='Review count of a place; 0 for users')
+})
+
+
+def place_completion(place):
+    return {'id': place.id, 'label': place.title, 'popularity': place.ratings.count}
+
+
+def user_completion(user):
+    return {'id': user.id, 'label': f'{user.first_name} {user.last_name} <{user.email}>',
+            'popularity': 0}
+
+
+@api.route('/')
+class Autocomplete(Resource):
+    @api.marshal_list_with(completion_model)
+    @api.doc(params={
+        'q': 'What has been typed, matched from the start of any word of a title, name or email',
+        'type': 'places (default) or users',
+        'k': f'Number of suggestions (default {DEFAULT_COMPLETIONS}, at most {MAX_COMPLETIONS})'
+    })
+    @api.response(400, 'Missing q, unknown type or invalid k')
+    def get(self):
+        """Suggest places by title, most reviewed first, or users by name or email"""
+        from app.services import facade
+        text = request.args.get('q', '')
+        kind = request.args.get('type', 'places')
+        k = request.args.get('k', DEFAULT_COMPLETIONS, type=int)
+        if not text.strip():
+            api.abort(400, "q must not be empty")
+        if k < 1:
+            api.abort(400, "k must be a positive integer")
+        k = min(k, MAX_COMPLETIONS)
+        if kind == 'places':
+            return [place_completion(place) for place in facade.autocomplete_places(text, k)], 200
+        if kind == 'users':
+            return [user_completion(user) for user in facade.autocomplete_users(text, k)], 200
+        api.abort(400, "type must be 'places' or 'users'")
@@ -0,0 +1,64 @@
+"""Request handling shared by the POST /<collection>/batch endpoints
+
+The body holds up to three lists of operations::
+
+    {"create": [{...}, ...], "update": [{"id": "...", ...}, ...], "delete": ["<id>", ...]}
+
+The response has one result per operation, in the same order, carrying the
+status the single-item endpoint would have answered with, plus the object
+or an error message. A failed item does not stop the others.
+"""
+from flask_restx import fields
+
+MAX_BATCH_SIZE = 1000
+
+
+def batch_model(api, name, item_model, update=True, delete=True):
+    """Swagger model for a batch request of item_model objects"""
+    spec = {'create': fields.List(fields.Nested(item_model), description='Objects to create')}
+    if update:
+        spec['update'] = fields.List(fields.Raw, description='Objects holding an id and the fields to change')
+    if delete:
+        spec['delete'] = fields.List(fields.String, description='IDs of the objects to delete')
+    return api.model(name, spec)
+
+
+def _result(result, status):
+    if result is None:
+        return {'status': 404, 'error': 'Not found'}
+    if isinstance(result, ValueError):
+        return {'status': 400, 'error': str(result)}
+    return {'status': status, 'data': result.to_dict()}
+
+
+def run_batch(api, create=None, update=None, delete=None):
+    """Validate the batch payload, dispatch it to the facade and build the response
+
+    Args:
+        api: Namespace used to abort on a malformed payload
+        create, update, delete: Facade batch methods; None for operations
+            the collection does not support
+    """
+    payload = api.payload
+    handlers = {'create': create, 'update': update, 'delete': delete}
+    if not isinstance(payload, dict):
+        api.abort(400, "Batch payload must be an object")
+    for operation, items in payload.items():
+        if handlers.get(operation) is None:
+            api.abort(400, f"Unsupported batch operation '{operation}'")
+        if not isinstance(items, list):
+            api.abort(400, f"'{operation}' must be a list")
+    if sum(len(items) for items in payload.values()) > MAX_BATCH_SIZE:
+        api.abort(400, f"A batch holds at most {MAX_BATCH_SIZE} operations")
+    if not all(isinstance(item, dict) for item in payload.get('create', []) + payload.get('update', [])):
+        api.abort(400, "Items to create or update must be objects")
+
+    response = {}
+    if 'create' in payload:
+        response['create'] = [_result(result, 201) for result in create(payload['create'])]
+    if 'update' in payload:
+        response['update'] = [_result(result, 200) for result in update(payload['update'])]
+    if 'delete' in payload:
+        response['delete'] = [{'id': obj_id, 'status': 200 if deleted else 404}
+                              for obj_id, deleted in zip(payload['delete'], delete(payload['delete']))]
+    return response, 200
@@ -1,5 +1,6 @@
 from flask_restx import Namespace, Resource, fields
 from app.services import facade
+from app.services.metrics import metrics
 
 api = Namespace('health', description='Health check')
 
@@ -7,7 +8,8 @@ health_response_model = api.model('HealthResponse', {
     'status': fields.String(description='Overall status'),
     'timestamp': fields.DateTime(description='Current timestamp'),
     'services': fields.Raw(description='Service status'),
-    'counts': fields.Raw(description='Entity counts')
+    'counts': fields.Raw(description='Entity counts'),
+    'process': fields.Raw(description='RSS, uptime and request rate of the API process')
 })
 
 @api.route('/')
@@ -17,12 +19,7 @@ class Health(Resource):
         """Get system health status"""
         from datetime import datetime
         
-        # Get counts from facade
-        user_count = len(facade.get_all_users())
-        place_count = len(facade.get_all_places())
-        review_count = len(facade.get_all_reviews())
-        amenity_count = len(facade.get_all_amenities())
-        
+        # Counters kept by the repositories; nothing is copied or loaded
         return {
             'status': 'healthy',
             'timestamp': datetime.now(),
@@ -30,10 +27,6 @@ class Health(Resource):
                 'database': 'connected',
                 'api': 'running'
             },
-            'counts': {
-                'users': user_count,
-                'places': place_count,
-                'reviews': review_count,
-                'amenities': amenity_count
-            }
+            'counts': facade.get_counts(),
+            'process': metrics.snapshot()
         }, 200
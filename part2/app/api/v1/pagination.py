@@ -0,0 +1,39 @@
+"""Query parameters and response headers shared by the paginated list endpoints
+
+Lists come in pages of DEFAULT_PAGE_SIZE unless the client sends limit,
+so a request never costs more than one page. A page that is not the last
+one carries the cursor of the next page in the X-Next-Cursor header and
+a Link header with rel="next".
+"""
+from urllib.parse import urlencode
+
+from flask import request
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+page_params = {
+    'limit': f'Page size (default {DEFAULT_PAGE_SIZE}, at most {MAX_PAGE_SIZE})',
+    'cursor': 'Opaque cursor from the X-Next-Cursor header of the previous page'
+}
+
+
+def page_args(api):
+    """Return (limit, cursor); limit defaults to DEFAULT_PAGE_SIZE, cursor to None"""
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    cursor = request.args.get('cursor')
+    if limit < 1:
+        api.abort(400, "limit must be a positive integer")
+    return min(limit, MAX_PAGE_SIZE), cursor
+
+
+def page_headers(next_cursor):
+    """Response headers pointing at the next page, if there is one"""
+    if next_cursor is None:
+        return {}
+    args = request.args.to_dict()
+    args['cursor'] = next_cursor
+    return {
+        'X-Next-Cursor': next_cursor,
+        'Link': f'<{request.base_url}?{urlencode(args)}>; rel="next"'
+    }
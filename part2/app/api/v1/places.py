@@ -1,4 +1,10 @@
-from flask_restx import Namespace, Resource, fields
+import math
+
+from flask import request
+from flask_restx import Namespace, Resource, fields, marshal
+
+from app.api.v1.pagination import page_params, page_args, page_headers
+from app.api.v1.batch import batch_model, run_batch
 
 api = Namespace('places', description='Place operations')
 
@@ -23,6 +29,14 @@ place_review_model = api.model('PlaceReview', {
     'user_id': fields.String(description='ID of the user')
 })
 
+# Running rating aggregates kept on each place
+ratings_model = api.model('PlaceRatings', {
+    'count': fields.Integer(description='Number of reviews'),
+    'sum': fields.Integer(description='Sum of all ratings'),
+    'average': fields.Float(description='Mean rating, null without reviews'),
+    'histogram': fields.List(fields.Integer, description='Number of 1 to 5 star ratings')
+})
+
 # Define the place model for input validation and documentation
 place_input_model = api.model('PlaceInput', {
     'title': fields.String(required=True, description='Title of the place'),
@@ -45,6 +59,7 @@ place_response_model = api.model('PlaceResponse', {
     'owner': fields.Nested(user_model, description='Owner details'),
     'amenities': fields.List(fields.Nested(amenity_model), description='Amenities'),
     'reviews': fields.List(fields.Nested(place_review_model), description='List of reviews'),
+    'ratings': fields.Nested(ratings_model, description='Rating aggregates'),
     'created_at': fields.DateTime(description='Creation timestamp'),
     'updated_at': fields.DateTime(description='Last update timestamp')
 })
@@ -54,7 +69,8 @@ place_list_model = api.model('PlaceList', {
     'id': fields.String(description='Place ID'),
     'title': fields.String(description='Title of the place'),
     'latitude': fields.Float(description='Latitude of the place'),
-    'longitude': fields.Float(description='Longitude of the place')
+    'longitude': fields.Float(description='Longitude of the place'),
+    'ratings': fields.Nested(ratings_model, description='Rating aggregates')
 })
 
 # Simplified model for place reviews list
@@ -64,19 +80,142 @@ place_reviews_list_model = api.model('PlaceReviewsList', {
     'rating': fields.Integer(description='Rating of the place (1-5)')
 })
 
+def list_item(place):
+    """Basic info of a place, as in place_list_model"""
+    return {
+        'id': place.id,
+        'title': place.title,
+        'latitude': place.latitude,
+        'longitude': place.longitude,
+        'ratings': place.ratings.to_dict()
+    }
+
+# Facet counts returned with a filtered listing when asked for
+amenity_facet_model = api.model('PlaceAmenityFacet', {
+    'id': fields.String(description='Amenity ID'),
+    'name': fields.String(description='Name of the amenity'),
+    'count': fields.Integer(description='Matching places having the amenity')
+})
+
+price_facet_model = api.model('PlacePriceFacet', {
+    'min': fields.Float(description='Lowest price in the bucket'),
+    'max': fields.Float(description='Price the bucket stops below; null for the last one'),
+    'count': fields.Integer(description='Matching places in the bucket')
+})
+
+place_facets_model = api.model('PlaceFacets', {
+    'total': fields.Integer(description='Number of matching places'),
+    'amenities': fields.List(fields.Nested(amenity_facet_model), description='Per amenity'),
+    'price': fields.List(fields.Nested(price_facet_model), description='Per price bucket')
+})
+
+place_listing_model = api.model('PlaceListing', {
+    'places': fields.List(fields.Nested(place_list_model), description='Places of this page'),
+    'facets': fields.Nested(place_facets_model, description='Counts over all matches')
+})
+
+# Map viewport replies: clusters at low zoom, single places when zoomed in
+map_cluster_model = api.model('PlaceMapCluster', {
+    'latitude': fields.Float(description='Mean latitude of the clustered places'),
+    'longitude': fields.Float(description='Mean longitude of the clustered places'),
+    'count': fields.Integer(description='Number of places in the cluster')
+})
+
+place_map_model = api.model('PlaceMap', {
+    'zoom': fields.Integer(description='Zoom level'),
+    'clusters': fields.List(fields.Nested(map_cluster_model), description='Place clusters'),
+    'places': fields.List(fields.Nested(place_list_model), description='Single places')
+})
+
 @api.route('/')
 class PlaceList(Resource):
-    @api.marshal_list_with(place_list_model)
+    @api.doc(params={
+        'min_price': 'Only places costing at least this much per night',
+        'max_price': 'Only places costing at most this much per night',
+        'min_rating': 'Only places with a mean rating of at least this much',
+        'amenities': 'Comma-separated amenity names or ids; only places having all of them',
+        'sort': "price, rating, created_at or, with near, distance, '-' first for "
+                "descending order (default distance with near, price when filtering "
+                "by price only, else created_at)",
+        'order': "Price order when sort is not given: 'asc' (default) or 'desc'",
+        'facets': "true to reply {places, facets} with match counts per amenity and price bucket",
+        'near': "Point as 'lat,lon'; places come nearest first (needs radius_km or k)",
+        'radius_km': 'With near: only places at most this many km away; '
+                     "combines with the filters above and sort=distance",
+        'k': 'With near: only the k nearest places; not combined with other filters',
+        'explain': "true to reply with the query plan and the rows it examined instead of places",
+        **page_params
+    })
+    @api.response(200, 'Places; with facets=true, places and facets', place_list_model)
+    @api.response(400, 'Invalid query parameters')
     def get(self):
         """Retrieve a list of all places"""
         from app.services import facade
-        places = facade.get_all_places()
-        return [{
-            'id': place.id,
-            'title': place.title,
-            'latitude': place.latitude,
-            'longitude': place.longitude
-        } for place in places], 200
+        min_price = request.args.get('min_price', type=float)
+        max_price = request.args.get('max_price', type=float)
+        min_rating = request.args.get('min_rating', type=float)
+        order = request.args.get('order', 'asc')
+        if order not in ('asc', 'desc'):
+            api.abort(400, "order must be 'asc' or 'desc'")
+        sort = request.args.get('sort')
+        facets = request.args.get('facets', '').lower() in ('1', 'true', 'yes')
+        explain = request.args.get('explain', '').lower() in ('1', 'true', 'yes')
+        amenities = [name.strip() for name in request.args.get('amenities', '').split(',')
+                     if name.strip()]
+        near = request.args.get('near')
+        radius_km = request.args.get('radius_km', type=float)
+        k = request.args.get('k', type=int)
+        if radius_km is not None and not 0 < radius_km < math.inf:
+            api.abort(400, "radius_km must be a positive, finite number")
+        if k is not None and k < 1:
+            api.abort(400, "k must be a positive integer")
+        limit, cursor = page_args(api)
+        priced = min_price is not None or max_price is not None
+        filtered = bool(amenities or priced or min_rating is not None or sort or facets
+                        or explain)
+        
+        counts = None
+        try:
+            point = None
+            if near is not None:
+                if filtered and k is not None:
+                    api.abort(400, "near with k cannot be combined with other filters")
+                try:
+                    latitude, longitude = (float(part) for part in near.split(','))
+                except ValueError:
+                    api.abort(400, "near must be 'lat,lon'")
+                point = (latitude, longitude, radius_km)
+            if near is not None and not filtered:
+                places, next_cursor = facade.find_places_near_page(
+                    latitude, longitude, radius_km, k, limit, cursor)
+            elif filtered:
+                if point is not None and radius_km is None:
+                    api.abort(400, "near needs radius_km when combined with other filters")
+                if sort is None:
+                    # A price range alone keeps listing by price, as it always has
+                    by_price = priced and not amenities and min_rating is None
+                    if point is not None:
+                        sort = 'distance'
+                    elif by_price:
+                        sort = '-price' if order == 'desc' else 'price'
+                    else:
+                        sort = 'created_at'
+                criteria = {'min_price': min_price, 'max_price': max_price,
+                            'min_rating': min_rating,
+                            'amenity_ids': facade.resolve_amenities(amenities)}
+                if explain:
+                    return facade.explain_places(sort, limit, cursor, point, **criteria), 200
+                places, next_cursor, counts = facade.list_places(
+                    sort, limit, cursor, facets, point, **criteria)
+            else:
+                places, next_cursor = facade.get_places_page(limit, cursor)
+        except ValueError as e:
+            api.abort(400, str(e))
+        items = [list_item(place) for place in places]
+        if counts is not None:
+            return (marshal({'places': items, 'facets': counts}, place_listing_model), 200,
+                    page_headers(next_cursor))
+        return marshal(items, place_list_model), 200, page_headers(next_cursor)
     
     @api.expect(place_input_model)
     @api.response(201, 'Place successfully created')
@@ -103,6 +242,65 @@ class PlaceList(Resource):
         except Exception as e:
             api.abort(400, f"Failed to create place: {str(e)}")
 
+@api.route('/batch')
+class PlaceBatch(Resource):
+    @api.expect(batch_model(api, 'PlaceBatch', place_input_model, delete=False))
+    @api.response(200, 'Per-item results')
+    @api.response(400, 'Malformed batch')
+    def post(self):
+        """Create and update several places in one request"""
+        from app.services import facade
+        return run_batch(api, create=facade.create_places, update=facade.update_places)
+
+@api.route('/search')
+class PlaceSearch(Resource):
+    @api.marshal_list_with(place_list_model)
+    @api.doc(params={
+        'q': 'Words to find in titles, descriptions and reviews; the last may be the start of a word',
+        **page_params
+    })
+    @api.response(400, 'Missing query or invalid page parameters')
+    def get(self):
+        """Search places by text, best match first"""
+        from app.services import facade
+        query = request.args.get('q', '')
+        if not query.strip():
+            api.abort(400, "q must not be empty")
+        limit, cursor = page_args(api)
+        try:
+            places, next_cursor = facade.search_places(query, limit, cursor)
+        except ValueError as e:
+            api.abort(400, str(e))
+        return [list_item(place) for place in places], 200, page_headers(next_cursor)
+
+@api.route('/map')
+class PlaceMap(Resource):
+    @api.marshal_with(place_map_model)
+    @api.doc(params={
+        'bbox': "Viewport as 'west,south,east,north' in degrees; west > east crosses the antimeridian",
+        'zoom': 'Map zoom level, 0 (whole world on one 256 px tile) to 22'
+    })
+    @api.response(400, 'Invalid bounding box or zoom, or viewport too large for the zoom')
+    def get(self):
+        """Get the clusters or places to draw in a map viewport"""
+        from app.services import facade
+        zoom = request.args.get('zoom', type=int)
+        if zoom is None:
+            api.abort(400, "zoom must be an integer")
+        try:
+            west, south, east, north = (float(part) for part in request.args.get('bbox', '').split(','))
+        except ValueError:
+            api.abort(400, "bbox must be 'west,south,east,north'")
+        try:
+            shown = facade.get_place_map(south, west, north, east, zoom)
+        except ValueError as e:
+            api.abort(400, str(e))
+        return {
+            'zoom': zoom,
+            'clusters': shown['clusters'],
+            'places': [list_item(place) for place in shown['places']]
+        }, 200
+
 @api.route('/<string:place_id>')
 class PlaceResource(Resource):
     @api.marshal_with(place_response_model)
@@ -130,7 +328,7 @@ class PlaceResource(Resource):
             # Handle amenities update if provided
             if 'amenities' in data:
                 # Remove all existing amenities
-                current_amenities = place.get_amenities()
+                current_amenities = list(place.get_amenities())
                 for amenity in current_amenities:
                     facade.remove_amenity_from_place(place_id, amenity.id)
                 # Add new amenities
@@ -146,23 +344,32 @@ class PlaceResource(Resource):
 @api.route('/<string:place_id>/reviews')
 class PlaceReviewList(Resource):
     @api.marshal_list_with(place_reviews_list_model)
+    @api.doc(params={
+        'sort': "'rating' or 'created_at', prefixed with '-' for descending order",
+        **page_params
+    })
     @api.response(200, 'List of reviews for the place retrieved successfully')
+    @api.response(400, 'Invalid query parameters')
     @api.response(404, 'Place not found')
     def get(self, place_id):
         """Get all reviews for a specific place"""
         from app.services import facade
+        limit, cursor = page_args(api)
+        
+        try:
+            result = facade.get_reviews_by_place_page(place_id, limit, cursor,
+                                                      request.args.get('sort'))
+        except ValueError as e:
+            api.abort(400, str(e))
         
         # Check if place exists
-        place = facade.get_place(place_id)
-        if not place:
+        if result is None:
             api.abort(404, f"Place {place_id} not found")
-        
-        # Get reviews for this place
-        reviews = facade.get_reviews_by_place(place_id)
+        reviews, next_cursor = result
         
         # Format response
         return [{
             'id': review.id,
             'text': review.text,
             'rating': review.rating
-        } for review in reviews], 200
+        } for review in reviews], 200, page_headers(next_cursor)
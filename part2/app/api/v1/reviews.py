@@ -1,5 +1,8 @@
 from flask_restx import Namespace, Resource, fields
 
+from app.api.v1.pagination import page_params, page_args, page_headers
+from app.api.v1.batch import batch_model, run_batch
+
 api = Namespace('reviews', description='Review operations')
 
 # Model for Swagger documentation
@@ -23,11 +26,17 @@ review_response_model = api.model('ReviewResponse', {
 @api.route('/')
 class ReviewList(Resource):
     @api.marshal_list_with(review_response_model)
+    @api.doc(params=page_params)
+    @api.response(400, 'Invalid limit or cursor')
     def get(self):
         """List all reviews"""
         from app.services import facade
-        reviews = facade.get_all_reviews()
-        return [review.to_dict() for review in reviews], 200
+        limit, cursor = page_args(api)
+        try:
+            reviews, next_cursor = facade.get_reviews_page(limit, cursor)
+        except ValueError as e:
+            api.abort(400, str(e))
+        return [review.to_dict() for review in reviews], 200, page_headers(next_cursor)
     
     @api.expect(review_model)
     @api.marshal_with(review_response_model, code=201)
@@ -43,6 +52,17 @@ class ReviewList(Resource):
         except ValueError as e:
             api.abort(400, str(e))
 
+@api.route('/batch')
+class ReviewBatch(Resource):
+    @api.expect(batch_model(api, 'ReviewBatch', review_model))
+    @api.response(200, 'Per-item results')
+    @api.response(400, 'Malformed batch')
+    def post(self):
+        """Create, update and delete several reviews in one request"""
+        from app.services import facade
+        return run_batch(api, create=facade.create_reviews, update=facade.update_reviews,
+                         delete=facade.delete_reviews)
+
 @api.route('/<string:review_id>')
 class Review(Resource):
     @api.marshal_with(review_response_model)
@@ -1,5 +1,8 @@
 from flask_restx import Namespace, Resource, fields
 
+from app.api.v1.pagination import page_params, page_args, page_headers
+from app.api.v1.batch import batch_model, run_batch
+
 api = Namespace('users', description='User operations')
 
 # Model for Swagger documentation
@@ -25,11 +28,17 @@ user_response_model = api.model('UserResponse', {
 class UserList(Resource):
     @api.marshal_list_with(user_response_model)
     @api.response(200, 'List of users retrieved successfully')
+    @api.doc(params=page_params)
+    @api.response(400, 'Invalid limit or cursor')
     def get(self):
         """List all users"""
         from app.services import facade
-        users = facade.get_all_users()
-        return [user.to_dict() for user in users], 200
+        limit, cursor = page_args(api)
+        try:
+            users, next_cursor = facade.get_users_page(limit, cursor)
+        except ValueError as e:
+            api.abort(400, str(e))
+        return [user.to_dict() for user in users], 200, page_headers(next_cursor)
     
     @api.expect(user_model, validate=True)
     @api.marshal_with(user_response_model, code=201)
@@ -52,6 +61,16 @@ class UserList(Resource):
         except ValueError as e:
             api.abort(400, str(e))
 
+@api.route('/batch')
+class UserBatch(Resource):
+    @api.expect(batch_model(api, 'UserBatch', user_model, delete=False))
+    @api.response(200, 'Per-item results')
+    @api.response(400, 'Malformed batch')
+    def post(self):
+        """Create and update several users in one request"""
+        from app.services import facade
+        return run_batch(api, create=facade.create_users, update=facade.update_users)
+
 @api.route('/<string:user_id>')
 class UserResource(Resource):
     @api.marshal_with(user_response_model)
@@ -83,7 +102,7 @@ class UserResource(Resource):
         # Check if email is being changed and if new email already exists
         if 'email' in data and data['email'] != user.email:
             existing_user = facade.get_user_by_email(data['email'])
-            if existing_user:
+            if existing_user and existing_user.id != user_id:
                 api.abort(400, f"Email {data['email']} already registered")
         
         try:
@@ -93,3 +112,70 @@ class UserResource(Resource):
             api.abort(404, f"User {user_id} not found")
         except ValueError as e:
             api.abort(400, str(e))
+
+# Summaries for a user's own listings and reviews
+user_place_model = api.model('UserPlace', {
+    'id': fields.String(description='Place ID'),
+    'title': fields.String(description='Title of the place'),
+    'price': fields.Float(description='Price per night'),
+    'latitude': fields.Float(description='Latitude of the place'),
+    'longitude': fields.Float(description='Longitude of the place')
+})
+
+user_review_model = api.model('UserReview', {
+    'id': fields.String(description='Review ID'),
+    'text': fields.String(description='Text of the review'),
+    'rating': fields.Integer(description='Rating of the place (1-5)'),
+    'place_id': fields.String(description='ID of the reviewed place')
+})
+
+@api.route('/<string:user_id>/places')
+class UserPlaceList(Resource):
+    @api.marshal_list_with(user_place_model)
+    @api.doc(params=page_params)
+    @api.response(200, 'Places owned by the user, oldest first')
+    @api.response(400, 'Invalid limit or cursor')
+    @api.response(404, 'User not found')
+    def get(self, user_id):
+        """List the places a user owns"""
+        from app.services import facade
+        limit, cursor = page_args(api)
+        try:
+            result = facade.get_places_by_owner_page(user_id, limit, cursor)
+        except ValueError as e:
+            api.abort(400, str(e))
+        if result is None:
+            api.abort(404, f"User {user_id} not found")
+        places, next_cursor = result
+        return [{
+            'id': place.id,
+            'title': place.title,
+            'price': place.price,
+            'latitude': place.latitude,
+            'longitude': place.longitude
+        } for place in places], 200, page_headers(next_cursor)
+
+@api.route('/<string:user_id>/reviews')
+class UserReviewList(Resource):
+    @api.marshal_list_with(user_review_model)
+    @api.doc(params=page_params)
+    @api.response(200, 'Reviews written by the user, oldest first')
+    @api.response(400, 'Invalid limit or cursor')
+    @api.response(404, 'User not found')
+    def get(self, user_id):
+        """List the reviews a user wrote"""
+        from app.services import facade
+        limit, cursor = page_args(api)
+        try:
+            result = facade.get_reviews_by_user_page(user_id, limit, cursor)
+        except ValueError as e:
+            api.abort(400, str(e))
+        if result is None:
+            api.abort(404, f"User {user_id} not found")
+        reviews, next_cursor = result
+        return [{
+            'id': review.id,
+            'text': review.text,
+            'rating': review.rating,
+            'place_id': review.place.id
+        } for review in reviews], 200, page_headers(next_cursor)
@@ -1,14 +1,32 @@
-import uuid
 from datetime import datetime
 
-class BaseModel:
-    """Base class with common attributes and methods for all models"""
+from app.models.fields import ModelMeta
+from app.models.ids import new_id
+
+class BaseModel(metaclass=ModelMeta):
+    """Base class with common attributes and methods for all models
+    
+    Models declare their fields with the descriptors in app.models.fields
+    and keep everything in __slots__ rather than a per-instance __dict__,
+    so every object has a fixed, compact layout. Fields are validated once,
+    on assignment; load() builds an object from trusted data without
+    validating it again.
+    
+    Every object carries a version that goes up whenever it changes: on
+    field assignment, save() and the relationship methods. to_dict()
+    caches its result against the versions it was built from.
+    """
+    
+    __slots__ = ('id', 'created_at', 'updated_at', '_version', '_cached')
     
     def __init__(self, *args, **kwargs):
         """Initialize a new BaseModel instance"""
-        self.id = str(uuid.uuid4())
-        self.created_at = datetime.now()
-        self.updated_at = datetime.now()
+        self.id = new_id()
+        # One datetime serves both timestamps until the first update
+        self.created_at = self.updated_at = datetime.now()
+        self._version = 0
+        self._cached = None
+        self._setup()
         
         # If kwargs is provided, set attributes from it
         if kwargs:
@@ -20,37 +38,99 @@ class BaseModel:
                             value = datetime.fromisoformat(value)
                         except ValueError:
                             pass
+                elif not hasattr(type(self), key):
+                    # No slot to keep it in; extra keys in a payload have
+                    # always been accepted, so leave it out
+                    continue
                 setattr(self, key, value)
     
+    def _setup(self):
+        """Initialize per-instance state that is not a field, such as relation lists"""
+    
+    @classmethod
+    def load(cls, **values):
+        """Build an object from values that were validated before being stored
+        
+        This is the trusted fast path used to restore objects from the
+        write-ahead log or a snapshot: no field is validated. Timestamps
+        must already be datetimes.
+        """
+        obj = cls.__new__(cls)
+        obj._version = 0
+        obj._cached = None
+        obj._setup()
+        fields = cls._fields
+        for key, value in values.items():
+            field = fields.get(key)
+            if field is not None:
+                field.store(obj, value)
+            else:
+                setattr(obj, key, value)
+        return obj
+    
+    def touch(self):
+        """Mark the object as changed, invalidating its cached dictionary"""
+        self._version += 1
+    
     def save(self):
         """Update the updated_at timestamp whenever the object is modified"""
         self.updated_at = datetime.now()
+        self.touch()
     
     def update(self, data):
         """Update the attributes of the object based on the provided dictionary"""
-        for key, value in data.items():
-            if hasattr(self, key) and key not in ['id', 'created_at']:
-                setattr(self, key, value)
-        self.save()  # Update the updated_at timestamp
+        try:
+            for key, value in data.items():
+                if hasattr(self, key) and key not in ['id', 'created_at']:
+                    setattr(self, key, value)
+        finally:
+            # Also covers the attributes set before a failing one
+            self.save()  # Update the updated_at timestamp
+    
+    def _cache_stamp(self):
+        """Value that changes whenever to_dict() would return something new
+        
+        Models whose dictionary embeds other objects that cannot notify
+        them of changes add those objects' versions.
+        """
+        return self._version
     
     def to_dict(self):
-        """Convert the object to a dictionary"""
+        """Convert the object to a dictionary
+        
+        The result is cached until the object or one of the objects it
+        embeds changes. Callers get their own top-level dict, but nested
+        lists and dicts are shared with the cache and must not be modified.
+        """
+        # Read the stamp first: a change made while serializing leaves the
+        # entry stale instead of caching new data under the new stamp
+        stamp = self._cache_stamp()
+        cached = self._cached
+        if cached is None or cached[0] != stamp:
+            cached = self._cached = (stamp, self._serialize())
+        return dict(cached[1])
+    
+    def _serialize(self):
+        """Build the dictionary returned by to_dict()"""
         obj_dict = {}
         obj_dict['id'] = self.id
         obj_dict['created_at'] = self.created_at.isoformat()
         obj_dict['updated_at'] = self.updated_at.isoformat()
         
-        # Add other attributes that don't start with underscore
-        for key, value in self.__dict__.items():
-            if not key.startswith('_'):
-                if key not in ['id', 'created_at', 'updated_at']:  # Already added
-                    if hasattr(value, 'isoformat'):  # Handle datetime objects
-                        obj_dict[key] = value.isoformat()
-                    else:
-                        obj_dict[key] = value
+        # Add the other public slots and serializable fields
+        for key in self._serialized:
+            if key in obj_dict:  # Already added
+                continue
+            value = getattr(self, key, None)
+            if hasattr(value, 'isoformat'):  # Handle datetime objects
+                obj_dict[key] = value.isoformat()
+            else:
+                obj_dict[key] = value
         
         return obj_dict
     
     def __str__(self):
         """String representation of the object"""
-        return f"[{self.__class__.__name__}] ({self.id}) {self.__dict__}"
+        attributes = {name: getattr(self, name, None) for name in self._slot_names
+                      if name not in ('_version', '_cached')}
+        return f"[{self.__class__.__name__}] ({self.id}) {attributes}"
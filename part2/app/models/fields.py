@@ -0,0 +1,324 @@
+"""Declarative, validated model fields
+
+A model lists its fields as class attributes::
+
+    class Amenity(BaseModel):
+        name = String('Name', max_length=50)
+
+When the class is created, ModelMeta gives each field a slot to store its
+value in and each field turns its options into a few check steps, closures
+with their bounds and messages bound, regular expressions compiled and
+references resolved only once, composed into one check function. Assigning
+to a field runs its check a single time; load() on a model skips it for
+values that were validated before they were stored.
+"""
+import math
+import re
+
+
+class Field:
+    """Validating descriptor backed by a slot named after the field
+
+    Args:
+        label (str): Name used in error messages
+        serialize (bool): Whether BaseModel.to_dict() includes the value
+    """
+
+    def __init__(self, label=None, serialize=True):
+        self.label = label
+        self.serialize = serialize
+        self.name = None
+        self.check = None
+        self._slot = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        if self.label is None:
+            self.label = name
+
+    def bind(self, slot):
+        """Attach the slot created for this field and compose its checks"""
+        self._slot = slot
+        self._put = slot.__set__
+        self.check = chain(self.compile())
+
+    def compile(self):
+        """Return the steps checking (and possibly converting) a value
+
+        Each step takes the value, raises ValueError if it is invalid and
+        returns it, converted if need be, for the next step.
+        """
+        return []
+
+    def validate(self, value):
+        """Return value as it would be stored, or raise ValueError"""
+        return self.check(value)
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        return self._slot.__get__(obj, owner)
+
+    def __set__(self, obj, value):
+        self._put(obj, self.check(value))
+        obj._version += 1
+
+    def store(self, obj, value):
+        """Set value without validating it (trusted data)"""
+        self._put(obj, value)
+
+
+def _unchanged(value):
+    return value
+
+
+def chain(steps):
+    """Compose check steps into one function; a lone step is returned as it is"""
+    steps = tuple(steps)
+    if not steps:
+        return _unchanged
+    if len(steps) == 1:
+        return steps[0]
+
+    def check(value):
+        for step in steps:
+            value = step(value)
+        return value
+    return check
+
+
+def _range_step(minimum, maximum, message):
+    """Inclusive bounds check, or None without bounds"""
+    if minimum is None and maximum is None:
+        return None
+    low = -math.inf if minimum is None else minimum
+    high = math.inf if maximum is None else maximum
+
+    def check_range(value):
+        if value < low or value > high:
+            raise ValueError(message)
+        return value
+    return check_range
+
+
+def _instance_of(model_name):
+    """Return a function giving the registered class model_name, looked up once"""
+    model = None
+
+    def resolve():
+        nonlocal model
+        if model is None:
+            model = ModelMeta.registry[model_name]
+        return model
+    return resolve
+
+
+class String(Field):
+    """str field; required fields reject None and ''"""
+
+    def __init__(self, label=None, required=True, max_length=None, pattern=None,
+                 pattern_message=None, **options):
+        super().__init__(label, **options)
+        self.required = required
+        self.max_length = max_length
+        self.pattern = pattern
+        self.pattern_message = pattern_message
+
+    def compile(self):
+        label, max_length = self.label, self.max_length
+        if self.required:
+            message = f"{label} must be a non-empty string"
+
+            def check_type(value):
+                if not value or not isinstance(value, str):
+                    raise ValueError(message)
+                return value
+        else:
+            message = f"{label} must be a string or None"
+
+            def check_type(value):
+                if not isinstance(value, str):
+                    raise ValueError(message)
+                return value
+        steps = [check_type]
+        if max_length is not None:
+            length_message = f"{label} cannot exceed {max_length} characters"
+
+            def check_length(value):
+                if len(value) > max_length:
+                    raise ValueError(length_message)
+                return value
+            steps.append(check_length)
+        if self.pattern is not None:
+            match = re.compile(self.pattern).match
+            pattern_message = self.pattern_message or f"Invalid {label.lower()} format"
+
+            def check_pattern(value):
+                if not match(value):
+                    raise ValueError(pattern_message)
+                return value
+            steps.append(check_pattern)
+        if self.required:
+            return steps
+        check = chain(steps)
+        return [lambda value: value if value is None else check(value)]
+
+
+class Number(Field):
+    """int or float field stored as float, with optional bounds
+
+    Args:
+        positive (bool): Reject zero and negative values
+        minimum, maximum (float, optional): Inclusive bounds
+    """
+
+    def __init__(self, label=None, positive=False, minimum=None, maximum=None, **options):
+        super().__init__(label, **options)
+        self.positive = positive
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def compile(self):
+        label = self.label
+        message = f"{label} must be a number"
+
+        def to_float(value):
+            if value.__class__ is not float:
+                if not isinstance(value, (int, float)):
+                    raise ValueError(message)
+                value = float(value)
+            return value
+        steps = [to_float]
+        if self.positive:
+            positive_message = f"{label} must be positive"
+
+            def check_positive(value):
+                if value <= 0:
+                    raise ValueError(positive_message)
+                return value
+            steps.append(check_positive)
+        check_range = _range_step(self.minimum, self.maximum,
+                                  f"{label} must be between {self.minimum} and {self.maximum}")
+        if check_range is not None:
+            steps.append(check_range)
+        return steps
+
+
+class Integer(Field):
+    """int field with optional inclusive bounds"""
+
+    def __init__(self, label=None, minimum=None, maximum=None, **options):
+        super().__init__(label, **options)
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def compile(self):
+        label = self.label
+        message = f"{label} must be an integer"
+
+        def check_type(value):
+            if not isinstance(value, int):
+                raise ValueError(message)
+            return value
+        steps = [check_type]
+        check_range = _range_step(self.minimum, self.maximum,
+                                  f"{label} must be between {self.minimum} and {self.maximum}")
+        if check_range is not None:
+            steps.append(check_range)
+        return steps
+
+
+class Boolean(Field):
+    """bool field"""
+
+    def compile(self):
+        message = f"{self.label} must be a boolean"
+
+        def check_type(value):
+            if value is not True and value is not False:
+                raise ValueError(message)
+            return value
+        return [check_type]
+
+
+class Reference(Field):
+    """Field holding another model object, named by class to avoid import cycles
+
+    The class is looked up in ModelMeta.registry the first time the field
+    is assigned and kept from then on. References are left out of
+    to_dict(); models serialize them as ids themselves.
+    """
+
+    def __init__(self, model_name, label=None, **options):
+        options.setdefault('serialize', False)
+        super().__init__(label, **options)
+        self.model_name = model_name
+
+    def compile(self):
+        model = _instance_of(self.model_name)
+        message = f"{self.label} must be a {self.model_name} instance"
+
+        def check_type(value):
+            if not isinstance(value, model()):
+                raise ValueError(message)
+            return value
+        return [check_type]
+
+
+class Related(Field):
+    """Collection of other model objects, kept in a Relation
+
+    Assigning any iterable stores a new Relation with its members in
+    order; every member must be an instance of the named model.
+    """
+
+    def __init__(self, model_name, label=None, **options):
+        options.setdefault('serialize', False)
+        super().__init__(label, **options)
+        self.model_name = model_name
+
+    def compile(self):
+        from app.models.relations import Relation
+        model = _instance_of(self.model_name)
+        message = f"Can only add {self.model_name} instances"
+
+        def to_relation(value):
+            kind = model()
+            for member in value:
+                if not isinstance(member, kind):
+                    raise ValueError(message)
+            return Relation(value)
+        return [to_relation]
+
+
+class ModelMeta(type):
+    """Metaclass that lays out slots for declared fields and compiles them"""
+
+    registry = {}
+
+    def __new__(mcs, name, bases, namespace):
+        fields = [(key, value) for key, value in namespace.items() if isinstance(value, Field)]
+        # A field and its slot cannot share a name, so values live in '_<name>'
+        slots = tuple(namespace.get('__slots__', ())) + tuple(f'_{key}' for key, _ in fields)
+        namespace['__slots__'] = slots
+        cls = super().__new__(mcs, name, bases, namespace)
+        for key, field in fields:
+            field.bind(cls.__dict__[f'_{key}'])
+
+        inherited = {}
+        for base in reversed(cls.__mro__[1:]):
+            inherited.update(getattr(base, '_fields', {}))
+        inherited.update(fields)
+        cls._fields = inherited
+        # Slot names in declaration order, base class first
+        cls._slot_names = tuple(slot for klass in reversed(cls.__mro__)
+                                for slot in klass.__dict__.get('__slots__', ()))
+        # What to_dict() walks: public plain slots and serializable fields
+        cls._serialized = tuple(
+            slot[1:] if slot[1:] in inherited else slot
+            for slot in cls._slot_names
+            if not slot.startswith('_')
+            or (slot[1:] in inherited and inherited[slot[1:]].serialize)
+        )
+        mcs.registry[name] = cls
+        return cls
@@ -0,0 +1,90 @@
+"""Object identifiers
+
+Ids are canonical UUID strings. Two schemes produce them:
+
+  uuid4  random, the historical default
+  uuid7  time-ordered (RFC 9562): a 48-bit millisecond timestamp, then a
+         counter that keeps ids made in the same millisecond in order, then
+         random bits. Sorting uuid7 ids as strings sorts them by creation.
+
+Both are 36-character strings, so existing uuid4 ids stay valid next to
+new ones. Set HBNB_ID_SCHEME=uuid7 (or call use_scheme()) to switch; only
+ids made afterwards are time-ordered. Ids stay strings in memory; the
+snapshot file stores them in 16 bytes (see app.persistence.snapshot).
+"""
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+_COUNTER_MAX = 0xFFF
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+
+def uuid4():
+    """Return a random id"""
+    return str(uuid.uuid4())
+
+
+def uuid7():
+    """Return a time-ordered id, greater than every id this process made before"""
+    global _last_ms, _counter
+    ms = time.time_ns() // 1000000
+    with _lock:
+        if ms > _last_ms:
+            # Start low in the 12-bit counter so the millisecond has room
+            _counter = int.from_bytes(os.urandom(1), 'big')
+        else:
+            # Same millisecond, or the clock went back: keep counting
+            ms = _last_ms
+            _counter += 1
+            if _counter > _COUNTER_MAX:
+                ms += 1
+                _counter = 0
+        _last_ms = ms
+        counter = _counter
+    random_bits = int.from_bytes(os.urandom(8), 'big') & 0x3FFFFFFFFFFFFFFF
+    value = ms << 80 | 0x7 << 76 | counter << 64 | 0x2 << 62 | random_bits
+    text = f'{value:032x}'
+    return f'{text[:8]}-{text[8:12]}-{text[12:16]}-{text[16:20]}-{text[20:]}'
+
+
+SCHEMES = {'uuid4': uuid4, 'uuid7': uuid7}
+_scheme = os.getenv('HBNB_ID_SCHEME', 'uuid4')
+if _scheme not in SCHEMES:
+    raise ValueError(f"Unknown id scheme '{_scheme}'")
+_factory = SCHEMES[_scheme]
+
+
+def use_scheme(name):
+    """Make new_id() produce ids of the named scheme ('uuid4' or 'uuid7')"""
+    global _scheme, _factory
+    if name not in SCHEMES:
+        raise ValueError(f"Unknown id scheme '{name}'")
+    _scheme, _factory = name, SCHEMES[name]
+
+
+def current_scheme():
+    return _scheme
+
+
+def new_id():
+    """Return a fresh id in the current scheme"""
+    return _factory()
+
+
+def is_time_ordered(obj_id):
+    """True if obj_id is a uuid7 id"""
+    return len(obj_id) == 36 and obj_id[14] == '7' and obj_id[8] == '-'
+
+
+def id_timestamp(obj_id):
+    """Return the UTC creation time embedded in a uuid7 id, None for other ids"""
+    if not is_time_ordered(obj_id):
+        return None
+    ms = int(obj_id[:8] + obj_id[9:13], 16)
+    return datetime.fromtimestamp(ms / 1000, timezone.utc)
+
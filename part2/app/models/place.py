@@ -1,8 +1,22 @@
 from app.models.base_model import BaseModel
+from app.models.fields import String, Number, Reference, Related
+from app.models.relations import Relation
+from app.models.ratings import RatingSummary
 
 class Place(BaseModel):
     """Place class representing a rental property"""
     
+    __slots__ = ('_ratings',)
+    
+    title = String('Title', max_length=100)
+    description = String('Description', required=False)
+    price = Number('Price', positive=True)
+    latitude = Number('Latitude', minimum=-90.0, maximum=90.0)
+    longitude = Number('Longitude', minimum=-180.0, maximum=180.0)
+    owner = Reference('User', label='Owner')
+    reviews = Related('Review')
+    amenities = Related('Amenity')
+    
     def __init__(self, title, description, price, latitude, longitude, owner, **kwargs):
         """
         Initialize a new Place instance
@@ -17,136 +31,77 @@ class Place(BaseModel):
         """
         super().__init__(**kwargs)
         
-        # Validate and set attributes
+        # Each assignment validates its field
         self.title = title
         self.description = description
         self.price = price
         self.latitude = latitude
         self.longitude = longitude
         self.owner = owner
-        self.reviews = []  # List to store related reviews
-        self.amenities = []  # List to store related amenities
-        
-        # Validate the attributes
-        self._validate()
-    
-    @property
-    def title(self):
-        return self._title
-    
-    @title.setter
-    def title(self, value):
-        if not value or not isinstance(value, str):
-            raise ValueError("Title must be a non-empty string")
-        if len(value) > 100:
-            raise ValueError("Title cannot exceed 100 characters")
-        self._title = value
-    
-    @property
-    def description(self):
-        return self._description
-    
-    @description.setter
-    def description(self, value):
-        if value is not None and not isinstance(value, str):
-            raise ValueError("Description must be a string or None")
-        self._description = value
-    
-    @property
-    def price(self):
-        return self._price
-    
-    @price.setter
-    def price(self, value):
-        if not isinstance(value, (int, float)):
-            raise ValueError("Price must be a number")
-        if value <= 0:
-            raise ValueError("Price must be positive")
-        self._price = float(value)
-    
-    @property
-    def latitude(self):
-        return self._latitude
-    
-    @latitude.setter
-    def latitude(self, value):
-        if not isinstance(value, (int, float)):
-            raise ValueError("Latitude must be a number")
-        if value < -90.0 or value > 90.0:
-            raise ValueError("Latitude must be between -90.0 and 90.0")
-        self._latitude = float(value)
-    
-    @property
-    def longitude(self):
-        return self._longitude
-    
-    @longitude.setter
-    def longitude(self, value):
-        if not isinstance(value, (int, float)):
-            raise ValueError("Longitude must be a number")
-        if value < -180.0 or value > 180.0:
-            raise ValueError("Longitude must be between -180.0 and 180.0")
-        self._longitude = float(value)
-    
-    @property
-    def owner(self):
-        return self._owner
     
-    @owner.setter
-    def owner(self, value):
-        # Import here to avoid circular imports
-        from app.models.user import User
-        if not isinstance(value, User):
-            raise ValueError("Owner must be a User instance")
-        self._owner = value
-    
-    def _validate(self):
-        """Validate all place attributes"""
-        # Trigger property setters to validate
-        self.title = self._title
-        self.description = self._description
-        self.price = self._price
-        self.latitude = self._latitude
-        self.longitude = self._longitude
-        self.owner = self._owner
+    def _setup(self):
+        # Both relations start out empty, so skip validating them
+        self._fields['reviews'].store(self, Relation())
+        self._fields['amenities'].store(self, Relation())
+        self._ratings = RatingSummary()
     
     def add_review(self, review):
         """Add a review to the place"""
         from app.models.review import Review
         if not isinstance(review, Review):
             raise ValueError("Can only add Review instances")
-        if review not in self.reviews:
-            self.reviews.append(review)
+        if self.reviews.add(review):
+            self._ratings.add(review.rating)
+            self.touch()
     
     def remove_review(self, review):
         """Remove a review from the place"""
-        if review in self.reviews:
-            self.reviews.remove(review)
+        if self.reviews.discard(review):
+            self._ratings.remove(review.rating)
+            self.touch()
+    
+    def rating_changed(self, review, old_rating):
+        """Move a listed review from old_rating to its current rating in the aggregates"""
+        if review in self.reviews and review.rating != old_rating:
+            self._ratings.replace(old_rating, review.rating)
+            self.touch()
+    
+    @property
+    def ratings(self):
+        """Running review count, rating sum and histogram (RatingSummary)"""
+        return self._ratings
     
     def add_amenity(self, amenity):
         """Add an amenity to the place"""
         from app.models.amenity import Amenity
         if not isinstance(amenity, Amenity):
             raise ValueError("Can only add Amenity instances")
-        if amenity not in self.amenities:
-            self.amenities.append(amenity)
+        if self.amenities.add(amenity):
+            self.touch()
     
     def remove_amenity(self, amenity):
         """Remove an amenity from the place"""
-        if amenity in self.amenities:
-            self.amenities.remove(amenity)
+        if self.amenities.discard(amenity):
+            self.touch()
     
     def get_reviews(self):
-        """Get all reviews for this place"""
-        return self.reviews.copy()
+        """Get a live, read-only view of the reviews for this place"""
+        return self.reviews.view()
     
     def get_amenities(self):
-        """Get all amenities for this place"""
-        return self.amenities.copy()
+        """Get a live, read-only view of the amenities for this place"""
+        return self.amenities.view()
+    
+    def _cache_stamp(self):
+        # Reviews touch their place when they change; the owner and the
+        # amenities do not know which places embed them, so their versions
+        # are checked here. Versions only grow, so a sum is enough.
+        return (self._version, self._owner._version,
+                sum(amenity._version for amenity in self.amenities))
     
-    def to_dict(self):
+    def _serialize(self):
         """Convert place to dictionary"""
-        place_dict = super().to_dict()
+        place_dict = super()._serialize()
         
         # Remove the empty lists that base class added (they'll be replaced)
         if 'reviews' in place_dict:
@@ -154,7 +109,7 @@ class Place(BaseModel):
         if 'amenities' in place_dict:
             del place_dict['amenities']
         
-        # Add place attributes (they have underscore prefixes due to properties)
+        # Add place attributes
         place_dict['title'] = self.title
         place_dict['description'] = self.description
         place_dict['price'] = self.price
@@ -182,6 +137,8 @@ class Place(BaseModel):
             for amenity in self.amenities
         ]
         
+        place_dict['ratings'] = self._ratings.to_dict()
+        
         # Include review objects as required
         place_dict['reviews'] = [
             {
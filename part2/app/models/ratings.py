@@ -0,0 +1,39 @@
+"""Running rating aggregates for places"""
+
+
+class RatingSummary:
+    """Review count, rating sum and 1-5 histogram, updated one review at a time"""
+
+    __slots__ = ('count', 'total', 'histogram')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.histogram = [0, 0, 0, 0, 0]
+
+    def add(self, rating):
+        self.count += 1
+        self.total += rating
+        self.histogram[rating - 1] += 1
+
+    def remove(self, rating):
+        self.count -= 1
+        self.total -= rating
+        self.histogram[rating - 1] -= 1
+
+    def replace(self, old_rating, new_rating):
+        self.remove(old_rating)
+        self.add(new_rating)
+
+    @property
+    def average(self):
+        """Mean rating, or None without reviews"""
+        return self.total / self.count if self.count else None
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.total,
+            'average': self.average,
+            'histogram': list(self.histogram)
+        }
@@ -0,0 +1,182 @@
+"""Relationship collections for model objects
+
+A Place keeps its reviews and amenities in a Relation: an insertion-ordered
+set keyed by object id, so membership tests, adds and removals take
+constant time however many members there are. Callers read it through a
+RelationView, a live read-only view handed out without copying.
+
+Relations do no locking of their own. The facade changes a place's
+relations, and reads its sorted orders, while holding the place's lock;
+plain iteration is safe without it.
+
+Sorted and paginated reads use SortedIndex, the structure behind the
+repositories' range queries, and the same opaque cursors. An order is
+indexed the first time it is read and kept up to date from then on, so a
+relation only pays for the orders that are actually used.
+"""
+from itertools import islice
+
+from app.persistence.indexes import SortedIndex
+from app.persistence.pagination import encode_cursor, decode_cursor
+
+# Name of insertion order in page() and in cursors
+INSERTION_ORDER = 'position'
+
+
+class Relation:
+    """Insertion-ordered set of model objects with O(1) membership and removal
+
+    Args:
+        objs (iterable, optional): Initial members, in order
+    """
+
+    __slots__ = ('_items', '_positions', '_next_position', '_indexes')
+
+    def __init__(self, objs=()):
+        self._items = {}
+        # Insertion positions and sorted orders are only kept once a
+        # listing has asked for them
+        self._positions = None
+        self._next_position = 0
+        self._indexes = None
+        for obj in objs:
+            self.add(obj)
+
+    def add(self, obj):
+        """Add obj; return False if it is already a member"""
+        if obj.id in self._items:
+            return False
+        self._items[obj.id] = obj
+        if self._positions is not None:
+            self._positions[obj.id] = self._next_position
+            self._next_position += 1
+        if self._indexes:
+            for index in self._indexes.values():
+                index.insert(obj)
+        return True
+
+    def discard(self, obj):
+        """Remove obj; return False if it was not a member"""
+        if self._items.get(obj.id) is not obj:
+            return False
+        del self._items[obj.id]
+        if self._indexes:
+            for index in self._indexes.values():
+                index.remove(obj.id)
+        if self._positions is not None:
+            del self._positions[obj.id]
+        return True
+
+    def refresh(self, obj):
+        """Re-file a member whose sort attributes may have changed"""
+        if self._indexes and self._items.get(obj.id) is obj:
+            for index in self._indexes.values():
+                index.remove(obj.id)
+                index.insert(obj)
+
+    def __contains__(self, obj):
+        return self._items.get(getattr(obj, 'id', None)) is obj
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        # Copy the members in one step (the GIL is held throughout), so the
+        # relation may change while a reader is still iterating
+        return iter(tuple(self._items.values()))
+
+    def view(self):
+        return RelationView(self)
+
+    def _index(self, order_by):
+        """Return the SortedIndex for order_by, building it on first use"""
+        if self._indexes is None:
+            self._indexes = {}
+        index = self._indexes.get(order_by)
+        if index is None:
+            if order_by == INSERTION_ORDER:
+                if self._positions is None:
+                    self._positions = {obj_id: position
+                                       for position, obj_id in enumerate(self._items)}
+                    self._next_position = len(self._positions)
+                positions = self._positions
+                index = SortedIndex(order_by, key=lambda obj: positions[obj.id])
+            else:
+                index = SortedIndex(order_by)
+            for obj in self._items.values():
+                index.insert(obj)
+            self._indexes[order_by] = index
+        return index
+
+    def page(self, limit, cursor=None, order_by=None, order='asc'):
+        """Return one page of members and the cursor for the next page
+
+        Args:
+            limit (int): Page size
+            cursor (str, optional): Cursor returned with the previous page
+            order_by (str, optional): Attribute to sort by, such as 'rating'
+                or 'created_at'; insertion order when omitted
+            order (str): 'asc' or 'desc'
+
+        Returns:
+            tuple: (objects, next_cursor); next_cursor is None on the last page
+
+        Raises:
+            ValueError: If cursor is invalid or from another order
+        """
+        index = self._index(order_by or INSERTION_ORDER)
+        after = decode_cursor(cursor, index.attr_name) if cursor else None
+        objects = index.range(limit=limit + 1, order=order, after=after)
+        if len(objects) <= limit:
+            return objects, None
+        last = objects[limit - 1]
+        return objects[:limit], encode_cursor(index.attr_name, index.key_of(last.id), last.id)
+
+    def sorted(self, order_by, order='asc'):
+        """Return every member sorted by an attribute"""
+        return self._index(order_by).range(order=order)
+
+
+class RelationView:
+    """Live, read-only view of a Relation
+
+    len() and membership read the relation directly. Indexing walks it, so
+    a loop or page() is the way to go through large relations.
+    """
+
+    __slots__ = ('_relation',)
+
+    def __init__(self, relation):
+        self._relation = relation
+
+    def __contains__(self, obj):
+        return obj in self._relation
+
+    def __len__(self):
+        return len(self._relation)
+
+    def __iter__(self):
+        return iter(self._relation)
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return list(self)[position]
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("relation index out of range")
+        return next(islice(self, position, None))
+
+    def __eq__(self, other):
+        if isinstance(other, (RelationView, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return f"RelationView({list(self)!r})"
+
+    def page(self, limit, cursor=None, order_by=None, order='asc'):
+        return self._relation.page(limit, cursor, order_by, order)
+
+    def sorted(self, order_by, order='asc'):
+        return self._relation.sorted(order_by, order)
@@ -1,8 +1,14 @@
 from app.models.base_model import BaseModel
+from app.models.fields import String, Integer, Reference
 
 class Review(BaseModel):
     """Review class representing a review for a place"""
     
+    text = String('Text')
+    rating = Integer('Rating', minimum=1, maximum=5)
+    place = Reference('Place')
+    user = Reference('User')
+    
     def __init__(self, text, rating, place, user, **kwargs):
         """
         Initialize a new Review instance
@@ -15,76 +21,30 @@ class Review(BaseModel):
         """
         super().__init__(**kwargs)
         
-        # Validate and set attributes
+        # Each assignment validates its field
         self.text = text
         self.rating = rating
         self.place = place
         self.user = user
-        
-        # Validate the attributes
-        self._validate()
-    
-    @property
-    def text(self):
-        return self._text
-    
-    @text.setter
-    def text(self, value):
-        if not value or not isinstance(value, str):
-            raise ValueError("Text must be a non-empty string")
-        self._text = value
-    
-    @property
-    def rating(self):
-        return self._rating
-    
-    @rating.setter
-    def rating(self, value):
-        if not isinstance(value, int):
-            raise ValueError("Rating must be an integer")
-        if value < 1 or value > 5:
-            raise ValueError("Rating must be between 1 and 5")
-        self._rating = value
-    
-    @property
-    def place(self):
-        return self._place
-    
-    @place.setter
-    def place(self, value):
-        from app.models.place import Place
-        if not isinstance(value, Place):
-            raise ValueError("Place must be a Place instance")
-        self._place = value
-    
-    @property
-    def user(self):
-        return self._user
-    
-    @user.setter
-    def user(self, value):
-        from app.models.user import User
-        if not isinstance(value, User):
-            raise ValueError("User must be a User instance")
-        self._user = value
     
-    def _validate(self):
-        """Validate all review attributes"""
-        # Trigger property setters to validate
-        self.text = self._text
-        self.rating = self._rating
-        self.place = self._place
-        self.user = self._user
+    def touch(self):
+        """Mark the review as changed, along with the place that lists it"""
+        super().touch()
+        place = getattr(self, '_place', None)
+        if place is not None:
+            # The rating or date it is sorted by may have changed
+            place.reviews.refresh(self)
+            place.touch()
     
-    def to_dict(self):
+    def _serialize(self):
         """Convert review to dictionary"""
-        review_dict = super().to_dict()
+        review_dict = super()._serialize()
         
         # Remove empty lists that base class might have added
         if 'reviews' in review_dict:
             del review_dict['reviews']
         
-        # Add review attributes (they have underscore prefixes due to properties)
+        # Add review attributes
         review_dict['text'] = self.text
         review_dict['rating'] = self.rating
         
@@ -0,0 +1,254 @@
+"""Prefix autocomplete
+
+PrefixIndex files each object under keys made from its text, in one
+sorted list: every key is the normalized text from one of its words to
+the end ("sunny beach loft", "beach loft", "loft"), so typing the start
+of any word finds it. The keys starting with a prefix are one slice of the
+list, found by bisection. Results are ranked by a score, such as a place's
+review count, highest first, then alphabetically.
+
+Ranking a slice by scanning it costs as much as the slice is long, and
+short prefixes ("b") start a large share of all keys. So for every prefix
+whose slice is longer than SCAN_LIMIT, the best MAX_COMPLETIONS objects
+are kept, like the per-node lists of a completion trie. Such a ranking is
+merged from the rankings of the prefix one character longer ("ba", "bb",
+...), so only short slices are ever scanned. Writes update the kept lists
+in place while an object can only climb; when an object on a list drops
+in score or loses the prefix, the list is dropped and merged again from
+its children on the next query for it.
+
+Text is normalized like search text (see search.tokenize): lowercased,
+without accents, words separated by single spaces.
+"""
+import heapq
+from bisect import bisect_left, insort
+
+from app.persistence.locking import ReadWriteLock, NULL_LOCK
+from app.persistence.search import tokenize
+
+MAX_COMPLETIONS = 20
+SCAN_LIMIT = 512
+
+
+def normalize_prefix(text):
+    """Normalized form of what has been typed so far
+
+    Text ending in a space or punctuation ends with a space, so that it
+    only matches whole words.
+    """
+    words = tokenize(text)
+    if not words:
+        return ''
+    prefix = ' '.join(words)
+    return prefix + ' ' if not text[-1].isalnum() else prefix
+
+
+def word_keys(text):
+    """Keys for text: its normalized words from each word to the end"""
+    words = tokenize(text)
+    # The trailing space lets 'sunny ' match the whole word only
+    return [' '.join(words[start:]) + ' ' for start in range(len(words))]
+
+
+class PrefixIndex:
+    """Sorted keys with cached top completions for the busiest prefixes
+
+    Args:
+        texts (callable): Returns the texts an object is found by; the
+            first also orders objects of equal score
+        score (callable, optional): Popularity of an object, higher first
+    """
+
+    def __init__(self, texts, score=None):
+        self._texts = texts
+        self._score = score
+        # (key, object id), sorted
+        self._entries = []
+        self._objects = {}
+        self._keys = {}
+        # object id -> (-score, name, object id), the order of completions
+        self._ranks = {}
+        # prefix -> best ranks of objects with a key starting with it
+        self._tops = {}
+
+    def _rank(self, obj):
+        texts = self._texts(obj)
+        name = ' '.join(tokenize(texts[0])) if texts else ''
+        return (-(self._score(obj) if self._score is not None else 0), name, obj.id)
+
+    def upsert(self, obj):
+        """File obj under the keys and rank of its current state"""
+        keys = frozenset(key for text in self._texts(obj) for key in word_keys(text))
+        self._set(obj.id, keys, self._rank(obj) if keys else None)
+        if keys:
+            self._objects[obj.id] = obj
+
+    def remove(self, obj_id):
+        """Drop obj_id, if filed"""
+        self._set(obj_id, frozenset(), None)
+
+    def fill(self, objs):
+        """File objects into an empty index, sorting once"""
+        for obj in objs:
+            keys = frozenset(key for text in self._texts(obj) for key in word_keys(text))
+            if keys:
+                self._entries.extend((key, obj.id) for key in keys)
+                self._keys[obj.id] = keys
+                self._ranks[obj.id] = self._rank(obj)
+                self._objects[obj.id] = obj
+        self._entries.sort()
+        # Rank every long slice now rather than on its first query
+        self._children_ranking('', 0, len(self._entries))
+
+    def _set(self, obj_id, keys, rank):
+        old_keys = self._keys.get(obj_id, frozenset())
+        old_rank = self._ranks.get(obj_id)
+        if keys == old_keys and rank == old_rank:
+            return
+        for key in old_keys - keys:
+            del self._entries[bisect_left(self._entries, (key, obj_id))]
+        for key in keys - old_keys:
+            insort(self._entries, (key, obj_id))
+        if keys:
+            self._keys[obj_id] = keys
+            self._ranks[obj_id] = rank
+        else:
+            self._keys.pop(obj_id, None)
+            self._ranks.pop(obj_id, None)
+            self._objects.pop(obj_id, None)
+        if self._tops:
+            self._update_tops(old_keys, old_rank, keys, rank)
+
+    def _update_tops(self, old_keys, old_rank, keys, rank):
+        prefixes = {key[:end] for key in old_keys | keys for end in range(1, len(key) + 1)}
+        for prefix in prefixes:
+            top = self._tops.get(prefix)
+            if top is None:
+                continue
+            matches = any(key.startswith(prefix) for key in keys)
+            if old_rank in top:
+                if not matches or rank > old_rank:
+                    # Its replacement may be anywhere in the slice
+                    del self._tops[prefix]
+                    continue
+                top.remove(old_rank)
+            if matches:
+                insort(top, rank)
+                del top[MAX_COMPLETIONS:]
+
+    def _slice(self, prefix, lo=0, hi=None):
+        hi = len(self._entries) if hi is None else hi
+        start = bisect_left(self._entries, (prefix,), lo, hi)
+        # The first string after every string starting with prefix
+        end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return start, bisect_left(self._entries, (end,), start, hi)
+
+    def is_ranked(self, prefix):
+        """Whether completing prefix only reads: its ranking is kept or cheap"""
+        if prefix in self._tops:
+            return True
+        start, stop = self._slice(prefix)
+        return stop - start <= SCAN_LIMIT
+
+    def _ranking(self, prefix, start, stop):
+        # Best ranks among entries[start:stop], the slice of prefix
+        top = self._tops.get(prefix)
+        if top is not None:
+            return top
+        if stop - start <= SCAN_LIMIT:
+            ids = {obj_id for _, obj_id in self._entries[start:stop]}
+            return heapq.nsmallest(MAX_COMPLETIONS, (self._ranks[obj_id] for obj_id in ids))
+        top = self._tops[prefix] = self._children_ranking(prefix, start, stop)
+        return top
+
+    def _children_ranking(self, prefix, start, stop):
+        # An object among the best of the slice is among the best of the
+        # narrower slice holding its key, so merging those is enough
+        ranks = set()
+        depth = len(prefix)
+        position = start
+        while position < stop and len(self._entries[position][0]) == depth:
+            # Keys equal to prefix come first
+            ranks.add(self._ranks[self._entries[position][1]])
+            position += 1
+        while position < stop:
+            child = self._entries[position][0][:depth + 1]
+            end = self._slice(child, position, stop)[1]
+            ranks.update(self._ranking(child, position, end))
+            position = end
+        return heapq.nsmallest(MAX_COMPLETIONS, ranks)
+
+    def complete(self, prefix, limit=MAX_COMPLETIONS):
+        """Return up to limit objects with a key starting with prefix, best first
+
+        prefix must be normalized (see normalize_prefix). The ranking of a
+        slice longer than SCAN_LIMIT is kept for later queries.
+        """
+        if not prefix:
+            return []
+        top = self._ranking(prefix, *self._slice(prefix))
+        return [self._objects[obj_id] for _, _, obj_id in top[:limit]]
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class Completions:
+    """Autocomplete over the objects of a repository
+
+    The facade calls upsert() and remove() as objects, or what their score
+    depends on, change. Like PlaceSearch, the index is built from the
+    repository on the first query, and changes before then are left for
+    that build to pick up.
+
+    Args:
+        repo (InMemoryRepository): Objects to complete
+        texts (callable): Returns the texts an object is found by
+        score (callable, optional): Popularity of an object, higher first
+        thread_safe (bool): Guard the index with a read/write lock
+    """
+
+    def __init__(self, repo, texts, score=None, thread_safe=False):
+        self.repo = repo
+        self._texts = texts
+        self._score = score
+        self._lock = ReadWriteLock() if thread_safe else NULL_LOCK
+        self._index = None
+
+    def _build(self):
+        with self._lock.write():
+            if self._index is not None:
+                return
+            index = PrefixIndex(self._texts, self._score)
+            index.fill(self.repo.get_all())
+            self._index = index
+
+    def upsert(self, obj):
+        """Re-file obj, or drop it if it is no longer stored"""
+        with self._lock.write():
+            if self._index is None:
+                return
+            if self.repo.get(obj.id) is obj:
+                self._index.upsert(obj)
+            else:
+                self._index.remove(obj.id)
+
+    def remove(self, obj_id):
+        """Drop a deleted object"""
+        with self._lock.write():
+            if self._index is not None:
+                self._index.remove(obj_id)
+
+    def complete(self, text, limit=MAX_COMPLETIONS):
+        """Return up to limit objects matching what has been typed, best first"""
+        if self._index is None:
+            self._build()
+        prefix = normalize_prefix(text)
+        if not prefix:
+            return []
+        with self._lock.read():
+            if self._index.is_ranked(prefix):
+                return self._index.complete(prefix, limit)
+        # Ranking a long slice for the first time keeps it, which writes
+        with self._lock.write():
+            return self._index.complete(prefix, limit)
@@ -0,0 +1,544 @@
+"""Columnar shadow of the place repository
+
+Filtering places by price, position, rating and amenities only needs a few
+numbers per place. PlaceColumns keeps those numbers in parallel arrays, one
+row per place, so a combined filter is one pass over contiguous columns
+instead of a walk over scattered Place objects:
+
+    price, latitude, longitude   float64
+    rating                       float64 mean review rating, NaN if unrated
+    amenities                    bitmask, one bit per amenity
+
+Each amenity gets a dense integer code, in the order amenities are first
+seen, and code n is bit n of the masks. The reverse lookup is inverted:
+for each code, a bitmap with one bit per row marks the places that have
+the amenity. "Has all of these amenities" is the AND of a few bitmaps,
+which never looks at places lacking one of them. The row bitmaps are split
+into chunks of CHUNK_ROWS rows, so a write rebuilds one chunk rather than
+an int as long as the table. Deleting an amenity frees its code for the
+next new amenity.
+
+Rows stay dense: deleting a place moves the last row into its slot. A
+row -> place id list and a place id -> row dict map between the two.
+
+Facet counts come out of the same pass as the filter: the matching rows
+become one more bitmap, ANDed with each amenity bitmap and popcounted, and
+their prices are bucketed in a single vectorized (or plain) sweep. Places
+are also kept in rating order, as the repository has no index on a value
+that reviews change.
+
+NumPy is optional. With it, columns are ndarrays and a filter is a handful
+of vectorized comparisons. Without it, columns are array.array and the
+filter is a plain loop over them.
+"""
+import math
+from array import array
+from bisect import bisect_right
+
+from app.persistence.indexes import SortedIndex
+from app.persistence.locking import ReadWriteLock, NULL_LOCK
+from app.persistence.query import AccessPath, Between, HasAll
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_FLOAT_COLUMNS = ('price', 'latitude', 'longitude', 'rating')
+
+# Cost of filtering one row in a column scan, relative to checking a Place
+# object (see benchmarks/bench_columnar.py)
+SCAN_WEIGHT = 0.02 if np is not None else 0.15
+
+_WORD = 64
+
+# Rows per chunk of an amenity's row bitmap. Python ints are immutable, so
+# setting a bit copies the whole int; chunking bounds that copy.
+CHUNK_BITS = 12
+CHUNK_ROWS = 1 << CHUNK_BITS
+_CHUNK_MASK = CHUNK_ROWS - 1
+_WORD_MASK = (1 << _WORD) - 1
+
+# Set bit positions of every byte value, for turning row bitmaps into rows
+_BYTE_BITS = [tuple(bit for bit in range(8) if value >> bit & 1) for value in range(256)]
+
+
+def bits(value):
+    """Return the positions of the set bits of a non-negative int, ascending"""
+    data = value.to_bytes((value.bit_length() + 7) // 8, 'little')
+    return [offset * 8 + bit for offset, byte in enumerate(data) if byte
+            for bit in _BYTE_BITS[byte]]
+
+
+def row_bitmap(rows, size):
+    """Return the bitmap with a bit set for each of rows, the inverse of bits()"""
+    data = bytearray((size + 7) // 8)
+    for row in rows:
+        data[row >> 3] |= 1 << (row & 7)
+    return int.from_bytes(data, 'little')
+
+
+class RowBitmap:
+    """Set of row numbers kept as a list of CHUNK_ROWS-bit ints"""
+
+    __slots__ = ('chunks',)
+
+    def __init__(self, chunks=None):
+        self.chunks = chunks if chunks is not None else []
+
+    @classmethod
+    def from_int(cls, value):
+        """Split a bitmap held in one int, such as PlaceColumns' bitmap(), into chunks"""
+        data = value.to_bytes((value.bit_length() + 7) // 8, 'little')
+        step = CHUNK_ROWS // 8
+        return cls([int.from_bytes(data[start:start + step], 'little')
+                    for start in range(0, len(data), step)])
+
+    def flip(self, row):
+        """Toggle row, touching only the chunk holding it"""
+        index = row >> CHUNK_BITS
+        if index >= len(self.chunks):
+            self.chunks.extend([0] * (index + 1 - len(self.chunks)))
+        self.chunks[index] ^= 1 << (row & _CHUNK_MASK)
+
+    def __and__(self, other):
+        return RowBitmap([mine & theirs for mine, theirs in zip(self.chunks, other.chunks)])
+
+    def count(self):
+        return sum(chunk.bit_count() for chunk in self.chunks)
+
+    def rows(self):
+        """Return the rows in the set, ascending"""
+        return [index << CHUNK_BITS | bit for index, chunk in enumerate(self.chunks) if chunk
+                for bit in bits(chunk)]
+
+
+def rating_key(place):
+    """Mean rating to order places by; unrated places count as 0"""
+    return place.ratings.average or 0.0
+
+
+def place_row(place, amenity_mask):
+    """Column values for place, amenity bitmask included"""
+    rating = place.ratings.average
+    return {
+        'price': float(place.price),
+        'latitude': float(place.latitude),
+        'longitude': float(place.longitude),
+        'rating': math.nan if rating is None else rating,
+        'amenities': amenity_mask,
+    }
+
+
+class _NumpyColumns:
+    """ndarray columns grown by doubling"""
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.floats = {name: np.empty(capacity) for name in _FLOAT_COLUMNS}
+        self.amenities = np.zeros((capacity, 1), dtype=np.uint64)
+
+    def _words(self, mask):
+        return [(mask >> (_WORD * i)) & _WORD_MASK for i in range(self.amenities.shape[1])]
+
+    def _fit(self, mask):
+        capacity, words = self.amenities.shape
+        needed = max(1, -(-mask.bit_length() // _WORD))
+        if self.size == capacity or needed > words:
+            grown = np.zeros((max(capacity, self.size * 2), max(words, needed)), dtype=np.uint64)
+            grown[:capacity, :words] = self.amenities
+            self.amenities = grown
+            for name, column in self.floats.items():
+                self.floats[name] = np.resize(column, len(grown))
+
+    def set(self, row, values):
+        self._fit(values['amenities'])
+        if row == self.size:
+            self.size += 1
+        for name in _FLOAT_COLUMNS:
+            self.floats[name][row] = values[name]
+        self.amenities[row] = np.array(self._words(values['amenities']), dtype=np.uint64)
+
+    def move(self, src, dst):
+        for column in self.floats.values():
+            column[dst] = column[src]
+        self.amenities[dst] = self.amenities[src]
+
+    def pop(self):
+        self.size -= 1
+
+    def mask(self, row):
+        return sum(int(word) << (_WORD * i) for i, word in enumerate(self.amenities[row]))
+
+    def select(self, bounds, min_rating, rows=None):
+        """Return the rows passing every criterion, in row order
+
+        rows, if given, are the only candidates, in ascending order.
+        """
+        n = self.size
+        if rows is None:
+            keep = np.ones(n, dtype=bool)
+        else:
+            keep = np.zeros(n, dtype=bool)
+            keep[rows] = True
+        for name, (lo, hi) in bounds.items():
+            column = self.floats[name][:n]
+            if lo is not None:
+                keep &= column >= lo
+            if hi is not None:
+                keep &= column <= hi
+        if min_rating is not None:
+            keep &= self.floats['rating'][:n] >= min_rating
+        return np.flatnonzero(keep).tolist()
+
+    def bitmap(self, rows):
+        keep = np.zeros(self.size, dtype=bool)
+        keep[rows] = True
+        return int.from_bytes(np.packbits(keep, bitorder='little').tobytes(), 'little')
+
+    def histogram(self, name, rows, edges):
+        """Count rows per bucket of column name; bucket i is [edges[i - 1], edges[i])"""
+        values = self.floats[name][:self.size][rows]
+        buckets = np.searchsorted(np.asarray(edges, dtype=float), values, side='right')
+        return np.bincount(buckets, minlength=len(edges) + 1).tolist()
+
+
+class _ArrayColumns:
+    """array.array columns with Python int bitmasks, used without NumPy"""
+
+    def __init__(self):
+        self.size = 0
+        self.floats = {name: array('d') for name in _FLOAT_COLUMNS}
+        self.amenities = []
+
+    def set(self, row, values):
+        if row == self.size:
+            self.size += 1
+            for name in _FLOAT_COLUMNS:
+                self.floats[name].append(values[name])
+            self.amenities.append(values['amenities'])
+            return
+        for name in _FLOAT_COLUMNS:
+            self.floats[name][row] = values[name]
+        self.amenities[row] = values['amenities']
+
+    def move(self, src, dst):
+        for column in self.floats.values():
+            column[dst] = column[src]
+        self.amenities[dst] = self.amenities[src]
+
+    def pop(self):
+        self.size -= 1
+        for column in self.floats.values():
+            column.pop()
+        self.amenities.pop()
+
+    def mask(self, row):
+        return self.amenities[row]
+
+    def select(self, bounds, min_rating, rows=None):
+        """Return the rows passing every criterion, in row order
+
+        rows, if given, are the only candidates, in ascending order.
+        """
+        for name, (lo, hi) in bounds.items():
+            column = self.floats[name]
+            lo = -math.inf if lo is None else lo
+            hi = math.inf if hi is None else hi
+            if rows is None:
+                # The first pass walks the column directly, which beats indexing
+                rows = [row for row, value in enumerate(column) if lo <= value <= hi]
+            else:
+                rows = [row for row in rows if lo <= column[row] <= hi]
+        if rows is None:
+            rows = range(self.size)
+        if min_rating is not None:
+            rating = self.floats['rating']
+            # NaN (unrated) compares False and drops out
+            rows = [row for row in rows if rating[row] >= min_rating]
+        return list(rows)
+
+    def bitmap(self, rows):
+        return row_bitmap(rows, self.size)
+
+    def histogram(self, name, rows, edges):
+        """Count rows per bucket of column name; bucket i is [edges[i - 1], edges[i])"""
+        column = self.floats[name]
+        counts = [0] * (len(edges) + 1)
+        for row in rows:
+            counts[bisect_right(edges, column[row])] += 1
+        return counts
+
+
+class PlaceColumns:
+    """Array-backed shadow of the places in a repository
+
+    The facade calls upsert() and remove() whenever a place, its amenities
+    or its reviews change. The columns are built from the repository on
+    the first query, so restoring a durable store does not load every
+    place up front.
+
+    Args:
+        repo (InMemoryRepository): The place repository being shadowed
+        thread_safe (bool): Guard the columns with a read/write lock
+    """
+
+    def __init__(self, repo, thread_safe=False):
+        self.repo = repo
+        self._lock = ReadWriteLock() if thread_safe else NULL_LOCK
+        self._columns = None
+        self._ids = []
+        self._rows = {}
+        # Amenity id -> dense code, code -> RowBitmap of the rows having
+        # it, and the codes of deleted amenities, free to hand out again
+        self._amenity_codes = {}
+        self._amenity_rows = []
+        self._free_codes = []
+        self._by_rating = SortedIndex('rating', key=rating_key)
+
+    @property
+    def vectorized(self):
+        return np is not None
+
+    def _mask(self, amenities):
+        mask = 0
+        for amenity in amenities:
+            code = self._amenity_codes.get(amenity.id)
+            if code is None:
+                if self._free_codes:
+                    code = self._free_codes.pop()
+                else:
+                    code = len(self._amenity_rows)
+                    self._amenity_rows.append(RowBitmap())
+                self._amenity_codes[amenity.id] = code
+            mask |= 1 << code
+        return mask
+
+    def _flip(self, row, codes):
+        """Toggle row in the bitmaps of the given amenity codes"""
+        for code in codes:
+            self._amenity_rows[code].flip(row)
+
+    def _set(self, place):
+        # Caller holds the write lock
+        row = self._rows.get(place.id)
+        if row is None:
+            row = len(self._ids)
+            self._ids.append(place.id)
+            self._rows[place.id] = row
+            old_mask = 0
+        else:
+            old_mask = self._columns.mask(row)
+        values = place_row(place, self._mask(place.amenities))
+        self._columns.set(row, values)
+        self._flip(row, bits(old_mask ^ values['amenities']))
+        if self._by_rating.key_of(place.id) != rating_key(place):
+            self._by_rating.remove(place.id)
+            self._by_rating.insert(place)
+
+    def _build(self):
+        with self._lock.write():
+            if self._columns is None:
+                self._columns = _NumpyColumns() if np is not None else _ArrayColumns()
+                for place in self.repo.get_all():
+                    self._set(place)
+
+    def upsert(self, place):
+        """Store the current values of place, adding a row if it is new"""
+        with self._lock.write():
+            # Skip places deleted since the caller looked them up
+            if self._columns is not None and self.repo.get(place.id) is place:
+                self._set(place)
+
+    def remove(self, place_id):
+        """Drop the row of place_id, moving the last row into its slot"""
+        with self._lock.write():
+            if self._columns is None or place_id not in self._rows:
+                return
+            row = self._rows.pop(place_id)
+            last = len(self._ids) - 1
+            self._by_rating.remove(place_id)
+            self._flip(row, bits(self._columns.mask(row)))
+            if row != last:
+                moved = self._ids[last]
+                codes = bits(self._columns.mask(last))
+                self._flip(last, codes)
+                self._flip(row, codes)
+                self._columns.move(last, row)
+                self._ids[row] = moved
+                self._rows[moved] = row
+            self._ids.pop()
+            self._columns.pop()
+
+    def forget_amenity(self, amenity_id):
+        """Drop the code and bitmap of a deleted amenity
+
+        Its code is reused once no row has it any more, which is the case
+        when the amenity was removed from its places first.
+        """
+        with self._lock.write():
+            code = self._amenity_codes.pop(amenity_id, None)
+            if code is not None and not self._amenity_rows[code].count():
+                self._free_codes.append(code)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def amenity_code(self, amenity_id):
+        """Return the dense code of an amenity, None if no place has had it"""
+        if self._columns is None:
+            self._build()
+        return self._amenity_codes.get(amenity_id)
+
+    def _amenity_match(self, amenity_ids):
+        # Caller holds the read lock; returns None for no amenity_ids
+        matched = None
+        for amenity_id in amenity_ids:
+            code = self._amenity_codes.get(amenity_id)
+            if code is None:
+                return RowBitmap()
+            bitmap = self._amenity_rows[code]
+            matched = bitmap if matched is None else matched & bitmap
+        return matched
+
+    def places_with_amenities(self, amenity_ids):
+        """Return the ids of places having every one of amenity_ids, in row order"""
+        if self._columns is None:
+            self._build()
+        with self._lock.read():
+            matched = self._amenity_match(amenity_ids)
+            return [self._ids[row] for row in matched.rows()] if matched is not None else []
+
+    def _select(self, min_price, max_price, min_latitude, max_latitude,
+                min_longitude, max_longitude, min_rating, amenity_ids):
+        # Caller holds the read lock
+        rows = None
+        if amenity_ids:
+            rows = self._amenity_match(amenity_ids).rows()
+            if not rows:
+                return []
+        bounds = {
+            name: (lo, hi) for name, lo, hi in (
+                ('price', min_price, max_price),
+                ('latitude', min_latitude, max_latitude),
+                ('longitude', min_longitude, max_longitude),
+            ) if lo is not None or hi is not None
+        }
+        if bounds or min_rating is not None:
+            return self._columns.select(bounds, min_rating, rows)
+        return range(len(self._ids)) if rows is None else rows
+
+    def filter(self, min_price=None, max_price=None, min_latitude=None, max_latitude=None,
+               min_longitude=None, max_longitude=None, min_rating=None, amenity_ids=None):
+        """Return the ids of places matching every given criterion
+
+        Bounds are inclusive and None means unbounded. amenity_ids lists
+        amenities a place must all have; their row bitmaps narrow the
+        candidates before any column is read.
+        """
+        if self._columns is None:
+            self._build()
+        with self._lock.read():
+            rows = self._select(min_price, max_price, min_latitude, max_latitude,
+                                min_longitude, max_longitude, min_rating, amenity_ids)
+            return [self._ids[row] for row in rows]
+
+    def facet(self, price_edges, min_price=None, max_price=None, min_latitude=None,
+              max_latitude=None, min_longitude=None, max_longitude=None, min_rating=None,
+              amenity_ids=None):
+        """Return filter() results with how many of them have each amenity and price
+
+        Returns:
+            tuple: (place_ids, amenity_counts, price_counts), where
+            amenity_counts maps amenity id to the number of matches having
+            it, leaving out zeros, and price_counts[i] counts the matches
+            with price_edges[i - 1] <= price < price_edges[i]; the first
+            and last buckets are open-ended
+        """
+        if self._columns is None:
+            self._build()
+        with self._lock.read():
+            rows = self._select(min_price, max_price, min_latitude, max_latitude,
+                                min_longitude, max_longitude, min_rating, amenity_ids)
+            matched = RowBitmap.from_int(self._columns.bitmap(rows))
+            amenity_counts = {}
+            for amenity_id, code in self._amenity_codes.items():
+                count = (self._amenity_rows[code] & matched).count()
+                if count:
+                    amenity_counts[amenity_id] = count
+            price_counts = self._columns.histogram('price', rows, price_edges)
+            return [self._ids[row] for row in rows], amenity_counts, price_counts
+
+    def find_among(self, attr_name, place_ids, limit=None, order='asc', after=None):
+        """Return (rating, place) pairs for place_ids in rating order
+
+        Same contract as InMemoryRepository.find_among; 'rating' is the
+        only order kept here.
+        """
+        if attr_name != 'rating':
+            raise ValueError(f"Places are not kept in {attr_name} order")
+        if self._columns is None:
+            self._build()
+        with self._lock.read():
+            return self._by_rating.among(place_ids, limit, order, after)
+
+    def iter_by_rating(self, order='asc', after=None, batch=256):
+        """Yield places in rating order, batch by batch under the read lock"""
+        if self._columns is None:
+            self._build()
+        while True:
+            with self._lock.read():
+                entries = self._by_rating.entries(None, None, batch, order, after)
+            for _, place in entries:
+                yield place
+            if len(entries) < batch:
+                return
+            after = (entries[-1][0], entries[-1][1].id)
+
+    def _places(self, place_ids):
+        places = (self.repo.get(place_id) for place_id in place_ids)
+        return [place for place in places if place is not None]
+
+    def access_paths(self, query):
+        """Return the AccessPaths the columns offer for a Query
+
+        The amenity bitmaps serve HasAll on amenities, with their popcount
+        as the estimate; a column scan serves every price, position, rating
+        and amenity predicate at once; and the rating order serves
+        queries ordered by rating.
+        """
+        if self._columns is None:
+            self._build()
+        paths, covers, criteria = [], [], {}
+        for predicate in query.predicates:
+            if isinstance(predicate, HasAll) and predicate.attr_name == 'amenities':
+                ids = sorted(predicate.ids)
+                with self._lock.read():
+                    matched = self._amenity_match(ids)
+                    rows = matched.count() if matched is not None else 0
+                paths.append(AccessPath(
+                    f"amenity bitmaps {ids}", rows,
+                    lambda after, ids=ids: self._places(self.places_with_amenities(ids)),
+                    covers=(predicate,)))
+                if 'amenity_ids' not in criteria:
+                    criteria['amenity_ids'] = ids
+                    covers.append(predicate)
+            elif isinstance(predicate, Between) and predicate.attr_name in _FLOAT_COLUMNS:
+                if predicate.attr_name == 'rating':
+                    if predicate.hi is None and 'min_rating' not in criteria:
+                        criteria['min_rating'] = predicate.lo
+                        covers.append(predicate)
+                elif f'min_{predicate.attr_name}' not in criteria:
+                    criteria[f'min_{predicate.attr_name}'] = predicate.lo
+                    criteria[f'max_{predicate.attr_name}'] = predicate.hi
+                    covers.append(predicate)
+        if covers:
+            paths.append(AccessPath(
+                f"column scan ({', '.join(str(predicate) for predicate in covers)})", len(self),
+                lambda after: self._places(self.filter(**criteria)),
+                covers=tuple(covers), weight=SCAN_WEIGHT))
+        if query.order_by == 'rating':
+            paths.append(AccessPath(
+                "rating order walk", len(self),
+                lambda after: self.iter_by_rating(query.order, after), order='rating'))
+        return paths
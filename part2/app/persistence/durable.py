@@ -0,0 +1,141 @@
+"""Durable mode for the in-memory repositories
+
+Reads are served from memory as usual. Every add, update and delete is
+also appended to a write-ahead log, and the log is periodically compacted
+into a binary snapshot. A restart maps the snapshot, which loads objects
+lazily as they are first requested, and replays the short tail of the log
+written since.
+"""
+import logging
+import os
+
+from app.persistence.records import to_record, restore, remove
+from app.persistence.snapshot import MappedSnapshot, write_snapshot
+from app.persistence.wal import WriteAheadLog
+
+logger = logging.getLogger(__name__)
+
+
+class _Journal:
+    """Log writer bound to one repository"""
+
+    def __init__(self, store, kind):
+        self.store = store
+        self.kind = kind
+
+    def put(self, obj):
+        self.store.append({'op': 'put', 'kind': self.kind, 'data': to_record(obj)})
+
+    def delete(self, obj_id):
+        self.store.append({'op': 'delete', 'kind': self.kind, 'id': obj_id})
+
+    def put_many(self, objs):
+        self.store.append_many([{'op': 'put', 'kind': self.kind, 'data': to_record(obj)}
+                                for obj in objs])
+
+    def delete_many(self, obj_ids):
+        self.store.append_many([{'op': 'delete', 'kind': self.kind, 'id': obj_id}
+                                for obj_id in obj_ids])
+
+
+class DurableStore:
+    """Write-ahead log plus snapshot for a set of in-memory repositories
+
+    Args:
+        directory (str): Where the log and snapshot files live
+        sync_every (int): Records per fsync (group commit size)
+        sync_interval (float, optional): Maximum seconds between fsyncs
+        compact_every (int, optional): Compact once the log holds this many
+            records; None disables automatic compaction
+    """
+
+    LOG_NAME = 'hbnb.wal'
+    SNAPSHOT_NAME = 'hbnb.snapshot'
+
+    def __init__(self, directory, sync_every=1, sync_interval=None, compact_every=100000):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, self.SNAPSHOT_NAME)
+        self.log = WriteAheadLog(os.path.join(directory, self.LOG_NAME),
+                                 sync_every=sync_every, sync_interval=sync_interval)
+        self.compact_every = compact_every
+        self.repos = {}
+        # Sequence number of the last change, stamped on every log record
+        # and in the snapshot header so replay can skip what it already has
+        self.seq = 0
+
+    def load(self, repos):
+        """Fill repos from the snapshot and log, then start journaling them
+
+        Args:
+            repos (dict): Repository per model kind ('User', 'Place', ...)
+
+        Returns:
+            bool: True if any saved state was found
+        """
+        self.repos = repos
+        found = False
+        if os.path.exists(self.snapshot_path):
+            snapshot = MappedSnapshot(self.snapshot_path)
+            snapshot.attach(repos)
+            self.seq = snapshot.seq
+            found = True
+        for entry in self.log.replay():
+            # Records already folded into the snapshot survive in the log if
+            # the process died between writing the snapshot and truncating
+            if entry['seq'] <= self.seq:
+                continue
+            self._apply(entry)
+            self.seq = entry['seq']
+            found = True
+        for kind, repo in repos.items():
+            repo.attach_journal(_Journal(self, kind))
+        return found
+
+    def _apply(self, entry):
+        try:
+            if entry['op'] == 'put':
+                restore(entry['kind'], entry['data'], self.repos)
+            elif entry['op'] == 'delete':
+                remove(entry['kind'], entry['id'], self.repos)
+        except ValueError as e:
+            # Places and reviews can outlive the user or place they point
+            # to; such records cannot be rebuilt and are dropped
+            logger.warning("Could not restore %s record: %s", entry['kind'], e)
+
+    def append(self, entry):
+        """Log one change, compacting first if the log has grown too long"""
+        with self.log.lock:
+            self.seq += 1
+            entry['seq'] = self.seq
+            self.log.append(entry)
+            if self.compact_every is not None and self.log.appended >= self.compact_every:
+                self.compact()
+
+    def append_many(self, entries):
+        """Log a batch of changes, synced together as one group commit"""
+        if not entries:
+            return
+        with self.log.lock:
+            for entry in entries:
+                self.seq += 1
+                entry['seq'] = self.seq
+            self.log.append_many(entries)
+            if self.compact_every is not None and self.log.appended >= self.compact_every:
+                self.compact()
+
+    def compact(self):
+        """Write a snapshot of every repository and truncate the log
+
+        The log lock is held throughout, so writers queue up until the
+        snapshot is in place. Records are full-state upserts, which makes a
+        change that lands in both the snapshot and the fresh log harmless.
+        """
+        tmp_path = self.snapshot_path + '.tmp'
+        with self.log.lock:
+            write_snapshot(tmp_path, self.repos, self.seq)
+            os.replace(tmp_path, self.snapshot_path)
+            self.log.truncate()
+
+    def close(self):
+        self.log.close()
@@ -0,0 +1,394 @@
+"""Spatial index for latitude/longitude queries
+
+GeoIndex files objects in a grid of fixed-size latitude/longitude cells, in
+the manner of a geohash grid. A radius query only visits the cells the
+circle can reach: a band of rows around the latitude, and as many columns
+as the circle spans at that latitude, wrapping at the antimeridian and
+taking every column near a pole. The candidates found there are ranked by
+great-circle (haversine) distance, vectorized when NumPy is installed.
+
+Nearest-k runs radius queries with a doubling radius until one returns at
+least k objects. Everything closer than the k-th of those lies within the
+same radius, so the answer is exact.
+
+ClusterIndex serves map viewports. Map tiles are 256 px squares of the Web
+Mercator plane, 2**zoom of them across the world; each tile is cut into
+4 x 4 cluster cells of 64 px. For every zoom level up to max_zoom the
+index keeps a count and coordinate sums per occupied cell, updated as
+objects come and go, so the clusters of a viewport are read off directly.
+A viewport is at most MAX_VIEWPORT_CELLS cells across, which bounds the
+reply by screen size whatever the number of objects.
+"""
+import heapq
+import math
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Mean Earth radius (IUGG), in km
+EARTH_RADIUS_KM = 6371.0088
+# Farthest any two points can be
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+_KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# Web Mercator stops short of the poles
+MAX_MERCATOR_LATITUDE = 85.05112878
+MAX_ZOOM = 22
+# Cluster cells per tile side (64 px cells on 256 px tiles)
+_TILE_CELLS_SHIFT = 2
+# Widest viewport, in cluster cells per side (4096 px)
+MAX_VIEWPORT_CELLS = 64
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points, in km"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distances_km(lat, lon, lats, lons):
+    """Great-circle distances from (lat, lon) to each point of lats/lons, in km
+
+    With NumPy the results can differ from haversine_km() in the last
+    bits; anything compared against them, such as cursor positions, should
+    come from here or distance_km().
+    """
+    if np is None:
+        return [haversine_km(lat, lon, other_lat, other_lon)
+                for other_lat, other_lon in zip(lats, lons)]
+    phi = math.radians(lat)
+    phis = np.radians(np.asarray(lats, dtype=float))
+    dlon = np.radians(np.asarray(lons, dtype=float) - lon)
+    a = np.sin((phis - phi) / 2) ** 2 + math.cos(phi) * np.cos(phis) * np.sin(dlon / 2) ** 2
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))).tolist()
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Distance between two points, exactly as distances_km() computes it"""
+    return distances_km(lat1, lon1, (lat2,), (lon2,))[0]
+
+
+def check_point(latitude, longitude):
+    """Raise ValueError unless the point is a valid latitude/longitude"""
+    if not -90 <= latitude <= 90:
+        raise ValueError("Latitude must be between -90 and 90")
+    if not -180 <= longitude <= 180:
+        raise ValueError("Longitude must be between -180 and 180")
+
+
+def check_radius(radius_km):
+    """Raise ValueError unless radius_km is a finite distance, not negative"""
+    if not 0 <= radius_km < math.inf:
+        raise ValueError("Radius must be a finite number, not negative")
+
+
+def check_box(south, west, north, east):
+    """Raise ValueError unless the corners make a valid bounding box
+
+    west may exceed east for a box crossing the antimeridian.
+    """
+    check_point(south, west)
+    check_point(north, east)
+    if south > north:
+        raise ValueError("South must not be north of north")
+
+
+def mercator(lat, lon):
+    """Web Mercator position of a point, both coordinates in [0, 1]"""
+    lat = max(-MAX_MERCATOR_LATITUDE, min(MAX_MERCATOR_LATITUDE, lat))
+    sin_lat = math.sin(math.radians(lat))
+    return (lon + 180) / 360, 0.5 - math.log((1 + sin_lat) / (1 - sin_lat)) / (4 * math.pi)
+
+
+def _cell_of(x, y, size):
+    return min(int(x * size), size - 1), min(int(y * size), size - 1)
+
+
+def viewport_cells(south, west, north, east, zoom):
+    """Return (columns, rows) of the cluster cells a box covers at zoom
+
+    Raises:
+        ValueError: If the box is more than MAX_VIEWPORT_CELLS cells across
+    """
+    size = 1 << (zoom + _TILE_CELLS_SHIFT)
+    first_column, top = _cell_of(*mercator(north, west), size)
+    last_column, bottom = _cell_of(*mercator(south, east), size)
+    if west > east:
+        last_column += size
+    if last_column - first_column >= MAX_VIEWPORT_CELLS or bottom - top >= MAX_VIEWPORT_CELLS:
+        raise ValueError("Viewport is too large for this zoom level")
+    columns = [column % size for column in range(first_column, last_column + 1)]
+    return columns, range(top, bottom + 1)
+
+
+def cluster_points(points, zoom):
+    """Group (lat, lon) points into the cluster cells of zoom
+
+    Returns:
+        list: {'latitude', 'longitude', 'count'} per occupied cell, the
+            position being the mean of the cell's points
+    """
+    size = 1 << (zoom + _TILE_CELLS_SHIFT)
+    cells = {}
+    for lat, lon in points:
+        cell = cells.setdefault(_cell_of(*mercator(lat, lon), size), [0, 0.0, 0.0])
+        cell[0] += 1
+        cell[1] += lat
+        cell[2] += lon
+    return [_cluster(cell) for cell in cells.values()]
+
+
+def _cluster(cell):
+    count, lat_sum, lon_sum = cell
+    return {'latitude': lat_sum / count, 'longitude': lon_sum / count, 'count': count}
+
+
+class GeoIndex:
+    """Grid index over a pair of latitude/longitude attributes
+
+    Args:
+        name (str): Name of the index in its repository
+        lat_attr (str): Attribute holding the latitude
+        lon_attr (str): Attribute holding the longitude
+        cell_degrees (float): Cell size; 0.05 degrees is about 5.5 km of latitude
+    """
+
+    def __init__(self, name, lat_attr, lon_attr, cell_degrees=0.05):
+        self.name = name
+        self.lat_attr = lat_attr
+        self.lon_attr = lon_attr
+        self.cell_degrees = cell_degrees
+        self._rows = math.ceil(180 / cell_degrees)
+        self._columns = math.ceil(360 / cell_degrees)
+        # (row, column) -> {object id: (lat, lon)}
+        self._cells = {}
+        self._objects = {}
+        # Cell and point each object was filed under
+        self._keys = {}
+
+    def _cell(self, lat, lon):
+        row = min(int((lat + 90) / self.cell_degrees), self._rows - 1)
+        column = int((lon + 180) / self.cell_degrees) % self._columns
+        return row, column
+
+    def insert(self, obj):
+        """File obj under its current position"""
+        lat = getattr(obj, self.lat_attr, None)
+        lon = getattr(obj, self.lon_attr, None)
+        if lat is None or lon is None:
+            return
+        point = (float(lat), float(lon))
+        cell = self._cell(*point)
+        self._cells.setdefault(cell, {})[obj.id] = point
+        self._objects[obj.id] = obj
+        self._keys[obj.id] = cell
+
+    def remove(self, obj_id):
+        """Drop the entry filed for obj_id, if any"""
+        cell = self._keys.pop(obj_id, None)
+        if cell is None:
+            return
+        del self._objects[obj_id]
+        bucket = self._cells[cell]
+        del bucket[obj_id]
+        if not bucket:
+            del self._cells[cell]
+
+    def clear(self):
+        self._cells.clear()
+        self._objects.clear()
+        self._keys.clear()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _reach(self, lat, lon, radius_km):
+        """Return (row range, column set or None for all) the circle can touch"""
+        angle = radius_km / EARTH_RADIUS_KM
+        dlat = math.degrees(angle)
+        lo_row, _ = self._cell(max(-90.0, lat - dlat), 0.0)
+        hi_row, _ = self._cell(min(90.0, lat + dlat), 0.0)
+        rows = range(lo_row, hi_row + 1)
+        cos_lat = math.cos(math.radians(lat))
+        if lat + dlat >= 90 or lat - dlat <= -90 or math.sin(angle) >= cos_lat:
+            return rows, None
+        # Widest longitude offset of a spherical cap around (lat, lon)
+        dlon = math.degrees(math.asin(math.sin(angle) / cos_lat))
+        first = int((lon - dlon + 180) // self.cell_degrees)
+        last = int((lon + dlon + 180) // self.cell_degrees)
+        if last - first + 1 >= self._columns:
+            return rows, None
+        return rows, {column % self._columns for column in range(first, last + 1)}
+
+    def _buckets(self, rows, columns):
+        """Yield the occupied cells among the given rows and columns"""
+        width = self._columns if columns is None else len(columns)
+        if len(rows) * width <= len(self._cells):
+            cells = self._cells
+            return (cells[(row, column)] for row in rows
+                    for column in (range(self._columns) if columns is None else columns)
+                    if (row, column) in cells)
+        # Fewer occupied cells than reachable ones: walk those instead
+        return (bucket for (row, column), bucket in self._cells.items()
+                if row in rows and (columns is None or column in columns))
+
+    def _gather(self, rows, columns):
+        """Return the ids and points filed in the given rows and columns"""
+        ids, lats, lons = [], [], []
+        for bucket in self._buckets(rows, columns):
+            for obj_id, (other_lat, other_lon) in bucket.items():
+                ids.append(obj_id)
+                lats.append(other_lat)
+                lons.append(other_lon)
+        return ids, lats, lons
+
+    def in_box(self, south, west, north, east):
+        """Return (lat, lon, object) for each object inside a bounding box
+
+        west may exceed east for a box crossing the antimeridian.
+        """
+        check_box(south, west, north, east)
+        lo_row, _ = self._cell(south, 0.0)
+        hi_row, _ = self._cell(north, 0.0)
+        first = int((west + 180) / self.cell_degrees)
+        last = int((east + 180) / self.cell_degrees)
+        if west > east:
+            last += self._columns
+        columns = None
+        if last - first + 1 < self._columns:
+            columns = {column % self._columns for column in range(first, last + 1)}
+        ids, lats, lons = self._gather(range(lo_row, hi_row + 1), columns)
+        wraps = west > east
+        return [(lat, lon, self._objects[obj_id]) for obj_id, lat, lon in zip(ids, lats, lons)
+                if south <= lat <= north
+                and ((lon >= west or lon <= east) if wraps else west <= lon <= east)]
+
+    def within(self, lat, lon, radius_km, limit=None):
+        """Return (distance_km, object) pairs within radius_km, nearest first
+
+        Ties in distance are broken by object id.
+        """
+        check_point(lat, lon)
+        check_radius(radius_km)
+        ids, lats, lons = self._gather(*self._reach(lat, lon, radius_km))
+        matches = ((distance, obj_id) for distance, obj_id
+                   in zip(distances_km(lat, lon, lats, lons), ids) if distance <= radius_km)
+        if limit is None:
+            matches = sorted(matches)
+        else:
+            matches = heapq.nsmallest(limit, matches)
+        return [(distance, self._objects[obj_id]) for distance, obj_id in matches]
+
+    def count_reach(self, lat, lon, radius_km):
+        """Return how many objects lie in the cells a radius query would visit
+
+        An upper bound on within(), read from cell sizes without computing
+        any distance.
+        """
+        return sum(len(bucket) for bucket in self._buckets(*self._reach(lat, lon, radius_km)))
+
+    def nearest(self, lat, lon, k, radius_km=None):
+        """Return the k (distance_km, object) pairs nearest to (lat, lon), nearest first
+
+        radius_km, if given, caps the search distance.
+        """
+        check_point(lat, lon)
+        if k < 1:
+            raise ValueError("k must be a positive integer")
+        limit = MAX_DISTANCE_KM if radius_km is None else radius_km
+        radius = min(limit, self.cell_degrees * _KM_PER_DEGREE)
+        while True:
+            found = self.within(lat, lon, radius, limit=k)
+            if len(found) >= k or radius >= limit:
+                return found
+            radius = min(limit, radius * 2)
+
+
+class ClusterIndex:
+    """Per-zoom cluster counts over a pair of latitude/longitude attributes
+
+    Args:
+        name (str): Name of the index in its repository
+        lat_attr (str): Attribute holding the latitude
+        lon_attr (str): Attribute holding the longitude
+        max_zoom (int): Highest zoom level with stored clusters; each level
+            adds up to one cell per object, so the deep levels, where cells
+            hold few objects, are left to be computed from the objects
+    """
+
+    def __init__(self, name, lat_attr, lon_attr, max_zoom=10):
+        self.name = name
+        self.lat_attr = lat_attr
+        self.lon_attr = lon_attr
+        self.max_zoom = max_zoom
+        # One {(column, row): [count, lat sum, lon sum]} per zoom level
+        self._levels = [{} for _ in range(max_zoom + 1)]
+        # Point each object was counted at
+        self._keys = {}
+
+    def _cells(self, lat, lon):
+        x, y = mercator(lat, lon)
+        for zoom, level in enumerate(self._levels):
+            yield level, _cell_of(x, y, 1 << (zoom + _TILE_CELLS_SHIFT))
+
+    def insert(self, obj):
+        """Count obj at its current position"""
+        lat = getattr(obj, self.lat_attr, None)
+        lon = getattr(obj, self.lon_attr, None)
+        if lat is None or lon is None:
+            return
+        self.remove(obj.id)
+        lat, lon = float(lat), float(lon)
+        for level, key in self._cells(lat, lon):
+            cell = level.get(key)
+            if cell is None:
+                level[key] = [1, lat, lon]
+            else:
+                cell[0] += 1
+                cell[1] += lat
+                cell[2] += lon
+        self._keys[obj.id] = (lat, lon)
+
+    def remove(self, obj_id):
+        """Stop counting obj_id, if it is counted"""
+        point = self._keys.pop(obj_id, None)
+        if point is None:
+            return
+        lat, lon = point
+        for level, key in self._cells(lat, lon):
+            cell = level[key]
+            if cell[0] == 1:
+                del level[key]
+            else:
+                cell[0] -= 1
+                cell[1] -= lat
+                cell[2] -= lon
+
+    def clear(self):
+        for level in self._levels:
+            level.clear()
+        self._keys.clear()
+
+    def __len__(self):
+        return len(self._keys)
+
+    def clusters(self, south, west, north, east, zoom):
+        """Return the clusters of the cells a bounding box overlaps, at a stored zoom level
+
+        Returns:
+            list: {'latitude', 'longitude', 'count'} per occupied cell
+
+        Raises:
+            ValueError: If the box or zoom is invalid, or the box is too
+                large for the zoom level
+        """
+        check_box(south, west, north, east)
+        if not 0 <= zoom <= self.max_zoom:
+            raise ValueError(f"Zoom must be between 0 and {self.max_zoom}")
+        columns, rows = viewport_cells(south, west, north, east, zoom)
+        level = self._levels[zoom]
+        cells = (level.get((column, row)) for row in rows for column in columns)
+        return [_cluster(cell) for cell in cells if cell is not None]
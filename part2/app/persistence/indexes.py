@@ -0,0 +1,281 @@
+"""Secondary indexes used by the in-memory repository"""
+from bisect import bisect_left, bisect_right, insort
+
+
+def casefold(value):
+    """Normalize strings for case-insensitive lookups, leave anything else as is"""
+    if isinstance(value, str):
+        return value.casefold()
+    return value
+
+
+def object_id(value):
+    """Key references by the id of the object they hold, so an id finds them too"""
+    return getattr(value, 'id', value)
+
+
+class HashIndex:
+    """Hash index mapping an attribute value to the objects that hold it
+
+    A unique index keeps a single object per key and rejects duplicates.
+    A non-unique index keeps an insertion-ordered dict of objects per key
+    so that both lookups and removals are constant time.
+
+    attr_name may be a tuple of attribute names for a composite index: the
+    key is then the tuple of their normalized values, and objects missing
+    any of them are not filed.
+    """
+
+    def __init__(self, attr_name, unique=False, normalize=None):
+        self.attr_name = attr_name
+        self.attr_names = attr_name if isinstance(attr_name, tuple) else (attr_name,)
+        self.unique = unique
+        self.normalize = normalize
+        self._buckets = {}
+        # Key each object was filed under, so removal still works after
+        # the object has been mutated behind the repository's back
+        self._keys = {}
+
+    def _normalized(self, value):
+        if value is not None and self.normalize is not None:
+            return self.normalize(value)
+        return value
+
+    def key_for(self, value):
+        """Return the normalized key for a raw attribute value, or tuple of them"""
+        if not isinstance(self.attr_name, tuple):
+            return self._normalized(value)
+        if value is None or any(part is None for part in value):
+            return None
+        return tuple(self._normalized(part) for part in value)
+
+    def value_of(self, obj, changes=None):
+        """Return the raw indexed value of obj, as it would be with changes applied"""
+        changes = changes or {}
+        values = tuple(changes[name] if name in changes else getattr(obj, name, None)
+                       for name in self.attr_names)
+        return values if isinstance(self.attr_name, tuple) else values[0]
+
+    def touched_by(self, changes):
+        """Return True if changes (attribute -> value) set an indexed attribute"""
+        return any(name in changes for name in self.attr_names)
+
+    def check(self, obj_id, value):
+        """Raise ValueError if storing value for obj_id would break uniqueness"""
+        self._check_key(obj_id, self.key_for(value))
+
+    def _check_key(self, obj_id, key):
+        if not self.unique or key is None:
+            return
+        holder = self._buckets.get(key)
+        if holder is not None and holder.id != obj_id:
+            raise ValueError(f"Duplicate value for unique attribute "
+                             f"'{', '.join(self.attr_names)}': {key}")
+
+    def insert(self, obj):
+        """File obj under the current value of the indexed attribute"""
+        key = self.key_for(self.value_of(obj))
+        if key is None:
+            return
+        self._check_key(obj.id, key)
+        if self.unique:
+            self._buckets[key] = obj
+        else:
+            self._buckets.setdefault(key, {})[obj.id] = obj
+        self._keys[obj.id] = key
+
+    def remove(self, obj_id):
+        """Drop the entry filed for obj_id, if any"""
+        if obj_id not in self._keys:
+            return
+        key = self._keys.pop(obj_id)
+        if self.unique:
+            self._buckets.pop(key, None)
+            return
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket.pop(obj_id, None)
+            if not bucket:
+                del self._buckets[key]
+
+    def clear(self):
+        self._buckets.clear()
+        self._keys.clear()
+
+    def find(self, value):
+        """Return every object filed under value"""
+        key = self.key_for(value)
+        if self.unique:
+            obj = self._buckets.get(key)
+            return [obj] if obj is not None else []
+        return list(self._buckets.get(key, {}).values())
+
+    def count(self, value):
+        """Return how many objects are filed under value"""
+        key = self.key_for(value)
+        if self.unique:
+            return int(key in self._buckets)
+        return len(self._buckets.get(key, ()))
+
+    def find_one(self, value):
+        """Return the first object filed under value, or None"""
+        key = self.key_for(value)
+        if self.unique:
+            return self._buckets.get(key)
+        bucket = self._buckets.get(key)
+        if bucket:
+            return next(iter(bucket.values()))
+        return None
+
+    def __len__(self):
+        return len(self._keys)
+
+
+class _Top:
+    """Sentinel that sorts after any object id"""
+
+    def __lt__(self, other):
+        return False
+
+    def __le__(self, other):
+        return self is other
+
+    def __gt__(self, other):
+        return self is not other
+
+    def __ge__(self, other):
+        return True
+
+
+_TOP = _Top()
+
+# SortedIndex.among() walks the index when the candidate set is at least
+# 1/WALK_SHARE of it, and sorts the candidates when they are fewer
+WALK_SHARE = 8
+
+
+class SortedIndex:
+    """Ordered index over an attribute, backed by a bisect-sorted list
+
+    Entries are (key, object id) tuples so that objects sharing a key keep a
+    stable order and can be located exactly for removal.
+
+    Args:
+        attr_name (str): Attribute to order by
+        key (callable, optional): Computes the key from the object instead
+            of reading attr_name, which then only names the order
+    """
+
+    def __init__(self, attr_name, key=None):
+        self.attr_name = attr_name
+        self._key = key
+        self._entries = []
+        self._objects = {}
+        self._keys = {}
+
+    def insert(self, obj):
+        """File obj under the current value of the indexed attribute"""
+        if self._key is not None:
+            key = self._key(obj)
+        else:
+            key = getattr(obj, self.attr_name, None)
+        if key is None:
+            return
+        insort(self._entries, (key, obj.id))
+        self._objects[obj.id] = obj
+        self._keys[obj.id] = key
+
+    def remove(self, obj_id):
+        """Drop the entry filed for obj_id, if any"""
+        if obj_id not in self._keys:
+            return
+        entry = (self._keys.pop(obj_id), obj_id)
+        del self._objects[obj_id]
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+
+    def clear(self):
+        self._entries.clear()
+        self._objects.clear()
+        self._keys.clear()
+
+    def key_of(self, obj_id):
+        """Return the key obj_id is filed under, or None"""
+        return self._keys.get(obj_id)
+
+    def bounds(self, lo=None, hi=None):
+        """Return the slice of entries whose keys fall within [lo, hi]"""
+        start = 0 if lo is None else bisect_left(self._entries, (lo,))
+        stop = len(self._entries) if hi is None else bisect_right(self._entries, (hi, _TOP))
+        return start, max(start, stop)
+
+    def _resume(self, start, stop, order, after):
+        """Narrow the slice [start, stop) to the entries past after in order"""
+        if after is not None:
+            if order == 'desc':
+                stop = max(start, min(stop, bisect_left(self._entries, after)))
+            else:
+                start = min(stop, max(start, bisect_right(self._entries, after)))
+        return start, stop
+
+    def count(self, lo=None, hi=None):
+        """Return how many entries have lo <= key <= hi, without visiting them"""
+        start, stop = self.bounds(lo, hi)
+        return stop - start
+
+    def entries(self, lo=None, hi=None, limit=None, order='asc', after=None):
+        """Return (key, object) pairs with lo <= key <= hi in key order, at most limit of them
+
+        after is an optional (key, object id) position; only entries that
+        come after it in the requested order are returned.
+        """
+        start, stop = self._resume(*self.bounds(lo, hi), order, after)
+        if limit is not None:
+            if order == 'desc':
+                start = max(start, stop - limit)
+            else:
+                stop = min(stop, start + limit)
+        entries = self._entries[start:stop]
+        if order == 'desc':
+            entries.reverse()
+        return [(key, self._objects[obj_id]) for key, obj_id in entries]
+
+    def range(self, lo=None, hi=None, limit=None, order='asc', after=None):
+        """Return objects with lo <= key <= hi in key order, at most limit of them
+
+        after works as in entries().
+        """
+        return [obj for _, obj in self.entries(lo, hi, limit, order, after)]
+
+    def among(self, obj_ids, limit=None, order='asc', after=None):
+        """Return (key, object) pairs for the objects of obj_ids, in key order
+
+        obj_ids is a set. When it holds a fair share of the index the
+        entries are walked in order, stopping after limit matches;
+        otherwise only obj_ids are looked up and sorted. after works as in
+        range().
+        """
+        if len(obj_ids) * WALK_SHARE < len(self._entries):
+            entries = sorted(((self._keys[obj_id], obj_id) for obj_id in obj_ids
+                              if obj_id in self._keys), reverse=(order == 'desc'))
+            if after is not None:
+                if order == 'desc':
+                    entries = [entry for entry in entries if entry < after]
+                else:
+                    entries = [entry for entry in entries if entry > after]
+            entries = entries[:limit]
+        else:
+            start, stop = self._resume(0, len(self._entries), order, after)
+            positions = range(stop - 1, start - 1, -1) if order == 'desc' else range(start, stop)
+            entries = []
+            for position in positions:
+                entry = self._entries[position]
+                if entry[1] in obj_ids:
+                    entries.append(entry)
+                    if len(entries) == limit:
+                        break
+        return [(key, self._objects[obj_id]) for key, obj_id in entries]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,90 @@
+"""Lock primitives for running the in-memory backend under a threaded server"""
+import threading
+from contextlib import contextmanager, nullcontext
+
+
+class ReadWriteLock:
+    """Lock allowing many concurrent readers or a single writer
+
+    Writers are preferred: once a writer is waiting, new readers queue
+    behind it so a steady stream of reads cannot starve writes.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class LockStripes:
+    """Fixed pool of re-entrant locks shared out by key hash
+
+    Operations touching several entities lock all of their stripes at once
+    through hold(), which always acquires in ascending stripe order so two
+    operations can never wait on each other in a cycle.
+    """
+
+    def __init__(self, count=64):
+        self._locks = [threading.RLock() for _ in range(count)]
+
+    def stripes_for(self, *keys):
+        """Return the sorted, de-duplicated stripe numbers guarding keys"""
+        return sorted({hash(str(key)) % len(self._locks) for key in keys if key is not None})
+
+    @contextmanager
+    def hold(self, *keys):
+        acquired = []
+        try:
+            for stripe in self.stripes_for(*keys):
+                self._locks[stripe].acquire()
+                acquired.append(self._locks[stripe])
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+
+class NullLock:
+    """Stand-in for ReadWriteLock and LockStripes when thread safety is off"""
+
+    def read(self):
+        return nullcontext()
+
+    def write(self):
+        return nullcontext()
+
+    def hold(self, *keys):
+        return nullcontext()
+
+
+NULL_LOCK = NullLock()
@@ -0,0 +1,59 @@
+"""Opaque cursors for keyset pagination
+
+A cursor records the attribute a listing is ordered by and the position
+(key, id) of the last object on the previous page. The next page starts
+right after that position, so fetching it costs the same whatever the page
+number.
+
+Keys are datetimes for the timestamp orderings and finite numbers for every
+other one; decode_cursor() rejects a cursor holding anything else, so a
+tampered cursor never reaches the index comparisons.
+"""
+import base64
+import json
+import math
+from datetime import datetime
+
+# Orderings whose keys are datetimes, stored as {'dt': isoformat}
+DATETIME_ATTRS = ('created_at', 'updated_at')
+
+
+def encode_cursor(attr_name, key, obj_id):
+    """Return an opaque, URL-safe cursor for the position (key, obj_id)"""
+    if isinstance(key, datetime):
+        key = {'dt': key.isoformat()}
+    raw = json.dumps([attr_name, key, obj_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _decode_key(key, attr_name):
+    if attr_name.lstrip('-') in DATETIME_ATTRS:
+        if not isinstance(key, dict) or not isinstance(key.get('dt'), str):
+            raise ValueError("Invalid cursor")
+        key = datetime.fromisoformat(key['dt'])
+        # Timestamps are naive; an aware one would not compare with them
+        if key.tzinfo is not None:
+            raise ValueError("Invalid cursor")
+        return key
+    if isinstance(key, bool) or not isinstance(key, (int, float)) or not math.isfinite(key):
+        raise ValueError("Invalid cursor")
+    return key
+
+
+def decode_cursor(cursor, attr_name):
+    """Return the (key, obj_id) position stored in cursor
+
+    Raises:
+        ValueError: If the cursor is malformed, holds a key of the wrong
+            type for attr_name or belongs to a listing ordered by another
+            attribute
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_attr, key, obj_id = json.loads(raw)
+        if cursor_attr != attr_name or not isinstance(obj_id, str):
+            raise ValueError("Invalid cursor")
+        key = _decode_key(key, attr_name)
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    return key, obj_id
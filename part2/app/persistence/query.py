@@ -0,0 +1,291 @@
+"""Conjunctive queries planned over repository indexes
+
+A Query is a conjunction of predicates with an optional order and limit.
+Every index able to answer one of the predicates, or to hand objects over
+in the requested order, offers an AccessPath together with the number of
+rows it would read. Those numbers come from the indexes themselves:
+
+    hash index         size of the bucket
+    sorted index       width of the bisected range
+    geo grid           objects in the cells the circle reaches
+    amenity bitmaps    popcount of their AND
+    column scan        every row, each far cheaper than reading an object
+
+and a full scan of the repository is always on offer. The planner costs
+each path as the objects the query would examine if that path drove it:
+the candidates it reads, which are checked against the other predicates,
+plus an in-memory sort when they do not come in the requested order. A
+path that does come in order stops after limit matches; how soon is
+estimated from the selectivity of the predicates it leaves to check,
+taken from the narrowest single-index estimate of each predicate and
+assumed independent.
+
+Query.explain() reports the chosen path, its estimates, the predicates
+left to check, the paths passed over with their costs and, once run, the
+objects actually examined and returned.
+"""
+import math
+from operator import attrgetter
+
+from app.persistence.geo import distance_km
+
+# Share of objects assumed to pass a predicate that no index can estimate
+DEFAULT_SELECTIVITY = 1 / 3
+# Cost of sorting, per object and per halving of the input, relative to
+# examining one object
+SORT_COST = 0.05
+
+
+class Predicate:
+    """One condition of a query; attr_name names what indexes may serve it"""
+
+    attr_name = None
+
+    def matches(self, obj):
+        """Return True if obj satisfies the predicate"""
+        raise NotImplementedError
+
+
+class Equals(Predicate):
+    """attr_name equals value, both passed through normalize if given"""
+
+    def __init__(self, attr_name, value, normalize=None):
+        self.attr_name = attr_name
+        self.value = value
+        self.normalize = normalize
+
+    def matches(self, obj):
+        value = getattr(obj, self.attr_name, None)
+        if self.normalize is None:
+            return value == self.value
+        return value is not None and self.normalize(value) == self.normalize(self.value)
+
+    def __str__(self):
+        return f"{self.attr_name} = {self.value!r}"
+
+
+class Between(Predicate):
+    """lo <= value <= hi, either bound optional; objects without a value never match
+
+    key, if given, computes the value, and attr_name only names it; no
+    attribute index serves such a predicate.
+    """
+
+    def __init__(self, attr_name, lo=None, hi=None, key=None):
+        self.attr_name = attr_name
+        self.lo = lo
+        self.hi = hi
+        self.key = key
+
+    def value(self, obj):
+        if self.key is not None:
+            return self.key(obj)
+        return getattr(obj, self.attr_name, None)
+
+    def matches(self, obj):
+        value = self.value(obj)
+        return (value is not None and (self.lo is None or value >= self.lo)
+                and (self.hi is None or value <= self.hi))
+
+    def __str__(self):
+        if self.hi is None:
+            return f"{self.attr_name} >= {self.lo}"
+        if self.lo is None:
+            return f"{self.attr_name} <= {self.hi}"
+        return f"{self.attr_name} between {self.lo} and {self.hi}"
+
+
+class HasAll(Predicate):
+    """The collection in attr_name holds an item with each of ids"""
+
+    def __init__(self, attr_name, ids):
+        self.attr_name = attr_name
+        self.ids = frozenset(ids)
+
+    def matches(self, obj):
+        return self.ids <= {item.id for item in getattr(obj, self.attr_name, ())}
+
+    def __str__(self):
+        return f"{self.attr_name} has all of {sorted(self.ids)}"
+
+
+class Near(Predicate):
+    """At most radius_km from a point, by great-circle distance
+
+    attr_name is the name of the geo index; lat_attr and lon_attr hold the
+    position of an object.
+    """
+
+    def __init__(self, attr_name, latitude, longitude, radius_km,
+                 lat_attr='latitude', lon_attr='longitude'):
+        self.attr_name = attr_name
+        self.latitude = latitude
+        self.longitude = longitude
+        self.radius_km = radius_km
+        self.lat_attr = lat_attr
+        self.lon_attr = lon_attr
+
+    def distance(self, obj):
+        """Distance from the point to obj in km, None if obj has no position"""
+        lat = getattr(obj, self.lat_attr, None)
+        lon = getattr(obj, self.lon_attr, None)
+        if lat is None or lon is None:
+            return None
+        # Same arithmetic as the geo index, so cursor positions built from
+        # this distance line up with the distances it resumes on
+        return distance_km(self.latitude, self.longitude, lat, lon)
+
+    def matches(self, obj):
+        distance = self.distance(obj)
+        return distance is not None and distance <= self.radius_km
+
+    def __str__(self):
+        return f"{self.attr_name} within {self.radius_km} km of ({self.latitude}, {self.longitude})"
+
+
+class AccessPath:
+    """One way of producing the candidates of a query
+
+    Args:
+        name (str): What explain() shows for the path
+        rows (int): Rows the path reads, exact or an upper bound
+        fetch (callable): fetch(after) returns an iterable of objects; an
+            ordered path resumes after the (key, id) position it is given
+        covers (tuple): Predicates every object handed over satisfies
+        order (str, optional): Query order the objects come in
+        weight (float): Cost of reading one row, relative to examining an object
+    """
+
+    def __init__(self, name, rows, fetch, covers=(), order=None, weight=1.0):
+        self.name = name
+        self.rows = rows
+        self.fetch = fetch
+        self.covers = covers
+        self.order = order
+        self.weight = weight
+
+
+class Query:
+    """A conjunction of predicates over one repository, optionally ordered and limited
+
+    Args:
+        repo (InMemoryRepository): Repository queried; its indexes offer
+            paths, and a full scan is always possible
+        predicates (list): Predicates every result satisfies
+        order_by (str, optional): Name of the order, such as an attribute
+        order (str): 'asc' or 'desc'
+        key (callable, optional): Sort key of an object; reads order_by by default
+        limit (int, optional): Most results to return
+        after (tuple, optional): (key, id) position to resume after
+        sources (tuple): Other holders of access paths, such as PlaceColumns
+    """
+
+    def __init__(self, repo, predicates=(), order_by=None, order='asc', key=None, limit=None,
+                 after=None, sources=()):
+        if order not in ('asc', 'desc'):
+            raise ValueError("Order must be 'asc' or 'desc'")
+        self.repo = repo
+        self.predicates = list(predicates)
+        self.order_by = order_by
+        self.order = order
+        self.key = key or (attrgetter(order_by) if order_by else None)
+        self.limit = limit
+        self.after = after if order_by else None
+        self.sources = sources
+        self._plan = None
+        self._stats = None
+
+    def _in_order(self, path):
+        return self.order_by is None or path.order == self.order_by
+
+    def _cost(self, path, selectivity):
+        """Return (cost, estimated matches) of driving the query with path"""
+        rest = 1.0
+        for predicate in self.predicates:
+            if predicate not in path.covers:
+                rest *= selectivity[predicate]
+        read = path.rows
+        if self._in_order(path) and self.limit is not None and rest > 0:
+            read = min(read, math.ceil(self.limit / rest))
+        matches = path.rows * rest
+        cost = read * path.weight
+        if not self._in_order(path):
+            cost += SORT_COST * matches * math.log2(matches + 1)
+        return cost, matches
+
+    def plan(self):
+        """Cost every access path and return the cheapest, planning only once"""
+        if self._plan is None:
+            paths = self.repo.access_paths(self)
+            for source in self.sources:
+                paths.extend(source.access_paths(self))
+            total = max(1, self.repo.count())
+            estimates = {}
+            for path in paths:
+                if len(path.covers) == 1:
+                    predicate = path.covers[0]
+                    estimates[predicate] = min(estimates.get(predicate, 1.0), path.rows / total)
+            selectivity = {predicate: estimates.get(predicate, DEFAULT_SELECTIVITY)
+                           for predicate in self.predicates}
+            costed = sorted(((*self._cost(path, selectivity), i, path)
+                             for i, path in enumerate(paths)), key=lambda entry: entry[:3])
+            self._plan = costed
+        return self._plan[0][3]
+
+    def run(self):
+        """Run the cheapest plan and return the matching objects in order"""
+        path = self.plan()
+        residual = [predicate for predicate in self.predicates if predicate not in path.covers]
+        in_order = self._in_order(path)
+        found, examined = [], 0
+        for obj in path.fetch(self.after if in_order else None):
+            examined += 1
+            if all(predicate.matches(obj) for predicate in residual):
+                found.append(obj)
+                if in_order and self.limit is not None and len(found) >= self.limit:
+                    break
+        if not in_order:
+            descending = self.order == 'desc'
+            keyed = sorted((((self.key(obj), obj.id), obj) for obj in found),
+                           key=lambda entry: entry[0], reverse=descending)
+            if self.after is not None:
+                keyed = [(position, obj) for position, obj in keyed
+                         if (position < self.after if descending else position > self.after)]
+            found = [obj for _, obj in keyed[:self.limit]]
+        self._stats = {'rows_examined': examined, 'rows_returned': len(found)}
+        return found
+
+    def explain(self, analyze=True):
+        """Describe the chosen plan; with analyze, run the query first
+
+        Returns:
+            dict: 'access' (the chosen path), 'estimated_rows' (rows it
+                reads), 'estimated_matches', 'cost', 'filter' (predicates
+                checked on each object it hands over), 'order' ('index'
+                when the path yields the order, 'sort' when the results are
+                sorted afterwards, None if unordered), 'alternatives' (the
+                other paths with their rows and costs, cheapest first) and,
+                with analyze, 'rows_examined' and 'rows_returned'
+        """
+        if analyze and self._stats is None:
+            self.run()
+        path = self.plan()
+        cost, matches = self._plan[0][:2]
+        order = None
+        if self.order_by is not None:
+            order = 'index' if self._in_order(path) else 'sort'
+        report = {
+            'access': path.name,
+            'estimated_rows': path.rows,
+            'estimated_matches': round(matches, 1),
+            'cost': round(cost, 1),
+            'filter': [str(predicate) for predicate in self.predicates
+                       if predicate not in path.covers],
+            'order': order,
+            'alternatives': [{'access': other.name, 'estimated_rows': other.rows,
+                              'cost': round(other_cost, 1)}
+                             for other_cost, _, _, other in self._plan[1:]],
+        }
+        if analyze:
+            report.update(self._stats)
+        return report
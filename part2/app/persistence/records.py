@@ -0,0 +1,120 @@
+"""Flat record format for persisting model objects
+
+Records are plain dicts of JSON-friendly values. Relationships are stored
+as ids and resolved against the repositories when a record is restored, so
+restoring a record for an object that already exists updates it in place
+and every reference to it stays valid.
+"""
+import logging
+from datetime import datetime
+
+from app.models.user import User
+from app.models.place import Place
+from app.models.review import Review
+from app.models.amenity import Amenity
+
+# Listed in an order that guarantees references resolve on restore
+MODELS = {'User': User, 'Amenity': Amenity, 'Place': Place, 'Review': Review}
+
+FIELDS = {
+    'User': ('first_name', 'last_name', 'email', 'password', 'is_admin'),
+    'Amenity': ('name',),
+    'Place': ('title', 'description', 'price', 'latitude', 'longitude'),
+    'Review': ('text', 'rating'),
+}
+
+logger = logging.getLogger(__name__)
+
+
+def to_record(obj):
+    """Return the flat record for a model object"""
+    kind = type(obj).__name__
+    record = {
+        'id': obj.id,
+        'created_at': obj.created_at.isoformat(),
+        'updated_at': obj.updated_at.isoformat(),
+    }
+    for field in FIELDS[kind]:
+        record[field] = getattr(obj, field)
+    if kind == 'Place':
+        record['owner_id'] = obj.owner.id
+        record['amenity_ids'] = [amenity.id for amenity in obj.amenities]
+    elif kind == 'Review':
+        record['place_id'] = obj.place.id
+        record['user_id'] = obj.user.id
+    return record
+
+
+def _resolve(repos, kind, obj_id):
+    obj = repos[kind].get(obj_id)
+    if obj is None:
+        raise ValueError(f"{kind} {obj_id} referenced by a record does not exist")
+    return obj
+
+
+def _references(kind, record, repos):
+    if kind == 'Place':
+        return {'owner': _resolve(repos, 'User', record['owner_id'])}
+    if kind == 'Review':
+        return {
+            'place': _resolve(repos, 'Place', record['place_id']),
+            'user': _resolve(repos, 'User', record['user_id']),
+        }
+    return {}
+
+
+def _amenities(repos, record):
+    """Amenities a place record lists, skipping any deleted since it was written"""
+    amenities = []
+    for amenity_id in record['amenity_ids']:
+        amenity = repos['Amenity'].get(amenity_id)
+        if amenity is None:
+            logger.warning("Place %s lists missing Amenity %s; dropping the link",
+                           record['id'], amenity_id)
+        else:
+            amenities.append(amenity)
+    return amenities
+
+
+def restore(kind, record, repos):
+    """Create or update the object described by record inside repos"""
+    repo = repos[kind]
+    values = {field: record[field] for field in FIELDS[kind]}
+    values.update(_references(kind, record, repos))
+    obj = repo.get(record['id'])
+    if obj is None:
+        # Logged records were validated when first written
+        obj = MODELS[kind].load(id=record['id'],
+                                created_at=datetime.fromisoformat(record['created_at']),
+                                updated_at=datetime.fromisoformat(record['updated_at']),
+                                **values)
+        repo.add(obj)
+    else:
+        old_rating = None
+        if kind == 'Review':
+            if values['place'] is not obj.place:
+                obj.place.remove_review(obj)
+            else:
+                old_rating = obj.rating
+        for field, value in values.items():
+            setattr(obj, field, value)
+        obj.updated_at = datetime.fromisoformat(record['updated_at'])
+        repo.save(obj)
+        if old_rating is not None:
+            obj.place.rating_changed(obj, old_rating)
+    if kind == 'Place':
+        obj.amenities = _amenities(repos, record)
+        obj.touch()
+    elif kind == 'Review':
+        obj.place.add_review(obj)
+    return obj
+
+
+def remove(kind, obj_id, repos):
+    """Delete an object and unlink it from its relations"""
+    obj = repos[kind].get(obj_id)
+    if obj is None:
+        return
+    if kind == 'Review':
+        obj.place.remove_review(obj)
+    repos[kind].delete(obj_id)
@@ -1,4 +1,11 @@
 from abc import ABC, abstractmethod
+from functools import partial
+
+from app.persistence.indexes import HashIndex, SortedIndex
+from app.persistence.geo import GeoIndex, ClusterIndex
+from app.persistence.locking import ReadWriteLock, NULL_LOCK
+from app.persistence.pagination import encode_cursor, decode_cursor
+from app.persistence.query import AccessPath, Between, Equals, Near
 
 class Repository(ABC):
     @abstractmethod
@@ -25,28 +32,485 @@ class Repository(ABC):
     def get_by_attribute(self, attr_name, attr_value):
         pass
 
+    @abstractmethod
+    def count(self):
+        """Return the number of stored objects without loading them"""
+        pass
+
+    @abstractmethod
+    def get_page(self, limit, cursor=None):
+        """Return (objects, next_cursor) for one page in creation order"""
+        pass
+
+    @abstractmethod
+    def add_many(self, objs):
+        """Add several objects; return one result per object"""
+        pass
+
+    @abstractmethod
+    def update_many(self, updates):
+        """Apply several (obj_id, data) updates; return one result per update"""
+        pass
+
+    @abstractmethod
+    def delete_many(self, obj_ids):
+        """Delete several objects; return one result per id"""
+        pass
+
 
 class InMemoryRepository(Repository):
-    def __init__(self):
+    def __init__(self, thread_safe=False):
+        # Writers take the lock exclusively while storage and indexes change;
+        # plain id lookups rely on dict.get being atomic and skip it
+        self._lock = ReadWriteLock() if thread_safe else NULL_LOCK
         self._storage = {}
+        self._indexes = {}
+        self._sorted_indexes = {}
+        self._geo_indexes = {}
+        self._journal = None
+        self._backing = None
+        # Creation order, used for keyset pagination
+        self.create_sorted_index('created_at')
 
-    def add(self, obj):
+    def attach_journal(self, journal):
+        """Start recording every change with journal.put / journal.delete"""
+        self._journal = journal
+
+    def attach_backing(self, backing):
+        """Serve objects missing from memory out of backing, loading them on first access
+
+        Until everything has been loaded the indexes stay cold: writes skip
+        them, and the first query that needs them, or a write that must
+        check a unique index, loads the rest and rebuilds them.
+        """
+        with self._lock.write():
+            self._backing = backing
+
+    def adopt(self, obj):
+        """Take in an object loaded by the backing store, without journaling it"""
         self._storage[obj.id] = obj
 
+    def _warm(self):
+        if self._backing is not None:
+            with self._lock.write():
+                self._load_rest()
+
+    def _load_rest(self):
+        # Caller holds the write lock
+        if self._backing is None:
+            return
+        self._backing.load_all()
+        self._backing = None
+        for index in self._all_indexes():
+            index.clear()
+        for obj in self._storage.values():
+            self._index(obj)
+
+    def _warm_for_write(self):
+        # Caller holds the write lock
+        if self._backing is not None and any(index.unique for index in self._indexes.values()):
+            self._load_rest()
+
+    def create_index(self, attr_name, unique=False, normalize=None):
+        """Declare a hash index on attr_name and fill it from stored objects
+
+        attr_name may be a tuple of names for a composite key, looked up
+        with a tuple of values.
+        """
+        index = HashIndex(attr_name, unique=unique, normalize=normalize)
+        with self._lock.write():
+            for obj in self._storage.values():
+                index.insert(obj)
+            self._indexes[attr_name] = index
+        return index
+
+    def create_sorted_index(self, attr_name):
+        """Declare an ordered index on attr_name for range queries"""
+        index = SortedIndex(attr_name)
+        with self._lock.write():
+            for obj in self._storage.values():
+                index.insert(obj)
+            self._sorted_indexes[attr_name] = index
+        return index
+
+    def create_geo_index(self, name, lat_attr, lon_attr, cell_degrees=0.05):
+        """Declare a spatial index on a latitude/longitude attribute pair"""
+        index = GeoIndex(name, lat_attr, lon_attr, cell_degrees)
+        with self._lock.write():
+            for obj in self._storage.values():
+                index.insert(obj)
+            self._geo_indexes[name] = index
+        return index
+
+    def create_cluster_index(self, name, lat_attr, lon_attr, max_zoom=10):
+        """Declare per-zoom map clusters on a latitude/longitude attribute pair"""
+        index = ClusterIndex(name, lat_attr, lon_attr, max_zoom)
+        with self._lock.write():
+            for obj in self._storage.values():
+                index.insert(obj)
+            self._geo_indexes[name] = index
+        return index
+
+    def _all_indexes(self):
+        return [*self._indexes.values(), *self._sorted_indexes.values(),
+                *self._geo_indexes.values()]
+
+    def _check_indexes(self, obj, changes=None):
+        """Raise ValueError if obj, with changes applied, would break a unique index"""
+        for index in self._indexes.values():
+            if index.unique and (changes is None or index.touched_by(changes)):
+                index.check(obj.id, index.value_of(obj, changes))
+
+    def _index(self, obj):
+        if self._backing is not None:
+            return
+        for index in self._all_indexes():
+            index.insert(obj)
+
+    def _unindex(self, obj_id):
+        if self._backing is not None:
+            return
+        for index in self._all_indexes():
+            index.remove(obj_id)
+
+    def add(self, obj):
+        with self._lock.write():
+            self._warm_for_write()
+            self._check_indexes(obj)
+            if obj.id in self._storage:
+                self._unindex(obj.id)
+            self._storage[obj.id] = obj
+            self._index(obj)
+            if self._journal is not None:
+                self._journal.put(obj)
+
     def get(self, obj_id):
-        return self._storage.get(obj_id)
+        obj = self._storage.get(obj_id)
+        backing = self._backing
+        if obj is None and backing is not None:
+            obj = backing.load(obj_id) or self._storage.get(obj_id)
+        return obj
 
     def get_all(self):
+        self._warm()
+        with self._lock.read():
+            return list(self._storage.values())
+
+    def count(self):
+        backing = self._backing
+        if backing is not None:
+            # Objects still in the snapshot count without being loaded
+            return len(self._storage) + backing.remaining()
+        return len(self._storage)
+
+    def objects(self):
+        """Return the stored objects without taking the repository lock
+
+        list() over a dict is atomic under the GIL. This is for callers that
+        may run while this repository's write lock is already held, such as
+        log compaction triggered by a write.
+        """
+        backing = self._backing
+        if backing is not None:
+            backing.load_all()
         return list(self._storage.values())
 
     def update(self, obj_id, data):
-        obj = self.get(obj_id)
-        if obj:
-            obj.update(data)
+        with self._lock.write():
+            obj = self.get(obj_id)
+            if obj:
+                self._warm_for_write()
+                self._check_indexes(obj, data)
+                self._unindex(obj_id)
+                try:
+                    obj.update(data)
+                finally:
+                    self._index(obj)
+                    if self._journal is not None:
+                        self._journal.put(obj)
+
+    def save(self, obj):
+        """Record changes made to obj in place: refresh its indexes and journal it"""
+        with self._lock.write():
+            if obj.id in self._storage:
+                self._unindex(obj.id)
+                self._index(obj)
+                if self._journal is not None:
+                    self._journal.put(obj)
 
     def delete(self, obj_id):
-        if obj_id in self._storage:
-            del self._storage[obj_id]
+        with self._lock.write():
+            if self.get(obj_id) is not None:
+                del self._storage[obj_id]
+                self._unindex(obj_id)
+                if self._journal is not None:
+                    self._journal.delete(obj_id)
+
+    def add_many(self, objs):
+        """Add a batch of objects under one lock acquisition and one log write
+
+        Objects are checked against the unique indexes one by one, earlier
+        objects of the batch included, and an object that fails is skipped.
+
+        Returns:
+            list: For each object, the object itself if it was added or the
+                ValueError that rejected it
+        """
+        results, added = [], []
+        with self._lock.write():
+            self._warm_for_write()
+            for obj in objs:
+                try:
+                    self._check_indexes(obj)
+                except ValueError as e:
+                    results.append(e)
+                    continue
+                if obj.id in self._storage:
+                    self._unindex(obj.id)
+                self._storage[obj.id] = obj
+                self._index(obj)
+                results.append(obj)
+                added.append(obj)
+            if self._journal is not None:
+                self._journal.put_many(added)
+        return results
+
+    def update_many(self, updates):
+        """Apply a batch of (obj_id, data) updates under one lock acquisition
+
+        Returns:
+            list: For each update, the updated object, None if obj_id does
+                not exist, or the ValueError that rejected the data
+        """
+        results, changed = [], []
+        with self._lock.write():
+            self._warm_for_write()
+            for obj_id, data in updates:
+                obj = self.get(obj_id)
+                if obj is None:
+                    results.append(None)
+                    continue
+                try:
+                    self._check_indexes(obj, data)
+                except ValueError as e:
+                    results.append(e)
+                    continue
+                self._unindex(obj_id)
+                try:
+                    obj.update(data)
+                    results.append(obj)
+                except ValueError as e:
+                    results.append(e)
+                finally:
+                    self._index(obj)
+                    changed.append(obj)
+            if self._journal is not None:
+                self._journal.put_many(changed)
+        return results
+
+    def delete_many(self, obj_ids):
+        """Delete a batch of objects under one lock acquisition
+
+        Returns:
+            list: For each id, True if the object was deleted, False if it
+                did not exist
+        """
+        results, deleted = [], []
+        with self._lock.write():
+            for obj_id in obj_ids:
+                if self.get(obj_id) is None:
+                    results.append(False)
+                    continue
+                del self._storage[obj_id]
+                self._unindex(obj_id)
+                results.append(True)
+                deleted.append(obj_id)
+            if self._journal is not None:
+                self._journal.delete_many(deleted)
+        return results
 
     def get_by_attribute(self, attr_name, attr_value):
-        return next((obj for obj in self._storage.values() if getattr(obj, attr_name) == attr_value), None)
+        self._warm()
+        with self._lock.read():
+            index = self._indexes.get(attr_name)
+            if index is not None:
+                return index.find_one(attr_value)
+            return next((obj for obj in self._storage.values() if getattr(obj, attr_name) == attr_value), None)
+
+    def find_by_attribute(self, attr_name, attr_value):
+        """Return every object whose attr_name equals attr_value"""
+        self._warm()
+        with self._lock.read():
+            index = self._indexes.get(attr_name)
+            if index is not None:
+                return index.find(attr_value)
+            return [obj for obj in self._storage.values() if getattr(obj, attr_name) == attr_value]
+
+    def find_range(self, attr_name, lo=None, hi=None, limit=None, order='asc', after=None):
+        """Return objects with lo <= attr_name <= hi ordered by attr_name
+
+        Either bound may be None for an open range. order is 'asc' or 'desc'.
+        after is an optional (value, id) position to resume from.
+        """
+        if order not in ('asc', 'desc'):
+            raise ValueError("Order must be 'asc' or 'desc'")
+        self._warm()
+        with self._lock.read():
+            index = self._sorted_indexes.get(attr_name)
+            if index is not None:
+                return index.range(lo, hi, limit, order, after)
+            matches = [
+                obj for obj in self._storage.values()
+                if getattr(obj, attr_name, None) is not None
+                and (lo is None or getattr(obj, attr_name) >= lo)
+                and (hi is None or getattr(obj, attr_name) <= hi)
+            ]
+        matches.sort(key=lambda obj: (getattr(obj, attr_name), obj.id), reverse=(order == 'desc'))
+        if after is not None:
+            if order == 'desc':
+                matches = [obj for obj in matches if (getattr(obj, attr_name), obj.id) < after]
+            else:
+                matches = [obj for obj in matches if (getattr(obj, attr_name), obj.id) > after]
+        return matches[:limit] if limit is not None else matches
+
+    def find_among(self, attr_name, obj_ids, limit=None, order='asc', after=None):
+        """Return (value, object) pairs for the objects of obj_ids ordered by attr_name
+
+        obj_ids is a set of ids, typically the matches of a filter that
+        does not know about order. limit and after work as in find_range.
+        """
+        if order not in ('asc', 'desc'):
+            raise ValueError("Order must be 'asc' or 'desc'")
+        self._warm()
+        with self._lock.read():
+            index = self._sorted_indexes.get(attr_name)
+            if index is not None:
+                return index.among(obj_ids, limit, order, after)
+            matches = [(getattr(obj, attr_name), obj) for obj in
+                       (self._storage.get(obj_id) for obj_id in obj_ids)
+                       if obj is not None and getattr(obj, attr_name, None) is not None]
+        matches.sort(key=lambda pair: (pair[0], pair[1].id), reverse=(order == 'desc'))
+        if after is not None:
+            if order == 'desc':
+                matches = [pair for pair in matches if (pair[0], pair[1].id) < after]
+            else:
+                matches = [pair for pair in matches if (pair[0], pair[1].id) > after]
+        return matches[:limit] if limit is not None else matches
+
+    def iter_range(self, attr_name, lo=None, hi=None, order='asc', after=None, batch=256):
+        """Yield objects with lo <= attr_name <= hi in order, batch by batch
+
+        Each batch is read under the read lock and resumes after the last
+        entry of the one before, so a caller may stop at any point.
+        """
+        self._warm()
+        while True:
+            with self._lock.read():
+                entries = self._sorted_indexes[attr_name].entries(lo, hi, batch, order, after)
+            for _, obj in entries:
+                yield obj
+            if len(entries) < batch:
+                return
+            after = (entries[-1][0], entries[-1][1].id)
+
+    def _fetch_near(self, predicate, after):
+        found = self.find_near(predicate.attr_name, predicate.latitude, predicate.longitude,
+                               predicate.radius_km)
+        return (obj for distance, obj in found if after is None or (distance, obj.id) > after)
+
+    def access_paths(self, query):
+        """Return the AccessPaths the indexes offer for a Query, a full scan last
+
+        A hash index serves Equals, a sorted index Between on its attribute
+        or the query order, and a geo index Near, ordered by distance.
+        """
+        self._warm()
+        paths = []
+        with self._lock.read():
+            total = len(self._storage)
+            for predicate in query.predicates:
+                attr_name = predicate.attr_name
+                if isinstance(predicate, Equals) and attr_name in self._indexes:
+                    rows = self._indexes[attr_name].count(predicate.value)
+                    paths.append(AccessPath(
+                        f"hash index {attr_name}", rows,
+                        lambda after, value=predicate.value, attr_name=attr_name:
+                            self.find_by_attribute(attr_name, value),
+                        covers=(predicate,)))
+                elif (isinstance(predicate, Between) and predicate.key is None
+                      and attr_name in self._sorted_indexes):
+                    rows = self._sorted_indexes[attr_name].count(predicate.lo, predicate.hi)
+                    in_order = query.order_by == attr_name
+                    paths.append(AccessPath(
+                        f"sorted index {attr_name} [{predicate.lo}, {predicate.hi}]", rows,
+                        partial(self.iter_range, attr_name, predicate.lo, predicate.hi,
+                                query.order if in_order else 'asc'),
+                        covers=(predicate,), order=attr_name if in_order else None))
+                elif isinstance(predicate, Near) and isinstance(self._geo_indexes.get(attr_name),
+                                                                GeoIndex):
+                    rows = self._geo_indexes[attr_name].count_reach(
+                        predicate.latitude, predicate.longitude, predicate.radius_km)
+                    in_order = query.order_by == 'distance' and query.order == 'asc'
+                    paths.append(AccessPath(
+                        f"geo index {attr_name} within {predicate.radius_km} km", rows,
+                        partial(self._fetch_near, predicate), covers=(predicate,),
+                        order='distance' if in_order else None))
+            order_by = query.order_by
+            if order_by in self._sorted_indexes and all(path.order != order_by for path in paths):
+                paths.append(AccessPath(
+                    f"sorted index {order_by} walk", total,
+                    partial(self.iter_range, order_by, None, None, query.order), order=order_by))
+        paths.append(AccessPath("full scan", total, lambda after: self.get_all()))
+        return paths
+
+    def find_page(self, attr_name, lo=None, hi=None, limit=20, cursor=None, order='asc'):
+        """Return one page of find_range results and the cursor for the next page
+
+        Returns:
+            tuple: (objects, next_cursor); next_cursor is None on the last page
+
+        Raises:
+            ValueError: If cursor is invalid
+        """
+        after = decode_cursor(cursor, attr_name) if cursor else None
+        objects = self.find_range(attr_name, lo, hi, limit + 1, order, after)
+        if len(objects) <= limit:
+            return objects, None
+        last = objects[limit - 1]
+        return objects[:limit], encode_cursor(attr_name, getattr(last, attr_name), last.id)
+
+    def get_page(self, limit, cursor=None):
+        return self.find_page('created_at', limit=limit, cursor=cursor)
+
+    def find_near(self, index_name, latitude, longitude, radius_km=None, k=None):
+        """Return (distance_km, object) pairs around a point, nearest first
+
+        Args:
+            index_name (str): Name given to create_geo_index
+            radius_km (float, optional): Only objects at most this far
+            k (int, optional): Only the k nearest objects
+
+        Raises:
+            ValueError: If neither radius_km nor k is given, or either or
+                the point is out of range
+        """
+        if radius_km is None and k is None:
+            raise ValueError("A radius or k is required")
+        self._warm()
+        with self._lock.read():
+            index = self._geo_indexes[index_name]
+            if k is None:
+                return index.within(latitude, longitude, radius_km)
+            return index.nearest(latitude, longitude, k, radius_km)
+
+    def find_in_box(self, index_name, south, west, north, east):
+        """Return (latitude, longitude, object) for each object inside a bounding box"""
+        self._warm()
+        with self._lock.read():
+            return self._geo_indexes[index_name].in_box(south, west, north, east)
+
+    def get_clusters(self, index_name, south, west, north, east, zoom):
+        """Return the stored clusters of a bounding box at a zoom level"""
+        self._warm()
+        with self._lock.read():
+            return self._geo_indexes[index_name].clusters(south, west, north, east, zoom)
@@ -0,0 +1,299 @@
+"""Full-text search over places
+
+TextIndex is an inverted index: for each term, the documents containing
+it and how often. Documents are ranked with BM25 and a query matches the
+documents containing all of its terms. The last query term also matches
+longer words it begins ("bea" finds "beach"), for search as you type; the
+vocabulary is kept sorted, so its expansions are found by bisection.
+
+Documents are added and removed as bags of weighted terms, which lets a
+place's document grow one review at a time. PlaceSearch builds those bags:
+a place's title (weight TITLE_WEIGHT), description and the text of each of
+its reviews make up one document per place.
+
+Text is split into words, lowercased and stripped of accents, so "Café"
+matches "cafe".
+"""
+import heapq
+import math
+import re
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+
+from app.persistence.locking import ReadWriteLock, NULL_LOCK
+
+_WORD = re.compile(r'\w+')
+
+# BM25 parameters: term frequency saturation and length normalization
+K1 = 1.2
+B = 0.75
+# Most vocabulary terms one prefix expands to
+MAX_PREFIX_TERMS = 64
+# Once the index holds STOPWORD_MIN_DOCS documents, query words found in
+# more than STOPWORD_SHARE of them are left out: their BM25 weight is near
+# zero, yet scoring them would visit most of the index
+STOPWORD_SHARE = 0.5
+STOPWORD_MIN_DOCS = 1000
+TITLE_WEIGHT = 3
+
+
+def tokenize(text):
+    """Return the lowercased, accent-free words of text"""
+    if not text:
+        return []
+    text = unicodedata.normalize('NFKD', text.casefold())
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _WORD.findall(text)
+
+
+class TextIndex:
+    """Inverted index with BM25 ranking and prefix matching on the last term"""
+
+    def __init__(self):
+        # term -> {doc id: weighted term frequency}
+        self._postings = {}
+        self._terms = []
+        self._lengths = {}
+        self._total_length = 0
+
+    def add(self, doc_id, terms):
+        """Add a Counter of weighted terms to a document, creating it if needed"""
+        length = 0
+        for term, count in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                insort(self._terms, term)
+            postings[doc_id] = postings.get(doc_id, 0) + count
+            length += count
+        self._lengths[doc_id] = self._lengths.get(doc_id, 0) + length
+        self._total_length += length
+
+    def remove(self, doc_id, terms):
+        """Take back terms earlier added to a document"""
+        for term, count in terms.items():
+            postings = self._postings.get(term)
+            if postings is None or doc_id not in postings:
+                continue
+            left = postings[doc_id] - count
+            if left > 0:
+                postings[doc_id] = left
+            else:
+                del postings[doc_id]
+                if not postings:
+                    del self._postings[term]
+                    del self._terms[bisect_left(self._terms, term)]
+            self._lengths[doc_id] -= count
+            self._total_length -= count
+
+    def drop(self, doc_id):
+        """Forget a document whose terms have all been removed"""
+        self._total_length -= self._lengths.pop(doc_id, 0)
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def expand(self, prefix):
+        """Return the vocabulary terms starting with prefix, most frequent first"""
+        terms = self._terms
+        position = bisect_left(terms, prefix)
+        matches = []
+        while position < len(terms) and terms[position].startswith(prefix):
+            matches.append(terms[position])
+            position += 1
+        if len(matches) > MAX_PREFIX_TERMS:
+            matches = heapq.nlargest(MAX_PREFIX_TERMS, matches,
+                                     key=lambda term: len(self._postings[term]))
+        return matches
+
+    def _idf(self, term):
+        df = len(self._postings[term])
+        return math.log(1 + (len(self._lengths) - df + 0.5) / (df + 0.5))
+
+    def search(self, query, limit=None, after=None, prefix=True):
+        """Return (score, doc id) pairs for documents matching every query term
+
+        Best match first, ties broken by document id. after is an optional
+        (score, doc id) position; only results ranked below it are
+        returned. With prefix, the last term also matches the words it
+        begins; a query ending in a space does not count as having a prefix.
+        Words in most documents of a large index are ignored (see
+        STOPWORD_SHARE).
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        # One group of alternative terms per query word; a document scores
+        # the best alternative of each group
+        groups = [[word] for word in words]
+        if prefix and not query[-1:].isspace():
+            groups[-1] = self.expand(words[-1]) or [words[-1]]
+        groups = [[term for term in group if term in self._postings] for group in groups]
+        if not all(groups):
+            return []
+        if len(self._lengths) >= STOPWORD_MIN_DOCS:
+            common = STOPWORD_SHARE * len(self._lengths)
+            groups = [group for group in groups
+                      if sum(len(self._postings[term]) for term in group) <= common]
+            if not groups:
+                return []
+        # Start from the group with the fewest documents and narrow down
+        groups.sort(key=lambda group: sum(len(self._postings[term]) for term in group))
+        candidates = set()
+        for term in groups[0]:
+            candidates.update(self._postings[term])
+        for group in groups[1:]:
+            matched = set()
+            for term in group:
+                docs = self._postings[term]
+                if len(docs) < len(candidates):
+                    matched.update(doc_id for doc_id in docs if doc_id in candidates)
+                else:
+                    matched.update(doc_id for doc_id in candidates if doc_id in docs)
+            candidates = matched
+            if not candidates:
+                return []
+        # BM25 with the length normalization K1 * (1 - B + B * length / average)
+        # written as base + slope * length
+        base, slope = K1 * (1 - B), K1 * B * len(self._lengths) / self._total_length
+        lengths = self._lengths
+        scores = dict.fromkeys(candidates, 0.0)
+        for group in groups:
+            best = {}
+            for term in group:
+                postings, weight = self._postings[term], self._idf(term) * (K1 + 1)
+                # Walk whichever is shorter, the postings or the candidates
+                if len(postings) > len(scores):
+                    postings = {doc_id: postings[doc_id] for doc_id in scores
+                                if doc_id in postings}
+                elif len(groups) > 1:
+                    postings = {doc_id: tf for doc_id, tf in postings.items()
+                                if doc_id in scores}
+                for doc_id, tf in postings.items():
+                    score = weight * tf / (tf + base + slope * lengths[doc_id])
+                    if score > best.get(doc_id, 0.0):
+                        best[doc_id] = score
+            for doc_id, score in best.items():
+                scores[doc_id] += score
+        scored = [(-score, doc_id) for doc_id, score in scores.items()]
+        if after is not None:
+            position = (-after[0], after[1])
+            scored = [entry for entry in scored if entry > position]
+        if limit is None:
+            scored.sort()
+        else:
+            scored = heapq.nsmallest(limit, scored)
+        return [(-negative, doc_id) for negative, doc_id in scored]
+
+
+def place_terms(place):
+    """Weighted terms of a place's own fields"""
+    terms = Counter()
+    for word in tokenize(place.title):
+        terms[word] += TITLE_WEIGHT
+    terms.update(tokenize(place.description))
+    return terms
+
+
+class PlaceSearch:
+    """Search index over the places of a repository and their reviews
+
+    The facade calls upsert_place(), remove_place(), upsert_review() and
+    remove_review() as things change. Like PlaceColumns, the index is built
+    from the repositories on the first search, and changes before then are
+    left for that build to pick up.
+
+    Args:
+        place_repo (InMemoryRepository): Places to index
+        review_repo (InMemoryRepository): Their reviews
+        thread_safe (bool): Guard the index with a read/write lock
+    """
+
+    def __init__(self, place_repo, review_repo, thread_safe=False):
+        self.place_repo = place_repo
+        self.review_repo = review_repo
+        self._lock = ReadWriteLock() if thread_safe else NULL_LOCK
+        self._index = None
+        # What each place and review contributed, to take back on change
+        self._place_terms = {}
+        self._review_terms = {}
+        self._place_reviews = {}
+
+    def _build(self):
+        with self._lock.write():
+            if self._index is not None:
+                return
+            self._index = TextIndex()
+            for place in self.place_repo.get_all():
+                self._set_place(place)
+            for review in self.review_repo.get_all():
+                if self.place_repo.get(review.place.id) is review.place:
+                    self._set_review(review)
+
+    def _set_place(self, place):
+        # Caller holds the write lock
+        old = self._place_terms.get(place.id)
+        terms = place_terms(place)
+        if old == terms:
+            return
+        if old is not None:
+            self._index.remove(place.id, old)
+        self._index.add(place.id, terms)
+        self._place_terms[place.id] = terms
+        self._place_reviews.setdefault(place.id, set())
+
+    def _set_review(self, review):
+        # Caller holds the write lock
+        self._unset_review(review.id)
+        terms = Counter(tokenize(review.text))
+        self._index.add(review.place.id, terms)
+        self._review_terms[review.id] = (review.place.id, terms)
+        self._place_reviews.setdefault(review.place.id, set()).add(review.id)
+
+    def _unset_review(self, review_id):
+        # Caller holds the write lock
+        entry = self._review_terms.pop(review_id, None)
+        if entry is not None:
+            place_id, terms = entry
+            self._index.remove(place_id, terms)
+            self._place_reviews[place_id].discard(review_id)
+
+    def upsert_place(self, place):
+        """Re-index a place's title and description, adding the place if new"""
+        with self._lock.write():
+            if self._index is not None and self.place_repo.get(place.id) is place:
+                self._set_place(place)
+
+    def remove_place(self, place_id):
+        """Drop a place and the text of its reviews"""
+        with self._lock.write():
+            if self._index is None or place_id not in self._place_terms:
+                return
+            for review_id in self._place_reviews.pop(place_id, ()):
+                self._index.remove(place_id, self._review_terms.pop(review_id)[1])
+            self._index.remove(place_id, self._place_terms.pop(place_id))
+            self._index.drop(place_id)
+
+    def upsert_review(self, review):
+        """Index the current text of a review under its place"""
+        with self._lock.write():
+            if (self._index is not None and self.review_repo.get(review.id) is review
+                    and review.place.id in self._place_terms):
+                self._set_review(review)
+
+    def remove_review(self, review_id):
+        """Take a review's text out of its place's document"""
+        with self._lock.write():
+            if self._index is not None:
+                self._unset_review(review_id)
+
+    def search(self, query, limit=None, after=None):
+        """Return (score, place id) pairs for query, best first
+
+        See TextIndex.search for limit and after.
+        """
+        if self._index is None:
+            self._build()
+        with self._lock.read():
+            return self._index.search(query, limit, after)
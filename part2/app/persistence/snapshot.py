@@ -0,0 +1,390 @@
+"""Memory-mapped binary snapshot of the whole facade state
+
+Layout (version 2, native byte order recorded in the header)::
+
+    b'HBNBSNAP'  uint32 version  uint32 header length
+    header       JSON directory: sequence number, then for every table its
+                 row count and the byte offset of each column
+    columns      8-byte aligned blocks, one or more per column
+
+Column kinds:
+    f8    float64 per row (prices, coordinates)
+    ts    int64 microseconds since 1970-01-01 per row (naive datetimes)
+    u1    uint8 per row (ratings, booleans)
+    str   uint64 offset table of rows + 1 entries, UTF-8 blob, uint8 null mask
+    uuid  16 bytes per row; used for the id column when every id is a
+          canonical UUID string (version 2)
+    ref   int32 row number in another table, -1 for none
+    list  uint64 offset table of rows + 1 entries, int32 row numbers
+
+Every table also stores 'id_order', the row numbers sorted by id, so a
+single object can be found by binary search without building a dict of
+all ids. Loading only maps the file and parses the header; objects are
+materialized one at a time, together with the objects they reference,
+the first time the repositories ask for them.
+"""
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import uuid
+from array import array
+from datetime import datetime, timedelta
+
+from app.persistence.records import MODELS
+
+MAGIC = b'HBNBSNAP'
+VERSION = 2
+# Versions this module can read; version 1 has no uuid columns
+READABLE = (1, 2)
+_PREAMBLE = struct.Struct('=8sII')
+_EPOCH = datetime(1970, 1, 1)
+
+# Column layout per model kind: (attribute, column kind, referenced kind)
+SCHEMA = {
+    'User': [
+        ('first_name', 'str', None), ('last_name', 'str', None),
+        ('email', 'str', None), ('password', 'str', None), ('is_admin', 'u1', None),
+    ],
+    'Amenity': [
+        ('name', 'str', None),
+    ],
+    'Place': [
+        ('title', 'str', None), ('description', 'str', None), ('price', 'f8', None),
+        ('latitude', 'f8', None), ('longitude', 'f8', None), ('owner', 'ref', 'User'),
+        ('amenities', 'list', 'Amenity'), ('reviews', 'list', 'Review'),
+    ],
+    'Review': [
+        ('text', 'str', None), ('rating', 'u1', None),
+        ('place', 'ref', 'Place'), ('user', 'ref', 'User'),
+    ],
+}
+_COMMON = [('id', 'str', None), ('created_at', 'ts', None), ('updated_at', 'ts', None)]
+
+
+def _micros(value):
+    return (value - _EPOCH) // timedelta(microseconds=1)
+
+
+def pack_id(obj_id):
+    """Return the 16-byte form of a canonical UUID id, None for any other string
+
+    The bytes sort the same way as the string, so id_order and the binary
+    search over a packed id column agree with string order.
+    """
+    try:
+        value = uuid.UUID(obj_id)
+    except (ValueError, TypeError, AttributeError):
+        return None
+    if str(value) != obj_id:
+        return None
+    return value.bytes
+
+
+def unpack_id(data):
+    """Return the id string for the 16-byte form made by pack_id()"""
+    return str(uuid.UUID(bytes=bytes(data)))
+
+
+def _live_rows(repos):
+    """Assign row numbers, leaving out objects whose references are gone"""
+    rows = {kind: {} for kind in MODELS}
+    for kind in ('User', 'Amenity'):
+        for obj in repos[kind].objects():
+            rows[kind][obj.id] = (len(rows[kind]), obj)
+    for obj in repos['Place'].objects():
+        if obj.owner.id in rows['User']:
+            rows['Place'][obj.id] = (len(rows['Place']), obj)
+    for obj in repos['Review'].objects():
+        if obj.place.id in rows['Place'] and obj.user.id in rows['User']:
+            rows['Review'][obj.id] = (len(rows['Review']), obj)
+    return rows
+
+
+class _Writer:
+    """Accumulates column blocks, each aligned to 8 bytes"""
+
+    def __init__(self):
+        self.data = bytearray()
+
+    def block(self, chunk):
+        """Append chunk and return its offset"""
+        self.data += b'\0' * (-len(self.data) % 8)
+        offset = len(self.data)
+        self.data += chunk
+        return offset
+
+
+def _id_column(ids):
+    """Return (kind, blocks) for the id column, packed to 16 bytes per row if possible"""
+    packed = [pack_id(obj_id) for obj_id in ids]
+    if all(packed):
+        return 'uuid', {'data': b''.join(packed)}
+    return 'str', _encode_column('str', ids, None)
+
+
+def _encode_column(kind, values, row_of):
+    """Return the arrays making up one column, keyed by block name"""
+    if kind == 'f8':
+        return {'data': array('d', values)}
+    if kind == 'ts':
+        return {'data': array('q', (_micros(value) for value in values))}
+    if kind == 'u1':
+        return {'data': array('B', (int(value) for value in values))}
+    if kind == 'ref':
+        return {'data': array('i', (row_of.get(value.id, -1) for value in values))}
+    if kind == 'list':
+        offsets, items = array('Q', [0]), array('i')
+        for related in values:
+            items.extend(row_of[obj.id] for obj in related if obj.id in row_of)
+            offsets.append(len(items))
+        return {'offsets': offsets, 'data': items}
+    offsets, nulls, blob = array('Q', [0]), bytearray(), bytearray()
+    for value in values:
+        nulls.append(value is None)
+        if value is not None:
+            blob += value.encode('utf-8')
+        offsets.append(len(blob))
+    return {'offsets': offsets, 'data': blob, 'nulls': nulls}
+
+
+def write_snapshot(path, repos, seq=0):
+    """Write the state of repos to path in snapshot format
+
+    Args:
+        path (str): Destination file
+        repos (dict): Repository per model kind ('User', 'Place', ...)
+        seq (int): Log sequence number the snapshot is consistent with
+    """
+    rows = _live_rows(repos)
+    row_numbers = {kind: {obj_id: row for obj_id, (row, _) in rows[kind].items()}
+                   for kind in MODELS}
+    writer = _Writer()
+    tables = {}
+    for kind in MODELS:
+        objects = [obj for _, obj in rows[kind].values()]
+        columns = {}
+        for attr, col_kind, target in _COMMON + SCHEMA[kind]:
+            values = [getattr(obj, attr) for obj in objects]
+            if attr == 'id':
+                col_kind, blocks = _id_column(values)
+            else:
+                blocks = _encode_column(col_kind, values, row_numbers.get(target))
+            columns[attr] = {'kind': col_kind}
+            for name, data in blocks.items():
+                columns[attr][name] = writer.block(data)
+        order = sorted(row_numbers[kind])
+        columns['id_order'] = {
+            'kind': 'ref',
+            'data': writer.block(array('i', (row_numbers[kind][obj_id] for obj_id in order)))
+        }
+        tables[kind] = {'rows': len(objects), 'columns': columns}
+
+    header = json.dumps({'seq': seq, 'byteorder': sys.byteorder, 'tables': tables}).encode('utf-8')
+    with open(path, 'wb') as out:
+        out.write(_PREAMBLE.pack(MAGIC, VERSION, len(header)))
+        out.write(header)
+        out.write(b'\0' * (-(_PREAMBLE.size + len(header)) % 8))
+        out.write(writer.data)
+        out.flush()
+        os.fsync(out.fileno())
+
+
+class MappedTable:
+    """Read-only view of one table of a mapped snapshot"""
+
+    def __init__(self, kind, view, base, spec):
+        self.kind = kind
+        self.rows = spec['rows']
+        self._view = view
+        self._base = base
+        self._columns = spec['columns']
+        self._arrays = {}
+
+    def _array(self, attr, block, code):
+        """Zero-copy typed view of one block of a column"""
+        key = (attr, block)
+        if key not in self._arrays:
+            itemsize = struct.calcsize(code)
+            count = self.rows + 1 if block == 'offsets' else self.rows
+            if block == 'data' and self._columns[attr]['kind'] == 'list':
+                offsets = self._array(attr, 'offsets', 'Q')
+                count = offsets[self.rows] if self.rows else 0
+            start = self._base + self._columns[attr][block]
+            self._arrays[key] = self._view[start:start + count * itemsize].cast(code)
+        return self._arrays[key]
+
+    def _uuid(self, attr, row):
+        """Raw 16 bytes of a uuid cell"""
+        start = self._base + self._columns[attr]['data'] + 16 * row
+        return self._view[start:start + 16]
+
+    def string(self, attr, row):
+        if self._columns[attr]['kind'] == 'uuid':
+            return unpack_id(self._uuid(attr, row))
+        if self._array(attr, 'nulls', 'B')[row]:
+            return None
+        offsets = self._array(attr, 'offsets', 'Q')
+        start = self._base + self._columns[attr]['data']
+        return str(self._view[start + offsets[row]:start + offsets[row + 1]], 'utf-8')
+
+    def value(self, attr, row):
+        """Decode one cell; references come back as row numbers"""
+        kind = self._columns[attr]['kind']
+        if kind in ('str', 'uuid'):
+            return self.string(attr, row)
+        if kind == 'f8':
+            return self._array(attr, 'data', 'd')[row]
+        if kind == 'ts':
+            return _EPOCH + timedelta(microseconds=self._array(attr, 'data', 'q')[row])
+        if kind == 'u1':
+            return self._array(attr, 'data', 'B')[row]
+        if kind == 'ref':
+            return self._array(attr, 'data', 'i')[row]
+        offsets = self._array(attr, 'offsets', 'Q')
+        return self._array(attr, 'data', 'i')[offsets[row]:offsets[row + 1]].tolist()
+
+    def find(self, obj_id):
+        """Return the row holding obj_id, or None, by binary search over id_order"""
+        if self._columns['id']['kind'] == 'uuid':
+            # Canonical UUID strings sort like their bytes, so the search
+            # compares the packed form and never decodes a cell
+            target = pack_id(obj_id)
+            if target is None:
+                return None
+            return self._search(target, lambda row: self._uuid('id', row).tobytes())
+        return self._search(obj_id, lambda row: self.string('id', row))
+
+    def _search(self, target, key):
+        order = self._array('id_order', 'data', 'i')
+        lo, hi = 0, self.rows
+        while lo < hi:
+            mid = (lo + hi) // 2
+            current = key(order[mid])
+            if current < target:
+                lo = mid + 1
+            elif current > target:
+                hi = mid
+            else:
+                return order[mid]
+        return None
+
+
+class MappedSnapshot:
+    """Snapshot file mapped into memory and served to repositories lazily
+
+    attach() hands the snapshot to each repository as its backing store.
+    A repository asks load() for ids it does not hold yet and load_all()
+    when it needs every object, e.g. to build its indexes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as snapshot:
+            self._map = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_length = _PREAMBLE.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not an HBnB snapshot")
+        if version not in READABLE:
+            raise ValueError(f"Unsupported snapshot version {version}")
+        header = json.loads(self._map[_PREAMBLE.size:_PREAMBLE.size + header_length])
+        if header['byteorder'] != sys.byteorder:
+            raise ValueError("Snapshot was written on a machine with a different byte order")
+        base = _PREAMBLE.size + header_length
+        base += -base % 8
+        self.seq = header['seq']
+        self._view = memoryview(self._map)
+        self.tables = {kind: MappedTable(kind, self._view, base, spec)
+                       for kind, spec in header['tables'].items()}
+        self._taken = {kind: set() for kind in self.tables}
+        self._lock = threading.RLock()
+        self.repos = {}
+
+    def attach(self, repos):
+        """Make the snapshot the backing store of each repository"""
+        self.repos = repos
+        for kind, repo in repos.items():
+            repo.attach_backing(_Backing(self, kind))
+
+    def remaining(self, kind):
+        """Number of rows of kind not materialized yet"""
+        return self.tables[kind].rows - len(self._taken[kind])
+
+    def _materialize(self, kind, row):
+        """Build the object stored at row along with what it references
+
+        Returns None when the row was handed out before and the object has
+        since been deleted, or when an object it references is gone.
+        """
+        table = self.tables[kind]
+        repo = self.repos[kind]
+        if row in self._taken[kind]:
+            return repo.get(table.string('id', row))
+        values = {attr: table.value(attr, row) for attr, col_kind, _ in SCHEMA[kind]
+                  if col_kind != 'list'}
+        if kind == 'User':
+            values['is_admin'] = bool(values['is_admin'])
+        elif kind == 'Place':
+            values['owner'] = self._materialize('User', values['owner'])
+            if values['owner'] is None:
+                return None
+        elif kind == 'Review':
+            values['place'] = self._materialize('Place', values['place'])
+            values['user'] = self._materialize('User', values['user'])
+            if values['place'] is None or values['user'] is None:
+                return None
+            # Materializing the place pulls in all of its reviews, this one included
+            if row in self._taken[kind]:
+                return repo.get(table.string('id', row))
+        # Snapshots only hold validated objects, so take the trusted path
+        obj = MODELS[kind].load(id=table.string('id', row),
+                                created_at=table.value('created_at', row),
+                                updated_at=table.value('updated_at', row), **values)
+        self._taken[kind].add(row)
+        repo.adopt(obj)
+        if kind == 'Place':
+            amenities = (self._materialize('Amenity', related)
+                         for related in table.value('amenities', row))
+            obj.amenities = [amenity for amenity in amenities if amenity is not None]
+            # add_review keeps the rating aggregates in step
+            for related in table.value('reviews', row):
+                review = self._materialize('Review', related)
+                if review is not None:
+                    obj.add_review(review)
+        return obj
+
+    def load(self, kind, obj_id):
+        """Materialize the object with obj_id unless it was already handed out"""
+        row = self.tables[kind].find(obj_id)
+        if row is None:
+            return None
+        with self._lock:
+            if row in self._taken[kind]:
+                return None
+            return self._materialize(kind, row)
+
+    def load_all(self, kind):
+        """Materialize every row of kind not handed out yet"""
+        with self._lock:
+            for row in range(self.tables[kind].rows):
+                if row not in self._taken[kind]:
+                    self._materialize(kind, row)
+
+
+class _Backing:
+    """Snapshot access bound to one repository"""
+
+    def __init__(self, snapshot, kind):
+        self.snapshot = snapshot
+        self.kind = kind
+
+    def load(self, obj_id):
+        return self.snapshot.load(self.kind, obj_id)
+
+    def load_all(self):
+        self.snapshot.load_all(self.kind)
+
+    def remaining(self):
+        return self.snapshot.remaining(self.kind)
@@ -0,0 +1,110 @@
+"""Append-only write-ahead log of repository changes"""
+import json
+import os
+import threading
+import time
+
+
+class WriteAheadLog:
+    """Newline-delimited JSON log with group-commit fsync batching
+
+    Every append is written and flushed to the operating system right away,
+    so a crash of the process loses nothing. fsync, which is what protects
+    against power loss, is batched: it runs once sync_every records have
+    accumulated or sync_interval seconds have passed since the last one,
+    whichever comes first. sync_every=1 syncs every record.
+    """
+
+    def __init__(self, path, sync_every=1, sync_interval=None):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.lock = threading.RLock()
+        self._trim_torn_tail()
+        self._file = open(path, 'ab')
+        self._pending = 0
+        self._last_sync = time.monotonic()
+        self.appended = 0
+
+    def _trim_torn_tail(self, chunk_size=4096):
+        """Cut off a final record left incomplete by a crash mid-write
+
+        Otherwise the next append would be glued onto the torn bytes.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as log:
+            end = log.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - chunk_size)
+                log.seek(start)
+                chunk = log.read(position - start)
+                newline = chunk.rfind(b'\n')
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position != end:
+                log.truncate(position)
+
+    def append(self, record):
+        """Write one record to the end of the log"""
+        line = json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+        with self.lock:
+            self._file.write(line)
+            self._file.flush()
+            self._pending += 1
+            self.appended += 1
+            if self._pending >= self.sync_every or (
+                    self.sync_interval is not None
+                    and time.monotonic() - self._last_sync >= self.sync_interval):
+                self.sync()
+
+    def append_many(self, records):
+        """Write several records with a single flush and at most one fsync"""
+        lines = b''.join(json.dumps(record, separators=(',', ':')).encode('utf-8') + b'\n'
+                         for record in records)
+        with self.lock:
+            self._file.write(lines)
+            self._file.flush()
+            self._pending += len(records)
+            self.appended += len(records)
+            if self._pending >= self.sync_every or (
+                    self.sync_interval is not None
+                    and time.monotonic() - self._last_sync >= self.sync_interval):
+                self.sync()
+
+    def sync(self):
+        """Force every appended record to stable storage"""
+        with self.lock:
+            if self._pending:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._pending = 0
+            self._last_sync = time.monotonic()
+
+    def replay(self):
+        """Yield the records in the log in the order they were written
+
+        A torn final line left by a crash mid-write is ignored.
+        """
+        with open(self.path, 'rb') as log:
+            for line in log:
+                if not line.endswith(b'\n'):
+                    break
+                yield json.loads(line)
+
+    def truncate(self):
+        """Discard every record, typically right after a snapshot"""
+        with self.lock:
+            self._file.truncate(0)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+            self.appended = 0
+
+    def close(self):
+        with self.lock:
+            self.sync()
+            self._file.close()
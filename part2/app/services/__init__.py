@@ -1,3 +1,19 @@
+import os
+
+from app.persistence.durable import DurableStore
 from app.services.facade import HBnBFacade
 
-facade = HBnBFacade()
+# Setting HBNB_DATA_DIR turns on durable mode: changes are written to a
+# log in that directory and replayed on the next start
+store = None
+if os.getenv('HBNB_DATA_DIR'):
+    sync_interval = os.getenv('HBNB_WAL_SYNC_INTERVAL')
+    store = DurableStore(
+        os.getenv('HBNB_DATA_DIR'),
+        sync_every=int(os.getenv('HBNB_WAL_SYNC_EVERY', '1')),
+        sync_interval=float(sync_interval) if sync_interval else None,
+        compact_every=int(os.getenv('HBNB_WAL_COMPACT_EVERY', '100000'))
+    )
+
+# The Flask server handles requests on multiple threads
+facade = HBnBFacade(thread_safe=True, store=store)
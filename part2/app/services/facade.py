@@ -1,18 +1,75 @@
 from app.persistence.repository import InMemoryRepository
+from app.persistence.indexes import casefold, object_id
+from app.persistence.locking import LockStripes, NULL_LOCK
+from app.persistence.columnar import PlaceColumns, rating_key
+from app.persistence.query import Query, Equals, Between, HasAll, Near
+from app.persistence.search import PlaceSearch
+from app.persistence.autocomplete import Completions
+from app.persistence.pagination import encode_cursor, decode_cursor
+from app.persistence.geo import (MAX_ZOOM, check_box, check_point, check_radius, cluster_points,
+                                 viewport_cells)
 from app.models.user import User
 from app.models.place import Place
 from app.models.review import Review
 from app.models.amenity import Amenity
 
 class HBnBFacade:
-    def __init__(self):
-        self.user_repo = InMemoryRepository()
-        self.place_repo = InMemoryRepository()
-        self.review_repo = InMemoryRepository()
-        self.amenity_repo = InMemoryRepository()
+    def __init__(self, thread_safe=False, store=None):
+        self.user_repo = InMemoryRepository(thread_safe=thread_safe)
+        self.place_repo = InMemoryRepository(thread_safe=thread_safe)
+        self.review_repo = InMemoryRepository(thread_safe=thread_safe)
+        self.amenity_repo = InMemoryRepository(thread_safe=thread_safe)
+        
+        # Per-entity locks for operations that read-modify-write one or more
+        # entities; keyed by entity id so unrelated writes don't contend
+        self._locks = LockStripes() if thread_safe else NULL_LOCK
+        
+        # Secondary indexes for attribute lookups
+        self.user_repo.create_index('email', unique=True, normalize=casefold)
+        self.amenity_repo.create_index('name', normalize=casefold)
+        self.place_repo.create_sorted_index('price')
+        self.review_repo.create_sorted_index('rating')
+        # Reverse links from a user to the places they own and the reviews
+        # they wrote, keyed by user id
+        self.place_repo.create_index('owner', normalize=object_id)
+        self.review_repo.create_index('user', normalize=object_id)
+        # Reviews by (user id, place id), so get_user_review_for_place is
+        # one lookup
+        self.review_repo.create_index(('user', 'place'), normalize=object_id)
+        self.place_repo.create_geo_index('location', 'latitude', 'longitude')
+        self.place_repo.create_cluster_index('map', 'latitude', 'longitude',
+                                             max_zoom=self.MAP_CLUSTER_ZOOM)
+        
+        # Array-backed copy of the numbers place filters need; every change
+        # to a place, its amenities or its reviews is mirrored into it
+        self.place_columns = PlaceColumns(self.place_repo, thread_safe=thread_safe)
+        
+        # Inverted index over place titles, descriptions and review text
+        self.place_search = PlaceSearch(self.place_repo, self.review_repo, thread_safe=thread_safe)
+        
+        # Type-ahead over place titles, most reviewed first, and over user
+        # names and emails
+        self.place_titles = Completions(self.place_repo, lambda place: [place.title],
+                                        score=lambda place: place.ratings.count,
+                                        thread_safe=thread_safe)
+        self.user_names = Completions(
+            self.user_repo, lambda user: [f'{user.first_name} {user.last_name}', user.email],
+            thread_safe=thread_safe)
+        
+        # In durable mode, restore saved state from the snapshot and log
+        self.store = store
+        restored = False
+        if store is not None:
+            restored = store.load({
+                'User': self.user_repo,
+                'Amenity': self.amenity_repo,
+                'Place': self.place_repo,
+                'Review': self.review_repo,
+            })
         
         # Initialize with some sample data for testing
-        self._init_sample_data()
+        if not restored:
+            self._init_sample_data()
     
     def _init_sample_data(self):
         """Initialize with some sample data for testing"""
@@ -111,12 +168,22 @@ class HBnBFacade:
         except Exception as e:
             print(f"Warning: Could not create sample reviews: {e}")
     
+    def get_counts(self):
+        """Get the number of stored objects of each kind"""
+        return {
+            'users': self.user_repo.count(),
+            'places': self.place_repo.count(),
+            'reviews': self.review_repo.count(),
+            'amenities': self.amenity_repo.count()
+        }
+    
     # User methods
     def create_user(self, user_data):
         """Create a new user"""
         try:
             user = User(**user_data)
             self.user_repo.add(user)
+            self.user_names.upsert(user)
             return user
         except Exception as e:
             raise ValueError(f"Failed to create user: {e}")
@@ -129,40 +196,121 @@ class HBnBFacade:
         """Get all users"""
         return self.user_repo.get_all()
     
+    def get_users_page(self, limit, cursor=None):
+        """Get one page of users in creation order and the next page's cursor"""
+        return self.user_repo.get_page(limit, cursor)
+    
     def update_user(self, user_id, data):
         """Update user"""
-        user = self.get_user(user_id)
-        if user:
-            user.update(data)
-            return user
-        return None
+        with self._locks.hold(user_id):
+            user = self.get_user(user_id)
+            if user:
+                try:
+                    self.user_repo.update(user_id, data)
+                finally:
+                    self.user_names.upsert(user)
+                return user
+            return None
+    
+    def _owned(self, user_id):
+        """Return (places, reviews, lock keys) of everything deleting user_id removes"""
+        places = self.place_repo.find_by_attribute('owner', user_id)
+        reviews = self.review_repo.find_by_attribute('user', user_id)
+        keys = {user_id}
+        keys.update(review.id for review in reviews)
+        keys.update(review.place.id for review in reviews)
+        for place in places:
+            keys.add(place.id)
+            keys.update(review.id for review in place.get_reviews())
+        return places, reviews, keys
     
     def delete_user(self, user_id):
-        """Delete user"""
-        self.user_repo.delete(user_id)
-        return True
+        """Delete a user with the places they own and the reviews they wrote
+        
+        The reviews others left on those places go with the places. Both
+        are found through the owner and author indexes, so the cost grows
+        with the user's own data, not with the size of the repositories.
+        """
+        places, reviews, keys = self._owned(user_id)
+        while True:
+            # Every lock is taken at once, in stripe order; if the user's
+            # data changed before they were all held, take them again
+            with self._locks.hold(*keys):
+                places, reviews, held = self._owned(user_id)
+                if held <= keys:
+                    for review in reviews:
+                        self.delete_review(review.id)
+                    for place in places:
+                        self.delete_place(place.id)
+                    self.user_repo.delete(user_id)
+                    self.user_names.remove(user_id)
+                    return True
+            keys |= held
     
     def get_user_by_email(self, email):
         """Get user by email"""
         return self.user_repo.get_by_attribute('email', email)
     
+    def _user_page(self, repo, attr_name, user_id, limit, cursor):
+        if not self.get_user(user_id):
+            return None
+        after = tuple(decode_cursor(cursor, 'created_at')) if cursor else None
+        query = Query(repo, [Equals(attr_name, user_id, normalize=object_id)], 'created_at',
+                      limit=None if limit is None else limit + 1, after=after)
+        found = query.run()
+        if limit is None or len(found) <= limit:
+            return found, None
+        last = found[limit - 1]
+        return found[:limit], encode_cursor('created_at', last.created_at, last.id)
+    
+    def get_places_by_owner_page(self, user_id, limit=None, cursor=None):
+        """Get the places a user owns, oldest first and one page at a time
+        
+        Read from the owner index, so the cost does not grow with the
+        number of other users' places.
+        
+        Returns:
+            tuple: (places, next_cursor), or None if the user does not exist
+        
+        Raises:
+            ValueError: If cursor is invalid
+        """
+        return self._user_page(self.place_repo, 'owner', user_id, limit, cursor)
+    
+    def get_reviews_by_user_page(self, user_id, limit=None, cursor=None):
+        """Get the reviews a user wrote, oldest first and one page at a time
+        
+        Read from the author index, like get_places_by_owner_page.
+        
+        Returns:
+            tuple: (reviews, next_cursor), or None if the user does not exist
+        
+        Raises:
+            ValueError: If cursor is invalid
+        """
+        return self._user_page(self.review_repo, 'user', user_id, limit, cursor)
+    
     # Place methods
     def create_place(self, place_data):
         """Create a new place"""
-        try:
-            # Get owner from repository
-            if 'owner_id' in place_data:
-                owner = self.get_user(place_data['owner_id'])
-                if not owner:
-                    raise ValueError("Owner not found")
-                place_data['owner'] = owner
-                del place_data['owner_id']
+        with self._locks.hold(place_data.get('owner_id')):
+            try:
+                # Get owner from repository
+                if 'owner_id' in place_data:
+                    owner = self.get_user(place_data['owner_id'])
+                    if not owner:
+                        raise ValueError("Owner not found")
+                    place_data['owner'] = owner
+                    del place_data['owner_id']
             
-            place = Place(**place_data)
-            self.place_repo.add(place)
-            return place
-        except Exception as e:
-            raise ValueError(f"Failed to create place: {e}")
+                place = Place(**place_data)
+                self.place_repo.add(place)
+                self.place_columns.upsert(place)
+                self.place_search.upsert_place(place)
+                self.place_titles.upsert(place)
+                return place
+            except Exception as e:
+                raise ValueError(f"Failed to create place: {e}")
     
     def get_place(self, place_id):
         """Get place by ID"""
@@ -172,45 +320,291 @@ class HBnBFacade:
         """Get all places"""
         return self.place_repo.get_all()
     
+    def get_places_page(self, limit, cursor=None):
+        """Get one page of places in creation order and the next page's cursor"""
+        return self.place_repo.get_page(limit, cursor)
+    
+    def get_places_by_price(self, min_price=None, max_price=None, limit=None, order='asc'):
+        """Get places within a price range, ordered by price"""
+        return self.place_repo.find_range('price', min_price, max_price, limit, order)
+    
+    def get_places_by_price_page(self, min_price=None, max_price=None, limit=20, cursor=None, order='asc'):
+        """Get one page of places within a price range and the next page's cursor"""
+        return self.place_repo.find_page('price', min_price, max_price, limit, cursor, order)
+    
+    def find_places(self, min_price=None, max_price=None, min_latitude=None, max_latitude=None,
+                    min_longitude=None, max_longitude=None, min_rating=None, amenity_ids=None):
+        """Get places matching every given criterion, in one pass over the place columns"""
+        place_ids = self.place_columns.filter(
+            min_price, max_price, min_latitude, max_latitude,
+            min_longitude, max_longitude, min_rating, amenity_ids)
+        places = (self.get_place(place_id) for place_id in place_ids)
+        return [place for place in places if place is not None]
+    
+    def find_places_page(self, limit=None, cursor=None, **criteria):
+        """Get one page of find_places() results in creation order and the next page's cursor
+        
+        Without a limit every match is returned.
+        """
+        places, next_cursor, _ = self.list_places(limit=limit, cursor=cursor, **criteria)
+        return places, next_cursor
+    
+    PLACE_SORTS = ('price', 'rating', 'created_at')
+    
+    # Upper bounds of the price buckets counted by list_places(); the last
+    # bucket has no upper bound
+    PRICE_FACET_EDGES = (50, 100, 200, 500)
+    
+    def _place_query(self, sort, limit, cursor, near, criteria):
+        """Build the Query behind list_places() and explain_places()"""
+        order_by = sort.lstrip('-')
+        order = 'desc' if sort.startswith('-') else 'asc'
+        sorts = self.PLACE_SORTS + (('distance',) if near is not None else ())
+        if order_by not in sorts:
+            raise ValueError(f"Cannot sort places by '{order_by}'")
+        predicates = []
+        for name in ('price', 'latitude', 'longitude'):
+            lo, hi = criteria.get(f'min_{name}'), criteria.get(f'max_{name}')
+            if lo is not None or hi is not None:
+                predicates.append(Between(name, lo, hi))
+        if criteria.get('min_rating') is not None:
+            predicates.append(Between('rating', criteria['min_rating'],
+                                      key=lambda place: place.ratings.average))
+        if criteria.get('amenity_ids'):
+            predicates.append(HasAll('amenities', criteria['amenity_ids']))
+        key = None
+        if near is not None:
+            latitude, longitude, radius_km = near
+            check_point(latitude, longitude)
+            if radius_km is None:
+                raise ValueError("A radius is required")
+            check_radius(radius_km)
+            predicates.append(Near('location', latitude, longitude, radius_km))
+            if order_by == 'distance':
+                key = predicates[-1].distance
+        if order_by == 'rating':
+            key = rating_key
+        after = tuple(decode_cursor(cursor, sort)) if cursor else None
+        return Query(self.place_repo, predicates, order_by, order, key,
+                     None if limit is None else limit + 1, after, sources=(self.place_columns,))
+    
+    def list_places(self, sort='created_at', limit=None, cursor=None, facets=False, near=None,
+                    **criteria):
+        """Get filtered places, sorted and one page at a time, with facet counts
+        
+        The query planner picks the cheapest way to find the page: one of
+        the indexes answering a criterion, with the others checked on each
+        candidate, a scan of the place columns, or an index already in the
+        requested order walked until the page is full (see explain_places).
+        
+        Args:
+            sort (str): 'price', 'rating' or 'created_at', or 'distance'
+                with near, with a leading '-' for descending order; unrated
+                places rank as 0
+            limit (int, optional): Page size; every match when omitted
+            cursor (str, optional): Cursor returned with the previous page
+            facets (bool): Also count the matches per amenity and price
+                bucket, in one pass over the place columns
+            near (tuple, optional): (latitude, longitude, radius_km); only
+                places within the radius
+            **criteria: Filters accepted by find_places()
+        
+        Returns:
+            tuple: (places, next_cursor, facets); facets is None unless
+                asked for, else a dict with 'total', 'amenities' ({'id',
+                'name', 'count'} each, most common first) and 'price'
+                ({'min', 'max', 'count'} each, max None for the last bucket)
+        
+        Raises:
+            ValueError: If sort, cursor or near is invalid, or facets are
+                asked for with near
+        """
+        query = self._place_query(sort, limit, cursor, near, criteria)
+        counts = None
+        if facets:
+            if near is not None:
+                raise ValueError("Facets cannot be combined with near")
+            place_ids, amenity_counts, price_counts = self.place_columns.facet(
+                self.PRICE_FACET_EDGES, **criteria)
+            counts = self._place_facets(len(place_ids), amenity_counts, price_counts)
+            # Every match is known already: order just those
+            ordered = self.place_columns if query.order_by == 'rating' else self.place_repo
+            found = [place for _, place in ordered.find_among(
+                query.order_by, set(place_ids), query.limit, query.order, query.after)]
+        else:
+            found = query.run()
+        if limit is None or len(found) <= limit:
+            return found, None, counts
+        last = found[limit - 1]
+        return found[:limit], encode_cursor(sort, query.key(last), last.id), counts
+    
+    def explain_places(self, sort='created_at', limit=None, cursor=None, near=None, **criteria):
+        """Run a list_places() query and report how it was planned and what it read
+        
+        Returns:
+            dict: The chosen access path, its estimated rows and matches,
+                the criteria checked on each candidate, whether the order
+                came from an index or a sort, the paths passed over with
+                their costs, and the rows examined and returned; see
+                Query.explain()
+        """
+        return self._place_query(sort, limit, cursor, near, criteria).explain()
+    
+    def _place_facets(self, total, amenity_counts, price_counts):
+        amenities = []
+        for amenity_id, count in amenity_counts.items():
+            amenity = self.get_amenity(amenity_id)
+            if amenity:
+                amenities.append({'id': amenity_id, 'name': amenity.name, 'count': count})
+        amenities.sort(key=lambda facet: (-facet['count'], facet['name']))
+        edges = (0, *self.PRICE_FACET_EDGES, None)
+        price = [{'min': lo, 'max': hi, 'count': count}
+                 for lo, hi, count in zip(edges, edges[1:], price_counts)]
+        return {'total': total, 'amenities': amenities, 'price': price}
+    
+    def find_places_near(self, latitude, longitude, radius_km=None, k=None):
+        """Get (distance_km, place) pairs around a point, nearest first
+        
+        radius_km bounds the distance and k keeps only the k nearest; at
+        least one of them is required.
+        """
+        return self.place_repo.find_near('location', latitude, longitude, radius_km, k)
+    
+    def find_places_near_page(self, latitude, longitude, radius_km=None, k=None,
+                              limit=None, cursor=None):
+        """Get one page of find_places_near() places and the next page's cursor"""
+        found = self.find_places_near(latitude, longitude, radius_km, k)
+        if cursor:
+            after = tuple(decode_cursor(cursor, 'distance'))
+            found = [(distance, place) for distance, place in found
+                     if (distance, place.id) > after]
+        places = [place for _, place in found]
+        if limit is None or len(places) <= limit:
+            return places, None
+        distance, last = found[limit - 1]
+        return places[:limit], encode_cursor('distance', distance, last.id)
+    
+    def search_places(self, query, limit=None, cursor=None):
+        """Get places matching a text query, best match first, and the next page's cursor
+        
+        Titles, descriptions and review text are searched; every word of
+        the query must match, the last one also as a prefix.
+        """
+        after = decode_cursor(cursor, 'score') if cursor else None
+        found = self.place_search.search(query, None if limit is None else limit + 1, after)
+        next_cursor = None
+        if limit is not None and len(found) > limit:
+            found = found[:limit]
+            next_cursor = encode_cursor('score', *found[-1])
+        # Skip places deleted since the search
+        places = (self.get_place(place_id) for _, place_id in found)
+        return [place for place in places if place is not None], next_cursor
+    
+    def autocomplete_places(self, text, limit=10):
+        """Get places with a title word starting with text, most reviewed first"""
+        return self.place_titles.complete(text, limit)
+    
+    def autocomplete_users(self, text, limit=10):
+        """Get users with a name or email word starting with text, by name"""
+        return self.user_names.complete(text, limit)
+    
+    # Deepest zoom level with clusters kept up to date, and the most single
+    # places a deeper viewport returns before they are clustered
+    MAP_CLUSTER_ZOOM = 10
+    MAX_MAP_PLACES = 500
+    
+    def get_place_map(self, south, west, north, east, zoom):
+        """Get what a map shows in a bounding box at a zoom level
+        
+        Up to MAP_CLUSTER_ZOOM the reply is the stored clusters only.
+        Deeper, the places in the box are returned one by one, or clustered
+        on the fly if there are more than MAX_MAP_PLACES.
+        
+        Returns:
+            dict: 'clusters' ({'latitude', 'longitude', 'count'} each) and
+                'places' lists
+        
+        Raises:
+            ValueError: If the box or zoom is invalid, or the box is too
+                large for the zoom level
+        """
+        check_box(south, west, north, east)
+        if not 0 <= zoom <= MAX_ZOOM:
+            raise ValueError(f"Zoom must be between 0 and {MAX_ZOOM}")
+        if zoom <= self.MAP_CLUSTER_ZOOM:
+            return {'clusters': self.place_repo.get_clusters('map', south, west, north, east, zoom),
+                    'places': []}
+        # Same viewport size limit as the stored levels
+        viewport_cells(south, west, north, east, zoom)
+        found = self.place_repo.find_in_box('location', south, west, north, east)
+        if len(found) > self.MAX_MAP_PLACES:
+            return {'clusters': cluster_points([(lat, lon) for lat, lon, _ in found], zoom),
+                    'places': []}
+        return {'clusters': [], 'places': [place for _, _, place in found]}
+    
+    def get_places_with_amenities(self, amenity_ids):
+        """Get the places having every given amenity, from the inverted amenity bitmaps"""
+        places = map(self.get_place, self.place_columns.places_with_amenities(amenity_ids))
+        return [place for place in places if place is not None]
+    
     def update_place(self, place_id, data):
         """Update place"""
-        place = self.get_place(place_id)
-        if place:
-            place.update(data)
-            return place
-        return None
+        with self._locks.hold(place_id):
+            place = self.get_place(place_id)
+            if place:
+                try:
+                    self.place_repo.update(place_id, data)
+                finally:
+                    self.place_columns.upsert(place)
+                    self.place_search.upsert_place(place)
+                    self.place_titles.upsert(place)
+                return place
+            return None
     
     def delete_place(self, place_id):
-        """Delete place"""
-        self.place_repo.delete(place_id)
-        return True
+        """Delete place, along with its reviews"""
+        place = self.get_place(place_id)
+        review_ids = [review.id for review in place.get_reviews()] if place else []
+        with self._locks.hold(place_id, *review_ids):
+            if place is not None:
+                # Reviews added since are deleted with the place too
+                self.review_repo.delete_many([review.id for review in place.get_reviews()])
+            self.place_repo.delete(place_id)
+            self.place_columns.remove(place_id)
+            self.place_search.remove_place(place_id)
+            self.place_titles.remove(place_id)
+            return True
     
     # Review methods
     def create_review(self, review_data):
         """Create a new review"""
-        try:
-            # Get place and user from repository
-            if 'place_id' in review_data:
-                place = self.get_place(review_data['place_id'])
-                if not place:
-                    raise ValueError("Place not found")
-                review_data['place'] = place
-                del review_data['place_id']
+        with self._locks.hold(review_data.get('place_id'), review_data.get('user_id')):
+            try:
+                # Get place and user from repository
+                if 'place_id' in review_data:
+                    place = self.get_place(review_data['place_id'])
+                    if not place:
+                        raise ValueError("Place not found")
+                    review_data['place'] = place
+                    del review_data['place_id']
             
-            if 'user_id' in review_data:
-                user = self.get_user(review_data['user_id'])
-                if not user:
-                    raise ValueError("User not found")
-                review_data['user'] = user
-                del review_data['user_id']
+                if 'user_id' in review_data:
+                    user = self.get_user(review_data['user_id'])
+                    if not user:
+                        raise ValueError("User not found")
+                    review_data['user'] = user
+                    del review_data['user_id']
             
-            review = Review(**review_data)
-            self.review_repo.add(review)
-            # Also add review to place
-            review.place.add_review(review)
-            return review
-        except Exception as e:
-            raise ValueError(f"Failed to create review: {e}")
+                review = Review(**review_data)
+                self.review_repo.add(review)
+                # Also add review to place
+                review.place.add_review(review)
+                self.place_columns.upsert(review.place)
+                self.place_search.upsert_review(review)
+                self.place_titles.upsert(review.place)
+                return review
+            except Exception as e:
+                raise ValueError(f"Failed to create review: {e}")
     
     def get_review(self, review_id):
         """Get review by ID"""
@@ -220,6 +614,19 @@ class HBnBFacade:
         """Get all reviews"""
         return self.review_repo.get_all()
     
+    def get_reviews_page(self, limit, cursor=None):
+        """Get one page of reviews in creation order and the next page's cursor"""
+        return self.review_repo.get_page(limit, cursor)
+    
+    def get_user_review_for_place(self, user_id, place_id):
+        """Get the review a user wrote for a place, or None
+        
+        One lookup in the (user, place) index; users and places may be
+        given as objects or ids. If the user reviewed the place more than
+        once, the first review is returned.
+        """
+        return self.review_repo.get_by_attribute(('user', 'place'), (user_id, place_id))
+    
     def get_reviews_by_place(self, place_id):
         """Get all reviews for a specific place"""
         place = self.get_place(place_id)
@@ -227,21 +634,75 @@ class HBnBFacade:
             return place.get_reviews()
         return []
     
+    REVIEW_SORTS = ('rating', 'created_at')
+    
+    def get_reviews_by_place_page(self, place_id, limit=None, cursor=None, sort=None):
+        """Get a place's reviews, sorted and one page at a time
+        
+        Args:
+            place_id (str): Place ID
+            limit (int, optional): Page size; all reviews when omitted
+            cursor (str, optional): Cursor returned with the previous page
+            sort (str, optional): 'rating' or 'created_at', with a leading
+                '-' for descending order; the order reviews were added in
+                when omitted
+        
+        Returns:
+            tuple: (reviews, next_cursor), or None if the place does not exist
+        
+        Raises:
+            ValueError: If sort or cursor is invalid
+        """
+        order_by, order = None, 'asc'
+        if sort:
+            order_by = sort.lstrip('-')
+            order = 'desc' if sort.startswith('-') else 'asc'
+            if order_by not in self.REVIEW_SORTS:
+                raise ValueError(f"Cannot sort reviews by '{order_by}'")
+        place = self.get_place(place_id)
+        if not place:
+            return None
+        # Sorted orders are built and updated under the place's lock
+        with self._locks.hold(place_id):
+            reviews = place.get_reviews()
+            if limit is None:
+                if order_by is None:
+                    return list(reviews), None
+                return reviews.sorted(order_by, order), None
+            return reviews.page(limit, cursor, order_by, order)
+    
     def update_review(self, review_id, data):
         """Update review"""
         review = self.get_review(review_id)
-        if review:
-            review.update(data)
-            return review
-        return None
+        if not review:
+            return None
+        # The place re-sorts the review, so hold its lock as well
+        with self._locks.hold(review_id, review.place.id):
+            review = self.get_review(review_id)
+            if review:
+                old_rating = review.rating
+                try:
+                    self.review_repo.update(review_id, data)
+                finally:
+                    review.place.rating_changed(review, old_rating)
+                    self.place_columns.upsert(review.place)
+                    self.place_search.upsert_review(review)
+                return review
+            return None
     
     def delete_review(self, review_id):
         """Delete review"""
         review = self.get_review(review_id)
         if review:
-            # Remove from place first
-            review.place.remove_review(review)
-            self.review_repo.delete(review_id)
+            with self._locks.hold(review_id, review.place.id):
+                # Re-check under the lock in case of a concurrent delete
+                if self.get_review(review_id) is review:
+                    # Remove from place first
+                    review.place.remove_review(review)
+                    self.review_repo.delete(review_id)
+                    self.place_columns.upsert(review.place)
+                    self.place_search.remove_review(review_id)
+                    self.place_titles.upsert(review.place)
         return True
     
     # Amenity methods
@@ -262,37 +723,92 @@ class HBnBFacade:
         """Get all amenities"""
         return self.amenity_repo.get_all()
     
+    def get_amenity_by_name(self, name):
+        """Get amenity by name, ignoring case"""
+        return self.amenity_repo.get_by_attribute('name', name)
+    
+    def resolve_amenities(self, names):
+        """Map amenity ids or names to ids; unknown entries are kept as they are"""
+        amenities = ((name, self.get_amenity(name) or self.get_amenity_by_name(name))
+                     for name in names)
+        return [amenity.id if amenity else name for name, amenity in amenities]
+    
+    def get_amenities_page(self, limit, cursor=None):
+        """Get one page of amenities in creation order and the next page's cursor"""
+        return self.amenity_repo.get_page(limit, cursor)
+    
     def update_amenity(self, amenity_id, data):
         """Update amenity"""
-        amenity = self.get_amenity(amenity_id)
-        if amenity:
-            amenity.update(data)
-            return amenity
-        return None
+        with self._locks.hold(amenity_id):
+            amenity = self.get_amenity(amenity_id)
+            if amenity:
+                self.amenity_repo.update(amenity_id, data)
+                return amenity
+            return None
+    
+    def _linked_places(self, amenity_ids):
+        """Return the ids of the places having any of amenity_ids, from the amenity bitmaps"""
+        place_ids = set()
+        for amenity_id in amenity_ids:
+            place_ids.update(self.place_columns.places_with_amenities([amenity_id]))
+        return place_ids
+    
+    def _delete_amenities(self, amenity_ids, delete):
+        """Unlink amenity_ids from their places, then run delete() and return its result"""
+        keys = set(amenity_ids) | self._linked_places(amenity_ids)
+        while True:
+            # As in delete_user: if a place gained one of the amenities
+            # before every lock was held, take them again
+            with self._locks.hold(*keys):
+                place_ids = self._linked_places(amenity_ids)
+                if place_ids <= keys:
+                    amenities = [amenity for amenity in map(self.get_amenity, amenity_ids)
+                                 if amenity is not None]
+                    for place_id in place_ids:
+                        place = self.get_place(place_id)
+                        if place is None:
+                            continue
+                        for amenity in amenities:
+                            place.remove_amenity(amenity)
+                        self.place_repo.save(place)
+                        self.place_columns.upsert(place)
+                    result = delete()
+                    for amenity_id in amenity_ids:
+                        self.place_columns.forget_amenity(amenity_id)
+                    return result
+            keys |= place_ids
     
     def delete_amenity(self, amenity_id):
-        """Delete amenity"""
-        self.amenity_repo.delete(amenity_id)
-        return True
+        """Delete amenity, removing it from the places that have it"""
+        def delete():
+            self.amenity_repo.delete(amenity_id)
+            return True
+        return self._delete_amenities([amenity_id], delete)
     
     # Relationship methods
     def add_amenity_to_place(self, place_id, amenity_id):
         """Add an amenity to a place"""
-        place = self.get_place(place_id)
-        amenity = self.get_amenity(amenity_id)
-        if place and amenity:
-            place.add_amenity(amenity)
-            return True
-        return False
+        with self._locks.hold(place_id, amenity_id):
+            place = self.get_place(place_id)
+            amenity = self.get_amenity(amenity_id)
+            if place and amenity:
+                place.add_amenity(amenity)
+                self.place_repo.save(place)
+                self.place_columns.upsert(place)
+                return True
+            return False
     
     def remove_amenity_from_place(self, place_id, amenity_id):
         """Remove an amenity from a place"""
-        place = self.get_place(place_id)
-        amenity = self.get_amenity(amenity_id)
-        if place and amenity:
-            place.remove_amenity(amenity)
-            return True
-        return False
+        with self._locks.hold(place_id, amenity_id):
+            place = self.get_place(place_id)
+            amenity = self.get_amenity(amenity_id)
+            if place and amenity:
+                place.remove_amenity(amenity)
+                self.place_repo.save(place)
+                self.place_columns.upsert(place)
+                return True
+            return False
     
     def get_place_amenities(self, place_id):
         """Get all amenities for a place"""
@@ -300,3 +816,189 @@ class HBnBFacade:
         if place:
             return place.get_amenities()
         return []
+    
+    # Batch methods
+    #
+    # Each returns one result per input item, in order: the created or
+    # updated object, None when the id does not exist, or the ValueError
+    # that rejected the item. Deletes return True or False per id. Valid
+    # items go to the repository in a single add_many/update_many call.
+    def _build_all(self, items, build, kind):
+        """Build objects from dicts, keeping a ValueError for each failure"""
+        built = []
+        for data in items:
+            try:
+                built.append(build(dict(data)))
+            except Exception as e:
+                built.append(ValueError(f"Failed to create {kind}: {e}"))
+        return built
+    
+    def _add_built(self, repo, built):
+        """Store the objects among built with one add_many call"""
+        added = iter(repo.add_many([obj for obj in built if not isinstance(obj, ValueError)]))
+        return [obj if isinstance(obj, ValueError) else next(added) for obj in built]
+    
+    def _update_all(self, repo, updates):
+        """Split {'id': ..., **changes} dicts and apply them with update_many"""
+        updates = [dict(data) for data in updates]
+        ids = [data.pop('id', None) for data in updates]
+        with self._locks.hold(*ids):
+            return repo.update_many(list(zip(ids, updates)))
+    
+    def create_users(self, users_data):
+        """Create several users"""
+        built = self._build_all(users_data, lambda data: User(**data), 'user')
+        results = self._add_built(self.user_repo, built)
+        for user in results:
+            if not isinstance(user, ValueError):
+                self.user_names.upsert(user)
+        return results
+    
+    def update_users(self, updates):
+        """Update several users"""
+        try:
+            return self._update_all(self.user_repo, updates)
+        finally:
+            for data in updates:
+                user = self.get_user(data.get('id'))
+                if user is not None:
+                    self.user_names.upsert(user)
+    
+    def delete_users(self, user_ids):
+        """Delete several users, each with their places and reviews as in delete_user"""
+        results = []
+        for user_id in user_ids:
+            existed = self.get_user(user_id) is not None
+            self.delete_user(user_id)
+            results.append(existed)
+        return results
+    
+    def _resolve_amenities(self, amenity_ids):
+        # Unknown ids are skipped, as add_amenity_to_place does
+        amenities = (self.get_amenity(amenity_id) for amenity_id in amenity_ids)
+        return [amenity for amenity in amenities if amenity is not None]
+    
+    def create_places(self, places_data):
+        """Create several places, amenities included, with one write per place"""
+        def build(data):
+            owner = self.get_user(data.pop('owner_id', None))
+            if not owner:
+                raise ValueError("Owner not found")
+            amenities = self._resolve_amenities(data.pop('amenities', []))
+            place = Place(owner=owner, **data)
+            for amenity in amenities:
+                place.add_amenity(amenity)
+            return place
+        
+        with self._locks.hold(*(data.get('owner_id') for data in places_data)):
+            built = self._build_all(places_data, build, 'place')
+            results = self._add_built(self.place_repo, built)
+            for place in results:
+                if not isinstance(place, ValueError):
+                    self.place_columns.upsert(place)
+                    self.place_search.upsert_place(place)
+                    self.place_titles.upsert(place)
+            return results
+    
+    def update_places(self, updates):
+        """Update several places; an 'amenities' list of ids replaces the current ones"""
+        updates = [dict(data) for data in updates]
+        for data in updates:
+            if 'amenities' in data:
+                data['amenities'] = self._resolve_amenities(data['amenities'])
+        try:
+            return self._update_all(self.place_repo, updates)
+        finally:
+            # Rejected updates may have changed some fields before failing
+            for data in updates:
+                place = self.get_place(data.get('id'))
+                if place is not None:
+                    self.place_columns.upsert(place)
+                    self.place_search.upsert_place(place)
+                    self.place_titles.upsert(place)
+    
+    def delete_places(self, place_ids):
+        """Delete several places, along with their reviews"""
+        places = [place for place in map(self.get_place, place_ids) if place is not None]
+        review_ids = [review.id for place in places for review in place.get_reviews()]
+        with self._locks.hold(*place_ids, *review_ids):
+            self.review_repo.delete_many(
+                [review.id for place in places for review in place.get_reviews()])
+            results = self.place_repo.delete_many(place_ids)
+            for place_id in place_ids:
+                self.place_columns.remove(place_id)
+                self.place_search.remove_place(place_id)
+                self.place_titles.remove(place_id)
+            return results
+    
+    def create_reviews(self, reviews_data):
+        """Create several reviews"""
+        def build(data):
+            place = self.get_place(data.pop('place_id', None))
+            if not place:
+                raise ValueError("Place not found")
+            user = self.get_user(data.pop('user_id', None))
+            if not user:
+                raise ValueError("User not found")
+            return Review(place=place, user=user, **data)
+        
+        keys = [key for data in reviews_data for key in (data.get('place_id'), data.get('user_id'))]
+        with self._locks.hold(*keys):
+            built = self._build_all(reviews_data, build, 'review')
+            results = self._add_built(self.review_repo, built)
+            for review in results:
+                if not isinstance(review, ValueError):
+                    review.place.add_review(review)
+                    self.place_columns.upsert(review.place)
+                    self.place_search.upsert_review(review)
+                    self.place_titles.upsert(review.place)
+            return results
+    
+    def update_reviews(self, updates):
+        """Update several reviews"""
+        ids = [data.get('id') for data in updates]
+        # Lock the places too, as their reviews get re-sorted and re-counted
+        places = [review.place.id for review in map(self.get_review, ids) if review]
+        with self._locks.hold(*ids, *places):
+            old_ratings = {review.id: review.rating for review in map(self.get_review, ids)
+                           if review}
+            try:
+                return self._update_all(self.review_repo, updates)
+            finally:
+                for review_id, old_rating in old_ratings.items():
+                    review = self.get_review(review_id)
+                    if review is not None:
+                        review.place.rating_changed(review, old_rating)
+                        self.place_columns.upsert(review.place)
+                        self.place_search.upsert_review(review)
+    
+    def delete_reviews(self, review_ids):
+        """Delete several reviews and unlink them from their places"""
+        reviews = [self.get_review(review_id) for review_id in review_ids]
+        keys = [key for review in reviews if review for key in (review.id, review.place.id)]
+        with self._locks.hold(*keys):
+            for review in reviews:
+                # Skip reviews deleted concurrently since the lookup
+                if review and self.get_review(review.id) is review:
+                    review.place.remove_review(review)
+            results = self.review_repo.delete_many(review_ids)
+            for review in reviews:
+                if review:
+                    self.place_columns.upsert(review.place)
+                    self.place_search.remove_review(review.id)
+                    self.place_titles.upsert(review.place)
+            return results
+    
+    def create_amenities(self, amenities_data):
+        """Create several amenities"""
+        built = self._build_all(amenities_data, lambda data: Amenity(**data), 'amenity')
+        return self._add_built(self.amenity_repo, built)
+    
+    def update_amenities(self, updates):
+        """Update several amenities"""
+        return self._update_all(self.amenity_repo, updates)
+    
+    def delete_amenities(self, amenity_ids):
+        """Delete several amenities, removing them from the places that have them"""
+        return self._delete_amenities(amenity_ids,
+                                      lambda: self.amenity_repo.delete_many(amenity_ids))
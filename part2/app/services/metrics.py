@@ -0,0 +1,72 @@
+"""Process-level metrics reported by the health endpoint
+
+Everything here is O(1) per request and per probe: a request counter kept
+in one-second buckets over a sliding window, the process start time and
+the resident set size read from the operating system.
+"""
+import os
+import sys
+import threading
+import time
+
+
+def rss_bytes():
+    """Current resident set size, or the peak where the current one is unavailable"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class ProcessMetrics:
+    """Uptime and request rate of the running process
+
+    Args:
+        window (int): Seconds over which the request rate is averaged
+    """
+
+    def __init__(self, window=60):
+        self.window = window
+        self.started = time.time()
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self._buckets = [0] * window
+        self._seconds = [0] * window
+        self.requests = 0
+
+    def record_request(self):
+        """Count one request; meant to be used as a before_request hook"""
+        second = int(time.monotonic())
+        slot = second % self.window
+        with self._lock:
+            if self._seconds[slot] != second:
+                self._seconds[slot] = second
+                self._buckets[slot] = 0
+            self._buckets[slot] += 1
+            self.requests += 1
+
+    def uptime(self):
+        return time.monotonic() - self._start
+
+    def request_rate(self):
+        """Requests per second over the last window seconds"""
+        now = int(time.monotonic())
+        with self._lock:
+            recent = sum(count for count, second in zip(self._buckets, self._seconds)
+                         if now - second < self.window)
+        return recent / max(1, min(self.window, self.uptime()))
+
+    def snapshot(self):
+        return {
+            'rss_bytes': rss_bytes(),
+            'uptime_seconds': round(self.uptime(), 3),
+            'requests_total': self.requests,
+            'requests_per_second': round(self.request_rate(), 3)
+        }
+
+
+metrics = ProcessMetrics()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Latency benchmark for place title autocomplete
+
+Fills a PrefixIndex with --places titles of two to four words, drawn with
+Zipf-like frequencies from a synthetic vocabulary, scored by a review count
+with a long tail. It then replays --queries keystrokes: the start of a
+random title word, one to all of its letters, sometimes after the word
+before it. Between keystrokes, places gain reviews (a score change) and
+are renamed (new keys), once per --write-every keystrokes each.
+
+Prints p50, p99 and max for keystrokes and for writes. The first query
+for a busy prefix ranks its whole slice once; those cold queries are
+included.
+
+Usage: python3 benchmarks/bench_autocomplete.py [--places N] [--queries N]
+                                                [--write-every N]
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.persistence.autocomplete import PrefixIndex, normalize_prefix
+
+
+class Listing:
+    __slots__ = ('id', 'title', 'reviews')
+
+    def __init__(self, obj_id, title, reviews):
+        self.id = obj_id
+        self.title = title
+        self.reviews = reviews
+
+
+def make_vocabulary(size, rng):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(letters) for _ in range(rng.randint(3, 9))))
+    words = list(words)
+    rng.shuffle(words)
+    return words
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return pick(0.5) * 1000, pick(0.99) * 1000, samples[-1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--places', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=20000)
+    parser.add_argument('--write-every', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(20000, rng)
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+
+    def title():
+        return ' '.join(rng.choices(vocabulary, cum_weights=weights, k=rng.randint(2, 4)))
+
+    listings = [Listing(f'place-{i}', title(), int(rng.paretovariate(1.2)) - 1)
+                for i in range(args.places)]
+    index = PrefixIndex(lambda listing: [listing.title], score=lambda listing: listing.reviews)
+    start = time.perf_counter()
+    index.fill(listings)
+    print(f"{args.places} titles indexed in {time.perf_counter() - start:.1f} s")
+
+    reads, writes = [], []
+    for i in range(args.queries):
+        if i % args.write_every == 0:
+            listing = rng.choice(listings)
+            if rng.random() < 0.5:
+                listing.reviews += 1
+            else:
+                listing.title = title()
+            begin = time.perf_counter()
+            index.upsert(listing)
+            writes.append(time.perf_counter() - begin)
+        words = rng.choice(listings).title.split()
+        at = rng.randrange(len(words))
+        typed = words[at][:rng.randint(1, len(words[at]))]
+        if at and rng.random() < 0.3:
+            typed = f'{words[at - 1]} {typed}'
+        begin = time.perf_counter()
+        index.complete(normalize_prefix(typed), 10)
+        reads.append(time.perf_counter() - begin)
+
+    for label, samples in [('keystroke', reads), ('write', writes)]:
+        p50, p99, worst = percentiles(samples)
+        print(f"{label:10} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  max {worst:8.3f} ms  "
+              f"({len(samples)} samples)")
+
+
+if __name__ == '__main__':
+    main()
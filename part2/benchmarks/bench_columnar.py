@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""Filter benchmark for the columnar place store
+
+Builds --places places with random prices, positions and amenities, then
+times one combined filter (price range, bounding box and two required
+amenities) three ways:
+
+  objects   a Python loop over place_repo.get_all(), reading Place attributes
+  columns   HBnBFacade.place_columns.filter(), vectorized when NumPy is
+            installed and a loop over array.array columns otherwise
+
+and the two amenities alone, as a loop over the objects and as an AND of
+the inverted amenity bitmaps. Last, it times the first 20 matches of a
+price range by price with facet counts: sorting and counting the scanned
+objects, against HBnBFacade.list_places().
+
+Usage: python3 benchmarks/bench_columnar.py [--places N] [--repeat N]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.persistence import columnar
+from app.services.facade import HBnBFacade
+
+
+def build_facade(places, rng):
+    facade = HBnBFacade()
+    owner = facade.get_all_users()[0]
+    amenity_ids = [amenity.id for amenity in facade.get_all_amenities()]
+    facade.create_places([{
+        'title': f'Place {i}', 'description': 'Benchmark place',
+        'price': rng.uniform(20, 500), 'latitude': rng.uniform(-60, 60),
+        'longitude': rng.uniform(-180, 180), 'owner_id': owner.id,
+        'amenities': rng.sample(amenity_ids, rng.randint(0, len(amenity_ids)))
+    } for i in range(places)])
+    return facade, amenity_ids[:2]
+
+
+def scan(facade, wanted):
+    wanted = set(wanted)
+    return [place.id for place in facade.place_repo.get_all()
+            if 100 <= place.price <= 200
+            and -10 <= place.latitude <= 50 and -30 <= place.longitude <= 60
+            and wanted <= {amenity.id for amenity in place.amenities}]
+
+
+def scan_listing(facade):
+    places = [place for place in facade.place_repo.get_all() if 100 <= place.price <= 300]
+    places.sort(key=lambda place: (place.price, place.id))
+    amenities, prices = {}, [0] * (len(facade.PRICE_FACET_EDGES) + 1)
+    for place in places:
+        for amenity in place.amenities:
+            amenities[amenity.id] = amenities.get(amenity.id, 0) + 1
+        prices[sum(edge <= place.price for edge in facade.PRICE_FACET_EDGES)] += 1
+    return places[:20], amenities, prices
+
+
+def timed(run, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--places', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    facade, wanted = build_facade(args.places, random.Random(42))
+    columns = facade.place_columns
+    columns.filter()  # build the columns outside the timing
+
+    scan_time, expected = timed(lambda: scan(facade, wanted), args.repeat)
+    column_time, found = timed(lambda: columns.filter(
+        min_price=100, max_price=200, min_latitude=-10, max_latitude=50,
+        min_longitude=-30, max_longitude=60, amenity_ids=wanted), args.repeat)
+    assert sorted(found) == sorted(expected)
+
+    wanted_set = set(wanted)
+    amenity_scan_time, expected_ids = timed(lambda: [
+        place.id for place in facade.place_repo.get_all()
+        if wanted_set <= {amenity.id for amenity in place.amenities}], args.repeat)
+    bitmap_time, found_ids = timed(lambda: columns.places_with_amenities(wanted), args.repeat)
+    assert sorted(found_ids) == sorted(expected_ids)
+
+    listing_scan_time, (expected_page, _, _) = timed(lambda: scan_listing(facade), args.repeat)
+    listing_time, (page, _, facets) = timed(lambda: facade.list_places(
+        'price', 20, facets=True, min_price=100, max_price=300), args.repeat)
+    assert page == expected_page
+
+    backend = 'numpy' if columnar.np is not None else 'array (NumPy not installed)'
+    print(f"{len(expected)} of {args.places} places match; column backend: {backend}")
+    print(f"objects  {scan_time * 1000:9.2f} ms")
+    print(f"columns  {column_time * 1000:9.2f} ms  ({scan_time / column_time:.1f}x)")
+    print(f"{len(expected_ids)} places have both amenities")
+    print(f"objects  {amenity_scan_time * 1000:9.2f} ms")
+    print(f"bitmaps  {bitmap_time * 1000:9.2f} ms  ({amenity_scan_time / bitmap_time:.1f}x)")
+    print(f"first page of {facets['total']} by price, with facets")
+    print(f"objects  {listing_scan_time * 1000:9.2f} ms")
+    print(f"indexes  {listing_time * 1000:9.2f} ms  ({listing_scan_time / listing_time:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
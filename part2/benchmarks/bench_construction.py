@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Construction throughput benchmark for the model classes
+
+Builds N objects of each model and reports objects per second along two
+paths:
+
+  validated  the constructor, which runs every field's compiled checks once
+  trusted    Model.load(), the path used to restore objects from the
+             write-ahead log and snapshots, which skips validation
+
+Usage: python3 benchmarks/bench_construction.py [--count N] [--repeat R]
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.user import User
+from app.models.place import Place
+from app.models.review import Review
+from app.models.amenity import Amenity
+
+
+def throughput(build, count, repeat):
+    """Return the best objects per second for build(i) over repeat runs"""
+    best = 0.0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for i in range(count):
+            build(i)
+        elapsed = time.perf_counter() - start
+        best = max(best, count / elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--count', type=int, default=50000, help='objects per model and run')
+    parser.add_argument('--repeat', type=int, default=5, help='runs per path, best is reported')
+    args = parser.parse_args()
+
+    owner = User(first_name='Bench', last_name='Owner', email='owner@bench.io')
+    place = Place(title='Bench place', description='Benchmark', price=80.0,
+                  latitude=0.0, longitude=0.0, owner=owner)
+    now = datetime.now()
+    paths = {
+        'User': (
+            lambda i: User(first_name='Ada', last_name='Lovelace', email=f'user{i}@example.com'),
+            lambda i: User.load(id=str(i), created_at=now, updated_at=now, first_name='Ada',
+                                last_name='Lovelace', email=f'user{i}@example.com',
+                                password=None, is_admin=False),
+        ),
+        'Amenity': (
+            lambda i: Amenity(name=f'Amenity {i}'),
+            lambda i: Amenity.load(id=str(i), created_at=now, updated_at=now,
+                                   name=f'Amenity {i}'),
+        ),
+        'Place': (
+            lambda i: Place(title=f'Place {i}', description='A cozy apartment',
+                            price=100.0 + i, latitude=40.7, longitude=-74.0, owner=owner),
+            lambda i: Place.load(id=str(i), created_at=now, updated_at=now, title=f'Place {i}',
+                                 description='A cozy apartment', price=100.0 + i,
+                                 latitude=40.7, longitude=-74.0, owner=owner),
+        ),
+        'Review': (
+            lambda i: Review(text='Great place! Very comfortable.', rating=5,
+                             place=place, user=owner),
+            lambda i: Review.load(id=str(i), created_at=now, updated_at=now,
+                                  text='Great place! Very comfortable.', rating=5,
+                                  place=place, user=owner),
+        ),
+    }
+
+    print(f"{'model':<10}{'validated/s':>14}{'trusted/s':>14}{'speedup':>10}")
+    for name, (validated, trusted) in paths.items():
+        checked = throughput(validated, args.count, args.repeat)
+        loaded = throughput(trusted, args.count, args.repeat)
+        print(f"{name:<10}{checked:>14,.0f}{loaded:>14,.0f}{loaded / checked:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
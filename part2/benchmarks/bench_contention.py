@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Contention benchmark for the thread-safe facade
+
+Runs a write-heavy mix of create_review / update_place / get_place calls
+from an increasing number of threads and reports throughput for two
+locking strategies:
+
+  global   every operation holds one process-wide lock
+  striped  the facade's per-entity lock stripes (HBnBFacade(thread_safe=True))
+
+Each operation also blocks for --io-ms while holding its lock, standing in
+for work that releases the GIL (write-ahead log fsync, network, etc.).
+Pure-Python work cannot run in parallel under the GIL, so that blocking
+time is what lock granularity decides: with one global lock it serializes,
+with striped locks threads touching different places overlap.
+
+Usage: python3 benchmarks/bench_contention.py [--ops N] [--places N] [--io-ms MS]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.facade import HBnBFacade
+
+
+def build_facade(places):
+    """Create a thread-safe facade populated with places and reviewers"""
+    facade = HBnBFacade(thread_safe=True)
+    owner = facade.create_user({
+        'first_name': 'Bench', 'last_name': 'Owner', 'email': 'owner@bench.io'
+    })
+    place_ids = [facade.create_place({
+        'title': f'Place {i}', 'description': 'Benchmark place', 'price': 50.0 + i,
+        'latitude': 0.0, 'longitude': 0.0, 'owner_id': owner.id
+    }).id for i in range(places)]
+    user_ids = [facade.create_user({
+        'first_name': 'Bench', 'last_name': f'User{i}', 'email': f'user{i}@bench.io'
+    }).id for i in range(places)]
+    return facade, place_ids, user_ids
+
+
+def worker(facade, hold, place_ids, user_ids, ops, io_seconds, seed):
+    """Run ops mixed operations, each holding its lock for io_seconds"""
+    rng = random.Random(seed)
+    for i in range(ops):
+        place_id = rng.choice(place_ids)
+        kind = i % 3
+        if kind == 0:
+            user_id = rng.choice(user_ids)
+            with hold(place_id, user_id):
+                time.sleep(io_seconds)
+                facade.create_review({
+                    'text': 'Benchmark review', 'rating': rng.randint(1, 5),
+                    'place_id': place_id, 'user_id': user_id
+                })
+        elif kind == 1:
+            with hold(place_id):
+                time.sleep(io_seconds)
+                facade.update_place(place_id, {'price': float(rng.randint(10, 500))})
+        else:
+            with hold(place_id):
+                time.sleep(io_seconds)
+                facade.get_place(place_id)
+
+
+def run(strategy, threads, ops, places, io_seconds):
+    """Return operations per second for one strategy and thread count"""
+    facade, place_ids, user_ids = build_facade(places)
+    if strategy == 'global':
+        global_lock = threading.RLock()
+
+        def hold(*keys):
+            return global_lock
+    else:
+        hold = facade._locks.hold
+
+    per_thread = ops // threads
+    pool = [
+        threading.Thread(target=worker,
+                         args=(facade, hold, place_ids, user_ids, per_thread, io_seconds, n))
+        for n in range(threads)
+    ]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return per_thread * threads / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ops', type=int, default=2000, help='total operations per run')
+    parser.add_argument('--places', type=int, default=500, help='number of places')
+    parser.add_argument('--io-ms', type=float, default=0.5, help='blocking time per operation')
+    parser.add_argument('--threads', default='1,2,4,8,16', help='comma separated thread counts')
+    args = parser.parse_args()
+
+    thread_counts = [int(n) for n in args.threads.split(',')]
+    print(f"{args.ops} ops over {args.places} places, {args.io_ms} ms blocking per op")
+    print(f"{'threads':>8} {'global ops/s':>14} {'striped ops/s':>14} {'speedup':>8}")
+    for threads in thread_counts:
+        global_rate = run('global', threads, args.ops, args.places, args.io_ms / 1000)
+        striped_rate = run('striped', threads, args.ops, args.places, args.io_ms / 1000)
+        print(f"{threads:>8} {global_rate:>14.0f} {striped_rate:>14.0f} {striped_rate / global_rate:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""Latency benchmark for the spatial place index
+
+Fills a place repository with --places places, most of them clustered
+around a few dozen cities and the rest spread over land latitudes, then
+times --queries radius and nearest-k lookups centred on random cities and
+prints p50, p99 and max per query kind. Map viewports are timed the same
+way: the whole world at zoom 3, and a 1280 x 800 px view at zoom 8.
+
+Places are built with Place.load (no validation) straight into the
+repository, which keeps its geo index up to date exactly as the facade's
+does.
+
+Usage: python3 benchmarks/bench_geo.py [--places N] [--queries N]
+                                       [--radius-km R] [--k K]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.place import Place
+from app.models.user import User
+from app.persistence import geo
+from app.persistence.repository import InMemoryRepository
+
+
+def build_repo(places, rng):
+    repo = InMemoryRepository()
+    repo.create_geo_index('location', 'latitude', 'longitude')
+    repo.create_cluster_index('map', 'latitude', 'longitude')
+    owner = User(first_name='Bench', last_name='Owner', email='bench@example.com')
+    cities = [(rng.uniform(-50, 60), rng.uniform(-180, 180)) for _ in range(50)]
+    now = datetime.now()
+    batch = []
+    for i in range(places):
+        if rng.random() < 0.8:
+            lat, lon = rng.choice(cities)
+            lat = max(-90.0, min(90.0, rng.gauss(lat, 0.3)))
+            lon = (rng.gauss(lon, 0.3) + 180) % 360 - 180
+        else:
+            lat, lon = rng.uniform(-60, 70), rng.uniform(-180, 180)
+        batch.append(Place.load(id=f'place-{i}', created_at=now, updated_at=now,
+                                title=f'Place {i}', description=None, price=100.0,
+                                latitude=lat, longitude=lon, owner=owner))
+    repo.add_many(batch)
+    return repo, cities
+
+
+def wrap(lon):
+    return (lon + 180) % 360 - 180
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return pick(0.5) * 1000, pick(0.99) * 1000, samples[-1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--places', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--radius-km', type=float, default=5.0)
+    parser.add_argument('--k', type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    start = time.perf_counter()
+    repo, cities = build_repo(args.places, rng)
+    print(f"{args.places} places indexed in {time.perf_counter() - start:.1f} s; "
+          f"distances: {'numpy' if geo.np is not None else 'math (NumPy not installed)'}")
+
+    queries = []
+    for _ in range(args.queries):
+        lat, lon = rng.choice(cities)
+        queries.append((lat + rng.uniform(-0.2, 0.2), lon + rng.uniform(-0.2, 0.2)))
+
+    for label, run in [
+        (f'radius {args.radius_km:g} km', lambda lat, lon: repo.find_near(
+            'location', lat, lon, radius_km=args.radius_km)),
+        (f'nearest {args.k}', lambda lat, lon: repo.find_near('location', lat, lon, k=args.k)),
+        ('map world z3', lambda lat, lon: repo.get_clusters('map', -85, -180, 85, 180, 3)),
+        # 1280 x 800 px at zoom 8 is 5 x 3.1 tiles of 1.4 degrees
+        ('map view z8', lambda lat, lon: repo.get_clusters(
+            'map', lat - 2, wrap(lon - 3.5), lat + 2, wrap(lon + 3.5), 8)),
+    ]:
+        samples, found = [], 0
+        for lat, lon in queries:
+            begin = time.perf_counter()
+            found += len(run(lat, lon))
+            samples.append(time.perf_counter() - begin)
+        p50, p99, worst = percentiles(samples)
+        print(f"{label:16} p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  max {worst:7.2f} ms  "
+              f"({found / len(queries):.0f} results per query)")
+
+
+if __name__ == '__main__':
+    main()
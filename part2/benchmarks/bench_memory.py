@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""Memory benchmark for the model classes
+
+Builds N objects of each model and reports the bytes each one costs,
+measured with tracemalloc, so the figures include everything the object
+owns: the instance itself, its id string, timestamps and field values.
+
+Two layouts are compared:
+
+  dict     the layout before models used __slots__: a per-instance __dict__
+           holding the same attributes, and separate created_at and
+           updated_at datetimes. Rebuilt here from the compact objects.
+  slots    the current models
+
+Usage: python3 benchmarks/bench_memory.py [--count N]
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.user import User
+from app.models.place import Place
+from app.models.review import Review
+from app.models.amenity import Amenity
+
+
+_dict_classes = {}
+
+
+def as_dict_layout(obj):
+    """Copy obj into the dict layout, attribute for attribute"""
+    # One plain class per model, so instances share their dict keys the
+    # way instances of the old model classes did
+    cls = type(obj)
+    if cls not in _dict_classes:
+        _dict_classes[cls] = type(f'{cls.__name__}Dict', (), {})
+    copy = _dict_classes[cls]()
+    for name in obj._slot_names:
+        value = getattr(obj, name, None)
+        if name == 'updated_at':
+            # Two separate datetime.now() calls used to produce two objects
+            value = datetime.fromtimestamp(value.timestamp())
+        elif isinstance(value, list):
+            value = list(value)
+        setattr(copy, name, value)
+    return copy
+
+
+def measure(build, count):
+    """Return bytes allocated per object by build(i) for i in range(count)"""
+    objects = [None] * count
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        objects[i] = build(i)
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return allocated / count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--count', type=int, default=50000, help='objects per model')
+    args = parser.parse_args()
+
+    owner = User(first_name='Bench', last_name='Owner', email='owner@bench.io')
+    place = Place(title='Bench place', description='Benchmark', price=80.0,
+                  latitude=0.0, longitude=0.0, owner=owner)
+    builders = {
+        'User': lambda i: User(first_name='Ada', last_name='Lovelace', email=f'user{i}@example.com'),
+        'Amenity': lambda i: Amenity(name=f'Amenity {i}'),
+        'Place': lambda i: Place(title=f'Place {i}', description='A cozy apartment',
+                                 price=100.0 + i, latitude=40.7, longitude=-74.0, owner=owner),
+        'Review': lambda i: Review(text='Great place! Very comfortable.', rating=5,
+                                   place=place, user=owner),
+    }
+
+    print(f"{'model':<10}{'dict':>10}{'slots':>10}{'saved':>10}")
+    for name, build in builders.items():
+        # The model object built for each copy is freed right away, so only
+        # what the copy holds on to is counted
+        dict_bytes = measure(lambda i: as_dict_layout(build(i)), args.count)
+        slot_bytes = measure(build, args.count)
+        print(f"{name:<10}{dict_bytes:>10.0f}{slot_bytes:>10.0f}{dict_bytes - slot_bytes:>10.0f}")
+
+if __name__ == '__main__':
+    main()
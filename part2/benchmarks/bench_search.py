@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""Query latency of the full-text place index
+
+Indexes --docs synthetic documents of about 40 words, drawn from a
+vocabulary of --vocabulary words with Zipf-like frequencies as in natural
+text, into a TextIndex. It then times --queries top-20 searches of each
+kind: one rare word, two mid-frequency words, a mid-frequency word with a
+three-letter prefix (search as you type), and a mid-frequency word after
+one of the ten most common words, which like "the" in English appear in
+most documents and are left out of queries. It prints p50, p99 and max
+per kind.
+
+Usage: python3 benchmarks/bench_search.py [--docs N] [--queries N]
+                                          [--vocabulary N]
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.persistence.search import TextIndex
+
+WORDS_PER_DOC = 40
+
+
+def make_vocabulary(size, rng):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(letters) for _ in range(rng.randint(4, 10))))
+    return sorted(words)
+
+
+def build_index(docs, vocabulary, rng):
+    # Zipf: the word of rank r has weight 1 / r
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, len(vocabulary) + 1)))
+    index = TextIndex()
+    for doc_id in range(docs):
+        words = rng.choices(vocabulary, cum_weights=weights, k=WORDS_PER_DOC)
+        index.add(f'place-{doc_id}', Counter(words))
+    return index
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))]
+    return pick(0.5) * 1000, pick(0.99) * 1000, samples[-1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--docs', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--vocabulary', type=int, default=50000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+    start = time.perf_counter()
+    index = build_index(args.docs, vocabulary, rng)
+    print(f"{args.docs} documents, {args.vocabulary} words indexed in "
+          f"{time.perf_counter() - start:.1f} s")
+
+    rare = vocabulary[len(vocabulary) // 2:]
+    mid = vocabulary[50:2000]
+    kinds = [
+        ('rare word', lambda: rng.choice(rare) + ' '),
+        ('two words', lambda: f'{rng.choice(mid)} {rng.choice(mid)} '),
+        ('word+prefix', lambda: f'{rng.choice(mid)} {rng.choice(mid)[:3]}'),
+        ('stopword+word', lambda: f'{rng.choice(vocabulary[:10])} {rng.choice(mid)} '),
+    ]
+    for label, make_query in kinds:
+        samples, found = [], 0
+        for _ in range(args.queries):
+            query = make_query()
+            begin = time.perf_counter()
+            found += len(index.search(query, limit=20))
+            samples.append(time.perf_counter() - begin)
+        p50, p99, worst = percentiles(samples)
+        print(f"{label:13} p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  max {worst:8.2f} ms  "
+              f"({found / args.queries:.1f} results per query)")
+
+
+if __name__ == '__main__':
+    main()
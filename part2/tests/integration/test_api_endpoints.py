@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 """Integration tests for API endpoints"""
 import unittest
+import base64
 import json
 import sys
 sys.path.insert(0, '.')
@@ -9,6 +10,12 @@ from app import create_app
 from app.services import facade
 
 
+def make_cursor(attr_name, key, obj_id='x'):
+    """Cursor as a client could forge it, with any key"""
+    raw = json.dumps([attr_name, key, obj_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
 class TestUserEndpoints(unittest.TestCase):
     """Test User API endpoints"""
     
@@ -29,6 +36,54 @@ class TestUserEndpoints(unittest.TestCase):
         data = json.loads(response.data)
         self.assertIsInstance(data, list)
     
+    def test_get_users_paginated(self):
+        """Test following X-Next-Cursor through GET /api/v1/users/"""
+        for i in range(3):
+            facade.create_user({'first_name': 'Page', 'last_name': f'User {i}',
+                                'email': f'page.user{i}@example.com'})
+        ids, url = [], '/api/v1/users/?limit=2'
+        while True:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            page = json.loads(response.data)
+            self.assertLessEqual(len(page), 2)
+            ids.extend(user['id'] for user in page)
+            cursor = response.headers.get('X-Next-Cursor')
+            if cursor is None:
+                break
+            self.assertIn('rel="next"', response.headers['Link'])
+            url = f'/api/v1/users/?limit=2&cursor={cursor}'
+        self.assertEqual(ids, [user.id for user in facade.get_all_users()])
+    
+    def test_get_users_default_page_size(self):
+        """Test GET /api/v1/users/ without limit returns one default-sized page"""
+        from app.api.v1.pagination import DEFAULT_PAGE_SIZE
+        for i in range(DEFAULT_PAGE_SIZE + 1):
+            facade.create_user({'first_name': 'Default', 'last_name': f'Page {i}',
+                                'email': f'default.page{i}@example.com'})
+        response = self.client.get('/api/v1/users/')
+        self.assertEqual(response.status_code, 200)
+        page = json.loads(response.data)
+        self.assertEqual(len(page), DEFAULT_PAGE_SIZE)
+        self.assertIn('X-Next-Cursor', response.headers)
+        self.assertEqual([user['id'] for user in page],
+                         [user.id for user in facade.get_all_users()][:DEFAULT_PAGE_SIZE])
+
+    def test_get_users_invalid_page_args(self):
+        """Test GET /api/v1/users/ with a bad limit or cursor"""
+        self.assertEqual(self.client.get('/api/v1/users/?limit=0').status_code, 400)
+        self.assertEqual(self.client.get('/api/v1/users/?cursor=bogus').status_code, 400)
+
+    def test_tampered_cursor_keys(self):
+        """Test list endpoints answer 400 to cursors holding a key of the wrong type"""
+        for key in ['abc', [1], 5]:
+            cursor = make_cursor('created_at', key)
+            for url in ['/api/v1/users/', '/api/v1/places/', '/api/v1/reviews/',
+                        '/api/v1/amenities/']:
+                with self.subTest(url=url, key=key):
+                    response = self.client.get(f'{url}?cursor={cursor}')
+                    self.assertEqual(response.status_code, 400)
+    
     def test_create_user_valid(self):
         """Test POST /api/v1/users/ with valid data"""
         user_data = {
@@ -47,7 +102,20 @@ class TestUserEndpoints(unittest.TestCase):
         self.assertEqual(data['email'], 'integration.test@example.com')
         # Password should not be in response
         self.assertNotIn('password', data)
-    
+
+    def test_create_user_extra_field(self):
+        """Test POST /api/v1/users/ ignores keys the model does not have"""
+        user_data = {
+            'first_name': 'Extra',
+            'last_name': 'Field',
+            'email': 'extra.field@example.com',
+            'password': 'testpass123',
+            'nickname': 'xf'
+        }
+        response = self.client.post('/api/v1/users/', json=user_data)
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('nickname', json.loads(response.data))
+
     def test_create_user_invalid_email(self):
         """Test POST /api/v1/users/ with invalid email"""
         user_data = {
@@ -87,6 +155,28 @@ class TestUserEndpoints(unittest.TestCase):
         response = self.client.get('/api/v1/users/nonexistent-id')
         self.assertEqual(response.status_code, 404)
 
+    def test_get_user_places_and_reviews(self):
+        """Test GET /api/v1/users/<id>/places and /reviews"""
+        owner = facade.create_user({'first_name': 'Owen', 'last_name': 'Listings',
+                                    'email': 'owen.listings@example.com'})
+        places = [facade.create_place({
+            'title': f'Owen place {i}', 'description': None, 'price': 60.0, 'latitude': 2.0,
+            'longitude': 2.0, 'owner_id': owner.id}) for i in range(2)]
+        review = facade.create_review({'text': 'Good stay', 'rating': 5,
+                                       'place_id': places[0].id, 'user_id': self.sample_user_id})
+        response = self.client.get(f'/api/v1/users/{owner.id}/places?limit=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)[0]['id'], places[0].id)
+        cursor = response.headers['X-Next-Cursor']
+        response = self.client.get(f'/api/v1/users/{owner.id}/places?limit=1&cursor={cursor}')
+        self.assertEqual([item['id'] for item in json.loads(response.data)], [places[1].id])
+        response = self.client.get(f'/api/v1/users/{self.sample_user_id}/reviews')
+        self.assertIn({'id': review.id, 'text': 'Good stay', 'rating': 5,
+                       'place_id': places[0].id}, json.loads(response.data))
+        self.assertEqual(self.client.get('/api/v1/users/nonexistent-id/places').status_code, 404)
+        self.assertEqual(self.client.get(f'/api/v1/users/{owner.id}/reviews?cursor=bad')
+                         .status_code, 400)
+
 
 class TestPlaceEndpoints(unittest.TestCase):
     """Test Place API endpoints"""
@@ -121,6 +211,207 @@ class TestPlaceEndpoints(unittest.TestCase):
             self.assertIn('latitude', data[0])
             self.assertIn('longitude', data[0])
     
+    def test_get_places_by_price(self):
+        """Test GET /api/v1/places/ with a price range"""
+        response = self.client.get('/api/v1/places/?max_price=150&limit=20')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        expected = [p.id for p in facade.get_places_by_price(max_price=150, limit=20)]
+        self.assertEqual([place['id'] for place in data], expected)
+    
+    def test_get_places_by_price_paginated(self):
+        """Test cursors on a price-filtered place listing"""
+        response = self.client.get('/api/v1/places/?max_price=1000&limit=1')
+        self.assertEqual(response.status_code, 200)
+        first = json.loads(response.data)
+        cursor = response.headers['X-Next-Cursor']
+        response = self.client.get(f'/api/v1/places/?max_price=1000&limit=1&cursor={cursor}')
+        second = json.loads(response.data)
+        expected = [p.id for p in facade.get_places_by_price(max_price=1000, limit=2)]
+        self.assertEqual([place['id'] for place in first + second], expected)
+    
+    def test_get_places_by_amenities(self):
+        """Test GET /api/v1/places/ keeps places having every listed amenity"""
+        wifi, pool = facade.get_all_amenities()[:2]
+        place = facade.create_place({'title': 'Wifi only', 'description': None, 'price': 70.0,
+                                     'latitude': 1.0, 'longitude': 1.0,
+                                     'owner_id': self.sample_user_id})
+        facade.add_amenity_to_place(place.id, wifi.id)
+        expected = [p.id for p in facade.get_places_with_amenities([wifi.id, pool.id])]
+        response = self.client.get(f'/api/v1/places/?amenities={wifi.name.upper()},{pool.id}')
+        self.assertEqual(response.status_code, 200)
+        ids = [item['id'] for item in json.loads(response.data)]
+        self.assertEqual(sorted(ids), sorted(expected))
+        self.assertNotIn(place.id, ids)
+        self.assertIn(place.id, [item['id'] for item in json.loads(
+            self.client.get(f'/api/v1/places/?amenities={wifi.id}&max_price=70').data)])
+        response = self.client.get('/api/v1/places/?amenities=no-such-amenity')
+        self.assertEqual(json.loads(response.data), [])
+    
+    def test_get_places_sorted_with_facets(self):
+        """Test GET /api/v1/places/ with sort, min_rating and facets"""
+        wifi = facade.get_all_amenities()[0]
+        cheap, dear = [facade.create_place({
+            'title': title, 'description': None, 'price': price, 'latitude': -5.0,
+            'longitude': -5.0, 'owner_id': self.sample_user_id
+        }) for title, price in [('Cheap hut', 20.0), ('Dear villa', 900.0)]]
+        facade.add_amenity_to_place(dear.id, wifi.id)
+        for place, rating in [(cheap, 2), (dear, 5)]:
+            facade.create_review({'text': 'Stayed here', 'rating': rating,
+                                  'user_id': self.sample_user_id, 'place_id': place.id})
+        response = self.client.get('/api/v1/places/?sort=-price&limit=1')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)[0]['id'],
+                         max(facade.get_all_places(), key=lambda place: place.price).id)
+        response = self.client.get(f'/api/v1/places/?min_rating=2&max_price=900&sort=-rating'
+                                   f'&amenities={wifi.id}&facets=true')
+        data = json.loads(response.data)
+        ids = [item['id'] for item in data['places']]
+        self.assertIn(dear.id, ids)
+        self.assertNotIn(cheap.id, ids)
+        self.assertEqual(data['facets']['total'], len(ids))
+        self.assertIn({'id': wifi.id, 'name': wifi.name, 'count': len(ids)},
+                      data['facets']['amenities'])
+        self.assertEqual(sum(bucket['count'] for bucket in data['facets']['price']), len(ids))
+        self.assertIsNone(data['facets']['price'][-1]['max'])
+        for query in ['sort=title', 'sort=price&cursor=bad', 'sort=price&near=0,0&k=1']:
+            self.assertEqual(self.client.get(f'/api/v1/places/?{query}').status_code, 400, query)
+
+    def test_get_places_sorted_tampered_cursor(self):
+        """Test each sort of GET /api/v1/places/ answers 400 to a cursor with a bad key"""
+        sorts = ['price', '-price', 'rating', '-rating', 'created_at', '-created_at']
+        for sort in sorts:
+            for key in ['a', [1], None, True, float('inf')]:
+                with self.subTest(sort=sort, key=key):
+                    response = self.client.get(
+                        f'/api/v1/places/?sort={sort}&cursor={make_cursor(sort, key)}')
+                    self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/v1/places/?near=0,0&radius_km=10&sort=distance'
+                                   f"&cursor={make_cursor('distance', 'a')}")
+        self.assertEqual(response.status_code, 400)
+
+    def test_get_places_explain(self):
+        """Test GET /api/v1/places/?explain=true reports the plan, also with near"""
+        place = facade.create_place({
+            'title': 'Harbour flat', 'description': None, 'price': 75.0, 'latitude': -33.86,
+            'longitude': 151.21, 'owner_id': self.sample_user_id
+        })
+        response = self.client.get('/api/v1/places/?sort=-price&limit=2&explain=true')
+        self.assertEqual(response.status_code, 200)
+        plan = json.loads(response.data)
+        self.assertEqual(plan['access'], 'sorted index price walk')
+        self.assertEqual(plan['order'], 'index')
+        self.assertEqual(plan['rows_returned'], 3)
+        self.assertIn('alternatives', plan)
+        response = self.client.get('/api/v1/places/?near=-33.86,151.21&radius_km=10'
+                                   '&max_price=80&explain=1')
+        plan = json.loads(response.data)
+        # Whether the geo index or a column scan wins depends on the column
+        # backend (NumPy or not), so only check what holds for both
+        paths = [plan['access']] + [other['access'] for other in plan['alternatives']]
+        self.assertTrue(any(path.startswith('geo index') for path in paths))
+        self.assertTrue(all(plan['cost'] <= other['cost'] for other in plan['alternatives']))
+        self.assertLessEqual(set(plan['filter']),
+                             {'price <= 80.0', 'location within 10.0 km of (-33.86, 151.21)'})
+        self.assertIn(plan['order'], ('index', 'sort'))
+        self.assertEqual(plan['rows_returned'], 1)
+        response = self.client.get('/api/v1/places/?near=-33.86,151.21&radius_km=10&max_price=80')
+        self.assertEqual([item['id'] for item in json.loads(response.data)], [place.id])
+        for query in ['near=0,0&max_price=10', 'near=0,0&radius_km=5&facets=true', 'sort=distance']:
+            self.assertEqual(self.client.get(f'/api/v1/places/?{query}').status_code, 400, query)
+
+    def test_get_places_near(self):
+        """Test GET /api/v1/places/?near= by radius and by k"""
+        far, close = [facade.create_place({
+            'title': title, 'description': None, 'price': 90.0, 'latitude': -41.29,
+            'longitude': longitude, 'owner_id': self.sample_user_id
+        }) for title, longitude in [('Far', 174.9), ('Close', 174.78)]]
+        response = self.client.get('/api/v1/places/?near=-41.29,174.776&radius_km=5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in json.loads(response.data)], [close.id])
+        response = self.client.get('/api/v1/places/?near=-41.29,174.776&k=2&limit=1')
+        self.assertEqual(json.loads(response.data)[0]['id'], close.id)
+        cursor = response.headers['X-Next-Cursor']
+        response = self.client.get(f'/api/v1/places/?near=-41.29,174.776&k=2&limit=1&cursor={cursor}')
+        self.assertEqual([item['id'] for item in json.loads(response.data)], [far.id])
+        for query in ['near=-41.29', 'near=-41.29,174.776', 'near=95,0&k=1',
+                      'near=0,0&k=1&max_price=10']:
+            self.assertEqual(self.client.get(f'/api/v1/places/?{query}').status_code, 400, query)
+
+    def test_get_places_near_bad_radius_or_k(self):
+        """Test GET /api/v1/places/?near= rejects non-finite or non-positive radius_km and k"""
+        for query in ['radius_km=nan', 'radius_km=inf', 'radius_km=-inf', 'radius_km=0',
+                      'radius_km=-5', 'k=0', 'k=-3', 'radius_km=nan&sort=price']:
+            response = self.client.get(f'/api/v1/places/?near=-41.29,174.776&{query}')
+            self.assertEqual(response.status_code, 400, query)
+            self.assertIn('must be a positive', json.loads(response.data)['message'], query)
+    
+    def test_get_place_map(self):
+        """Test GET /api/v1/places/map returns clusters zoomed out and places zoomed in"""
+        place = facade.create_place({'title': 'Map pin', 'description': None, 'price': 60.0,
+                                     'latitude': 64.1466, 'longitude': -21.9426,
+                                     'owner_id': self.sample_user_id})
+        response = self.client.get('/api/v1/places/map?bbox=-180,-85,180,85&zoom=1')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['places'], [])
+        self.assertEqual(sum(c['count'] for c in data['clusters']), len(facade.get_all_places()))
+        response = self.client.get('/api/v1/places/map?bbox=-21.95,64.14,-21.93,64.15&zoom=15')
+        data = json.loads(response.data)
+        self.assertEqual([p['id'] for p in data['places']], [place.id])
+        for query in ['bbox=-180,-85,180,85&zoom=9', 'bbox=1,2,3&zoom=3', 'bbox=0,0,1,1']:
+            self.assertEqual(self.client.get(f'/api/v1/places/map?{query}').status_code, 400, query)
+    
+    def test_search_places(self):
+        """Test GET /api/v1/places/search ranks matches and pages them"""
+        cove, lodge = [facade.create_place({
+            'title': title, 'description': description, 'price': 80.0, 'latitude': 2.0,
+            'longitude': 2.0, 'owner_id': self.sample_user_id
+        }) for title, description in [('Quokka cove', 'Right on the sand'),
+                                      ('Lodge', 'Quokkas visit the garden')]]
+        response = self.client.get('/api/v1/places/search?q=quokka')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in json.loads(response.data)], [cove.id, lodge.id])
+        response = self.client.get('/api/v1/places/search?q=quokka&limit=1')
+        self.assertEqual([item['id'] for item in json.loads(response.data)], [cove.id])
+        cursor = response.headers['X-Next-Cursor']
+        response = self.client.get(f'/api/v1/places/search?q=quokka&limit=1&cursor={cursor}')
+        self.assertEqual([item['id'] for item in json.loads(response.data)], [lodge.id])
+        self.assertEqual(self.client.get('/api/v1/places/search?q=%20').status_code, 400)
+        for key in ['a', [1, 2], None, True, float('nan')]:
+            response = self.client.get(
+                f"/api/v1/places/search?q=quokka&cursor={make_cursor('score', key)}")
+            self.assertEqual(response.status_code, 400, key)
+    
+    def test_place_batch(self):
+        """Test POST /api/v1/places/batch with good and bad items"""
+        amenity_ids = [amenity.id for amenity in facade.get_all_amenities()[:2]]
+        batch = {
+            'create': [
+                {'title': 'Batch Loft', 'description': 'Bulk', 'price': 90.0, 'latitude': 1.0,
+                 'longitude': 2.0, 'owner_id': self.sample_user_id, 'amenities': amenity_ids},
+                {'title': 'Batch Orphan', 'description': 'Bulk', 'price': 90.0, 'latitude': 1.0,
+                 'longitude': 2.0, 'owner_id': 'missing-user'},
+                {'title': 'Batch Free', 'description': 'Bulk', 'price': -1.0, 'latitude': 1.0,
+                 'longitude': 2.0, 'owner_id': self.sample_user_id},
+            ],
+            'update': [{'id': self.places[0].id, 'price': 123.0}, {'id': 'missing-place', 'price': 1.0}],
+        }
+        response = self.client.post('/api/v1/places/batch', json=batch)
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual([item['status'] for item in data['create']], [201, 400, 400])
+        self.assertEqual([item['status'] for item in data['update']], [200, 404])
+        created = facade.get_place(data['create'][0]['data']['id'])
+        self.assertEqual([amenity.id for amenity in created.get_amenities()], amenity_ids)
+        self.assertEqual(facade.get_place(self.places[0].id).price, 123.0)
+    
+    def test_place_batch_rejects_delete(self):
+        """Test a batch with an operation the collection does not offer"""
+        response = self.client.post('/api/v1/places/batch', json={'delete': [self.places[0].id]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIsNotNone(facade.get_place(self.places[0].id))
+    
     def test_create_place_valid(self):
         """Test POST /api/v1/places/ with valid data"""
         if hasattr(self, 'sample_user_id') and hasattr(self, 'sample_amenity_ids'):
@@ -193,6 +484,29 @@ class TestPlaceEndpoints(unittest.TestCase):
             self.assertEqual(response.status_code, 200)
             data = json.loads(response.data)
             self.assertIsInstance(data, list)
+    
+    def test_get_place_reviews_sorted_pages(self):
+        """Test paging through a place's reviews sorted by rating"""
+        place = facade.create_place({'title': 'Reviewed', 'description': None, 'price': 50.0,
+                                     'latitude': 1.0, 'longitude': 2.0,
+                                     'owner_id': facade.get_all_users()[0].id})
+        for rating in (3, 5, 1, 4):
+            facade.create_review({'text': f'Rated {rating}', 'rating': rating,
+                                  'place_id': place.id, 'user_id': facade.get_all_users()[1].id})
+        url = f'/api/v1/places/{place.id}/reviews'
+        response = self.client.get(f'{url}?sort=-rating&limit=3')
+        self.assertEqual([review['rating'] for review in json.loads(response.data)], [5, 4, 3])
+        cursor = response.headers['X-Next-Cursor']
+        response = self.client.get(f'{url}?sort=-rating&limit=3&cursor={cursor}')
+        self.assertEqual([review['rating'] for review in json.loads(response.data)], [1])
+        self.assertNotIn('X-Next-Cursor', response.headers)
+        self.assertEqual(self.client.get(f'{url}?sort=text').status_code, 400)
+        ratings = json.loads(self.client.get(f'/api/v1/places/{place.id}').data)['ratings']
+        self.assertEqual(ratings, {'count': 4, 'sum': 13, 'average': 3.25,
+                                   'histogram': [1, 0, 1, 1, 1]})
+        listed = json.loads(self.client.get('/api/v1/places/').data)
+        self.assertIn(ratings, [item['ratings'] for item in listed])
+        self.assertEqual(self.client.get('/api/v1/places/missing/reviews').status_code, 404)
 
 
 class TestReviewEndpoints(unittest.TestCase):
@@ -279,6 +593,19 @@ class TestAmenityEndpoints(unittest.TestCase):
         if self.amenities:
             self.sample_amenity_id = self.amenities[0].id
     
+    def test_amenity_batch(self):
+        """Test POST /api/v1/amenities/batch creating and deleting amenities"""
+        response = self.client.post('/api/v1/amenities/batch',
+                                    json={'create': [{'name': 'Batch Sauna'}, {'name': ''}]})
+        data = json.loads(response.data)
+        self.assertEqual([item['status'] for item in data['create']], [201, 400])
+        amenity_id = data['create'][0]['data']['id']
+        response = self.client.post('/api/v1/amenities/batch', json={'delete': [amenity_id, amenity_id]})
+        data = json.loads(response.data)
+        self.assertEqual(data['delete'], [{'id': amenity_id, 'status': 200},
+                                          {'id': amenity_id, 'status': 404}])
+        self.assertIsNone(facade.get_amenity(amenity_id))
+    
     def test_get_all_amenities(self):
         """Test GET /api/v1/amenities/"""
         response = self.client.get('/api/v1/amenities/')
@@ -316,5 +643,50 @@ class TestAmenityEndpoints(unittest.TestCase):
             self.assertEqual(data['id'], self.sample_amenity_id)
 
 
+class TestHealthEndpoint(unittest.TestCase):
+    """Test the health endpoint"""
+    
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+    
+    def test_health_reports_counts_and_process(self):
+        """Test GET /api/v1/health/ returns counts and process metrics"""
+        response = self.client.get('/api/v1/health/')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['counts']['users'], len(facade.get_all_users()))
+        self.assertEqual(data['counts']['amenities'], len(facade.get_all_amenities()))
+        self.assertGreater(data['process']['rss_bytes'], 0)
+        self.assertGreaterEqual(data['process']['requests_total'], 1)
+        self.assertGreater(data['process']['requests_per_second'], 0)
+
+
+
+class TestAutocompleteEndpoint(unittest.TestCase):
+    """Test the autocomplete endpoint"""
+    
+    def setUp(self):
+        self.app = create_app()
+        self.app.config['TESTING'] = True
+        self.client = self.app.test_client()
+    
+    def test_autocomplete_places_and_users(self):
+        """Test GET /api/v1/autocomplete/ for places and users"""
+        owner = facade.get_all_users()[0]
+        place = facade.create_place({'title': 'Okapi hideaway', 'description': None,
+                                     'price': 75.0, 'latitude': 3.0, 'longitude': 3.0,
+                                     'owner_id': owner.id})
+        response = self.client.get('/api/v1/autocomplete/?q=okap')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data),
+                         [{'id': place.id, 'label': 'Okapi hideaway', 'popularity': 0}])
+        response = self.client.get(f'/api/v1/autocomplete/?type=users&q={owner.last_name[:3]}')
+        self.assertIn(owner.id, [item['id'] for item in json.loads(response.data)])
+        for query in ['q=', 'q=a&type=reviews', 'q=a&k=0']:
+            self.assertEqual(self.client.get(f'/api/v1/autocomplete/?{query}').status_code, 400,
+                             query)
+
 if __name__ == '__main__':
     unittest.main()
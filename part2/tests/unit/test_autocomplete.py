@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Unit tests for prefix autocomplete"""
+import random
+import unittest
+import sys
+sys.path.insert(0, '.')
+
+from unittest import mock
+
+from app.persistence import autocomplete
+from app.persistence.autocomplete import PrefixIndex, normalize_prefix, word_keys
+from app.services.facade import HBnBFacade
+
+
+class Item:
+    def __init__(self, obj_id, title, score=0):
+        self.id = obj_id
+        self.title = title
+        self.score = score
+
+
+class TestPrefixIndex(unittest.TestCase):
+    """Test matching, ranking and the kept rankings of long slices"""
+
+    def setUp(self):
+        self.index = PrefixIndex(lambda item: [item.title], score=lambda item: item.score)
+
+    def titles(self, text, limit=20):
+        return [item.title for item in self.index.complete(normalize_prefix(text), limit)]
+
+    def test_keys(self):
+        """Test keys start at every word and typed text is normalized the same way"""
+        self.assertEqual(word_keys('Sunny Beach-Loft'),
+                         ['sunny beach loft ', 'beach loft ', 'loft '])
+        self.assertEqual(normalize_prefix('  Café, LO'), 'cafe lo')
+        self.assertEqual(normalize_prefix('cafe '), 'cafe ')
+        self.assertEqual(normalize_prefix(' ,'), '')
+
+    def test_match_and_rank(self):
+        """Test any word may start a match, best score first, then by name"""
+        for i, (title, score) in enumerate([('Beach loft', 2), ('Sunny beach house', 5),
+                                            ('Beachfront', 2), ('Loft', 0)]):
+            self.index.upsert(Item(f'i{i}', title, score))
+        self.assertEqual(self.titles('bea'), ['Sunny beach house', 'Beach loft', 'Beachfront'])
+        self.assertEqual(self.titles('beach '), ['Sunny beach house', 'Beach loft'])
+        self.assertEqual(self.titles('beach lo'), ['Beach loft'])
+        self.assertEqual(self.titles('lo', limit=1), ['Beach loft'])
+        self.index.remove('i0')
+        self.assertEqual(self.titles('lo'), ['Loft'])
+
+    def test_kept_rankings_stay_exact(self):
+        """Test random writes against a full ranking of the slice"""
+        rng = random.Random(3)
+        words = ['bay', 'beach', 'bed', 'bell', 'cabin', 'cave', 'city']
+        items = {}
+        with mock.patch.multiple(autocomplete, SCAN_LIMIT=4, MAX_COMPLETIONS=5):
+            for step in range(600):
+                obj_id = f'i{rng.randrange(60)}'
+                if rng.random() < 0.15:
+                    items.pop(obj_id, None)
+                    self.index.remove(obj_id)
+                else:
+                    title = ' '.join(rng.sample(words, rng.randint(1, 3)))
+                    items[obj_id] = Item(obj_id, title, rng.randrange(5))
+                    self.index.upsert(items[obj_id])
+                prefix = rng.choice(['b', 'be', 'c', 'ca', 'bell ', 'city c'])
+                expected = sorted((item for item in items.values()
+                                   if any(key.startswith(prefix) for key in word_keys(item.title))),
+                                  key=lambda item: (-item.score, item.title.lower(), item.id))
+                self.assertEqual(self.index.complete(prefix, 5), expected[:5], (step, prefix))
+            self.assertTrue(self.index._tops)
+
+
+class TestCompletions(unittest.TestCase):
+    """Test the facade keeps completions in step with places, reviews and users"""
+
+    def setUp(self):
+        self.facade = HBnBFacade()
+        self.owner, self.reviewer = self.facade.get_all_users()[:2]
+        self.places = [self.facade.create_place({
+            'title': title, 'description': None, 'price': 50.0, 'latitude': 0.0,
+            'longitude': 0.0, 'owner_id': self.owner.id
+        }) for title in ['Quetzal lodge', 'Quetzal nest']]
+
+    def titles(self, text):
+        return [place.title for place in self.facade.autocomplete_places(text)]
+
+    def test_reviews_lift_places(self):
+        """Test places with more reviews come first and follow review changes"""
+        self.assertEqual(self.titles('quetz'), ['Quetzal lodge', 'Quetzal nest'])
+        review = self.facade.create_review({'text': 'Lovely', 'rating': 5,
+                                            'user_id': self.reviewer.id,
+                                            'place_id': self.places[1].id})
+        self.assertEqual(self.titles('quetz'), ['Quetzal nest', 'Quetzal lodge'])
+        self.facade.delete_review(review.id)
+        self.facade.update_place(self.places[0].id, {'title': 'Toucan lodge'})
+        self.assertEqual(self.titles('quetz'), ['Quetzal nest'])
+        self.assertEqual(self.titles('lodge'), ['Toucan lodge'])
+        self.facade.delete_place(self.places[1].id)
+        self.assertEqual(self.titles('quetz'), [])
+
+    def test_users_by_name_and_email(self):
+        """Test users are found by first name, last name and email"""
+        user = self.facade.create_user({'first_name': 'Zebulon', 'last_name': 'Pike',
+                                        'email': 'zeb@frontier.example'})
+        self.assertEqual(self.facade.autocomplete_users('zebu'), [user])
+        self.assertEqual(self.facade.autocomplete_users('zeb@front'), [user])
+        self.facade.update_user(user.id, {'first_name': 'Zachary'})
+        self.assertEqual(self.facade.autocomplete_users('zebu'), [])
+        self.facade.delete_user(user.id)
+        self.assertEqual(self.facade.autocomplete_users('pike'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Unit tests for the columnar place store"""
+import math
+import unittest
+import sys
+sys.path.insert(0, '.')
+
+from app.persistence import columnar
+from app.services.facade import HBnBFacade
+
+
+class TestPlaceColumns(unittest.TestCase):
+    """Test filtering and keeping the columns in sync with the facade"""
+
+    def setUp(self):
+        self.facade = HBnBFacade()
+        self.owner = self.facade.get_all_users()[0]
+        self.reviewer = self.facade.get_all_users()[1]
+        self.wifi, self.pool = self.facade.get_all_amenities()[:2]
+        self.places = [self.facade.create_place({
+            'title': f'Place {i}', 'description': 'Test', 'price': price,
+            'latitude': latitude, 'longitude': 10.0, 'owner_id': self.owner.id
+        }) for i, (price, latitude) in enumerate([(50, 1.0), (120, 2.0), (80, 3.0), (200, 4.0)])]
+
+    def find(self, **criteria):
+        return sorted(place.title for place in self.facade.find_places(**criteria)
+                      if place in self.places)
+
+    def test_combined_filters(self):
+        """Test bounds on several columns are combined"""
+        self.assertEqual(self.find(min_price=60, max_price=150), ['Place 1', 'Place 2'])
+        self.assertEqual(self.find(min_price=60, max_latitude=2.5), ['Place 1'])
+        self.assertEqual(self.find(min_longitude=11.0), [])
+
+    def test_updates_are_mirrored(self):
+        """Test place updates and deletes reach the columns"""
+        self.facade.find_places()
+        self.facade.update_place(self.places[0].id, {'price': 130.0})
+        self.facade.delete_place(self.places[1].id)
+        self.assertEqual(self.find(min_price=100), ['Place 0', 'Place 3'])
+        self.assertEqual(len(self.facade.place_columns), len(self.facade.get_all_places()))
+
+    def test_amenity_filter(self):
+        """Test places must have every requested amenity"""
+        self.facade.add_amenity_to_place(self.places[0].id, self.wifi.id)
+        self.facade.add_amenity_to_place(self.places[0].id, self.pool.id)
+        self.facade.add_amenity_to_place(self.places[2].id, self.wifi.id)
+        self.assertEqual(self.find(amenity_ids=[self.wifi.id]), ['Place 0', 'Place 2'])
+        self.assertEqual(self.find(amenity_ids=[self.wifi.id, self.pool.id]), ['Place 0'])
+        self.facade.remove_amenity_from_place(self.places[0].id, self.pool.id)
+        self.assertEqual(self.find(amenity_ids=[self.wifi.id, self.pool.id]), [])
+        self.assertEqual(self.find(amenity_ids=['missing-amenity']), [])
+
+    def test_inverted_amenity_bitmaps(self):
+        """Test the amenity -> places bitmaps survive row moves and amenity changes"""
+        for place in self.places:
+            self.facade.add_amenity_to_place(place.id, self.wifi.id)
+        self.facade.add_amenity_to_place(self.places[3].id, self.pool.id)
+        code = self.facade.place_columns.amenity_code(self.wifi.id)
+        self.assertIsInstance(code, int)
+        # Deleting the first place moves the last row, which has the pool, into its slot
+        self.facade.delete_place(self.places[0].id)
+        self.facade.remove_amenity_from_place(self.places[2].id, self.wifi.id)
+        self.assertEqual(self.facade.place_columns.amenity_code(self.wifi.id), code)
+        with_wifi = self.facade.get_places_with_amenities([self.wifi.id])
+        self.assertEqual(sorted(place.title for place in with_wifi if place in self.places),
+                         ['Place 1', 'Place 3'])
+        both = self.facade.get_places_with_amenities([self.wifi.id, self.pool.id])
+        self.assertEqual([place for place in both if place in self.places], [self.places[3]])
+        self.assertEqual(self.find(amenity_ids=[self.pool.id], max_price=100), [])
+        self.assertEqual(self.facade.get_places_with_amenities(['missing-amenity']), [])
+
+    def test_deleted_amenity_is_unlinked(self):
+        """Test deleting an amenity removes it from places and frees its code"""
+        for place in self.places[:3]:
+            self.facade.add_amenity_to_place(place.id, self.pool.id)
+        self.facade.add_amenity_to_place(self.places[0].id, self.wifi.id)
+        code = self.facade.place_columns.amenity_code(self.pool.id)
+        self.assertTrue(self.facade.delete_amenity(self.pool.id))
+        self.assertIsNone(self.facade.get_amenity(self.pool.id))
+        self.assertEqual(self.find(amenity_ids=[self.pool.id]), [])
+        self.assertEqual(self.facade.get_places_with_amenities([self.pool.id]), [])
+        self.assertFalse(any(self.pool in place.get_amenities() for place in self.places))
+        self.assertEqual(self.find(amenity_ids=[self.wifi.id]), ['Place 0'])
+        self.assertIsNone(self.facade.place_columns.amenity_code(self.pool.id))
+        sauna = self.facade.create_amenity({'name': 'Sauna'})
+        self.facade.add_amenity_to_place(self.places[3].id, sauna.id)
+        self.assertEqual(self.facade.place_columns.amenity_code(sauna.id), code)
+        self.assertEqual(self.find(amenity_ids=[sauna.id]), ['Place 3'])
+        self.assertEqual(self.facade.delete_amenities([self.wifi.id, 'missing-amenity']),
+                         [True, False])
+        self.assertEqual(self.places[0].get_amenities(), [])
+
+    def test_rating_follows_reviews(self):
+        """Test the mean rating tracks review changes; unrated places never match"""
+        first = self.facade.create_review({'text': 'Great', 'rating': 5,
+                                           'place_id': self.places[3].id, 'user_id': self.reviewer.id})
+        self.facade.create_review({'text': 'Fine', 'rating': 3,
+                                   'place_id': self.places[3].id, 'user_id': self.reviewer.id})
+        self.assertEqual(self.find(min_rating=4), ['Place 3'])
+        self.facade.update_review(first.id, {'rating': 4})
+        self.assertEqual(self.find(min_rating=3.5), ['Place 3'])
+        self.facade.delete_review(first.id)
+        self.assertEqual(self.find(min_rating=3.5), [])
+        self.assertEqual(self.find(min_rating=3), ['Place 3'])
+
+    def test_batch_changes_are_mirrored(self):
+        """Test batch creates and deletes reach the columns"""
+        created = self.facade.create_places([{
+            'title': 'Batch', 'description': 'Test', 'price': 999.0, 'latitude': 0.0,
+            'longitude': 0.0, 'owner_id': self.owner.id, 'amenities': [self.pool.id]
+        }])
+        self.assertEqual(self.facade.find_places(min_price=999), created)
+        self.facade.delete_places([created[0].id])
+        self.assertEqual(self.facade.find_places(min_price=999), [])
+
+    def test_listing_sorts_and_pages(self):
+        """Test list_places orders by price, rating and creation, across pages"""
+        def listed(sort, limit=None, cursor=None):
+            # The sample places lie further north
+            places, next_cursor, _ = self.facade.list_places(sort, limit, cursor, max_latitude=5.0)
+            return [place.title for place in places], next_cursor
+        self.assertEqual(listed('price')[0], ['Place 0', 'Place 2', 'Place 1', 'Place 3'])
+        self.assertEqual(listed('-created_at')[0], ['Place 3', 'Place 2', 'Place 1', 'Place 0'])
+        for place, rating in [(self.places[1], 3), (self.places[2], 5)]:
+            self.facade.create_review({'text': 'Stay', 'rating': rating,
+                                       'place_id': place.id, 'user_id': self.reviewer.id})
+        self.assertEqual(listed('-rating')[0][:2], ['Place 2', 'Place 1'])
+        first, cursor = listed('-rating', limit=1)
+        second, _ = listed('-rating', limit=1, cursor=cursor)
+        self.assertEqual(first + second, ['Place 2', 'Place 1'])
+        with self.assertRaises(ValueError):
+            listed('price', limit=1, cursor=cursor)
+        with self.assertRaises(ValueError):
+            listed('title')
+
+    def test_facets_count_matches(self):
+        """Test facet counts cover every match, not just the page"""
+        self.facade.add_amenity_to_place(self.places[0].id, self.wifi.id)
+        self.facade.add_amenity_to_place(self.places[1].id, self.wifi.id)
+        self.facade.add_amenity_to_place(self.places[1].id, self.pool.id)
+        places, _, facets = self.facade.list_places(limit=1, facets=True, max_latitude=5.0,
+                                                    max_price=150)
+        self.assertEqual(len(places), 1)
+        self.assertEqual(facets['total'], 3)
+        self.assertEqual([(facet['name'], facet['count']) for facet in facets['amenities']],
+                         [(self.wifi.name, 2), (self.pool.name, 1)])
+        self.assertEqual([(facet['min'], facet['count']) for facet in facets['price']],
+                         [(0, 0), (50, 2), (100, 1), (200, 0), (500, 0)])
+        _, _, facets = self.facade.list_places(facets=True, max_latitude=5.0,
+                                               amenity_ids=[self.pool.id])
+        self.assertEqual(facets['total'], 1)
+        self.assertIsNone(self.facade.list_places(max_latitude=5.0)[2])
+
+
+class TestArrayColumns(unittest.TestCase):
+    """Test the column backends directly"""
+
+    def backends(self):
+        backends = [columnar._ArrayColumns()]
+        if columnar.np is not None:
+            backends.append(columnar._NumpyColumns(capacity=2))
+        return backends
+
+    def test_backends_agree(self):
+        """Test both backends select the same rows, across growth and moves"""
+        for columns in self.backends():
+            for row in range(5):
+                columns.set(row, {'price': row * 10.0, 'latitude': 0.0, 'longitude': 0.0,
+                                  'rating': math.nan if row == 4 else float(row),
+                                  'amenities': 1 << (row * 40)})
+            columns.move(4, 1)
+            columns.pop()
+            name = type(columns).__name__
+            self.assertEqual(columns.select({'price': (30.0, 40.0)}, None), [1, 3], name)
+            self.assertEqual(columns.select({}, 2.0), [2, 3], name)
+            self.assertEqual(columns.select({'price': (0.0, 30.0)}, None, [1, 2]), [2], name)
+            self.assertEqual(columns.mask(1), 1 << 160, name)
+            self.assertEqual(columnar.bits(columns.bitmap([1, 3])), [1, 3], name)
+            self.assertEqual(columns.histogram('price', [0, 1, 2, 3], [15.0, 30.0]), [1, 1, 2], name)
+
+    def test_row_bitmap_chunks(self):
+        """Test row bitmaps split across chunks agree with a single int"""
+        rows = [0, 5, columnar.CHUNK_ROWS - 1, columnar.CHUNK_ROWS, 3 * columnar.CHUNK_ROWS + 7]
+        bitmap = columnar.RowBitmap()
+        for row in rows + [5]:
+            bitmap.flip(row)
+        bitmap.flip(5)
+        self.assertEqual(bitmap.rows(), rows)
+        self.assertEqual(bitmap.count(), len(rows))
+        whole = columnar.row_bitmap(rows, rows[-1] + 1)
+        self.assertEqual(columnar.RowBitmap.from_int(whole).rows(), rows)
+        other = columnar.RowBitmap.from_int(columnar.row_bitmap(rows[1::2], rows[-1] + 1))
+        self.assertEqual((bitmap & other).rows(), rows[1::2])
+        self.assertEqual(columnar.RowBitmap.from_int(0).rows(), [])
+
+    def test_bits(self):
+        """Test set bit positions come back in ascending order"""
+        self.assertEqual(columnar.bits(0), [])
+        self.assertEqual(columnar.bits(1 << 200 | 1 << 9 | 1), [0, 9, 200])
+
+
+if __name__ == '__main__':
+    unittest.main()
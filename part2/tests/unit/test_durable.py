@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""Unit tests for the write-ahead log and durable facade mode"""
+import unittest
+import os
+import shutil
+import tempfile
+import sys
+sys.path.insert(0, '.')
+
+from app.persistence.durable import DurableStore
+from app.models import ids
+from app.persistence.snapshot import MappedSnapshot, pack_id, unpack_id
+from app.services.facade import HBnBFacade
+from app.models.amenity import Amenity
+
+
+class TestDurableStore(unittest.TestCase):
+    """Test logging, replay and compaction"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def open_facade(self, **options):
+        self.store = DurableStore(self.directory, **options)
+        return HBnBFacade(store=self.store)
+
+    def reopen(self, **options):
+        self.store.close()
+        return self.open_facade(**options)
+
+    def populate(self, facade):
+        """Exercise every kind of change and return the ids involved"""
+        user = facade.create_user({'first_name': 'Ada', 'last_name': 'Lovelace',
+                                   'email': 'ada@example.com'})
+        place = facade.create_place({'title': 'Loft', 'description': 'Bright', 'price': 80,
+                                     'latitude': 10, 'longitude': 20, 'owner_id': user.id})
+        amenity = facade.create_amenity({'name': 'Sauna'})
+        facade.add_amenity_to_place(place.id, amenity.id)
+        kept = facade.create_review({'text': 'Lovely', 'rating': 4,
+                                     'place_id': place.id, 'user_id': user.id})
+        dropped = facade.create_review({'text': 'Meh', 'rating': 2,
+                                        'place_id': place.id, 'user_id': user.id})
+        facade.update_place(place.id, {'price': 95.0})
+        facade.update_review(kept.id, {'rating': 5})
+        facade.update_user(user.id, {'email': 'ada@lovelace.org'})
+        facade.delete_review(dropped.id)
+        return user.id, place.id, amenity.id, kept.id, dropped.id
+
+    def assert_restored(self, facade, ids):
+        user_id, place_id, amenity_id, kept_id, dropped_id = ids
+        place = facade.get_place(place_id)
+        self.assertEqual(place.price, 95.0)
+        self.assertIs(place.owner, facade.get_user(user_id))
+        self.assertEqual([a.id for a in place.get_amenities()], [amenity_id])
+        self.assertEqual([r.id for r in place.get_reviews()], [kept_id])
+        self.assertEqual(place.ratings.histogram, [0, 0, 0, 0, 1])
+        self.assertIs(facade.get_review(kept_id).place, place)
+        self.assertIsNone(facade.get_review(dropped_id))
+        self.assertIs(facade.get_user_by_email('ADA@lovelace.org'), facade.get_user(user_id))
+
+    def test_replay_restores_state(self):
+        """Test that a restart replays the log"""
+        facade = self.open_facade()
+        ids = self.populate(facade)
+        counts = len(facade.get_all_users()), len(facade.get_all_places())
+        restarted = self.reopen()
+        self.assert_restored(restarted, ids)
+        # Sample data is only seeded on the first start
+        self.assertEqual((len(restarted.get_all_users()), len(restarted.get_all_places())), counts)
+
+    def test_compaction(self):
+        """Test that compaction snapshots state and truncates the log"""
+        facade = self.open_facade(compact_every=5)
+        ids = self.populate(facade)
+        self.assertTrue(os.path.exists(self.store.snapshot_path))
+        self.assertLess(self.store.log.appended, 5)
+        self.assert_restored(self.reopen(), ids)
+
+    def test_group_commit_batches_fsync(self):
+        """Test that fsync runs once per sync_every records"""
+        facade = self.open_facade(sync_every=4)
+        synced = []
+        original_sync = self.store.log.sync
+        self.store.log.sync = lambda: synced.append(1) or original_sync()
+        for i in range(8):
+            facade.create_amenity({'name': f'Amenity {i}'})
+        self.assertEqual(len(synced), 2)
+
+    def test_batches_are_logged_together(self):
+        """Test a batch is one log write and survives a restart"""
+        facade = self.open_facade()
+        synced = []
+        original_sync = self.store.log.sync
+        self.store.log.sync = lambda: synced.append(1) or original_sync()
+        amenities = facade.create_amenities([{'name': f'Batch {i}'} for i in range(5)])
+        facade.delete_amenities([amenities[0].id])
+        self.assertEqual(len(synced), 2)
+        restarted = self.reopen()
+        self.assertIsNone(restarted.get_amenity(amenities[0].id))
+        self.assertEqual([restarted.get_amenity(a.id).name for a in amenities[1:]],
+                         [f'Batch {i}' for i in range(1, 5)])
+
+    def test_dangling_amenity_is_skipped(self):
+        """Test a place listing a deleted amenity is restored without it"""
+        facade = self.open_facade()
+        user_id, place_id, amenity_id, _, _ = self.populate(facade)
+        # Deleted behind the facade's back, so the place still lists it
+        facade.amenity_repo.delete(amenity_id)
+        facade.update_place(place_id, {'price': 120.0})
+        with self.assertLogs('app.persistence.records', 'WARNING') as logs:
+            restarted = self.reopen()
+        self.assertIn(amenity_id, logs.output[0])
+        place = restarted.get_place(place_id)
+        self.assertEqual(place.price, 120.0)
+        self.assertEqual(place.get_amenities(), [])
+        self.assertIs(place.owner, restarted.get_user(user_id))
+
+    def test_torn_tail_is_ignored(self):
+        """Test that a partially written last record is skipped"""
+        facade = self.open_facade()
+        ids = self.populate(facade)
+        self.store.close()
+        with open(self.store.log.path, 'ab') as log:
+            log.write(b'{"op":"put","kind":"Amen')
+        facade = self.open_facade()
+        self.assert_restored(facade, ids)
+        amenity = facade.create_amenity({'name': 'After crash'})
+        restarted = self.reopen()
+        self.assert_restored(restarted, ids)
+        self.assertIsNotNone(restarted.get_amenity(amenity.id))
+
+
+class TestMappedSnapshot(unittest.TestCase):
+    """Test the binary snapshot format and lazy loading"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = DurableStore(self.directory)
+        self.facade = HBnBFacade(store=self.store)
+        self.owner = self.facade.create_user({'first_name': 'Grace', 'last_name': 'Hopper',
+                                              'email': 'grace@example.com', 'is_admin': True})
+        self.place = self.facade.create_place({'title': 'Cabin', 'description': None, 'price': 42.5,
+                                               'latitude': -33.9, 'longitude': 151.2,
+                                               'owner_id': self.owner.id})
+        self.facade.add_amenity_to_place(self.place.id, self.facade.get_all_amenities()[0].id)
+        self.review = self.facade.create_review({'text': 'Tiny but perfect', 'rating': 4,
+                                                 'place_id': self.place.id, 'user_id': self.owner.id})
+        self.store.compact()
+        self.store.close()
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def restart(self):
+        self.store = DurableStore(self.directory)
+        return HBnBFacade(store=self.store)
+
+    def test_round_trip(self):
+        """Test every field survives a snapshot round trip"""
+        facade = self.restart()
+        place = facade.get_place(self.place.id)
+        self.assertEqual(place.to_dict(), self.place.to_dict())
+        self.assertIsNone(place.description)
+        self.assertIs(place.owner.is_admin, True)
+        self.assertEqual(place.owner.created_at, self.owner.created_at)
+        self.assertIs(place.get_reviews()[0], facade.get_review(self.review.id))
+        self.assertEqual(len(facade.get_all_users()), len(self.facade.get_all_users()))
+        self.assertEqual(len(facade.get_all_reviews()), len(self.facade.get_all_reviews()))
+
+    def test_objects_load_lazily(self):
+        """Test only the requested object and its references get loaded"""
+        facade = self.restart()
+        self.assertEqual(len(facade.place_repo._storage), 0)
+        place = facade.get_place(self.place.id)
+        self.assertIs(facade.get_place(self.place.id), place)
+        self.assertEqual(list(facade.place_repo._storage), [self.place.id])
+        self.assertIn(self.owner.id, facade.user_repo._storage)
+        self.assertIsNone(facade.get_place('missing-id'))
+        # Range queries need the index, which loads the rest
+        self.assertEqual(len(facade.get_places_by_price()), len(self.facade.get_all_places()))
+
+    def test_counts_without_loading(self):
+        """Test counts include objects still in the snapshot"""
+        facade = self.restart()
+        self.assertEqual(facade.get_counts(), self.facade.get_counts())
+        self.assertEqual(len(facade.review_repo._storage), 0)
+        facade.get_place(self.place.id)
+        facade.delete_review(self.review.id)
+        self.assertEqual(facade.get_counts()['reviews'], self.facade.get_counts()['reviews'] - 1)
+
+    def test_deleted_object_stays_deleted(self):
+        """Test a deleted snapshot object is not loaded again"""
+        amenity_id = self.facade.get_all_amenities()[-1].id
+        facade = self.restart()
+        facade.delete_amenity(amenity_id)
+        self.assertIsNone(facade.get_amenity(amenity_id))
+        self.assertNotIn(amenity_id, [amenity.id for amenity in facade.get_all_amenities()])
+
+    def test_id_columns(self):
+        """Test UUID ids are packed and other ids still round-trip"""
+        self.assertEqual(self.snapshot_table('User')._columns['id']['kind'], 'uuid')
+        amenity = self.facade.get_all_amenities()[0]
+        facade = self.restart()
+        facade.amenity_repo.add(Amenity(name='Legacy', id='legacy-amenity'))
+        self.store.compact()
+        self.store.close()
+        self.assertEqual(self.snapshot_table('Amenity')._columns['id']['kind'], 'str')
+        facade = self.restart()
+        self.assertEqual(facade.get_amenity('legacy-amenity').name, 'Legacy')
+        self.assertEqual(facade.get_amenity(amenity.id).name, amenity.name)
+        self.assertIsNone(facade.get_amenity('LEGACY-AMENITY'))
+
+    def test_packed_ids(self):
+        """Test the 16-byte id form round-trips and keeps the string order"""
+        first, second = ids.uuid4(), ids.uuid4()
+        self.assertEqual(unpack_id(pack_id(first)), first)
+        self.assertEqual(first < second, pack_id(first) < pack_id(second))
+        self.assertIsNone(pack_id('not-a-uuid'))
+        self.assertIsNone(pack_id(first.upper()))
+
+    def snapshot_table(self, kind):
+        return MappedSnapshot(self.store.snapshot_path).tables[kind]
+
+    def test_rejects_other_files(self):
+        """Test that a file without the snapshot header is refused"""
+        path = os.path.join(self.directory, 'bogus')
+        with open(path, 'wb') as bogus:
+            bogus.write(b'{"seq": 0}\n' + b'\0' * 32)
+        with self.assertRaises(ValueError):
+            MappedSnapshot(path)
+
+
+if __name__ == '__main__':
+    unittest.main()
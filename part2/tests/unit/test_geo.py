@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""Unit tests for the spatial place index"""
+import math
+import random
+import unittest
+import sys
+sys.path.insert(0, '.')
+
+from app.persistence import geo
+from app.persistence.geo import GeoIndex, ClusterIndex, cluster_points, haversine_km
+from app.persistence.query import Near
+from app.services.facade import HBnBFacade
+
+
+class Point:
+    def __init__(self, obj_id, latitude, longitude):
+        self.id = obj_id
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+class TestGeoIndex(unittest.TestCase):
+    """Test radius and nearest-k queries against a brute-force scan"""
+
+    def setUp(self):
+        rng = random.Random(7)
+        self.points = [Point(f'p{i}', rng.uniform(-90, 90), rng.uniform(-180, 180))
+                       for i in range(2000)]
+        # Crowd the poles and both sides of the antimeridian
+        self.points += [Point(f'q{i}', rng.choice([-1, 1]) * rng.uniform(85, 90),
+                              rng.uniform(-180, 180)) for i in range(100)]
+        self.points += [Point(f'r{i}', rng.uniform(-10, 10), rng.choice([-1, 1]) * rng.uniform(179, 180))
+                        for i in range(100)]
+        self.index = GeoIndex('location', 'latitude', 'longitude', cell_degrees=1.0)
+        for point in self.points:
+            self.index.insert(point)
+
+    def brute(self, lat, lon):
+        # The index's own distance function, so ties and boundaries agree
+        distances = geo.distances_km(lat, lon, [p.latitude for p in self.points],
+                                     [p.longitude for p in self.points])
+        return sorted(zip(distances, (p.id for p in self.points)))
+
+    def assertSameFound(self, found, expected, lat, lon):
+        self.assertEqual([obj.id for _, obj in found], [obj_id for _, obj_id in expected],
+                         (lat, lon))
+        for distance, obj in found:
+            self.assertAlmostEqual(distance, haversine_km(lat, lon, obj.latitude, obj.longitude),
+                                   places=6)
+
+    def test_within_matches_scan(self):
+        """Test radius queries at the equator, the antimeridian and a pole"""
+        for lat, lon, radius in [(0, 0, 800), (5, 179.9, 300), (-5, -179.5, 1500),
+                                 (89.5, 10, 700), (-88, 0, 100), (45, 90, 20000)]:
+            expected = [(d, obj_id) for d, obj_id in self.brute(lat, lon) if d <= radius]
+            self.assertSameFound(self.index.within(lat, lon, radius), expected, lat, lon)
+
+    def test_nearest_matches_scan(self):
+        """Test nearest-k, alone and capped by a radius"""
+        for lat, lon in [(0, 0), (0, 180), (90, 0), (-33.9, 151.2)]:
+            self.assertSameFound(self.index.nearest(lat, lon, 5), self.brute(lat, lon)[:5],
+                                 lat, lon)
+        capped = self.index.nearest(0, 0, 1000, radius_km=500)
+        self.assertEqual(len(capped), len([d for d, _ in self.brute(0, 0) if d <= 500]))
+
+    def test_remove_and_refile(self):
+        """Test removed objects drop out and moved objects are found at their new place"""
+        point = self.points[0]
+        self.index.remove(point.id)
+        self.index.remove(point.id)
+        self.assertNotIn(point, [obj for _, obj in self.index.within(
+            point.latitude, point.longitude, 1)])
+        point.latitude, point.longitude = 12.5, -170.0
+        self.index.insert(point)
+        self.assertIs(self.index.nearest(12.5, -170.0, 1)[0][1], point)
+        self.assertEqual(len(self.index), len(self.points))
+
+    def test_invalid_queries(self):
+        """Test out-of-range points and arguments are rejected"""
+        with self.assertRaises(ValueError):
+            self.index.within(91, 0, 10)
+        for radius in (-1, math.nan, math.inf):
+            with self.assertRaises(ValueError):
+                self.index.within(0, 0, radius)
+        with self.assertRaises(ValueError):
+            self.index.nearest(0, 0, 0)
+
+    def test_scalar_distances(self):
+        """Test the vectorized and plain distance paths agree"""
+        lats, lons = [0.0, 51.5, -33.9], [0.0, -0.13, 151.2]
+        expected = [haversine_km(48.85, 2.35, lat, lon) for lat, lon in zip(lats, lons)]
+        for got, want in zip(geo.distances_km(48.85, 2.35, lats, lons), expected):
+            self.assertAlmostEqual(got, want, places=6)
+        self.assertAlmostEqual(haversine_km(48.8566, 2.3522, 51.5074, -0.1278), 343.5, delta=1)
+
+
+class TestClusterIndex(unittest.TestCase):
+    """Test the per-zoom cluster counts and bounding-box lookups"""
+
+    def setUp(self):
+        rng = random.Random(11)
+        self.points = [Point(f'p{i}', rng.uniform(-80, 80), rng.uniform(-180, 180))
+                       for i in range(1500)]
+        self.clusters = ClusterIndex('map', 'latitude', 'longitude', max_zoom=6)
+        self.grid = GeoIndex('location', 'latitude', 'longitude', cell_degrees=1.0)
+        for point in self.points:
+            self.clusters.insert(point)
+            self.grid.insert(point)
+
+    def summary(self, clusters):
+        return sorted((c['count'], round(c['latitude'], 6), round(c['longitude'], 6))
+                      for c in clusters)
+
+    def test_matches_recomputed_clusters(self):
+        """Test incremental counts equal clustering the current points from scratch"""
+        for point in self.points[:300]:
+            self.clusters.remove(point.id)
+        for point in self.points[300:600]:
+            point.latitude = -point.latitude
+            self.clusters.insert(point)
+        kept = self.points[300:]
+        for zoom in (0, 3, 6):
+            world = self.clusters.clusters(-90, -180, 90, 180, min(zoom, 3))
+            self.assertEqual(sum(c['count'] for c in world), len(kept))
+        expected = cluster_points([(p.latitude, p.longitude) for p in kept], 2)
+        self.assertEqual(self.summary(self.clusters.clusters(-90, -180, 90, 180, 2)),
+                         self.summary(expected))
+
+    def test_viewport_is_bounded(self):
+        """Test a viewport wider than the screen limit is refused"""
+        # 64 cells of 64 px across, the whole world at zoom 4
+        self.assertLessEqual(len(self.clusters.clusters(-90, -180, 90, 180, 4)), 64 * 64)
+        with self.assertRaises(ValueError):
+            self.clusters.clusters(-90, -180, 90, 180, 5)
+        # Deeper than the stored levels
+        with self.assertRaises(ValueError):
+            self.clusters.clusters(0, 0, 1, 1, 7)
+        with self.assertRaises(ValueError):
+            self.clusters.clusters(10, 0, 0, 10, 1)
+
+    def test_box_matches_scan(self):
+        """Test bounding boxes, including one across the antimeridian"""
+        for south, west, north, east in [(-10, -20, 30, 40), (-60, 170, 20, -160),
+                                         (-90, -180, 90, 180)]:
+            wraps = west > east
+            expected = sorted(p.id for p in self.points if south <= p.latitude <= north
+                              and ((p.longitude >= west or p.longitude <= east) if wraps
+                                   else west <= p.longitude <= east))
+            found = sorted(obj.id for _, _, obj in self.grid.in_box(south, west, north, east))
+            self.assertEqual(found, expected, (south, west, north, east))
+
+
+class TestPlaceLocations(unittest.TestCase):
+    """Test the facade keeps the place index in step with place changes"""
+
+    def setUp(self):
+        self.facade = HBnBFacade()
+        self.owner = self.facade.get_all_users()[0]
+        self.places = [self.facade.create_place({
+            'title': f'Place {i}', 'description': None, 'price': 50.0,
+            'latitude': -60.0, 'longitude': 100.0 + i * 0.01, 'owner_id': self.owner.id
+        }) for i in range(3)]
+
+    def near(self, **query):
+        return [place.title for _, place in self.facade.find_places_near(-60.0, 100.0, **query)]
+
+    def test_create_update_delete(self):
+        """Test places are found after create, move away on update and vanish on delete"""
+        self.assertEqual(self.near(radius_km=2), ['Place 0', 'Place 1', 'Place 2'])
+        self.facade.update_place(self.places[0].id, {'latitude': 10.0})
+        self.facade.delete_place(self.places[1].id)
+        self.assertEqual(self.near(radius_km=2), ['Place 2'])
+        self.assertEqual(self.near(k=2), ['Place 2', 'Place 0'])
+
+    def test_paging(self):
+        """Test distance cursors walk the results in order"""
+        first, cursor = self.facade.find_places_near_page(-60.0, 100.0, radius_km=5, limit=2)
+        second, end = self.facade.find_places_near_page(-60.0, 100.0, radius_km=5, limit=2,
+                                                        cursor=cursor)
+        self.assertEqual(first + second, self.places)
+        self.assertIsNone(end)
+        with self.assertRaises(ValueError):
+            self.facade.find_places_near(-60.0, 100.0)
+
+    def test_query_distance_matches_index(self):
+        """Test the distance a place query sorts and pages on is the index's own"""
+        near = Near('location', -60.0, 100.0, 5)
+        for distance, place in self.facade.find_places_near(-60.0, 100.0, radius_km=5):
+            self.assertEqual(near.distance(place), distance)
+        first, cursor, _ = self.facade.list_places('distance', 1, near=(-60.0, 100.0, 5))
+        rest, end, _ = self.facade.list_places('distance', 5, cursor, near=(-60.0, 100.0, 5))
+        self.assertEqual(first + rest, self.places)
+        self.assertIsNone(end)
+
+    def test_place_map(self):
+        """Test low zooms return clusters and high zooms the places themselves"""
+        shown = self.facade.get_place_map(-61, 99, -59, 101, 5)
+        self.assertEqual(shown['places'], [])
+        self.assertEqual([c['count'] for c in shown['clusters']], [3])
+        self.facade.delete_place(self.places[2].id)
+        shown = self.facade.get_place_map(-60.1, 99.9, -59.9, 100.1, 12)
+        self.assertEqual(shown['clusters'], [])
+        self.assertEqual(sorted(p.title for p in shown['places']), ['Place 0', 'Place 1'])
+        self.facade.MAX_MAP_PLACES = 1
+        shown = self.facade.get_place_map(-60.1, 99.9, -59.9, 100.1, 12)
+        self.assertEqual(sum(c['count'] for c in shown['clusters']), 2)
+        with self.assertRaises(ValueError):
+            self.facade.get_place_map(-61, 99, -59, 101, 12)
+        with self.assertRaises(ValueError):
+            self.facade.get_place_map(-60.1, 99.9, -59.9, 100.1, 23)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""Unit tests for the id schemes"""
+import unittest
+import uuid
+import sys
+sys.path.insert(0, '.')
+
+from app.models import ids
+from app.models.amenity import Amenity
+
+
+class TestIds(unittest.TestCase):
+    """Test uuid7 ordering and compatibility with uuid4 ids"""
+
+    def tearDown(self):
+        ids.use_scheme('uuid4')
+
+    def test_uuid7_is_time_ordered(self):
+        """Test uuid7 ids sort in creation order, even within a millisecond"""
+        made = [ids.uuid7() for _ in range(5000)]
+        self.assertEqual(made, sorted(made))
+        self.assertEqual(len(set(made)), len(made))
+        parsed = uuid.UUID(made[0])
+        self.assertEqual((parsed.version, str(parsed)), (7, made[0]))
+
+    def test_timestamp(self):
+        """Test the creation time is recovered from uuid7 ids only"""
+        amenity = Amenity(name='Wi-Fi')
+        self.assertIsNone(ids.id_timestamp(amenity.id))
+        ids.use_scheme('uuid7')
+        amenity = Amenity(name='Sauna')
+        self.assertTrue(ids.is_time_ordered(amenity.id))
+        embedded = ids.id_timestamp(amenity.id).replace(tzinfo=None)
+        self.assertLess(abs((embedded - amenity.created_at.utcnow()).total_seconds()), 5)
+
+    def test_unknown_scheme(self):
+        """Test an unknown scheme is refused"""
+        with self.assertRaises(ValueError):
+            ids.use_scheme('serial')
+
+
+if __name__ == '__main__':
+    unittest.main()
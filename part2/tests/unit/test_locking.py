@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Unit tests for the thread-safe repository mode"""
+import unittest
+import threading
+import sys
+sys.path.insert(0, '.')
+
+from app.persistence.locking import ReadWriteLock, LockStripes
+from app.services.facade import HBnBFacade
+
+
+class TestLockPrimitives(unittest.TestCase):
+    """Test the read/write lock and lock stripes"""
+
+    def test_readers_share_the_lock(self):
+        """Test that two readers can hold the lock at once"""
+        lock = ReadWriteLock()
+        both_inside = threading.Barrier(2, timeout=2)
+
+        def reader():
+            with lock.read():
+                both_inside.wait()
+
+        other = threading.Thread(target=reader)
+        other.start()
+        reader()
+        other.join()
+
+    def test_writer_excludes_readers(self):
+        """Test that a reader waits for an active writer"""
+        lock = ReadWriteLock()
+        events = []
+
+        def reader():
+            with lock.read():
+                events.append('read')
+
+        with lock.write():
+            thread = threading.Thread(target=reader)
+            thread.start()
+            thread.join(0.05)
+            events.append('write done')
+        thread.join(2)
+        self.assertEqual(events, ['write done', 'read'])
+
+    def test_stripes_are_sorted_and_unique(self):
+        """Test stripes are acquired in a consistent order"""
+        stripes = LockStripes(count=8)
+        keys = [f'key-{i}' for i in range(20)]
+        order = stripes.stripes_for(*keys)
+        self.assertEqual(order, sorted(set(order)))
+        self.assertEqual(stripes.stripes_for(*reversed(keys)), order)
+        self.assertEqual(stripes.stripes_for(None), [])
+
+
+class TestThreadSafeFacade(unittest.TestCase):
+    """Test concurrent writes through a thread-safe facade"""
+
+    def test_concurrent_reviews(self):
+        """Test concurrent create_review calls keep repos and places in sync"""
+        facade = HBnBFacade(thread_safe=True)
+        place = facade.get_all_places()[0]
+        user = facade.get_all_users()[1]
+        before = len(place.get_reviews())
+        rated_four = len(facade.review_repo.find_range('rating', 4, 4))
+
+        def post_reviews():
+            for _ in range(50):
+                facade.create_review({
+                    'text': 'Concurrent review', 'rating': 4,
+                    'place_id': place.id, 'user_id': user.id
+                })
+
+        threads = [threading.Thread(target=post_reviews) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(place.get_reviews()), before + 200)
+        self.assertEqual(len(facade.review_repo.find_range('rating', 4, 4)), rated_four + 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
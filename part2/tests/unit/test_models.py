@@ -197,5 +197,143 @@ class TestAmenityModel(unittest.TestCase):
             Amenity(name=long_name)
 
 
+class TestCompactLayout(unittest.TestCase):
+    """Test the __slots__ layout of the models"""
+    
+    def setUp(self):
+        self.user = User(first_name='John', last_name='Doe', email='john.doe@example.com',
+                         password='secret')
+        self.place = Place(title='Loft', description='Bright', price=80.0,
+                           latitude=10.0, longitude=20.0, owner=self.user)
+    
+    def test_no_instance_dict(self):
+        """Test model instances carry no __dict__"""
+        for obj in (self.user, self.place, Amenity(name='Wi-Fi'),
+                    Review(text='Nice', rating=4, place=self.place, user=self.user)):
+            self.assertFalse(hasattr(obj, '__dict__'), type(obj).__name__)
+    
+    def test_to_dict_fields(self):
+        """Test to_dict lists the plain fields in declaration order"""
+        self.assertEqual(list(self.user.to_dict()),
+                         ['id', 'created_at', 'updated_at', 'first_name', 'last_name',
+                          'email', 'is_admin'])
+        self.assertEqual(self.place.to_dict()['owner_id'], self.user.id)
+    
+    def test_unknown_attribute(self):
+        """Test unknown constructor arguments are ignored"""
+        amenity = Amenity(name='Wi-Fi', color='blue')
+        self.assertEqual(amenity.name, 'Wi-Fi')
+        self.assertFalse(hasattr(amenity, 'color'))
+        self.assertNotIn('color', amenity.to_dict())
+
+
+class TestFields(unittest.TestCase):
+    """Test the declarative field validation"""
+
+    def setUp(self):
+        self.user = User(first_name='John', last_name='Doe', email='john.doe@example.com')
+        self.place = Place(title='Loft', description=None, price=80,
+                           latitude=10, longitude=20, owner=self.user)
+
+    def test_fields_are_declared(self):
+        """Test each model exposes its fields, base class first"""
+        self.assertEqual(list(Place._fields),
+                         ['title', 'description', 'price', 'latitude', 'longitude', 'owner',
+                          'reviews', 'amenities'])
+        self.assertEqual(Review._fields['rating'].validate(3), 3)
+        self.assertEqual(Place._fields['price'].validate(5), 5.0)
+
+    def test_assignment_validates(self):
+        """Test updates run the same checks as the constructor"""
+        with self.assertRaises(ValueError):
+            self.place.latitude = 91
+        with self.assertRaises(ValueError):
+            self.user.is_admin = 'yes'
+        with self.assertRaises(ValueError):
+            self.place.owner = Amenity(name='Wi-Fi')
+        self.assertEqual(self.place.latitude, 10.0)
+        self.assertIsInstance(self.place.price, float)
+
+    def test_load_skips_validation(self):
+        """Test load builds an object from trusted values as given"""
+        loaded = Place.load(id='place-1', created_at=self.place.created_at,
+                            updated_at=self.place.updated_at, title='Loft', description=None,
+                            price=80.0, latitude=10.0, longitude=20.0, owner=self.user)
+        self.assertEqual(loaded.id, 'place-1')
+        self.assertEqual(loaded.get_reviews(), [])
+        self.assertEqual({key: value for key, value in loaded.to_dict().items() if key != 'id'},
+                         {key: value for key, value in self.place.to_dict().items() if key != 'id'})
+        # Nothing is checked on this path
+        self.assertEqual(Review.load(rating=9).rating, 9)
+
+
+class TestSerializationCache(unittest.TestCase):
+    """Test to_dict caching and its invalidation"""
+
+    def setUp(self):
+        self.user = User(first_name='John', last_name='Doe', email='john.doe@example.com')
+        self.place = Place(title='Loft', description='Bright', price=80.0,
+                           latitude=10.0, longitude=20.0, owner=self.user)
+        self.amenity = Amenity(name='Wi-Fi')
+        self.place.add_amenity(self.amenity)
+        self.review = Review(text='Nice', rating=4, place=self.place, user=self.user)
+        self.place.add_review(self.review)
+
+    def test_cached_until_changed(self):
+        """Test repeated calls reuse the cached dictionary"""
+        first = self.place.to_dict()
+        first['title'] = 'Changed by caller'
+        second = self.place.to_dict()
+        self.assertEqual(second['title'], 'Loft')
+        self.assertIs(second['amenities'], self.place.to_dict()['amenities'])
+        self.place.update({'price': 95.0})
+        self.assertEqual(self.place.to_dict()['price'], 95.0)
+
+    def test_relations_invalidate(self):
+        """Test changes to embedded objects show up in the place"""
+        self.user.update({'first_name': 'Jane'})
+        self.assertEqual(self.place.to_dict()['owner']['first_name'], 'Jane')
+        self.amenity.update({'name': 'Sauna'})
+        self.assertEqual(self.place.to_dict()['amenities'][0]['name'], 'Sauna')
+        self.review.update({'text': 'Lovely'})
+        self.assertEqual(self.place.to_dict()['reviews'][0]['text'], 'Lovely')
+        self.place.remove_review(self.review)
+        self.assertEqual(self.place.to_dict()['review_ids'], [])
+
+    def test_failed_update_invalidates(self):
+        """Test attributes set before a failing one are not hidden by the cache"""
+        self.user.to_dict()
+        with self.assertRaises(ValueError):
+            self.user.update({'last_name': 'Smith', 'email': 'not-an-email'})
+        self.assertEqual(self.user.to_dict()['last_name'], 'Smith')
+
+
+class TestRatings(unittest.TestCase):
+    """Test the running rating aggregates of a place"""
+
+    def setUp(self):
+        self.user = User(first_name='John', last_name='Doe', email='john.doe@example.com')
+        self.place = Place(title='Loft', description=None, price=80.0,
+                           latitude=10.0, longitude=20.0, owner=self.user)
+
+    def review(self, rating):
+        review = Review(text='Stayed here', rating=rating, place=self.place, user=self.user)
+        self.place.add_review(review)
+        return review
+
+    def test_aggregates_follow_reviews(self):
+        """Test adds, removals and rating changes update count, sum and histogram"""
+        self.assertEqual(self.place.to_dict()['ratings'],
+                         {'count': 0, 'sum': 0, 'average': None, 'histogram': [0, 0, 0, 0, 0]})
+        first, second = self.review(4), self.review(2)
+        self.place.add_review(first)
+        self.assertEqual((self.place.ratings.count, self.place.ratings.average), (2, 3.0))
+        second.update({'rating': 5})
+        self.place.rating_changed(second, 2)
+        self.place.remove_review(first)
+        self.assertEqual(self.place.to_dict()['ratings'],
+                         {'count': 1, 'sum': 5, 'average': 5.0, 'histogram': [0, 0, 0, 0, 1]})
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Unit tests for the query planner"""
+import random
+import unittest
+import sys
+sys.path.insert(0, '.')
+
+from app.models.user import User
+from app.persistence.query import Query, Equals
+from app.persistence.repository import InMemoryRepository
+from app.services.facade import HBnBFacade
+
+
+def casefold(value):
+    return value.casefold()
+
+
+class TestQueryPlan(unittest.TestCase):
+    """Test access path choice and results on a bare repository"""
+
+    def setUp(self):
+        self.repo = InMemoryRepository()
+        self.repo.create_index('last_name')
+        self.repo.create_sorted_index('created_at')
+        for i in range(60):
+            self.repo.add(User(first_name=f'User{i}', last_name='Rare' if i < 2 else 'Common',
+                               email=f'user{i}@example.com'))
+
+    def test_hash_index_beats_scan(self):
+        """Test a selective equality is read from its hash index"""
+        query = Query(self.repo, [Equals('last_name', 'Rare')])
+        self.assertEqual(sorted(user.first_name for user in query.run()), ['User0', 'User1'])
+        report = query.explain()
+        self.assertEqual(report['access'], 'hash index last_name')
+        self.assertEqual(report['estimated_rows'], 2)
+        self.assertEqual(report['rows_examined'], 2)
+        self.assertEqual(report['filter'], [])
+        self.assertIsNone(report['order'])
+        self.assertEqual(report['alternatives'][-1]['access'], 'full scan')
+
+    def test_ordered_walk_stops_at_limit(self):
+        """Test a limit on a sorted index order examines only a few rows"""
+        predicate = Equals('first_name', 'user10', normalize=casefold)
+        query = Query(self.repo, [predicate], 'created_at', 'desc', limit=3)
+        self.assertEqual([user.first_name for user in query.run()], ['User10'])
+        report = query.explain()
+        self.assertEqual(report['access'], 'sorted index created_at walk')
+        self.assertEqual(report['order'], 'index')
+        self.assertEqual(report['filter'], [str(predicate)])
+        self.assertEqual(report['rows_examined'], 60)
+
+        query = Query(self.repo, [Equals('last_name', 'Common')], 'created_at', limit=3)
+        self.assertEqual(len(query.run()), 3)
+        report = query.explain()
+        self.assertEqual(report['access'], 'sorted index created_at walk')
+        self.assertEqual(report['rows_examined'], 5)
+
+    def test_sorts_unordered_paths_and_resumes(self):
+        """Test results from an unordered path are sorted and resume after a position"""
+        query = Query(self.repo, [Equals('last_name', 'Rare')], 'first_name', 'desc')
+        first, second = query.run()
+        self.assertEqual(query.explain()['order'], 'sort')
+        resumed = Query(self.repo, [Equals('last_name', 'Rare')], 'first_name', 'desc',
+                        after=(first.first_name, first.id)).run()
+        self.assertEqual(resumed, [second])
+        with self.assertRaises(ValueError):
+            Query(self.repo, order_by='created_at', order='up')
+
+
+class TestPlaceQueries(unittest.TestCase):
+    """Test the facade plans place listings over its indexes and columns"""
+
+    def setUp(self):
+        self.facade = HBnBFacade()
+        owner = self.facade.get_all_users()[0]
+        self.wifi, self.pool = self.facade.get_all_amenities()[:2]
+        rng = random.Random(7)
+        self.places = []
+        for i in range(300):
+            place = self.facade.create_place({
+                'title': f'Place {i}', 'description': 'Test', 'price': float(rng.randint(10, 500)),
+                'latitude': rng.uniform(-30.0, -10.0), 'longitude': rng.uniform(-30.0, 30.0),
+                'owner_id': owner.id})
+            if i % 2 == 0:
+                self.facade.add_amenity_to_place(place.id, self.wifi.id)
+            if i % 50 == 0:
+                self.facade.add_amenity_to_place(place.id, self.pool.id)
+            self.places.append(place)
+
+    def brute(self, predicate, key, reverse=False):
+        return [place.id for place in sorted(
+            (place for place in self.places if predicate(place)),
+            key=lambda place: (key(place), place.id), reverse=reverse)]
+
+    def wifi_places(self):
+        return {place.id for place in self.places if self.wifi in place.amenities}
+
+    def listed(self, sort, limit, **criteria):
+        # The sample places lie north of the test places
+        criteria.setdefault('max_latitude', 0.0)
+        ids, cursor = [], None
+        while True:
+            page, cursor, _ = self.facade.list_places(sort, limit, cursor, **criteria)
+            ids.extend(place.id for place in page)
+            if cursor is None:
+                return ids
+
+    def test_plans_follow_selectivity(self):
+        """Test the cheapest path changes with what the criteria select"""
+        report = self.facade.explain_places(amenity_ids=[self.pool.id])
+        self.assertEqual(report['access'], f'amenity bitmaps {[self.pool.id]}')
+        self.assertEqual(report['rows_examined'], report['rows_returned'])
+        report = self.facade.explain_places('price', min_price=100, max_price=102)
+        self.assertEqual(report['access'], 'sorted index price [100, 102]')
+        self.assertEqual(report['order'], 'index')
+        report = self.facade.explain_places('-price', limit=5)
+        self.assertEqual(report['access'], 'sorted index price walk')
+        self.assertEqual(report['rows_examined'], 6)
+        report = self.facade.explain_places('rating', limit=5)
+        self.assertEqual(report['access'], 'rating order walk')
+        report = self.facade.explain_places('distance', near=(-20.0, 0.0, 300.0))
+        self.assertTrue(report['access'].startswith('geo index location'))
+        self.assertEqual(report['order'], 'index')
+        self.assertLess(report['rows_examined'], len(self.places))
+
+    def test_results_match_brute_force(self):
+        """Test every plan returns what checking each place would, in order, across pages"""
+        near = (-20.0, 0.0, 1500.0)
+        query = self.facade._place_query('distance', None, None, near, {})
+        distance = query.predicates[-1].distance
+        cases = [
+            ('price', {'min_price': 100, 'max_price': 300},
+             lambda place: 100 <= place.price <= 300, lambda place: place.price),
+            ('-created_at', {'amenity_ids': [self.wifi.id], 'max_price': 250},
+             lambda place: place.price <= 250 and place.id in self.wifi_places(),
+             lambda place: place.created_at),
+            ('-rating', {'min_latitude': -20.0}, lambda place: place.latitude >= -20.0,
+             lambda place: place.ratings.average or 0.0),
+            ('distance', {'near': near, 'min_price': 200},
+             lambda place: place.price >= 200 and distance(place) <= near[2], distance),
+        ]
+        for sort, criteria, predicate, key in cases:
+            with self.subTest(sort=sort):
+                expected = self.brute(predicate, key, reverse=sort.startswith('-'))
+                self.assertEqual(self.listed(sort, 7, **criteria), expected)
+
+    def test_distance_needs_near(self):
+        """Test sorting by distance without a point is refused"""
+        with self.assertRaises(ValueError):
+            self.facade.list_places('distance')
+        with self.assertRaises(ValueError):
+            self.facade.list_places(near=(0.0, 0.0, -1.0))
+        with self.assertRaises(ValueError):
+            self.facade.list_places(facets=True, near=(0.0, 0.0, 10.0))
+
+
+if __name__ == '__main__':
+    unittest.main()
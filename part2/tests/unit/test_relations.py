@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Unit tests for the relationship collections"""
+import unittest
+import sys
+sys.path.insert(0, '.')
+
+from app.models.relations import Relation
+from app.models.user import User
+from app.models.place import Place
+from app.models.review import Review
+from app.services.facade import HBnBFacade
+
+
+class TestRelation(unittest.TestCase):
+    """Test membership, views, sorted pages and their upkeep"""
+
+    def setUp(self):
+        self.user = User(first_name='Ada', last_name='Lovelace', email='ada@example.com')
+        self.place = Place(title='Loft', description=None, price=80.0,
+                           latitude=1.0, longitude=2.0, owner=self.user)
+        self.reviews = []
+        for rating in (3, 5, 1, 4, 2):
+            review = Review(text=f'Rated {rating}', rating=rating, place=self.place, user=self.user)
+            self.place.add_review(review)
+            self.reviews.append(review)
+
+    def test_set_semantics(self):
+        """Test members are unique, kept in order and removable"""
+        relation = Relation(self.reviews)
+        self.assertFalse(relation.add(self.reviews[0]))
+        self.assertTrue(relation.discard(self.reviews[1]))
+        self.assertFalse(relation.discard(self.reviews[1]))
+        self.assertNotIn(self.reviews[1], relation)
+        self.assertEqual(list(relation), [self.reviews[0]] + self.reviews[2:])
+
+    def test_view_is_live_and_read_only(self):
+        """Test get_reviews hands out a view that follows the place"""
+        view = self.place.get_reviews()
+        self.assertEqual(len(view), 5)
+        self.assertIs(view[-1], self.reviews[-1])
+        self.place.remove_review(self.reviews[0])
+        self.assertEqual(len(view), 4)
+        self.assertNotIn(self.reviews[0], view)
+        self.assertFalse(hasattr(view, 'add'))
+        # Changing the place while iterating the view is fine
+        for review in view:
+            self.place.remove_review(review)
+        self.assertEqual(view, [])
+
+    def test_pages(self):
+        """Test insertion order and sorted pages with cursors"""
+        view = self.place.get_reviews()
+        page, cursor = view.page(2)
+        self.assertEqual(page, self.reviews[:2])
+        page, cursor = view.page(2, cursor)
+        self.assertEqual(page, self.reviews[2:4])
+        by_rating, cursor = view.page(3, order_by='rating', order='desc')
+        self.assertEqual([review.rating for review in by_rating], [5, 4, 3])
+        rest, cursor = view.page(3, cursor, order_by='rating', order='desc')
+        self.assertEqual(([review.rating for review in rest], cursor), ([2, 1], None))
+        with self.assertRaises(ValueError):
+            view.page(3, view.page(1)[1], order_by='rating')
+
+    def test_sorted_orders_stay_current(self):
+        """Test adds, removals and rating changes are reflected in built orders"""
+        view = self.place.get_reviews()
+        view.sorted('rating')
+        self.reviews[1].update({'rating': 1})
+        self.place.remove_review(self.reviews[2])
+        late = Review(text='Late', rating=5, place=self.place, user=self.user)
+        self.place.add_review(late)
+        self.assertEqual([review.rating for review in view.sorted('rating')], [1, 2, 3, 4, 5])
+        self.assertIs(view.sorted('rating', order='desc')[0], late)
+        page, _ = view.page(10)
+        self.assertEqual(page[-1], late)
+
+
+class TestUserLinks(unittest.TestCase):
+    """Test the user -> places and user -> reviews indexes and cascading deletes"""
+
+    def setUp(self):
+        self.facade = HBnBFacade()
+        self.host = self.facade.create_user({'first_name': 'Hana', 'last_name': 'Host',
+                                             'email': 'hana@example.com'})
+        self.guest = self.facade.create_user({'first_name': 'Gus', 'last_name': 'Guest',
+                                              'email': 'gus@example.com'})
+        self.places = [self.facade.create_place({
+            'title': f'Host place {i}', 'description': None, 'price': 50.0 + i,
+            'latitude': 1.0, 'longitude': 1.0, 'owner_id': self.host.id}) for i in range(3)]
+        self.other = self.facade.get_all_places()[0]
+        self.guest_reviews = [self.facade.create_review({
+            'text': 'Nice', 'rating': 4, 'place_id': place.id, 'user_id': self.guest.id})
+            for place in (self.places[0], self.other)]
+        self.host_review = self.facade.create_review({
+            'text': 'Fine', 'rating': 3, 'place_id': self.other.id, 'user_id': self.host.id})
+
+    def test_user_listings(self):
+        """Test a user's places and reviews page in creation order from the indexes"""
+        first, cursor = self.facade.get_places_by_owner_page(self.host.id, limit=2)
+        rest, end = self.facade.get_places_by_owner_page(self.host.id, limit=2, cursor=cursor)
+        self.assertEqual(first + rest, self.places)
+        self.assertIsNone(end)
+        self.assertEqual(self.facade.get_reviews_by_user_page(self.guest.id),
+                         (self.guest_reviews, None))
+        self.assertIsNone(self.facade.get_reviews_by_user_page('missing-user'))
+        self.facade.update_place(self.places[1].id, {'title': 'Renamed'})
+        self.assertEqual(len(self.facade.get_places_by_owner_page(self.host.id)[0]), 3)
+
+    def test_user_review_for_place(self):
+        """Test the (user, place) lookup follows creates and deletes"""
+        self.assertIs(self.facade.get_user_review_for_place(self.guest.id, self.places[0].id),
+                      self.guest_reviews[0])
+        self.assertIs(self.facade.get_user_review_for_place(self.host, self.other),
+                      self.host_review)
+        self.assertIsNone(self.facade.get_user_review_for_place(self.host.id, self.places[0].id))
+        self.facade.delete_review(self.guest_reviews[0].id)
+        self.assertIsNone(self.facade.get_user_review_for_place(self.guest.id, self.places[0].id))
+
+    def test_delete_user_cascades(self):
+        """Test deleting a user removes their places, those places' reviews and their reviews"""
+        reviewed = self.facade.get_place(self.other.id).ratings.count
+        self.facade.delete_user(self.host.id)
+        self.assertIsNone(self.facade.get_user(self.host.id))
+        for place in self.places:
+            self.assertIsNone(self.facade.get_place(place.id))
+        self.assertIsNone(self.facade.get_review(self.guest_reviews[0].id))
+        self.assertIsNone(self.facade.get_review(self.host_review.id))
+        self.assertIs(self.facade.get_review(self.guest_reviews[1].id), self.guest_reviews[1])
+        self.assertEqual(self.other.ratings.count, reviewed - 1)
+        self.assertNotIn(self.host_review, self.other.get_reviews())
+        self.assertEqual(self.facade.get_reviews_by_user_page(self.guest.id),
+                         ([self.guest_reviews[1]], None))
+        self.assertEqual(self.facade.place_repo.find_by_attribute('owner', self.host.id), [])
+        self.assertEqual(self.facade.delete_users([self.guest.id, self.host.id]), [True, False])
+        self.assertEqual(self.facade.review_repo.find_by_attribute('user', self.guest.id), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""Unit tests for the in-memory repository"""
+import base64
+import json
+import unittest
+import sys
+sys.path.insert(0, '.')
+
+from unittest import mock
+
+from app.models.user import User
+from app.models.place import Place
+from app.models.amenity import Amenity
+from app.persistence.repository import InMemoryRepository
+from app.persistence import indexes
+from app.persistence.indexes import casefold, object_id
+
+
+class TestHashIndexes(unittest.TestCase):
+    """Test hash-backed secondary indexes"""
+
+    def setUp(self):
+        """Create a user repository with a unique email index"""
+        self.repo = InMemoryRepository()
+        self.repo.create_index('email', unique=True, normalize=casefold)
+        self.user = User(first_name='John', last_name='Doe', email='John.Doe@example.com')
+        self.repo.add(self.user)
+
+    def test_lookup_is_case_insensitive(self):
+        """Test lookup through a case-normalized index"""
+        self.assertIs(self.repo.get_by_attribute('email', 'john.doe@EXAMPLE.com'), self.user)
+        self.assertIsNone(self.repo.get_by_attribute('email', 'missing@example.com'))
+
+    def test_unique_violation(self):
+        """Test adding a duplicate value to a unique index"""
+        duplicate = User(first_name='Jane', last_name='Doe', email='john.doe@example.com')
+        with self.assertRaises(ValueError):
+            self.repo.add(duplicate)
+        self.assertIsNone(self.repo.get(duplicate.id))
+
+    def test_update_moves_index_entry(self):
+        """Test that update keeps the index in sync"""
+        self.repo.update(self.user.id, {'email': 'new@example.com'})
+        self.assertIsNone(self.repo.get_by_attribute('email', 'john.doe@example.com'))
+        self.assertIs(self.repo.get_by_attribute('email', 'new@example.com'), self.user)
+
+    def test_update_rejects_duplicate(self):
+        """Test that update refuses to steal another object's unique value"""
+        other = User(first_name='Jane', last_name='Doe', email='jane@example.com')
+        self.repo.add(other)
+        with self.assertRaises(ValueError):
+            self.repo.update(other.id, {'email': 'JOHN.DOE@example.com'})
+        self.assertEqual(other.email, 'jane@example.com')
+
+    def test_delete_removes_index_entry(self):
+        """Test that delete drops the index entry"""
+        self.repo.delete(self.user.id)
+        self.assertIsNone(self.repo.get_by_attribute('email', 'john.doe@example.com'))
+
+    def test_save_after_in_place_change(self):
+        """Test saving an object changed outside the repository"""
+        self.user.email = 'changed@example.com'
+        self.repo.save(self.user)
+        self.assertIs(self.repo.get_by_attribute('email', 'changed@example.com'), self.user)
+        self.assertIsNone(self.repo.get_by_attribute('email', 'john.doe@example.com'))
+
+    def test_non_unique_index(self):
+        """Test a non-unique index returns every match"""
+        repo = InMemoryRepository()
+        repo.create_index('name', normalize=casefold)
+        first = Amenity(name='Pool')
+        second = Amenity(name='pool')
+        repo.add(first)
+        repo.add(second)
+        self.assertEqual(repo.find_by_attribute('name', 'POOL'), [first, second])
+        repo.delete(first.id)
+        self.assertEqual(repo.find_by_attribute('name', 'pool'), [second])
+
+    def test_composite_index(self):
+        """Test a unique index over a tuple of attributes, keyed by referenced ids"""
+        repo = InMemoryRepository()
+        repo.create_index(('title', 'owner'), unique=True, normalize=object_id)
+        first, second = [Place(title=title, description=None, price=80.0, latitude=1.0,
+                               longitude=2.0, owner=self.user) for title in ('Loft', 'Barn')]
+        repo.add(first)
+        repo.add(second)
+        self.assertIs(repo.get_by_attribute(('title', 'owner'), ('Loft', self.user.id)), first)
+        self.assertIs(repo.get_by_attribute(('title', 'owner'), ('Loft', self.user)), first)
+        self.assertIsNone(repo.get_by_attribute(('title', 'owner'), ('Loft', 'nobody')))
+        with self.assertRaises(ValueError):
+            repo.update(second.id, {'title': 'Loft'})
+        self.assertEqual(second.title, 'Barn')
+        repo.delete(first.id)
+        repo.update(second.id, {'title': 'Loft'})
+        self.assertIs(repo.get_by_attribute(('title', 'owner'), ('Loft', self.user)), second)
+
+
+class TestSortedIndexes(unittest.TestCase):
+    """Test ordered indexes and range queries"""
+
+    def setUp(self):
+        """Create a place repository with a price index"""
+        self.owner = User(first_name='Owner', last_name='Test', email='owner@test.com')
+        self.repo = InMemoryRepository()
+        self.repo.create_sorted_index('price')
+        self.places = []
+        for price in [300, 100, 200, 100, 50]:
+            place = Place(title=f'Place {price}', description='Test', price=price,
+                          latitude=0, longitude=0, owner=self.owner)
+            self.repo.add(place)
+            self.places.append(place)
+
+    def prices(self, places):
+        return [place.price for place in places]
+
+    def test_range_query(self):
+        """Test bounded range queries are inclusive and ordered"""
+        self.assertEqual(self.prices(self.repo.find_range('price', 100, 200)), [100, 100, 200])
+        self.assertEqual(self.prices(self.repo.find_range('price', hi=100, limit=2)), [50, 100])
+        self.assertEqual(self.prices(self.repo.find_range('price', lo=150)), [200, 300])
+
+    def test_descending_with_limit(self):
+        """Test descending order keeps the highest keys"""
+        self.assertEqual(self.prices(self.repo.find_range('price', hi=200, limit=2, order='desc')), [200, 100])
+
+    def test_update_and_delete_keep_order(self):
+        """Test that updates and deletes are reflected in the index"""
+        self.repo.update(self.places[0].id, {'price': 10})
+        self.repo.delete(self.places[4].id)
+        self.assertEqual(self.prices(self.repo.find_range('price')), [10, 100, 100, 200])
+
+    def test_unindexed_attribute_falls_back_to_scan(self):
+        """Test range queries on attributes without a sorted index"""
+        found = self.repo.find_range('title', 'Place 100', 'Place 200')
+        self.assertEqual(self.prices(found), [100, 100, 200])
+
+    def test_find_among_walks_or_sorts(self):
+        """Test ordering a subset agrees whether the index is walked or the subset sorted"""
+        subset = {place.id for place in self.places[:4]}
+        low, high = sorted([self.places[1].id, self.places[3].id])
+        for share in (1, 100):
+            with mock.patch.object(indexes, 'WALK_SHARE', share):
+                # title has no sorted index and orders like price here
+                for attr_name in ('price', 'title'):
+                    found = self.repo.find_among(attr_name, subset, order='desc')
+                    self.assertEqual(self.prices(place for _, place in found), [300, 200, 100, 100])
+                found = self.repo.find_among('price', subset, limit=2, after=(100, low))
+                self.assertEqual([(price, place.id) for price, place in found],
+                                 [(100, high), (200, self.places[2].id)])
+                self.assertEqual(self.repo.find_among('price', set()), [])
+
+
+class TestPagination(unittest.TestCase):
+    """Test keyset pagination over sorted indexes"""
+
+    def setUp(self):
+        """Create a place repository with a price index"""
+        self.owner = User(first_name='Owner', last_name='Test', email='owner@test.com')
+        self.repo = InMemoryRepository()
+        self.repo.create_sorted_index('price')
+        self.places = []
+        for price in [300, 100, 200, 100, 50, 250, 100]:
+            place = Place(title=f'Place {price}', description='Test', price=price,
+                          latitude=0, longitude=0, owner=self.owner)
+            self.repo.add(place)
+            self.places.append(place)
+
+    def collect(self, fetch, limit):
+        """Follow cursors until the last page, returning the pages"""
+        pages, cursor = [], None
+        while True:
+            page, cursor = fetch(limit, cursor)
+            pages.append(page)
+            if cursor is None:
+                return pages
+
+    def test_pages_cover_everything_in_creation_order(self):
+        """Test get_page walks every object once, oldest first"""
+        pages = self.collect(self.repo.get_page, 3)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([place for page in pages for place in page], self.places)
+
+    def test_exact_multiple_has_no_empty_page(self):
+        """Test the last full page carries no cursor"""
+        pages = self.collect(self.repo.get_page, 7)
+        self.assertEqual([len(page) for page in pages], [7])
+
+    def test_pages_with_duplicate_keys(self):
+        """Test ties on the sort key are broken by id without gaps"""
+        fetch = lambda limit, cursor: self.repo.find_page('price', hi=250, limit=limit,
+                                                          cursor=cursor, order='desc')
+        pages = self.collect(fetch, 2)
+        found = [place for page in pages for place in page]
+        self.assertEqual(found, self.repo.find_range('price', hi=250, order='desc'))
+        self.assertEqual(len(set(place.id for place in found)), 6)
+
+    def test_page_survives_deleting_the_last_item(self):
+        """Test a cursor stays valid after the object it points at is deleted"""
+        page, cursor = self.repo.get_page(2)
+        self.repo.delete(page[-1].id)
+        rest, _ = self.repo.get_page(10, cursor)
+        self.assertEqual(rest, self.places[2:])
+
+    def test_invalid_cursor(self):
+        """Test garbage and cursors from another ordering are rejected"""
+        _, price_cursor = self.repo.find_page('price', limit=1)
+        for cursor in ('not-a-cursor', price_cursor):
+            with self.assertRaises(ValueError):
+                self.repo.get_page(2, cursor)
+
+    def test_cursor_with_wrong_key_type(self):
+        """Test cursors whose key does not fit the ordering are rejected"""
+        tampered = {
+            'created_at': ['abc', [1], 5, None, {'dt': 7}, {'dt': 'soon'},
+                           {'dt': '2025-01-01T00:00:00+00:00'}],
+            'price': ['abc', [1, 2], None, True, float('nan'), float('inf'),
+                      {'dt': '2025-01-01T00:00:00'}]
+        }
+        for attr_name, keys in tampered.items():
+            for key in keys:
+                raw = json.dumps([attr_name, key, 'x']).encode('utf-8')
+                cursor = base64.urlsafe_b64encode(raw).decode('ascii')
+                with self.subTest(attr_name=attr_name, key=key):
+                    with self.assertRaises(ValueError):
+                        self.repo.find_page(attr_name, limit=2, cursor=cursor)
+
+
+class TestBulkOperations(unittest.TestCase):
+    """Test add_many, update_many and delete_many"""
+
+    def setUp(self):
+        """Create a user repository with a unique email index"""
+        self.repo = InMemoryRepository()
+        self.repo.create_index('email', unique=True, normalize=casefold)
+        self.users = [User(first_name='User', last_name=str(i), email=f'user{i}@example.com')
+                      for i in range(3)]
+
+    def test_add_many_reports_per_object(self):
+        """Test duplicates inside the batch are rejected and the rest stored"""
+        duplicate = User(first_name='Dup', last_name='User', email='USER0@example.com')
+        results = self.repo.add_many(self.users[:1] + [duplicate] + self.users[1:])
+        self.assertIs(results[0], self.users[0])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2:], self.users[1:])
+        self.assertEqual(self.repo.get_all(), self.users)
+        self.assertIsNone(self.repo.get(duplicate.id))
+
+    def test_update_many(self):
+        """Test updates keep indexes in sync and report missing ids"""
+        self.repo.add_many(self.users)
+        results = self.repo.update_many([
+            (self.users[0].id, {'email': 'first@example.com'}),
+            ('missing', {'email': 'x@example.com'}),
+            (self.users[1].id, {'email': 'first@example.com'}),
+        ])
+        self.assertIs(results[0], self.users[0])
+        self.assertIsNone(results[1])
+        self.assertIsInstance(results[2], ValueError)
+        self.assertIs(self.repo.get_by_attribute('email', 'first@example.com'), self.users[0])
+        self.assertIs(self.repo.get_by_attribute('email', 'user1@example.com'), self.users[1])
+
+    def test_count_tracks_changes(self):
+        """Test count follows adds and deletes"""
+        self.assertEqual(self.repo.count(), 0)
+        self.repo.add_many(self.users)
+        self.repo.delete(self.users[0].id)
+        self.assertEqual(self.repo.count(), 2)
+
+    def test_delete_many(self):
+        """Test deletes report which ids existed"""
+        self.repo.add_many(self.users)
+        self.assertEqual(self.repo.delete_many([self.users[0].id, 'missing']), [True, False])
+        self.assertEqual(self.repo.get_all(), self.users[1:])
+        self.assertIsNone(self.repo.get_by_attribute('email', 'user0@example.com'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Unit tests for full-text place search"""
+import unittest
+import sys
+sys.path.insert(0, '.')
+
+from collections import Counter
+from unittest import mock
+
+from app.persistence import search
+from app.persistence.search import TextIndex, tokenize
+from app.services.facade import HBnBFacade
+
+
+class TestTextIndex(unittest.TestCase):
+    """Test tokenizing, matching and BM25 ranking"""
+
+    def setUp(self):
+        self.index = TextIndex()
+        docs = {
+            'a': 'quiet beach house with a beach view',
+            'b': 'city loft near the beach',
+            'c': 'mountain cabin, quiet and remote',
+            'd': 'beachfront villa',
+        }
+        for doc_id, text in docs.items():
+            self.index.add(doc_id, Counter(tokenize(text)))
+
+    def ids(self, query, **kwargs):
+        return [doc_id for _, doc_id in self.index.search(query, **kwargs)]
+
+    def test_tokenize(self):
+        """Test words are lowercased and lose their accents"""
+        self.assertEqual(tokenize('Café au LAIT, s\'il-vous-plaît!'),
+                         ['cafe', 'au', 'lait', 's', 'il', 'vous', 'plait'])
+        self.assertEqual(tokenize(None), [])
+
+    def test_every_word_must_match(self):
+        """Test results hold all query words, more frequent terms ranking higher"""
+        self.assertEqual(self.ids('beach '), ['a', 'b'])
+        self.assertEqual(self.ids('quiet beach '), ['a'])
+        self.assertEqual(self.ids('quiet lake'), [])
+        self.assertEqual(self.ids('   '), [])
+
+    def test_prefix_on_last_word(self):
+        """Test the last word also matches longer words unless followed by a space"""
+        self.assertEqual(sorted(self.ids('beach')), ['a', 'b', 'd'])
+        self.assertEqual(self.ids('qui'), ['c', 'a'])
+        self.assertEqual(self.ids('qui '), [])
+        self.assertEqual(self.ids('beach b'), ['a', 'b'])
+        self.assertEqual(self.ids('beach', prefix=False), ['a', 'b'])
+
+    def test_common_words_are_skipped(self):
+        """Test words in most documents of a large enough index are left out"""
+        self.index.add('e', Counter(tokenize('beach shack')))
+        self.assertEqual(len(self.ids('beach ')), 3)
+        with mock.patch.object(search, 'STOPWORD_MIN_DOCS', 5):
+            self.assertEqual(self.ids('beach shack '), ['e'])
+            self.assertEqual(self.ids('beach '), [])
+            self.assertEqual(self.ids('quiet '), ['c', 'a'])
+
+    def test_paging_and_removal(self):
+        """Test after resumes past a result and removed terms stop matching"""
+        first = self.index.search('beach', limit=1)
+        rest = self.index.search('beach', after=first[0])
+        self.assertEqual([doc_id for _, doc_id in first + rest], self.ids('beach'))
+        self.index.remove('d', Counter(tokenize('beachfront villa')))
+        self.index.drop('d')
+        self.assertEqual(self.ids('beachf'), [])
+        self.assertEqual(len(self.index), 3)
+
+
+class TestPlaceSearch(unittest.TestCase):
+    """Test the facade keeps the search index in step with places and reviews"""
+
+    def setUp(self):
+        self.facade = HBnBFacade()
+        self.owner, self.reviewer = self.facade.get_all_users()[:2]
+        self.loft = self.facade.create_place({
+            'title': 'Sunny zanzibarian loft', 'description': 'Close to the harbour',
+            'price': 90.0, 'latitude': 0.0, 'longitude': 0.0, 'owner_id': self.owner.id})
+        self.cabin = self.facade.create_place({
+            'title': 'Cabin', 'description': 'A zanzibarian retreat', 'price': 60.0,
+            'latitude': 0.0, 'longitude': 0.0, 'owner_id': self.owner.id})
+
+    def titles(self, query):
+        return [place.title for place in self.facade.search_places(query)[0]]
+
+    def test_title_outranks_description(self):
+        """Test a title match ranks above the same word in a description"""
+        self.assertEqual(self.titles('zanzibarian'), ['Sunny zanzibarian loft', 'Cabin'])
+
+    def test_changes_are_indexed(self):
+        """Test place updates, reviews and deletes reach the index"""
+        self.facade.search_places('build the index first')
+        review = self.facade.create_review({'text': 'Wonderful xylophonist neighbours',
+                                            'rating': 5, 'place_id': self.cabin.id,
+                                            'user_id': self.reviewer.id})
+        self.assertEqual(self.titles('xylophonist'), ['Cabin'])
+        self.facade.update_review(review.id, {'text': 'Clamorous neighbours'})
+        self.assertEqual(self.titles('xylophonist'), [])
+        self.facade.update_place(self.cabin.id, {'title': 'Xylophonist cabin'})
+        self.assertEqual(self.titles('xylo'), ['Xylophonist cabin'])
+        self.facade.delete_review(review.id)
+        self.assertEqual(self.titles('clamorous'), [])
+        self.facade.delete_place(self.loft.id)
+        self.assertEqual(self.titles('zanzibarian'), ['Xylophonist cabin'])
+
+    def test_paging(self):
+        """Test score cursors walk the results in order"""
+        first, cursor = self.facade.search_places('zanzibarian', limit=1)
+        second, end = self.facade.search_places('zanzibarian', limit=1, cursor=cursor)
+        self.assertEqual(first + second, [self.loft, self.cabin])
+        self.assertIsNone(end)
+
+
+if __name__ == '__main__':
+    unittest.main()
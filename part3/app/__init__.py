@@ -18,7 +18,17 @@ def create_app(config_name='development'):
         from app.models.place import Place
         from app.models.review import Review
         from app.models.amenity import Amenity
-        
+        from app.persistence.cache import NullCache
+        from app.persistence.migrations import upgrade_schema
+        from app.persistence.search import install_search
+        from app.services.facade import HBnBFacade
+
         db.create_all()
+        added = upgrade_schema(db.session, db.metadata)
+        if 'places' in added:
+            # New rating aggregate columns start at 0; count the reviews
+            # already there
+            HBnBFacade(cache=NullCache()).rebuild_rating_aggregates()
+        install_search(db.session)
         
     return app
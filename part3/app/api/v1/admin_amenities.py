@@ -33,11 +33,8 @@ class AdminAmenityModify(Resource):
         if not current_user.get('is_admin'):
             return {'error': 'Admin privileges required'}, 403
 
-        amenity = facade.get_amenity(amenity_id)
+        data = request.json
+        amenity = facade.update_amenity(amenity_id, data)
         if not amenity:
             return {'error': 'Amenity not found'}, 404
-
-        data = request.json
-        amenity.update(data)
-        facade.save_amenity(amenity)
         return amenity.to_dict(), 200
@@ -48,10 +48,7 @@ class AdminUserModify(Resource):
             if existing_user and existing_user.id != user_id:
                 return {'error': 'Email is already in use'}, 400
 
-        user = facade.get_user(user_id)
+        user = facade.update_user(user_id, data)
         if not user:
             return {'error': 'User not found'}, 404
-
-        user.update(data)
-        facade.save_user(user)
         return user.to_dict(), 200
@@ -0,0 +1,49 @@
+from flask import request
+from flask_restx import Namespace, Resource
+from flask_jwt_extended import jwt_required, get_jwt
+from app.services import facade
+
+api = Namespace('autocomplete', description='Type-ahead suggestions')
+
+DEFAULT_COMPLETIONS = 10
+MAX_COMPLETIONS = 20
+
+def completion_count():
+    k = request.args.get('k', DEFAULT_COMPLETIONS, type=int)
+    if k < 1:
+        return None
+    return min(k, MAX_COMPLETIONS)
+
+@api.route('/places')
+class PlaceAutocomplete(Resource):
+    def get(self):
+        """Places with title words starting like q, most reviewed first"""
+        typed = request.args.get('q', '')
+        k = completion_count()
+        if not typed.strip():
+            return {'error': 'q must not be empty'}, 400
+        if k is None:
+            return {'error': 'k must be a positive integer'}, 400
+
+        return [{'id': place.id, 'label': place.title, 'popularity': place.review_count}
+                for place in facade.autocomplete_places(typed, k)], 200
+
+@api.route('/users')
+class UserAutocomplete(Resource):
+    @jwt_required()
+    def get(self):
+        """Users whose first name, last name or email starts with q (admin only)"""
+        current_user = get_jwt()
+        if not current_user.get('is_admin'):
+            return {'error': 'Admin privileges required'}, 403
+
+        typed = request.args.get('q', '')
+        k = completion_count()
+        if not typed.strip():
+            return {'error': 'q must not be empty'}, 400
+        if k is None:
+            return {'error': 'k must be a positive integer'}, 400
+
+        return [{'id': user.id, 'label': f'{user.first_name} {user.last_name} <{user.email}>',
+                 'popularity': 0}
+                for user in facade.autocomplete_users(typed, k)], 200
@@ -5,8 +5,50 @@ from app.services import facade
 
 api = Namespace('places', description='Place operations')
 
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 1000
+
 @api.route('/')
 class PlaceList(Resource):
+    def get(self):
+        """List places a page at a time, oldest first unless sorted
+
+        Filters: min_price, max_price, min_rating and amenities (comma-
+        separated ids). sort is price, rating or created_at, '-' first for
+        descending order. facets=true replies {places, facets}, facets
+        counting every match per amenity and price bucket.
+        """
+        limit = request.args.get('limit', 20, type=int)
+        cursor = request.args.get('cursor')
+        if limit < 1:
+            return {'error': 'limit must be a positive integer'}, 400
+        criteria = {
+            'min_price': request.args.get('min_price', type=float),
+            'max_price': request.args.get('max_price', type=float),
+            'min_rating': request.args.get('min_rating', type=float),
+            'amenity_ids': [amenity_id.strip() for amenity_id in
+                            request.args.get('amenities', '').split(',') if amenity_id.strip()]
+        }
+        sort = request.args.get('sort', 'created_at')
+        facets = request.args.get('facets', '').lower() in ('1', 'true', 'yes')
+
+        filtered = any(value not in (None, []) for value in criteria.values())
+        counts = None
+
+        try:
+            if filtered or facets or sort != 'created_at':
+                places, next_cursor, counts = facade.list_places(
+                    sort, min(limit, MAX_PAGE_SIZE), cursor, facets, **criteria)
+            else:
+                places, next_cursor = facade.get_places_page(min(limit, MAX_PAGE_SIZE), cursor)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+        items = [place.to_dict() for place in places]
+        if counts is not None:
+            return {'places': items, 'facets': counts}, 200, headers
+        return items, 200, headers
+
     @jwt_required()
     def post(self):
         """Create a new place for the logged-in user"""
@@ -19,8 +61,87 @@ class PlaceList(Resource):
         place = facade.create_place(data)
         return place.to_dict(), 201
 
+@api.route('/search')
+class PlaceSearch(Resource):
+    def get(self):
+        """Places matching every word of q, best match first"""
+        query = request.args.get('q', '')
+        limit = request.args.get('limit', 20, type=int)
+        cursor = request.args.get('cursor')
+        if limit < 1:
+            return {'error': 'limit must be a positive integer'}, 400
+
+        try:
+            places, next_cursor = facade.search_places(query, min(limit, MAX_PAGE_SIZE), cursor)
+        except ValueError as e:
+            return {'error': str(e)}, 400
+        headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+        return [place.to_dict() for place in places], 200, headers
+
+@api.route('/batch')
+class PlaceBatch(Resource):
+    @jwt_required()
+    def post(self):
+        """Create, update and delete several places in one transaction
+
+        Body: {"create": [...], "update": [{"id": ..., ...}], "delete": [ids]}.
+        Each item gets its own status; items the caller may not touch are
+        reported as 403 or 404 and left out, and the rest are written
+        together.
+        """
+        current_user = get_jwt()
+        is_admin = current_user.get('is_admin', False)
+        user_id = current_user.get('id')
+
+        data = request.json
+        if not isinstance(data, dict) or set(data) - {'create', 'update', 'delete'}:
+            return {'error': 'Batch must hold create, update and/or delete lists'}, 400
+        creates = data.get('create', [])
+        updates = data.get('update', [])
+        deletes = data.get('delete', [])
+        if len(creates) + len(updates) + len(deletes) > MAX_BATCH_SIZE:
+            return {'error': f'A batch holds at most {MAX_BATCH_SIZE} operations'}, 400
+
+        existing = facade.place_repo.get_many([item.get('id') for item in updates] + deletes)
+
+        def check(place_id):
+            place = existing.get(place_id)
+            if not place:
+                return {'id': place_id, 'status': 404, 'error': 'Place not found'}
+            if not is_admin and place.user_id != user_id:
+                return {'id': place_id, 'status': 403, 'error': 'Unauthorized action'}
+            return None
+
+        update_results = [check(item.get('id')) for item in updates]
+        delete_results = [check(place_id) for place_id in deletes]
+        allowed_updates = [(item['id'], {key: value for key, value in item.items() if key != 'id'})
+                           for item, result in zip(updates, update_results) if result is None]
+        allowed_deletes = [place_id for place_id, result in zip(deletes, delete_results)
+                           if result is None]
+        try:
+            created, updated, _ = facade.apply_place_batch(
+                [dict(item, owner_id=user_id) for item in creates], allowed_updates, allowed_deletes)
+        except (ValueError, TypeError) as e:
+            return {'error': str(e)}, 400
+        updated = iter(updated)
+
+        return {
+            'create': [{'status': 201, 'data': place.to_dict()} for place in created],
+            'update': [result or {'status': 200, 'data': next(updated).to_dict()}
+                       for result in update_results],
+            'delete': [result or {'id': place_id, 'status': 200}
+                       for place_id, result in zip(deletes, delete_results)]
+        }, 200
+
 @api.route('/<place_id>')
 class PlaceResource(Resource):
+    def get(self, place_id):
+        """Get place details, with its rating aggregates"""
+        place = facade.get_place_snapshot(place_id)
+        if not place:
+            return {'error': 'Place not found'}, 404
+        return place.to_dict(), 200
+
     @jwt_required()
     def put(self, place_id):
         """Update a place, only owner or admin"""
@@ -28,7 +149,7 @@ class PlaceResource(Resource):
         is_admin = current_user.get('is_admin', False)
         user_id = current_user.get('id')
 
-        place = facade.get_place(place_id)
+        place = facade.get_place_snapshot(place_id)
         if not place:
             return {'error': 'Place not found'}, 404
 
@@ -47,7 +168,7 @@ class PlaceResource(Resource):
         is_admin = current_user.get('is_admin', False)
         user_id = current_user.get('id')
 
-        place = facade.get_place(place_id)
+        place = facade.get_place_snapshot(place_id)
         if not place:
             return {'error': 'Place not found'}, 404
 
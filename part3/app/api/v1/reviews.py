@@ -14,7 +14,7 @@ class ReviewList(Resource):
         user_id = current_user.get('id')
 
         data = request.json
-        place = facade.get_place(data.get('place_id'))
+        place = facade.get_place_snapshot(data.get('place_id'))
         if not place:
             return {'error': 'Place not found'}, 404
 
@@ -26,7 +26,10 @@ class ReviewList(Resource):
             return {'error': 'You have already reviewed this place'}, 400
 
         data['user_id'] = user_id
-        review = facade.create_review(data)
+        try:
+            review = facade.create_review(data)
+        except ValueError as e:
+            return {'error': str(e)}, 400
         return review.to_dict(), 201
 
 @api.route('/<review_id>')
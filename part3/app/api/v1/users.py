@@ -23,10 +23,7 @@ class UserResource(Resource):
         if 'email' in data or 'password' in data:
             return {'error': 'You cannot modify email or password'}, 400
 
-        user = facade.get_user(user_id)
+        user = facade.update_user(user_id, data)
         if not user:
             return {'error': 'User not found'}, 404
-
-        user.update(data)
-        facade.save_user(user)
         return user.to_dict(), 200
@@ -1,10 +1,13 @@
 from app import db
-import uuid
 from datetime import datetime
 
+from app.models.ids import new_id
+
 class BaseModel(db.Model):
     __abstract__ = True  # SQLAlchemy won't create a table for this
 
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Canonical UUID strings: random by default, time-ordered with
+    # HBNB_ID_SCHEME=uuid7 (see app.models.ids)
+    id = db.Column(db.String(36), primary_key=True, default=new_id)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,10 +1,13 @@
 from app import db
 from app.models.base_model import BaseModel
+from app.persistence.listing import RATING_AVERAGE
 
 # Association table for Many-to-Many relationship between Place and Amenity
 place_amenity = db.Table('place_amenity',
     db.Column('place_id', db.String(36), db.ForeignKey('places.id'), primary_key=True),
-    db.Column('amenity_id', db.String(36), db.ForeignKey('amenities.id'), primary_key=True)
+    db.Column('amenity_id', db.String(36), db.ForeignKey('amenities.id'), primary_key=True),
+    # Places having an amenity, for amenity filters
+    db.Index('ix_place_amenity_amenity_id', 'amenity_id', 'place_id')
 )
 
 class Place(BaseModel, db.Model):
@@ -19,11 +22,47 @@ class Place(BaseModel, db.Model):
     # Foreign Key (Link to User)
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
 
+    # Rating aggregates, kept in step with the reviews by the facade so
+    # listings never scan the reviews table
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0)
+    rating_2 = db.Column(db.Integer, nullable=False, default=0)
+    rating_3 = db.Column(db.Integer, nullable=False, default=0)
+    rating_4 = db.Column(db.Integer, nullable=False, default=0)
+    rating_5 = db.Column(db.Integer, nullable=False, default=0)
+
     # Relationships
-    reviews = db.relationship('Review', backref='place', lazy=True)
+    # A place's reviews go with it; its amenity links are removed by the
+    # secondary relationship below
+    reviews = db.relationship('Review', backref='place', lazy=True,
+                              cascade='all, delete-orphan')
     amenities = db.relationship('Amenity', secondary=place_amenity, lazy='subquery',
                                 backref=db.backref('places', lazy=True))
 
+    # Orders of sorted listings, see app/persistence/listing.py
+    __table_args__ = (
+        db.Index('ix_places_price', price, 'id'),
+        db.Index('ix_places_rating', db.text(RATING_AVERAGE), 'id'),
+    )
+
+    @property
+    def owner_id(self):
+        """Id of the owning user, under the name the API uses"""
+        return self.user_id
+
+    def ratings(self):
+        """Review count, rating sum, average and 1-5 histogram"""
+        count = self.review_count or 0
+        total = self.rating_sum or 0
+        return {
+            'count': count,
+            'sum': total,
+            'average': total / count if count else None,
+            'histogram': [self.rating_1 or 0, self.rating_2 or 0, self.rating_3 or 0,
+                          self.rating_4 or 0, self.rating_5 or 0]
+        }
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -34,6 +73,7 @@ class Place(BaseModel, db.Model):
             'longitude': self.longitude,
             'owner_id': self.user_id,
             'amenities': [amenity.to_dict() for amenity in self.amenities],
+            'ratings': self.ratings(),
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -11,6 +11,11 @@ class Review(BaseModel, db.Model):
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
     place_id = db.Column(db.String(36), db.ForeignKey('places.id'), nullable=False)
 
+    # One review per user and place, see schema.sql
+    __table_args__ = (
+        db.Index('uq_reviews_user_place', user_id, place_id, unique=True),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
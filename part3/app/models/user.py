@@ -14,6 +14,13 @@ class User(BaseModel, db.Model):
     places = db.relationship('Place', backref='owner', lazy=True)
     reviews = db.relationship('Review', backref='author', lazy=True)
 
+    # Case-insensitive prefix lookups (autocomplete) seek these
+    __table_args__ = (
+        db.Index('ix_users_first_name_lower', db.func.lower(first_name)),
+        db.Index('ix_users_last_name_lower', db.func.lower(last_name)),
+        db.Index('ix_users_email_lower', db.func.lower(email)),
+    )
+
     def hash_password(self, password):
         from flask_bcrypt import generate_password_hash
         self.password = generate_password_hash(password).decode('utf8')
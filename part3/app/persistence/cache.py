@@ -0,0 +1,189 @@
+"""Read-through entity cache for the facade
+
+The facade's get_user_snapshot, get_place_snapshot and get_amenity_snapshot
+hand out Snapshots: read-only copies of a row's columns and of its
+to_dict(), taken once and detached from any session. Snapshots hold no
+lazy relationships and cannot be changed, nested values included, so one
+can be shared by every thread and request that asks for the same row.
+get_user, get_place and get_amenity still return model objects and skip
+the cache.
+
+EntityCache keeps them keyed by (model name, id), at most max_size of
+them, dropping the least recently used first, and each for at most ttl
+seconds. The facade invalidates an entry after every write to its row
+commits. A read that loaded a row from the database before such a write
+must not put its now stale copy back: put() is given the stamp() taken
+before the load and skips the entry if anything was invalidated since.
+
+Pass NullCache() to the facade to turn caching off.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_MAX_SIZE = 1024
+DEFAULT_TTL = 30.0
+
+
+class FrozenDict(dict):
+    """dict that refuses changes; JSON encoders still see a plain dict"""
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError("Snapshot data is read-only")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+
+def freeze(value):
+    """Return value with its dicts made FrozenDicts and its lists tuples"""
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+class Snapshot:
+    """Immutable, detached copy of a model object
+
+    Attributes read the row's columns, then the keys of its to_dict() (such
+    as a place's owner_id, amenities and ratings). to_dict() returns a new
+    top-level dict each time, so callers can add keys, but shares the
+    frozen nested values instead of copying them.
+    """
+
+    __slots__ = ('_kind', '_values', '_dict')
+
+    def __init__(self, obj):
+        values = {column.key: getattr(obj, column.key) for column in obj.__table__.columns}
+        object.__setattr__(self, '_kind', type(obj).__name__)
+        object.__setattr__(self, '_values', values)
+        object.__setattr__(self, '_dict', freeze(obj.to_dict()))
+
+    def __getattr__(self, name):
+        for source in (self._values, self._dict):
+            if name in source:
+                return source[name]
+        raise AttributeError(f"{self._kind} snapshot has no attribute '{name}'")
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{self._kind} snapshots are read-only")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{self._kind} snapshots are read-only")
+
+    def to_dict(self):
+        return dict(self._dict)
+
+    def __repr__(self):
+        return f"<{self._kind} snapshot {self._values.get('id')}>"
+
+
+class EntityCache:
+    """Size-bounded LRU of snapshots with a time to live, safe to share between threads
+
+    Args:
+        max_size (int): Most entries kept
+        ttl (float): Seconds an entry stays valid after it is put
+        clock (callable): Returns the current time in seconds
+    """
+
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, ttl=DEFAULT_TTL, clock=time.monotonic):
+        if max_size < 1:
+            raise ValueError("Cache size must be at least 1")
+        if ttl <= 0:
+            raise ValueError("Cache TTL must be positive")
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stamp = 0
+        self._hits = self._misses = self._expired = 0
+        self._evictions = self._invalidations = 0
+
+    def get(self, key):
+        """Return the live entry for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if self._clock() < expires:
+                    self._entries.move_to_end(key)
+                    self._hits += 1
+                    return value
+                del self._entries[key]
+                self._expired += 1
+            self._misses += 1
+            return None
+
+    def stamp(self):
+        """Return a token to pass to put() for a value about to be loaded"""
+        with self._lock:
+            return self._stamp
+
+    def put(self, key, value, since=None):
+        """Store value under key, unless an invalidation came after the since stamp"""
+        with self._lock:
+            if since is not None and since != self._stamp:
+                return False
+            self._entries[key] = (value, self._clock() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+            return True
+
+    def invalidate(self, *keys):
+        """Drop the entries for keys, whether cached or not"""
+        with self._lock:
+            self._stamp += 1
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self._invalidations += 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._stamp += 1
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self):
+        """Return the size, limits and hit, miss, expiry, eviction and invalidation counts"""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / lookups if lookups else None,
+                'expired': self._expired,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+
+
+class NullCache:
+    """Stand-in for EntityCache that never keeps anything"""
+
+    def get(self, key):
+        return None
+
+    def stamp(self):
+        return None
+
+    def put(self, key, value, since=None):
+        return False
+
+    def invalidate(self, *keys):
+        pass
+
+    def clear(self):
+        pass
+
+    def stats(self):
+        return {}
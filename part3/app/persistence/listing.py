@@ -0,0 +1,141 @@
+"""Filtered, sorted and faceted place listings
+
+A listing is one WHERE clause over places (price range, minimum mean
+rating, required amenities) with an ORDER BY that an index serves:
+
+    price        ix_places_price on (price, id)
+    rating       ix_places_rating on (RATING_AVERAGE, id), an expression
+                 index over the rating aggregates reviews keep up to date
+    created_at   ix_places_created_at
+
+"Has all of these amenities" is an INTERSECT of one
+ix_place_amenity_amenity_id range per amenity. Pages are keyset pages: the
+cursor holds the sort key and id of the last place, so every page is an
+index seek.
+
+Facet counts are one more statement over the same WHERE clause: the
+matches are collected once in a CTE, then grouped by price bucket, and
+looked up in the place_amenity primary key and grouped by amenity.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import text
+
+# Mean rating, unrated places counting as 0. The ORDER BY must repeat
+# this text exactly for SQLite to use the expression index.
+RATING_AVERAGE = ("(CASE WHEN review_count > 0 "
+                  "THEN CAST(rating_sum AS REAL) / review_count ELSE 0 END)")
+
+PLACE_SORTS = {
+    'price': 'price',
+    'rating': RATING_AVERAGE,
+    'created_at': 'created_at',
+}
+
+# Upper bounds of the price buckets counted as facets; the last bucket has
+# no upper bound
+PRICE_FACET_EDGES = (50, 100, 200, 500)
+
+_PAGE = """SELECT id, {key} AS sort_key FROM places WHERE {where}
+    ORDER BY {key} {direction}, id {direction} LIMIT :limit"""
+
+_PRICE_BUCKET = ' '.join(
+    ['CASE'] + [f'WHEN price < {edge} THEN {i}' for i, edge in enumerate(PRICE_FACET_EDGES)]
+    + [f'ELSE {len(PRICE_FACET_EDGES)} END'])
+
+_FACETS = f"""WITH matched AS (SELECT id, price FROM places WHERE {{where}})
+    SELECT 'price' AS facet, {_PRICE_BUCKET} AS value, COUNT(*) AS count
+    FROM matched GROUP BY value
+    UNION ALL
+    SELECT 'amenity', place_amenity.amenity_id, COUNT(*)
+    FROM matched CROSS JOIN place_amenity ON place_amenity.place_id = matched.id
+    GROUP BY place_amenity.amenity_id"""
+
+
+def _filter(min_price, max_price, min_rating, amenity_ids):
+    """Return (where, params) for the given criteria"""
+    conditions, params = [], {}
+    if min_price is not None:
+        conditions.append('price >= :min_price')
+        params['min_price'] = min_price
+    if max_price is not None:
+        conditions.append('price <= :max_price')
+        params['max_price'] = max_price
+    if min_rating is not None:
+        # Unrated places never match, as with a NULL average
+        conditions.append('review_count > 0 AND rating_sum >= :min_rating * review_count')
+        params['min_rating'] = min_rating
+    if amenity_ids:
+        ranges = []
+        for i, amenity_id in enumerate(sorted(set(amenity_ids))):
+            ranges.append(f'SELECT place_id FROM place_amenity WHERE amenity_id = :amenity_{i}')
+            params[f'amenity_{i}'] = amenity_id
+        conditions.append(f"id IN ({' INTERSECT '.join(ranges)})")
+    return ' AND '.join(conditions) or '1 = 1', params
+
+
+def encode_sort_cursor(sort, key, place_id):
+    """Opaque cursor pointing just past the place at (key, place_id) in sort order"""
+    if isinstance(key, datetime):
+        key = key.isoformat(' ')
+    raw = json.dumps([sort, key, place_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_sort_cursor(cursor, sort):
+    """Return the (key, place_id) position stored in a cursor for sort"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, key, place_id = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or not isinstance(place_id, str):
+        raise ValueError("Invalid cursor")
+    return key, place_id
+
+
+def list_place_ids(session, sort='created_at', limit=20, cursor=None, min_price=None,
+                   max_price=None, min_rating=None, amenity_ids=None):
+    """Return (place_ids, next_cursor) for one page of matches in sort order
+
+    sort is 'price', 'rating' or 'created_at', with a leading '-' for
+    descending order.
+    """
+    key = PLACE_SORTS.get(sort.lstrip('-'))
+    if key is None:
+        raise ValueError(f"Cannot sort places by '{sort.lstrip('-')}'")
+    descending = sort.startswith('-')
+    where, params = _filter(min_price, max_price, min_rating, amenity_ids)
+    if cursor:
+        params['after_key'], params['after_id'] = decode_sort_cursor(cursor, sort)
+        where += f" AND ({key}, id) {'<' if descending else '>'} (:after_key, :after_id)"
+    params['limit'] = limit + 1
+    statement = text(_PAGE.format(key=key, where=where,
+                                  direction='DESC' if descending else 'ASC'))
+    rows = session.execute(statement, params).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_sort_cursor(sort, rows[-1].sort_key, rows[-1].id)
+    return [row.id for row in rows], next_cursor
+
+
+def place_facets(session, min_price=None, max_price=None, min_rating=None, amenity_ids=None):
+    """Count the matches per price bucket and per amenity
+
+    Returns:
+        tuple: (total, amenity_counts, price_counts); amenity_counts maps
+        amenity id to the number of matches having it and price_counts[i]
+        counts the matches with PRICE_FACET_EDGES[i - 1] <= price <
+        PRICE_FACET_EDGES[i]
+    """
+    where, params = _filter(min_price, max_price, min_rating, amenity_ids)
+    amenity_counts, price_counts = {}, [0] * (len(PRICE_FACET_EDGES) + 1)
+    for row in session.execute(text(_FACETS.format(where=where)), params):
+        if row.facet == 'price':
+            price_counts[int(row.value)] = row.count
+        else:
+            amenity_counts[row.value] = row.count
+    return sum(price_counts), amenity_counts, price_counts
@@ -0,0 +1,58 @@
+"""Bring an existing database up to date with the models
+
+db.create_all() creates the tables that are missing, with their indexes,
+but never changes a table that already exists. A database made before a
+column or index was added to a model would then fail every query reading
+that column. upgrade_schema() closes the gap at startup: it adds each
+missing column with ALTER TABLE ... ADD COLUMN, taking the model's scalar
+default as the column default so that NOT NULL columns can be added to
+tables holding rows, and then creates every missing index.
+
+Adding a unique index fails on a table already holding duplicates; those
+rows have to be removed first.
+"""
+from sqlalchemy import inspect, literal
+from sqlalchemy.schema import CreateIndex
+
+
+def _column_ddl(column, dialect):
+    ddl = f"{column.name} {column.type.compile(dialect=dialect)}"
+    default = column.default
+    if default is not None and default.is_scalar:
+        value = literal(default.arg, column.type).compile(
+            dialect=dialect, compile_kwargs={'literal_binds': True})
+        ddl += f" DEFAULT {value}"
+    elif not column.nullable:
+        raise ValueError(f"Cannot add NOT NULL column '{column.table.name}.{column.name}' "
+                         f"without a default")
+    if not column.nullable:
+        ddl += " NOT NULL"
+    return ddl
+
+
+def upgrade_schema(session, metadata):
+    """Add the columns and indexes of metadata missing from existing tables
+
+    Returns:
+        dict: Table name -> names of the columns added, for tables that got any
+    """
+    connection = session.connection()
+    dialect = connection.dialect
+    inspector = inspect(connection)
+    existing = set(inspector.get_table_names())
+    added = {}
+    for table in metadata.sorted_tables:
+        if table.name not in existing:
+            continue
+        present = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in present:
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, dialect)}")
+                added.setdefault(table.name, []).append(column.name)
+        for index in table.indexes:
+            # IF NOT EXISTS rather than checkfirst, which cannot see
+            # expression indexes on SQLite
+            connection.execute(CreateIndex(index, if_not_exists=True))
+    session.commit()
+    return added
@@ -1,6 +1,28 @@
+import base64
+import json
+import operator
+from datetime import datetime
+
 from app import db
+from sqlalchemy import and_, func, inspect, or_
 from sqlalchemy.exc import IntegrityError
 
+
+def encode_cursor(obj):
+    """Opaque cursor pointing just past obj in (created_at, id) order"""
+    raw = json.dumps([obj.created_at.isoformat(), obj.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (created_at, id) position stored in cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, obj_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), str(obj_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
 class SQLAlchemyRepository:
     """Generic repository for any SQLAlchemy model"""
     def __init__(self, model):
@@ -23,6 +45,48 @@ class SQLAlchemyRepository:
     def get_all(self):
         return self.model.query.all()
 
+    def count(self):
+        """Return the row count with SELECT COUNT(*), without loading rows"""
+        return db.session.query(func.count()).select_from(self.model).scalar()
+
+    def get_page(self, limit, cursor=None):
+        """Return (objects, next_cursor) for one page in creation order
+
+        Keyset pagination: the page starts right after the (created_at, id)
+        position in the cursor, so the database seeks the created_at index
+        instead of skipping rows with OFFSET.
+        """
+        return self._keyset_page(limit, cursor, newest_first=False)
+
+    def get_latest(self, limit, cursor=None):
+        """Return (objects, next_cursor) for one page, newest first"""
+        return self._keyset_page(limit, cursor, newest_first=True)
+
+    def _keyset_page(self, limit, cursor, newest_first):
+        """Page in (created_at, id) order
+
+        created_at gives the order even when ids are time-ordered: rows
+        made with random ids before HBNB_ID_SCHEME=uuid7 was set would sort
+        by id among the new ones, not by age. Ties, such as rows made in
+        the same batch, are broken by id.
+        """
+        model = self.model
+        if newest_first:
+            query = model.query.order_by(model.created_at.desc(), model.id.desc())
+        else:
+            query = model.query.order_by(model.created_at, model.id)
+        if cursor:
+            created_at, obj_id = decode_cursor(cursor)
+            past = operator.lt if newest_first else operator.gt
+            query = query.filter(or_(
+                past(model.created_at, created_at),
+                and_(model.created_at == created_at, past(model.id, obj_id))
+            ))
+        objects = query.limit(limit + 1).all()
+        if len(objects) <= limit:
+            return objects, None
+        return objects[:limit], encode_cursor(objects[limit - 1])
+
     def update(self, obj, data):
         # In SQLAlchemy, modifying the object attributes directly tracks changes.
         # We just need to commit.
@@ -36,7 +100,82 @@ class SQLAlchemyRepository:
         obj = self.get(obj_id)
         if obj:
             db.session.delete(obj)
+            self.commit()
+
+    def commit(self):
+        """Commit the session, turning integrity errors into ValueError"""
+        try:
             db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            raise ValueError("Data integrity error (e.g., duplicate entry)")
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def add_many(self, objs, commit=True):
+        """Insert several objects in a single transaction
+
+        At flush the unit of work groups the pending rows of each table into
+        one executemany INSERT. Either every object is stored or, on an
+        integrity error, none is. With commit=False the caller commits, so
+        several batches can share one transaction.
+        """
+        db.session.add_all(objs)
+        if commit:
+            self.commit()
+        return objs
+
+    def get_many(self, obj_ids):
+        """Return {id: object} for the ids that exist, in one query"""
+        if not obj_ids:
+            return {}
+        return {obj.id: obj for obj in self.model.query.filter(self.model.id.in_(set(obj_ids)))}
+
+    def update_many(self, updates, commit=True):
+        """Apply several (obj_id, data) updates in a single transaction
+
+        data keys name columns or relationships of the model, given values
+        they accept (rows, not ids, for relationships); id, created_at and
+        updated_at are ignored. Returns one entry per update: the updated
+        object, or None if obj_id does not exist.
+
+        Raises:
+            ValueError: If a key is not a column or relationship, before
+                anything is changed
+        """
+        updates = list(updates)
+        mapper = inspect(self.model)
+        known = set(mapper.column_attrs.keys()) | set(mapper.relationships.keys())
+        for _, data in updates:
+            for key in data:
+                if key not in known:
+                    raise ValueError(f"Unknown {self.model.__name__} attribute '{key}'")
+        objs = self.get_many([obj_id for obj_id, _ in updates])
+        results = []
+        for obj_id, data in updates:
+            obj = objs.get(obj_id)
+            if obj is not None:
+                for key, value in data.items():
+                    if key not in ['id', 'created_at', 'updated_at']:
+                        setattr(obj, key, value)
+            results.append(obj)
+        if commit:
+            self.commit()
+        return results
+
+    def delete_many(self, obj_ids, commit=True):
+        """Delete several objects in a single transaction
+
+        Returns one entry per id: True if it was deleted, False if it did
+        not exist.
+        """
+        objs = self.get_many(obj_ids)
+        for obj in objs.values():
+            db.session.delete(obj)
+        if commit:
+            self.commit()
+        return [obj_id in objs for obj_id in obj_ids]
 
     def get_by_attribute(self, attr_name, attr_value):
         return self.model.query.filter(getattr(self.model, attr_name) == attr_value).first()
@@ -0,0 +1,206 @@
+"""Full-text place search with SQLite FTS5
+
+Two FTS5 tables hold the searchable text. place_search has one row per
+place, with the same rowid: its title and description. review_search has
+one row per review, with the review's rowid, keyed by place_id: its text.
+Triggers on places and reviews keep both in step with every write, whether
+it goes through the facade or not, so searches never read a stale index.
+Each write changes only its own row, so a review costs the same to write
+whatever the number of reviews its place already has.
+
+Reviews are gathered per place when searching instead: a place matches if
+each word is in its title, its description or one of its reviews, and
+its score adds the BM25 of its place row to that of its best matching
+review.
+
+Text is matched ignoring case and accents (unicode61 with
+remove_diacritics), and the 2- and 3-letter prefix indexes make
+search-as-you-type prefixes cheap. Title words weigh TITLE_WEIGHT times
+as much as description and review words. Title autocomplete uses
+place_search, restricted to the title column and ordered by review count.
+
+Only SQLite has FTS5; install_search() does nothing on other databases.
+"""
+import base64
+import json
+import re
+
+from sqlalchemy import text
+
+TITLE_WEIGHT = 3.0
+
+_WORD = re.compile(r'\w+')
+
+_TOKENIZE = "tokenize='unicode61 remove_diacritics 2', prefix='2 3'"
+
+SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS place_search USING fts5("
+    f"place_id UNINDEXED, title, description, {_TOKENIZE})",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS review_search USING fts5("
+    f"place_id UNINDEXED, text, {_TOKENIZE})",
+    "CREATE INDEX IF NOT EXISTS ix_reviews_place_id ON reviews (place_id)",
+    """CREATE TRIGGER IF NOT EXISTS place_search_insert AFTER INSERT ON places BEGIN
+        INSERT INTO place_search (rowid, place_id, title, description)
+        VALUES (new.rowid, new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS place_search_update AFTER UPDATE OF title, description ON places BEGIN
+        UPDATE place_search SET title = new.title, description = new.description
+        WHERE rowid = new.rowid;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS place_search_delete AFTER DELETE ON places BEGIN
+        DELETE FROM place_search WHERE rowid = old.rowid;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS review_search_insert AFTER INSERT ON reviews BEGIN
+        INSERT INTO review_search (rowid, place_id, text)
+        VALUES (new.rowid, new.place_id, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS review_search_update AFTER UPDATE OF text, place_id ON reviews BEGIN
+        UPDATE review_search SET place_id = new.place_id, text = new.text
+        WHERE rowid = new.rowid;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS review_search_delete AFTER DELETE ON reviews BEGIN
+        DELETE FROM review_search WHERE rowid = old.rowid;
+    END""",
+]
+
+# Left by the layout that kept all of a place's reviews in its place_search
+# row, rebuilding it on every review write
+_OLD_TRIGGERS = ['place_search_insert', 'place_search_review_insert',
+                 'place_search_review_update', 'place_search_review_delete']
+
+_FILL = [
+    """INSERT INTO place_search (rowid, place_id, title, description)
+        SELECT rowid, id, title, description FROM places""",
+    """INSERT INTO review_search (rowid, place_id, text)
+        SELECT rowid, place_id, text FROM reviews""",
+]
+
+_AUTOCOMPLETE = """SELECT places.id FROM place_search
+    JOIN places ON places.rowid = place_search.rowid
+    WHERE place_search MATCH :match
+    ORDER BY places.review_count DESC, places.title, places.id LIMIT :limit"""
+
+# Places with the word :term{i} in their own row or in one of their reviews
+_HAS_TERM = """SELECT place_id FROM (
+        SELECT place_id FROM place_search WHERE place_search MATCH :term{i}
+        UNION SELECT place_id FROM review_search WHERE review_search MATCH :term{i})"""
+
+# bm25() cannot be aggregated directly, hence the materialized review_hits
+_SEARCH = f"""WITH matched AS ({{matched}}),
+    place_scores AS (
+        SELECT place_id, bm25(place_search, 0.0, {TITLE_WEIGHT}, 1.0) AS score
+        FROM place_search WHERE place_search MATCH :any
+        AND place_id IN (SELECT place_id FROM matched)),
+    review_hits AS MATERIALIZED (
+        SELECT place_id, bm25(review_search, 0.0, 1.0) AS score
+        FROM review_search WHERE review_search MATCH :any
+        AND place_id IN (SELECT place_id FROM matched)),
+    review_scores AS (
+        SELECT place_id, min(score) AS score FROM review_hits GROUP BY place_id)
+    SELECT place_id, score FROM (
+        SELECT matched.place_id,
+               coalesce(place_scores.score, 0.0) + coalesce(review_scores.score, 0.0) AS score
+        FROM matched
+        LEFT JOIN place_scores ON place_scores.place_id = matched.place_id
+        LEFT JOIN review_scores ON review_scores.place_id = matched.place_id)
+    WHERE 1{{after}}
+    ORDER BY score, place_id LIMIT :limit"""
+
+
+def install_search(session):
+    """Create the search tables and their triggers, filling the tables if new
+
+    A place_search table from the layout that also held every review of a
+    place is dropped with its triggers and rebuilt. Returns False, without
+    touching the database, unless it is SQLite.
+    """
+    if session.get_bind().dialect.name != 'sqlite':
+        return False
+    exists = session.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'review_search'")).first()
+    if not exists:
+        for trigger in _OLD_TRIGGERS:
+            session.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        session.execute(text("DROP TABLE IF EXISTS place_search"))
+    for statement in SEARCH_DDL:
+        session.execute(text(statement))
+    if not exists:
+        for statement in _FILL:
+            session.execute(text(statement))
+    session.commit()
+    return True
+
+
+def rebuild_search(session):
+    """Refill the search tables from places and reviews"""
+    for table in ('place_search', 'review_search'):
+        session.execute(text(f"DELETE FROM {table}"))
+    for statement in _FILL:
+        session.execute(text(statement))
+    for table in ('place_search', 'review_search'):
+        session.execute(text(f"INSERT INTO {table} ({table}) VALUES ('optimize')"))
+    session.commit()
+
+
+def _terms(query, prefix):
+    # Quoted words, so FTS5 operators in user input are taken literally,
+    # the last one as a prefix if asked
+    terms = [f'"{word}"' for word in _WORD.findall(query or '')]
+    if terms and prefix:
+        terms[-1] += '*'
+    return terms
+
+
+def title_prefix_query(typed):
+    """FTS5 query for titles with consecutive words starting like typed
+
+    The last word is a prefix unless typed ends in a space or punctuation.
+    Returns None for text without words.
+    """
+    terms = _terms(typed, prefix=typed[-1:].isalnum())
+    return 'title : ' + ' + '.join(terms) if terms else None
+
+
+def autocomplete_place_ids(session, typed, limit):
+    """Ids of places whose title has words starting like typed, most reviewed first"""
+    match = title_prefix_query(typed)
+    if match is None:
+        return []
+    rows = session.execute(text(_AUTOCOMPLETE), {'match': match, 'limit': limit}).all()
+    return [row.id for row in rows]
+
+
+def encode_rank_cursor(score, place_id):
+    """Opaque cursor pointing just past a result at (score, place_id)"""
+    raw = json.dumps([score, place_id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_rank_cursor(cursor):
+    """Return the (score, place_id) position stored in cursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        score, place_id = json.loads(raw)
+        return float(score), str(place_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
+def search_place_ids(session, query, limit, cursor=None):
+    """Return ([(place_id, score)], next_cursor) for one page, best first"""
+    terms = _terms(query, prefix=not query[-1:].isspace())
+    if not terms:
+        raise ValueError("Search query must contain a word")
+    params = {f'term{i}': term for i, term in enumerate(terms)}
+    params.update({'any': ' OR '.join(terms), 'limit': limit + 1})
+    matched = '\n        INTERSECT '.join(_HAS_TERM.format(i=i) for i in range(len(terms)))
+    after = ''
+    if cursor:
+        params['score'], params['place_id'] = decode_rank_cursor(cursor)
+        after = ' AND (score, place_id) > (:score, :place_id)'
+    rows = session.execute(text(_SEARCH.format(matched=matched, after=after)), params).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_rank_cursor(rows[-1].score, rows[-1].place_id)
+    return [(row.place_id, row.score) for row in rows], next_cursor
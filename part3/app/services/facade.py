@@ -1,15 +1,58 @@
+from collections import Counter
+
+from app import db
 from app.models.user import User
 from app.models.place import Place
 from app.models.review import Review
 from app.models.amenity import Amenity
+from app.persistence.cache import EntityCache, Snapshot
+from app.persistence.listing import PRICE_FACET_EDGES, list_place_ids, place_facets
 from app.persistence.repository import SQLAlchemyRepository
+from app.persistence.search import autocomplete_place_ids, rebuild_search, search_place_ids
+from sqlalchemy import and_, func, or_
+from sqlalchemy.exc import IntegrityError
+
+# Histogram column of Place for each rating
+RATING_COLUMNS = {rating: getattr(Place, f'rating_{rating}') for rating in range(1, 6)}
 
 class HBnBFacade:
-    def __init__(self):
+    def __init__(self, cache=None):
         self.user_repo = SQLAlchemyRepository(User)
         self.place_repo = SQLAlchemyRepository(Place)
         self.review_repo = SQLAlchemyRepository(Review)
         self.amenity_repo = SQLAlchemyRepository(Amenity)
+        # Snapshots behind the get_*_snapshot reads; every write
+        # below invalidates the rows it changed once it commits
+        self.cache = cache if cache is not None else EntityCache()
+
+    def _cached(self, repo, obj_id):
+        """Snapshot of a row, from the cache or loaded and cached on a miss"""
+        key = (repo.model.__name__, obj_id)
+        snapshot = self.cache.get(key)
+        if snapshot is None:
+            since = self.cache.stamp()
+            obj = repo.get(obj_id)
+            if obj is None:
+                return None
+            snapshot = Snapshot(obj)
+            self.cache.put(key, snapshot, since)
+        return snapshot
+
+    def _forget(self, model, *obj_ids):
+        self.cache.invalidate(*((model.__name__, obj_id) for obj_id in obj_ids))
+
+    def cache_stats(self):
+        """Size, hit rate and counters of the entity cache"""
+        return self.cache.stats()
+
+    def get_counts(self):
+        """Number of rows of each kind, one COUNT(*) query per table"""
+        return {
+            'users': self.user_repo.count(),
+            'places': self.place_repo.count(),
+            'reviews': self.review_repo.count(),
+            'amenities': self.amenity_repo.count()
+        }
 
     # --------------------
     # User Operations
@@ -18,62 +61,391 @@ class HBnBFacade:
         user = User(**user_data)
         user.hash_password(user_data['password'])
         self.user_repo.add(user)
+        self._forget(User, user.id)
         return user
 
     def get_user(self, user_id):
         return self.user_repo.get(user_id)
 
+    def get_user_snapshot(self, user_id):
+        """Cached read-only snapshot of a user, or None"""
+        return self._cached(self.user_repo, user_id)
+
+    def update_user(self, user_id, user_data):
+        """Update a user's details, hashing a new password; None if not found"""
+        user = self.user_repo.get(user_id)
+        if not user:
+            return None
+        for key, value in user_data.items():
+            if key == 'password':
+                user.hash_password(value)
+            elif key not in ['id', 'created_at', 'updated_at']:
+                setattr(user, key, value)
+        self.user_repo.update(user, user_data)
+        self._forget(User, user_id)
+        return user
+
     def get_user_by_email(self, email):
         return self.user_repo.get_by_attribute('email', email)
 
+    def get_users_page(self, limit, cursor=None):
+        return self.user_repo.get_page(limit, cursor)
+
+    def autocomplete_users(self, typed, limit):
+        """Users whose first name, last name or email starts with typed, by name
+
+        Each condition is a range on an index of lower(column), so the
+        lookup seeks instead of scanning like ILIKE would.
+        """
+        prefix = typed.strip().lower()
+        if not prefix:
+            return []
+        # The first string after every string starting with prefix
+        end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        starts = [and_(func.lower(column) >= prefix, func.lower(column) < end)
+                  for column in (User.first_name, User.last_name, User.email)]
+        return (User.query.filter(or_(*starts))
+                .order_by(User.first_name, User.last_name, User.id).limit(limit).all())
+
     # --------------------
     # Place Operations
     # --------------------
     def create_place(self, place_data):
         place = Place(**place_data)
         self.place_repo.add(place)
+        self._forget(Place, place.id)
         return place
 
     def get_place(self, place_id):
         return self.place_repo.get(place_id)
 
+    def get_place_snapshot(self, place_id):
+        """Cached read-only snapshot of a place, or None"""
+        return self._cached(self.place_repo, place_id)
+
     def get_all_places(self):
         return self.place_repo.get_all()
 
+    def get_places_page(self, limit, cursor=None):
+        return self.place_repo.get_page(limit, cursor)
+
+    def get_newest_places(self, limit, cursor=None):
+        return self.place_repo.get_latest(limit, cursor)
+
     def update_place(self, place_id, place_data):
-        place = self.get_place(place_id)
+        place = self.place_repo.get(place_id)
         if not place:
             return None
         for key, value in place_data.items():
             if key not in ['id', 'created_at', 'updated_at']:
                 setattr(place, key, value)
         self.place_repo.update(place, place_data)
+        self._forget(Place, place_id)
         return place
 
+    def delete_place(self, place_id):
+        self.place_repo.delete(place_id)
+        self._forget(Place, place_id)
+
+    def list_places(self, sort='created_at', limit=20, cursor=None, facets=False, **criteria):
+        """Return (places, next_cursor, facets) for a filtered, sorted page
+
+        criteria are min_price, max_price, min_rating and amenity_ids. sort
+        is 'price', 'rating' or 'created_at', '-' first for descending
+        order, each served by an index. facets is None unless asked for,
+        else {'total', 'amenities', 'price'} counted over every match.
+        """
+        place_ids, next_cursor = list_place_ids(db.session, sort, limit, cursor, **criteria)
+        places = self.place_repo.get_many(place_ids)
+        counts = None
+        if facets:
+            total, amenity_counts, price_counts = place_facets(db.session, **criteria)
+            amenities = self.amenity_repo.get_many(list(amenity_counts))
+            edges = (0, *PRICE_FACET_EDGES, None)
+            counts = {
+                'total': total,
+                'amenities': sorted(
+                    ({'id': amenity_id, 'name': amenities[amenity_id].name, 'count': count}
+                     for amenity_id, count in amenity_counts.items() if amenity_id in amenities),
+                    key=lambda facet: (-facet['count'], facet['name'])),
+                'price': [{'min': lo, 'max': hi, 'count': count}
+                          for lo, hi, count in zip(edges, edges[1:], price_counts)]
+            }
+        return ([places[place_id] for place_id in place_ids if place_id in places],
+                next_cursor, counts)
+
+    def search_places(self, query, limit, cursor=None):
+        """Return (places, next_cursor) matching every word of query, best first
+
+        The last word also matches longer words it begins. Ranked by BM25
+        over the place_search and review_search FTS5 tables, which triggers
+        keep up to date.
+        """
+        ranked, next_cursor = search_place_ids(db.session, query, limit, cursor)
+        places = self.place_repo.get_many([place_id for place_id, _ in ranked])
+        return [places[place_id] for place_id, _ in ranked if place_id in places], next_cursor
+
+    def autocomplete_places(self, typed, limit):
+        """Places with title words starting like typed, most reviewed first"""
+        place_ids = autocomplete_place_ids(db.session, typed, limit)
+        places = self.place_repo.get_many(place_ids)
+        return [places[place_id] for place_id in place_ids if place_id in places]
+
+    def rebuild_search_index(self):
+        """Refill place_search and review_search from places and reviews
+
+        For databases where rows were written with the triggers missing,
+        such as ones created from an older schema.sql.
+        """
+        rebuild_search(db.session)
+
+    def _build_places(self, places_data):
+        # 'owner_id' is stored as the user_id column and 'amenities' is a
+        # list of amenity ids, all looked up with a single query
+        amenity_ids = [amenity_id for data in places_data for amenity_id in data.get('amenities', [])]
+        amenities = self.amenity_repo.get_many(amenity_ids)
+        places = []
+        for data in places_data:
+            data = dict(data)
+            data['user_id'] = data.pop('owner_id', data.get('user_id'))
+            place_amenities = [amenities[amenity_id] for amenity_id in data.pop('amenities', [])
+                               if amenity_id in amenities]
+            place = Place(**data)
+            place.amenities = place_amenities
+            places.append(place)
+        return places
+
+    def _resolve_place_updates(self, updates):
+        # The keys _build_places accepts, resolved the same way: 'owner_id'
+        # sets the user_id column and 'amenities' ids become Amenity rows
+        updates = list(updates)
+        amenity_ids = [amenity_id for _, data in updates for amenity_id in data.get('amenities', [])]
+        amenities = self.amenity_repo.get_many(amenity_ids)
+        resolved = []
+        for place_id, data in updates:
+            data = dict(data)
+            if 'owner_id' in data:
+                data['user_id'] = data.pop('owner_id')
+            if 'amenities' in data:
+                data['amenities'] = [amenities[amenity_id] for amenity_id in data['amenities']
+                                     if amenity_id in amenities]
+            resolved.append((place_id, data))
+        return resolved
+
+    def create_places(self, places_data):
+        """Create several places, with their amenities, in one transaction"""
+        places = self.place_repo.add_many(self._build_places(places_data))
+        self._forget(Place, *(place.id for place in places))
+        return places
+
+    def update_places(self, updates):
+        """Update several places in one transaction; updates are (place_id, data) pairs"""
+        updates = list(updates)
+        try:
+            return self.place_repo.update_many(self._resolve_place_updates(updates))
+        finally:
+            self._forget(Place, *(place_id for place_id, _ in updates))
+
+    def delete_places(self, place_ids):
+        """Delete several places in one transaction"""
+        try:
+            return self.place_repo.delete_many(place_ids)
+        finally:
+            self._forget(Place, *place_ids)
+
+    def apply_place_batch(self, creates, updates, deletes):
+        """Create, update and delete places in one transaction
+
+        Returns:
+            tuple: (created places, update results, delete results)
+        """
+        try:
+            created = self.place_repo.add_many(self._build_places(creates), commit=False)
+            updated = self.place_repo.update_many(self._resolve_place_updates(updates),
+                                                  commit=False)
+            deleted = self.place_repo.delete_many(deletes, commit=False)
+        except Exception:
+            db.session.rollback()
+            raise
+        self.place_repo.commit()
+        self._forget(Place, *(place.id for place in created),
+                     *(place_id for place_id, _ in updates), *deletes)
+        return created, updated, deleted
+
     # --------------------
     # Amenity Operations
     # --------------------
     def create_amenity(self, amenity_data):
         amenity = Amenity(**amenity_data)
         self.amenity_repo.add(amenity)
+        self._forget(Amenity, amenity.id)
         return amenity
 
     def get_amenity(self, amenity_id):
         return self.amenity_repo.get(amenity_id)
 
+    def get_amenity_snapshot(self, amenity_id):
+        """Cached read-only snapshot of an amenity, or None"""
+        return self._cached(self.amenity_repo, amenity_id)
+
+    def update_amenity(self, amenity_id, amenity_data):
+        """Rename an amenity; None if not found
+
+        Place snapshots list their amenities by name, so the whole cache is
+        dropped.
+        """
+        amenity = self.amenity_repo.get(amenity_id)
+        if not amenity:
+            return None
+        for key, value in amenity_data.items():
+            if key not in ['id', 'created_at', 'updated_at']:
+                setattr(amenity, key, value)
+        self.amenity_repo.update(amenity, amenity_data)
+        self.cache.clear()
+        return amenity
+
     def get_all_amenities(self):
         return self.amenity_repo.get_all()
 
+    def create_amenities(self, amenities_data):
+        """Create several amenities in one transaction"""
+        amenities = self.amenity_repo.add_many([Amenity(**data) for data in amenities_data])
+        self._forget(Amenity, *(amenity.id for amenity in amenities))
+        return amenities
+
+    def get_amenities_page(self, limit, cursor=None):
+        return self.amenity_repo.get_page(limit, cursor)
+
     # --------------------
     # Review Operations
     # --------------------
+    def _adjust_ratings(self, place_id, added=(), removed=()):
+        """Move a place's rating aggregates by the ratings added and removed
+
+        Issues one UPDATE ... SET column = column + delta in the caller's
+        transaction. The database applies the deltas, so concurrent reviews
+        of the same place cannot overwrite each other's counts.
+        """
+        deltas = Counter(added)
+        deltas.subtract(removed)
+        for rating in deltas:
+            if rating not in RATING_COLUMNS:
+                raise ValueError("Rating must be an integer between 1 and 5")
+        values = {RATING_COLUMNS[rating]: RATING_COLUMNS[rating] + delta
+                  for rating, delta in deltas.items() if delta}
+        if not values:
+            return
+        values[Place.review_count] = Place.review_count + len(added) - len(removed)
+        values[Place.rating_sum] = Place.rating_sum + sum(added) - sum(removed)
+        Place.query.filter_by(id=place_id).update(values, synchronize_session=False)
+        # Cached snapshots of the place go stale once this commits
+        db.session.info.setdefault('rated_places', set()).add(place_id)
+
+    def _write_reviews(self, write):
+        """Run write() and commit, or roll back everything it did
+
+        Then invalidate the places whose rating aggregates changed.
+        """
+        try:
+            result = write()
+            self.review_repo.commit()
+        except Exception:
+            db.session.rollback()
+            db.session.info.pop('rated_places', None)
+            raise
+        self._forget(Place, *db.session.info.pop('rated_places', ()))
+        return result
+
     def create_review(self, review_data):
-        review = Review(**review_data)
-        self.review_repo.add(review)
-        return review
+        """Create a review, refusing a second one by the same user for the same place
+
+        uq_reviews_user_place rejects the insert when another request got
+        there first, so two concurrent posts cannot both succeed.
+        """
+        def write():
+            review = Review(**review_data)
+            db.session.add(review)
+            self._adjust_ratings(review.place_id, added=[review.rating])
+            return review
+        try:
+            return self._write_reviews(write)
+        except (IntegrityError, ValueError):
+            if self.get_user_review_for_place(review_data.get('user_id'),
+                                              review_data.get('place_id')):
+                raise ValueError("You have already reviewed this place")
+            raise
+
+    def get_user_review_for_place(self, user_id, place_id):
+        """The review user_id wrote for place_id, or None; one uq_reviews_user_place probe"""
+        return Review.query.filter_by(user_id=user_id, place_id=place_id).first()
 
     def get_review(self, review_id):
         return self.review_repo.get(review_id)
 
     def get_all_reviews(self):
         return self.review_repo.get_all()
+
+    def get_reviews_page(self, limit, cursor=None):
+        return self.review_repo.get_page(limit, cursor)
+
+    def get_recent_reviews(self, limit, cursor=None):
+        return self.review_repo.get_latest(limit, cursor)
+
+    def update_review(self, review_id, review_data):
+        """Update a review, moving its rating between the place aggregates"""
+        def write():
+            review = self.get_review(review_id)
+            if not review:
+                return None
+            old_place_id, old_rating = review.place_id, review.rating
+            for key, value in review_data.items():
+                if key not in ['id', 'created_at', 'updated_at', 'user_id']:
+                    setattr(review, key, value)
+            if (review.place_id, review.rating) != (old_place_id, old_rating):
+                self._adjust_ratings(old_place_id, removed=[old_rating])
+                self._adjust_ratings(review.place_id, added=[review.rating])
+            return review
+        return self._write_reviews(write)
+
+    def delete_review(self, review_id):
+        """Delete a review; return False if it does not exist"""
+        def write():
+            review = self.get_review(review_id)
+            if not review:
+                return False
+            self._adjust_ratings(review.place_id, removed=[review.rating])
+            db.session.delete(review)
+            return True
+        return self._write_reviews(write)
+
+    def create_reviews(self, reviews_data):
+        """Create several reviews in one transaction, one aggregate UPDATE per place"""
+        def write():
+            reviews = self.review_repo.add_many([Review(**data) for data in reviews_data],
+                                                commit=False)
+            ratings = {}
+            for review in reviews:
+                ratings.setdefault(review.place_id, []).append(review.rating)
+            for place_id, added in ratings.items():
+                self._adjust_ratings(place_id, added=added)
+            return reviews
+        return self._write_reviews(write)
+
+    def rebuild_rating_aggregates(self):
+        """Recount every place's rating aggregates from its reviews
+
+        For rows written without the facade, such as SQL imports. A single
+        UPDATE with correlated subqueries; it reads the whole reviews table.
+        """
+        def count(*criteria):
+            return (db.session.query(func.count(Review.id))
+                    .filter(Review.place_id == Place.id, *criteria).scalar_subquery())
+        values = {
+            Place.review_count: count(),
+            Place.rating_sum: (db.session.query(func.coalesce(func.sum(Review.rating), 0))
+                               .filter(Review.place_id == Place.id).scalar_subquery())
+        }
+        for rating, column in RATING_COLUMNS.items():
+            values[column] = count(Review.rating == rating)
+        self._write_reviews(lambda: Place.query.update(values, synchronize_session=False))
+        self.cache.clear()
@@ -30,6 +30,14 @@ CREATE TABLE IF NOT EXISTS places (
     latitude FLOAT,
     longitude FLOAT,
     user_id VARCHAR(36) NOT NULL,
+    -- Rating aggregates, maintained with each review write
+    review_count INTEGER NOT NULL DEFAULT 0,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    rating_1 INTEGER NOT NULL DEFAULT 0,
+    rating_2 INTEGER NOT NULL DEFAULT 0,
+    rating_3 INTEGER NOT NULL DEFAULT 0,
+    rating_4 INTEGER NOT NULL DEFAULT 0,
+    rating_5 INTEGER NOT NULL DEFAULT 0,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (user_id) REFERENCES users(id)
@@ -56,3 +64,70 @@ CREATE TABLE IF NOT EXISTS place_amenity (
     FOREIGN KEY (place_id) REFERENCES places(id),
     FOREIGN KEY (amenity_id) REFERENCES amenities(id)
 );
+
+-- Creation-order indexes used by keyset pagination
+CREATE INDEX IF NOT EXISTS ix_users_created_at ON users (created_at);
+CREATE INDEX IF NOT EXISTS ix_amenities_created_at ON amenities (created_at);
+CREATE INDEX IF NOT EXISTS ix_places_created_at ON places (created_at);
+CREATE INDEX IF NOT EXISTS ix_reviews_created_at ON reviews (created_at);
+
+-- One review per user and place. The unique index enforces it, also on
+-- databases created before it, and is the single probe behind the
+-- already-reviewed check.
+CREATE UNIQUE INDEX IF NOT EXISTS uq_reviews_user_place ON reviews (user_id, place_id);
+
+-- Case-insensitive prefix lookups of users (autocomplete)
+CREATE INDEX IF NOT EXISTS ix_users_first_name_lower ON users (lower(first_name));
+CREATE INDEX IF NOT EXISTS ix_users_last_name_lower ON users (lower(last_name));
+CREATE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email));
+
+-- Sorted and filtered place listings. The rating index is over the same
+-- expression as RATING_AVERAGE in app/persistence/listing.py.
+CREATE INDEX IF NOT EXISTS ix_places_price ON places (price, id);
+CREATE INDEX IF NOT EXISTS ix_places_rating ON places (
+    (CASE WHEN review_count > 0 THEN CAST(rating_sum AS REAL) / review_count ELSE 0 END), id);
+CREATE INDEX IF NOT EXISTS ix_place_amenity_amenity_id ON place_amenity (amenity_id, place_id);
+
+-- Full-text place search (SQLite FTS5): one row per place, sharing its
+-- rowid, and one row per review, sharing the review's rowid and keyed by
+-- place_id. Triggers keep them up to date, each write touching only its
+-- own row. See app/persistence/search.py.
+CREATE INDEX IF NOT EXISTS ix_reviews_place_id ON reviews (place_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS place_search USING fts5(
+    place_id UNINDEXED, title, description,
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS review_search USING fts5(
+    place_id UNINDEXED, text,
+    tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS place_search_insert AFTER INSERT ON places BEGIN
+    INSERT INTO place_search (rowid, place_id, title, description)
+    VALUES (new.rowid, new.id, new.title, new.description);
+END;
+
+CREATE TRIGGER IF NOT EXISTS place_search_update AFTER UPDATE OF title, description ON places BEGIN
+    UPDATE place_search SET title = new.title, description = new.description
+    WHERE rowid = new.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS place_search_delete AFTER DELETE ON places BEGIN
+    DELETE FROM place_search WHERE rowid = old.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS review_search_insert AFTER INSERT ON reviews BEGIN
+    INSERT INTO review_search (rowid, place_id, text)
+    VALUES (new.rowid, new.place_id, new.text);
+END;
+
+CREATE TRIGGER IF NOT EXISTS review_search_update AFTER UPDATE OF text, place_id ON reviews BEGIN
+    UPDATE review_search SET place_id = new.place_id, text = new.text
+    WHERE rowid = new.rowid;
+END;
+
+CREATE TRIGGER IF NOT EXISTS review_search_delete AFTER DELETE ON reviews BEGIN
+    DELETE FROM review_search WHERE rowid = old.rowid;
+END;
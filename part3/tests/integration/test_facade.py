@@ -0,0 +1,476 @@
+#!/usr/bin/env python3
+"""Integration tests for the facade over an in-memory SQLite database"""
+import unittest
+import sys
+sys.path.insert(0, '.')
+
+from datetime import datetime, timedelta
+
+from app import create_app, db
+from app.models import ids
+from app.models.place import Place, place_amenity
+from app.models.review import Review
+from app.persistence.migrations import upgrade_schema
+from app.persistence.search import install_search
+from app.services.facade import HBnBFacade
+from sqlalchemy import text
+
+
+class TestPlaceDeletion(unittest.TestCase):
+    """Test deleting places that have reviews and amenities"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        self.facade = HBnBFacade()
+        self.owner = self.facade.create_user({
+            'first_name': 'Olive', 'last_name': 'Owner', 'email': 'olive@example.com',
+            'password': 'secret'})
+        self.guest = self.facade.create_user({
+            'first_name': 'Gus', 'last_name': 'Guest', 'email': 'gus@example.com',
+            'password': 'secret'})
+        self.wifi = self.facade.create_amenity({'name': 'WiFi'})
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def reviewed_place(self, title):
+        place = self.facade.create_place({
+            'title': title, 'price': 50.0, 'user_id': self.owner.id})
+        place.amenities.append(self.wifi)
+        db.session.commit()
+        self.facade.create_review({'text': 'Lovely', 'rating': 5,
+                                   'user_id': self.guest.id, 'place_id': place.id})
+        return place.id
+
+    def assertGone(self, place_id):
+        self.assertIsNone(db.session.get(Place, place_id))
+        self.assertIsNone(self.facade.get_place(place_id))
+        self.assertIsNone(self.facade.get_place_snapshot(place_id))
+        self.assertEqual(Review.query.filter_by(place_id=place_id).count(), 0)
+        links = db.session.query(place_amenity).filter_by(place_id=place_id).count()
+        self.assertEqual(links, 0)
+
+    def test_delete_place_with_reviews(self):
+        """Test a place is deleted together with its reviews and amenity links"""
+        place_id = self.reviewed_place('Loft')
+        self.assertIsNotNone(self.facade.get_place_snapshot(place_id))
+        self.facade.delete_place(place_id)
+        self.assertGone(place_id)
+        self.assertIsNotNone(self.facade.get_amenity(self.wifi.id))
+
+    def test_delete_places_with_reviews(self):
+        """Test the bulk delete removes reviewed places in one transaction"""
+        place_ids = [self.reviewed_place('Loft'), self.reviewed_place('Cabin')]
+        self.assertEqual(self.facade.delete_places(place_ids + ['missing']),
+                         [True, True, False])
+        for place_id in place_ids:
+            self.assertGone(place_id)
+        self.assertEqual(self.facade.get_counts()['reviews'], 0)
+
+
+class TestRatingAggregates(unittest.TestCase):
+    """Test the rating columns kept on places and their migration"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        self.facade = HBnBFacade()
+        owner = self.facade.create_user({
+            'first_name': 'Olive', 'last_name': 'Owner', 'email': 'olive@example.com',
+            'password': 'secret'})
+        self.guests = [self.facade.create_user({
+            'first_name': 'Guest', 'last_name': str(i), 'email': f'guest{i}@example.com',
+            'password': 'secret'}) for i in range(3)]
+        self.loft, self.cabin = [self.facade.create_place({
+            'title': title, 'price': 50.0, 'user_id': owner.id}) for title in ('Loft', 'Cabin')]
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def review(self, guest, place, rating):
+        return self.facade.create_review({'text': 'Stayed here', 'rating': rating,
+                                          'user_id': self.guests[guest].id,
+                                          'place_id': place.id})
+
+    def ratings(self, place):
+        db.session.expire_all()
+        return self.facade.get_place(place.id).ratings()
+
+    def all_ratings(self):
+        return {place.id: self.ratings(place) for place in (self.loft, self.cabin)}
+
+    def test_review_writes(self):
+        """Test creating, updating and deleting reviews moves the aggregates"""
+        first = self.review(0, self.loft, 5)
+        self.review(1, self.loft, 3)
+        self.assertEqual(self.ratings(self.loft),
+                         {'count': 2, 'sum': 8, 'average': 4.0, 'histogram': [0, 0, 1, 0, 1]})
+        self.facade.update_review(first.id, {'rating': 1})
+        self.assertEqual(self.ratings(self.loft)['average'], 2.0)
+        self.assertEqual(self.ratings(self.loft)['histogram'], [1, 0, 1, 0, 0])
+        self.facade.update_review(first.id, {'place_id': self.cabin.id})
+        self.assertEqual(self.ratings(self.loft)['count'], 1)
+        self.assertEqual(self.ratings(self.cabin),
+                         {'count': 1, 'sum': 1, 'average': 1.0, 'histogram': [1, 0, 0, 0, 0]})
+        self.assertTrue(self.facade.delete_review(first.id))
+        self.assertEqual(self.ratings(self.cabin),
+                         {'count': 0, 'sum': 0, 'average': None, 'histogram': [0, 0, 0, 0, 0]})
+        self.assertEqual(self.ratings(self.loft)['average'], 3.0)
+
+    def test_second_review_of_a_place(self):
+        """Test uq_reviews_user_place refuses a second review and the session stays usable"""
+        self.review(0, self.loft, 5)
+        with self.assertRaises(ValueError) as caught:
+            self.review(0, self.loft, 1)
+        self.assertEqual(str(caught.exception), "You have already reviewed this place")
+        self.assertEqual(self.ratings(self.loft)['histogram'], [0, 0, 0, 0, 1])
+        self.assertEqual(Review.query.filter_by(place_id=self.loft.id).count(), 1)
+        self.review(1, self.loft, 3)
+        self.review(0, self.cabin, 4)
+        self.assertEqual(self.ratings(self.loft)['count'], 2)
+        self.assertEqual(self.facade.get_counts()['reviews'], 3)
+
+    def test_rebuild_matches_live(self):
+        """Test recounting from the reviews gives the values the writes kept"""
+        self.review(0, self.loft, 5)
+        self.review(1, self.loft, 2)
+        self.review(2, self.cabin, 4)
+        self.facade.create_reviews([{'text': 'Again', 'rating': 3, 'user_id': self.guests[0].id,
+                                     'place_id': self.cabin.id}])
+        live = self.all_ratings()
+        db.session.execute(text("UPDATE places SET review_count = 0, rating_sum = 0, "
+                                "rating_2 = 7"))
+        db.session.commit()
+        self.facade.rebuild_rating_aggregates()
+        self.assertEqual(self.all_ratings(), live)
+
+    def test_upgrade_schema(self):
+        """Test a places table without the rating columns gets them back, then a recount"""
+        self.review(0, self.loft, 4)
+        self.review(1, self.loft, 2)
+        live = self.all_ratings()
+        columns = ['review_count', 'rating_sum'] + [f'rating_{i}' for i in range(1, 6)]
+        db.session.execute(text("DROP INDEX ix_places_rating"))
+        for column in columns:
+            db.session.execute(text(f"ALTER TABLE places DROP COLUMN {column}"))
+        db.session.commit()
+        added = upgrade_schema(db.session, db.metadata)
+        self.assertEqual(sorted(added['places']), sorted(columns))
+        self.assertNotIn('reviews', added)
+        indexes = db.session.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'index' "
+            "AND name = 'ix_places_rating'")).all()
+        self.assertEqual(len(indexes), 1)
+        self.assertEqual(self.ratings(self.loft)['count'], 0)
+        self.facade.rebuild_rating_aggregates()
+        self.assertEqual(self.all_ratings(), live)
+        self.assertEqual(upgrade_schema(db.session, db.metadata), {})
+
+
+class TestPlaceBatch(unittest.TestCase):
+    """Test batch place updates take the keys batch creates take"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        self.facade = HBnBFacade()
+        self.owner = self.facade.create_user({
+            'first_name': 'Olive', 'last_name': 'Owner', 'email': 'olive@example.com',
+            'password': 'secret'})
+        self.heir = self.facade.create_user({
+            'first_name': 'Hal', 'last_name': 'Heir', 'email': 'hal@example.com',
+            'password': 'secret'})
+        self.wifi, self.pool = self.facade.create_amenities([{'name': 'WiFi'}, {'name': 'Pool'}])
+        self.place = self.facade.create_places([{
+            'title': 'Loft', 'price': 50.0, 'owner_id': self.owner.id,
+            'amenities': [self.wifi.id]}])[0]
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def test_update_owner_and_amenities(self):
+        """Test owner_id and amenity ids in an update are resolved like in a create"""
+        _, updated, _ = self.facade.apply_place_batch([], [(self.place.id, {
+            'owner_id': self.heir.id, 'amenities': [self.pool.id, 'missing']})], [])
+        self.assertEqual(updated[0].user_id, self.heir.id)
+        db.session.expire_all()
+        place = self.facade.get_place(self.place.id)
+        self.assertEqual(place.owner_id, self.heir.id)
+        self.assertEqual([amenity.name for amenity in place.amenities], ['Pool'])
+
+    def test_update_unknown_key(self):
+        """Test an update with a key that is not a place attribute changes nothing"""
+        with self.assertRaises(ValueError):
+            self.facade.update_places([(self.place.id, {'title': 'Attic', 'rooms': 3})])
+        db.session.expire_all()
+        self.assertEqual(self.facade.get_place(self.place.id).title, 'Loft')
+
+
+class TestPlaceListing(unittest.TestCase):
+    """Test filtered, sorted and faceted listings page like the whole list"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        self.facade = HBnBFacade()
+        owner = self.facade.create_user({
+            'first_name': 'Olive', 'last_name': 'Owner', 'email': 'olive@example.com',
+            'password': 'secret'})
+        guests = [self.facade.create_user({
+            'first_name': 'Guest', 'last_name': str(i), 'email': f'guest{i}@example.com',
+            'password': 'secret'}) for i in range(2)]
+        self.wifi, self.pool = self.facade.create_amenities([{'name': 'WiFi'}, {'name': 'Pool'}])
+        # Two places share a price, two a mean rating and two a creation time,
+        # so ties have to be broken by id across page boundaries
+        prices = [30.0, 120.0, 75.0, 75.0, 600.0, 250.0, 45.0]
+        amenities = [[self.wifi.id], [self.wifi.id, self.pool.id], [], [self.pool.id],
+                     [self.wifi.id, self.pool.id], [self.wifi.id], []]
+        ratings = [[5], [4, 2], [3], [5, 4], [], [1], []]
+        start = datetime(2025, 1, 1)
+        self.places = self.facade.create_places([{
+            'title': f'Place {i}', 'price': price, 'owner_id': owner.id,
+            'amenities': amenity_ids} for i, (price, amenity_ids)
+            in enumerate(zip(prices, amenities))])
+        for i, place in enumerate(self.places):
+            place.created_at = start + timedelta(hours=min(i, 5))
+        db.session.commit()
+        self.facade.create_reviews([
+            {'text': 'Fine', 'rating': rating, 'user_id': guests[j].id, 'place_id': place.id}
+            for place, place_ratings in zip(self.places, ratings)
+            for j, rating in enumerate(place_ratings)])
+        db.session.expire_all()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def key(self, place, sort):
+        name = sort.lstrip('-')
+        if name == 'rating':
+            return place.ratings()['average'] or 0
+        return getattr(place, name)
+
+    def expected(self, sort, match=lambda place: True):
+        places = [place for place in self.places if match(place)]
+        places.sort(key=lambda place: (self.key(place, sort), place.id),
+                    reverse=sort.startswith('-'))
+        return [place.id for place in places]
+
+    def paged(self, sort, limit, **criteria):
+        ids, cursor = [], None
+        while True:
+            page, cursor, _ = self.facade.list_places(sort, limit, cursor, **criteria)
+            self.assertLessEqual(len(page), limit)
+            ids.extend(place.id for place in page)
+            if cursor is None:
+                return ids
+
+    def test_sort_orders_across_pages(self):
+        """Test every sort, both directions, gives the full order across pages"""
+        for sort in ['price', '-price', 'rating', '-rating', 'created_at', '-created_at']:
+            for limit in (1, 2, 3):
+                with self.subTest(sort=sort, limit=limit):
+                    self.assertEqual(self.paged(sort, limit), self.expected(sort))
+
+    def test_filters_across_pages(self):
+        """Test price, rating and amenity filters combine and page in order"""
+        def has(place, *amenities):
+            return {amenity.id for amenity in amenities} <= {a.id for a in place.amenities}
+        cases = [
+            ({'min_price': 45, 'max_price': 250}, lambda p: 45 <= p.price <= 250),
+            ({'min_rating': 3}, lambda p: (p.ratings()['average'] or 0) >= 3),
+            ({'amenity_ids': [self.wifi.id]}, lambda p: has(p, self.wifi)),
+            ({'amenity_ids': [self.wifi.id, self.pool.id]},
+             lambda p: has(p, self.wifi, self.pool)),
+            ({'amenity_ids': [self.pool.id], 'max_price': 200, 'min_rating': 2},
+             lambda p: has(p, self.pool) and p.price <= 200
+             and (p.ratings()['average'] or 0) >= 2),
+        ]
+        for criteria, match in cases:
+            for sort in ['price', '-rating', 'created_at']:
+                with self.subTest(criteria=criteria, sort=sort):
+                    expected = self.expected(sort, match)
+                    self.assertTrue(expected)
+                    self.assertEqual(self.paged(sort, 1, **criteria), expected)
+
+    def test_facets_with_filters(self):
+        """Test facet counts cover every match of the filter, not just the page"""
+        _, _, facets = self.facade.list_places('price', 1, facets=True, max_price=300)
+        self.assertEqual(facets['total'], 6)
+        self.assertEqual(facets['amenities'], [
+            {'id': self.wifi.id, 'name': 'WiFi', 'count': 3},
+            {'id': self.pool.id, 'name': 'Pool', 'count': 2}])
+        self.assertEqual([bucket['count'] for bucket in facets['price']], [2, 2, 1, 1, 0])
+        _, _, facets = self.facade.list_places('price', 1, facets=True,
+                                               amenity_ids=[self.pool.id], min_rating=4)
+        self.assertEqual(facets['total'], 1)
+        self.assertEqual(facets['amenities'], [
+            {'id': self.pool.id, 'name': 'Pool', 'count': 1}])
+        self.assertEqual([bucket['count'] for bucket in facets['price']], [0, 1, 0, 0, 0])
+
+    def test_invalid_sort_or_cursor(self):
+        """Test unknown sorts and cursors from another sort are rejected"""
+        _, cursor, _ = self.facade.list_places('price', 1)
+        for sort, page_cursor in [('title', None), ('rating', cursor), ('price', 'bogus')]:
+            with self.assertRaises(ValueError):
+                self.facade.list_places(sort, 1, page_cursor)
+
+
+class TestEntityCache(unittest.TestCase):
+    """Test the cached snapshot reads next to the model reads"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        self.facade = HBnBFacade()
+        owner = self.facade.create_user({
+            'first_name': 'Olive', 'last_name': 'Owner', 'email': 'olive@example.com',
+            'password': 'secret'})
+        self.place = self.facade.create_place({
+            'title': 'Loft', 'price': 50.0, 'user_id': owner.id})
+        self.place.amenities.append(self.facade.create_amenity({'name': 'WiFi'}))
+        db.session.commit()
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def test_get_place_returns_model(self):
+        """Test get_place returns the model object and does not use the cache"""
+        place = self.facade.get_place(self.place.id)
+        self.assertIsInstance(place, Place)
+        self.assertEqual([amenity.name for amenity in place.amenities], ['WiFi'])
+        self.assertEqual(self.facade.cache_stats()['size'], 0)
+
+    def test_snapshot_is_cached_and_read_only(self):
+        """Test snapshots come from the cache and share frozen nested values"""
+        first = self.facade.get_place_snapshot(self.place.id)
+        second = self.facade.get_place_snapshot(self.place.id)
+        self.assertIs(first, second)
+        self.assertEqual(self.facade.cache_stats()['hits'], 1)
+        with self.assertRaises(AttributeError):
+            first.title = 'Changed'
+        data = first.to_dict()
+        data['extra'] = True
+        self.assertNotIn('extra', first.to_dict())
+        self.assertIs(data['amenities'], first.to_dict()['amenities'])
+        with self.assertRaises(TypeError):
+            data['ratings']['count'] = 10
+        self.assertEqual(data['amenities'][0]['name'], 'WiFi')
+
+    def test_update_invalidates_snapshot(self):
+        """Test a facade update drops the cached snapshot"""
+        self.facade.get_place_snapshot(self.place.id)
+        self.facade.update_place(self.place.id, {'title': 'Cabin'})
+        self.assertEqual(self.facade.get_place_snapshot(self.place.id).title, 'Cabin')
+
+
+class TestSearch(unittest.TestCase):
+    """Test full-text search over place rows and per-review rows"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        self.facade = HBnBFacade()
+        owner = self.facade.create_user({
+            'first_name': 'Olive', 'last_name': 'Owner', 'email': 'olive@example.com',
+            'password': 'secret'})
+        self.guest = self.facade.create_user({
+            'first_name': 'Gus', 'last_name': 'Guest', 'email': 'gus@example.com',
+            'password': 'secret'})
+        self.beach = self.facade.create_place({
+            'title': 'Quiet beach house', 'price': 50.0, 'user_id': owner.id})
+        self.loft = self.facade.create_place({
+            'title': 'City loft', 'description': 'Busy street', 'price': 80.0,
+            'user_id': owner.id})
+
+    def tearDown(self):
+        db.session.remove()
+        self.context.pop()
+
+    def titles(self, query):
+        return [place.title for place in self.facade.search_places(query, 10)[0]]
+
+    def review_rows(self):
+        return db.session.execute(text("SELECT count(*) FROM review_search")).scalar()
+
+    def test_words_across_place_and_reviews(self):
+        """Test a place matches with its words split between its row and its reviews"""
+        review = self.facade.create_review({'text': 'Near the beach', 'rating': 4,
+                                            'user_id': self.guest.id,
+                                            'place_id': self.loft.id})
+        self.assertEqual(self.review_rows(), 1)
+        self.assertEqual(self.titles('loft beach'), ['City loft'])
+        self.assertEqual(self.titles('beac'), ['Quiet beach house', 'City loft'])
+        self.facade.update_review(review.id, {'text': 'Near the park'})
+        self.assertEqual(self.titles('loft beach'), [])
+        self.assertEqual(self.titles('loft park'), ['City loft'])
+        self.facade.delete_review(review.id)
+        self.assertEqual(self.review_rows(), 0)
+        self.assertEqual(self.titles('park'), [])
+
+    def test_install_replaces_old_layout(self):
+        """Test install_search rebuilds a place_search table that held all reviews"""
+        self.facade.create_review({'text': 'Near the beach', 'rating': 4,
+                                   'user_id': self.guest.id, 'place_id': self.loft.id})
+        for statement in ["DROP TABLE review_search", "DROP TABLE place_search",
+                          "CREATE VIRTUAL TABLE place_search USING fts5("
+                          "place_id UNINDEXED, title, description, reviews)",
+                          """CREATE TRIGGER place_search_review_insert AFTER INSERT ON reviews
+                          BEGIN UPDATE place_search SET reviews = new.text; END"""]:
+            db.session.execute(text(statement))
+        db.session.commit()
+        self.assertTrue(install_search(db.session))
+        triggers = db.session.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'trigger' "
+            "AND name = 'place_search_review_insert'")).all()
+        self.assertEqual(triggers, [])
+        self.assertEqual(self.review_rows(), 1)
+        self.assertEqual(self.titles('loft beach'), ['City loft'])
+
+
+class TestNewestFirst(unittest.TestCase):
+    """Test newest-first pages over random and time-ordered ids"""
+
+    def setUp(self):
+        self.app = create_app('testing')
+        self.context = self.app.app_context()
+        self.context.push()
+        self.facade = HBnBFacade()
+
+    def tearDown(self):
+        ids.use_scheme('uuid4')
+        db.session.remove()
+        self.context.pop()
+
+    def test_mixed_schemes(self):
+        """Test rows made with random ids before switching to uuid7 still page by age"""
+        start = datetime(2025, 1, 1)
+        made = []
+        for i in range(12):
+            if i == 6:
+                ids.use_scheme('uuid7')
+            made.append(self.facade.create_amenity({'name': f'Amenity {i}'}))
+            made[-1].created_at = start + timedelta(minutes=i)
+        db.session.commit()
+        newest, cursor = [], None
+        while True:
+            page, cursor = self.facade.amenity_repo.get_latest(5, cursor)
+            newest.extend(amenity.id for amenity in page)
+            if cursor is None:
+                break
+        self.assertEqual(newest, [amenity.id for amenity in reversed(made)])
+
+
+if __name__ == '__main__':
+    unittest.main()
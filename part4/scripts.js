@@ -90,10 +90,11 @@ function checkAuthenticationIndex() {
         loginLink.style.display = 'none';
         fetchPlaces(token);
     }
+    setupPriceFilter(token);
 }
 
 
-async function fetchPlaces(token = null) {
+async function fetchPlaces(token = null, maxPrice = 'All') {
 
     try {
         const headers = {};
@@ -102,7 +103,13 @@ async function fetchPlaces(token = null) {
             headers['Authorization'] = `Bearer ${token}`;
         }
 
-        const response = await fetch('http://127.0.0.1:5000/api/v1/places', {
+        // The API filters by price, so only matching places are sent
+        const url = new URL('http://127.0.0.1:5000/api/v1/places/');
+        if (maxPrice !== 'All') {
+            url.searchParams.set('max_price', maxPrice);
+        }
+
+        const response = await fetch(url, {
             method: 'GET',
             headers: headers
         });
@@ -113,7 +120,6 @@ async function fetchPlaces(token = null) {
 
         const places = await response.json();
         displayPlaces(places);
-        setupPriceFilter();
 
     } catch (error) {
         console.error(error);
@@ -145,28 +151,13 @@ function displayPlaces(places) {
 }
 
 
-function setupPriceFilter() {
+function setupPriceFilter(token = null) {
 
     const filter = document.getElementById('price-filter');
     if (!filter) return;
 
     filter.addEventListener('change', (event) => {
-
-        const selectedPrice = event.target.value;
-        const placeCards = document.querySelectorAll('.place-card');
-
-        placeCards.forEach(card => {
-
-            const placePrice = parseFloat(card.getAttribute('data-price'));
-
-            if (selectedPrice === 'All') {
-                card.style.display = 'block';
-            } else if (placePrice <= parseFloat(selectedPrice)) {
-                card.style.display = 'block';
-            } else {
-                card.style.display = 'none';
-            }
-        });
+        fetchPlaces(token, event.target.value);
     });
 }
 